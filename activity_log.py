@@ -0,0 +1,1391 @@
+# Georgius Benedikt Ermanta
+# Fintech
+# This module stores the users' key actions during the blockchain simulation, only allocating memory for what has
+# actually been recorded.
+
+'''
+activity_log.py
+---------------
+A module to store the user activity log of the blockchain simulation.
+
+This module defines 3 storage backends for the log. In all of them, entries are only created when an action, prize,
+electricity bill or bankruptcy is recorded, instead of creating an empty entry for every user and every day before the
+simulation starts.
+- `SparseActivityLog` stores the recorded entries in dictionaries, per user and per day.
+- `ColumnarActivityLog` stores every record as an event in typed columns (day, user id, event code and value), which
+costs a few bytes per event and allows whole-run aggregations to be computed as a single vectorized reduction.
+- `MemmapActivityLog` stores the same events as fixed-width records in a memory-mapped file, for logs larger than the
+available memory. An existing log file can be opened for analysis without reading it fully.
+
+For reading, all logs behave like the nested dictionary,
+    {
+        user_name: {
+            day: {
+                action: [param]
+            }
+        }
+    }
+where:
+    - user_name : str
+        The user name.
+    - day : str
+        The day during the simulation (e.g. 'Day 1').
+    - action : str
+        'Action 1', 'Action 2', 'Action 3' and 'Action 4' always map to a (possibly empty) list of the parameters of
+        the actions performed. 'Electricity', 'Prize' and 'Bankrupt' are only present when they have been recorded.
+Days without any record read as an entry with 4 empty action lists, and iterating over a user's log goes through
+every day of the simulation, so `print_actions` in `main.py` works unchanged.
+The recorded events can also be listed in the order they were recorded (`events`), e.g. to write them to a checkpoint
+and record them again into a new log.
+
+Classes
+-------
+ActivityLog
+    The base class of the log backends, providing the nested dictionary read access.
+SparseActivityLog
+    A class to store the user activity log in dictionaries, allocating entries lazily.
+ColumnarActivityLog
+    A class to store the user activity log as events in typed columns.
+MemmapActivityLog
+    A class to store the user activity log as fixed-width event records in a memory-mapped file.
+RecordField
+    A read-only column of the records of a memory-mapped log.
+UserLog
+    A read-only view of a single user's log, indexed by day.
+'''
+
+# import libraries
+import bisect
+from abc import ABC, abstractmethod
+import json
+import mmap
+import struct
+from array import array
+
+# numpy is optional: it is only used to aggregate the columnar log
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# the actions that are stored as lists of parameters
+ACTIONS = ('Action 1', 'Action 2', 'Action 3', 'Action 4')
+
+# event codes of the columnar log
+EVENT_CODES = {'Action 1': 1, 'Action 2': 2, 'Action 3': 3, 'Action 4': 4, 'Electricity': 5, 'Prize': 6, 'Bankrupt': 7}
+EVENT_KEYS = {code: key for key, code in EVENT_CODES.items()}
+
+# numeric encoding of the text parameters (machine status, mining type, and bankruptcy status)
+PARAM_CODES = {'off': 0.0, 'on': 1.0, 'solo': 0.0, 'pooled': 1.0, 'no': 0.0, 'yes': 1.0}
+PARAM_DECODERS = {
+    'Action 3': lambda value: 'on' if value else 'off',
+    'Action 4': lambda value: 'pooled' if value else 'solo',
+    'Bankrupt': lambda value: 'yes' if value else 'no',
+}
+
+# file layout of the memory-mapped log: a 24-byte header (magic, version, flags, number of days and number of records)
+# followed by 24-byte records (day, user id, event code, 7 padding bytes and value)
+LOG_MAGIC = b'SDPALOG\x00'
+LOG_VERSION = 1
+LOG_HEADER = struct.Struct('<8sHHIQ')
+LOG_RECORD = struct.Struct('<IIB7xd')
+# header flag of logs whose events were not recorded in chronological order
+LOG_UNORDERED = 1
+# the smallest number of records the file grows to (a closed log is truncated to its records, possibly none)
+LOG_MIN_CAPACITY = 1024
+# NumPy view of a record
+if np is not None:
+    LOG_DTYPE = np.dtype({'names': ['day', 'user', 'code', 'value'], 'formats': ['<u4', '<u4', 'u1', '<f8'],
+                          'offsets': [0, 4, 8, 16], 'itemsize': LOG_RECORD.size})
+
+class ActivityLog(ABC):
+    '''
+    The base class of the log backends.
+
+    Subclasses store the records, and must implement the abstract methods `add_user`, `record`, `day_entry`,
+    `recorded_days` and `user_names` (an incomplete backend cannot be instantiated). This class provides the read
+    access as a nested dictionary (`log[user_name]['Day 1']['Action 1']`).
+    ...
+
+    Attributes
+    ----------
+    n_days : int
+        Number of days in the simulation.
+
+    Methods
+    -------
+    add_user(user_name)
+        Adds a user with an empty log.
+    record(user_name, current_day, key, param)
+        Records an action, prize, electricity bill or bankruptcy.
+    record_many(user_names, current_day, key, params)
+        Records the same kind of entry for several users.
+    day_entry(user_name, current_day)
+        Returns the entry of a user on a given day.
+    recorded_days(user_name)
+        Returns the days on which something has been recorded for a user.
+    user_names()
+        Returns the names of the users in the log.
+    events(first_day = 1, last_day = None)
+        Returns the events recorded over a range of days.
+    '''
+
+    def __init__(self, n_days, user_names = ()):
+        '''
+        Parameters
+        ----------
+        n_days : int
+            Number of days in the simulation.
+        user_names : iterable, optional
+            The names of the users (default is an empty tuple).
+        '''
+
+        # store the number of days in the simulation
+        self.n_days = n_days
+        for user_name in user_names:
+            self.add_user(user_name)
+
+    @abstractmethod
+    def add_user(self, user_name):
+        raise NotImplementedError
+
+    @abstractmethod
+    def record(self, user_name, current_day, key, param):
+        raise NotImplementedError
+
+    # record the same kind of entry for several users
+    def record_many(self, user_names, current_day, key, params):
+        '''
+        Records the same kind of entry (e.g. the electricity bill) for several users on the same day.
+
+        Parameters
+        ----------
+        user_names : iterable
+            The user names.
+        current_day : int
+            The current day.
+        key : str
+            'Action 1', 'Action 2', 'Action 3', 'Action 4', 'Electricity', 'Prize' or 'Bankrupt'.
+        params : iterable
+            The parameter (or value) of each user, in the same order as `user_names`.
+        '''
+
+        for user_name, param in zip(user_names, params):
+            self.record(user_name, current_day, key, param)
+
+    @abstractmethod
+    def day_entry(self, user_name, current_day):
+        raise NotImplementedError
+
+    @abstractmethod
+    def recorded_days(self, user_name):
+        raise NotImplementedError
+
+    @abstractmethod
+    def user_names(self):
+        raise NotImplementedError
+
+    # the events of a range of days
+    def events(self, first_day = 1, last_day = None):
+        '''
+        Returns the events recorded from `first_day` to `last_day` (inclusive), day by day. Recording the events
+        in the returned order into an empty log reproduces the entries of these days.
+
+        Parameters
+        ----------
+        first_day : int, optional
+            The first day (default is 1).
+        last_day : int, optional
+            The last day (default is None, i.e. the last recorded day).
+
+        Returns
+        -------
+        list
+            A list of `(user_name, day, key, param)` tuples.
+        '''
+
+        events = []
+        for user_name in self.user_names():
+            for day in self.recorded_days(user_name):
+                if day < first_day or (last_day is not None and day > last_day):
+                    continue
+                for key, param in self.day_entry(user_name, day).items():
+                    if key in ACTIONS:
+                        events.extend((user_name, day, key, action_param) for action_param in param)
+                    else:
+                        events.append((user_name, day, key, param))
+        # sort by day, keeping the order of the records within the day
+        events.sort(key = lambda event: event[1])
+        return events
+
+    # read access, as a nested dictionary
+    def __getitem__(self, user_name):
+        if user_name not in self:
+            raise KeyError(user_name)
+        return UserLog(self, user_name)
+
+    def __contains__(self, user_name):
+        return user_name in self.user_names()
+
+    def __iter__(self):
+        return iter(self.user_names())
+
+    def __len__(self):
+        return len(self.user_names())
+
+    def keys(self):
+        return self.user_names()
+
+    def items(self):
+        return ((user_name, UserLog(self, user_name)) for user_name in self.user_names())
+
+class SparseActivityLog(ActivityLog):
+    '''
+    A class to store the user activity log in dictionaries, allocating entries lazily.
+    ...
+
+    Attributes
+    ----------
+    n_days : int
+        Number of days in the simulation.
+    entries : dict
+        Stores the user names (keys) and their recorded days (values). The recorded days are stored as a dictionary
+        of the day number (int) and the entry of the day (dict), where the entry only contains what has been recorded.
+
+    Methods
+    -------
+    add_user(user_name)
+        Adds a user with an empty log.
+    record(user_name, current_day, key, param)
+        Records an action, prize, electricity bill or bankruptcy.
+    record_many(user_names, current_day, key, params)
+        Records the same kind of entry for several users.
+    day_entry(user_name, current_day)
+        Returns the entry of a user on a given day.
+    recorded_days(user_name)
+        Returns the days on which something has been recorded for a user.
+    user_names()
+        Returns the names of the users in the log.
+    '''
+
+    def __init__(self, n_days, user_names = ()):
+        '''
+        Parameters
+        ----------
+        n_days : int
+            Number of days in the simulation.
+        user_names : iterable, optional
+            The names of the users (default is an empty tuple).
+        '''
+
+        # recorded entries for each user
+        self.entries = {}
+        super().__init__(n_days, user_names)
+
+    # add a user with an empty log
+    def add_user(self, user_name):
+        '''
+        Adds a user with an empty log. Does nothing if the user already exists.
+
+        Parameters
+        ----------
+        user_name : str
+            The user name.
+        '''
+
+        if user_name not in self.entries:
+            self.entries[user_name] = {}
+
+    # record an action, prize, electricity bill or bankruptcy
+    def record(self, user_name, current_day, key, param):
+        '''
+        Records an action, prize, electricity bill or bankruptcy.
+
+        Parameters
+        ----------
+        user_name : str
+            The user name.
+        current_day : int
+            The current day.
+        key : str
+            'Action 1', 'Action 2', 'Action 3' or 'Action 4' to append `param` to the list of parameters of the action,
+            or 'Electricity', 'Prize' or 'Bankrupt' to set the value of the entry.
+        param
+            The parameter of the action, or the value of the entry.
+        '''
+
+        # create the user's log and the day's entry only when needed
+        user_entries = self.entries.get(user_name)
+        if user_entries is None:
+            user_entries = self.entries[user_name] = {}
+        entry = user_entries.get(current_day)
+        if entry is None:
+            entry = user_entries[current_day] = {}
+
+        # actions are stored as lists of parameters
+        if key in ACTIONS:
+            if key in entry:
+                entry[key].append(param)
+            else:
+                entry[key] = [param]
+        else:
+            entry[key] = param
+
+    # record the same kind of entry for several users
+    def record_many(self, user_names, current_day, key, params):
+        '''
+        Records the same kind of entry (e.g. the electricity bill) for several users on the same day, in a single loop
+        without a method call per entry.
+
+        Parameters
+        ----------
+        user_names : iterable
+            The user names.
+        current_day : int
+            The current day.
+        key : str
+            'Action 1', 'Action 2', 'Action 3', 'Action 4', 'Electricity', 'Prize' or 'Bankrupt'.
+        params : iterable
+            The parameter (or value) of each user, in the same order as `user_names`.
+        '''
+
+        # actions are appended to lists, as in `record`
+        if key in ACTIONS:
+            for user_name, param in zip(user_names, params):
+                self.record(user_name, current_day, key, param)
+            return
+
+        entries = self.entries
+        for user_name, param in zip(user_names, params):
+            user_entries = entries.get(user_name)
+            if user_entries is None:
+                user_entries = entries[user_name] = {}
+            entry = user_entries.get(current_day)
+            if entry is None:
+                user_entries[current_day] = {key: param}
+            else:
+                entry[key] = param
+
+    # the entry of a user on a given day
+    def day_entry(self, user_name, current_day):
+        '''
+        Returns the entry of a user on a given day, in the same format as the eagerly created log, i.e. the 4 action
+        lists are always present, followed by the recorded 'Electricity', 'Prize' and 'Bankrupt' values.
+        The returned entry is a new dictionary; modifying it does not change the log (use `record` instead).
+
+        Parameters
+        ----------
+        user_name : str
+            The user name.
+        current_day : int
+            The day.
+
+        Returns
+        -------
+        dict
+            The entry of the day.
+
+        Raises
+        ------
+        KeyError
+            If the user is not in the log.
+        '''
+
+        entry = self.entries[user_name].get(current_day)
+        # days without any record
+        if entry is None:
+            return {action: [] for action in ACTIONS}
+
+        day_entry = {action: entry.get(action, []) for action in ACTIONS}
+        for key, param in entry.items():
+            if key not in day_entry:
+                day_entry[key] = param
+        return day_entry
+
+    # days with a record
+    def recorded_days(self, user_name):
+        '''
+        Returns the days on which something has been recorded for a user, in ascending order.
+
+        Parameters
+        ----------
+        user_name : str
+            The user name.
+
+        Returns
+        -------
+        list
+            The recorded days (int).
+        '''
+
+        return sorted(self.entries[user_name])
+
+    # names of the users
+    def user_names(self):
+        '''
+        Returns the names of the users in the log.
+
+        Returns
+        -------
+        dict_keys
+            The user names, in the order they were added.
+        '''
+
+        return self.entries.keys()
+
+    # the events of a range of days
+    def events(self, first_day = 1, last_day = None):
+        '''
+        Returns the events recorded from `first_day` to `last_day` (inclusive), day by day, see `ActivityLog.events`.
+        The entries are read directly, in the order their keys were first recorded.
+
+        Parameters
+        ----------
+        first_day : int, optional
+            The first day (default is 1).
+        last_day : int, optional
+            The last day (default is None, i.e. the last recorded day).
+
+        Returns
+        -------
+        list
+            A list of `(user_name, day, key, param)` tuples.
+        '''
+
+        events = []
+
+        # a few days (e.g. the last day): look the days up, instead of going through every entry of every user
+        if last_day is not None and (last_day - first_day + 1) * 2 <= self.n_days:
+            for day in range(max(first_day, 1), last_day + 1):
+                for user_name, user_entries in self.entries.items():
+                    entry = user_entries.get(day)
+                    if entry is None:
+                        continue
+                    for key, param in entry.items():
+                        if key in ACTIONS:
+                            events.extend((user_name, day, key, action_param) for action_param in param)
+                        else:
+                            events.append((user_name, day, key, param))
+            return events
+
+        for user_name, user_entries in self.entries.items():
+            for day, entry in user_entries.items():
+                if day < first_day or (last_day is not None and day > last_day):
+                    continue
+                for key, param in entry.items():
+                    if key in ACTIONS:
+                        events.extend((user_name, day, key, action_param) for action_param in param)
+                    else:
+                        events.append((user_name, day, key, param))
+        # sort by day, keeping the order of the records within the day
+        events.sort(key = lambda event: event[1])
+        return events
+
+class ColumnarActivityLog(ActivityLog):
+    '''
+    A class to store the user activity log as events in typed columns.
+
+    Every record is appended as one event to 4 columns: the day (unsigned int), the user id (unsigned int), the event
+    code (unsigned char, see `EVENT_CODES`) and the value (double). Text parameters ('on'/'off', 'solo'/'pooled',
+    'yes') are encoded as 1.0/0.0. The columns are `array.array` buffers, which grow in chunks, so an event costs
+    17 bytes instead of the dictionaries and lists of the other backends.
+    Events are expected to be recorded in chronological order (as in the simulation), which allows the entries of a
+    day to be read without scanning the whole log.
+    ...
+
+    Attributes
+    ----------
+    n_days : int
+        Number of days in the simulation.
+    days : array.array
+        The day of each event.
+    users : array.array
+        The user id of each event.
+    codes : array.array
+        The event code of each event.
+    values : array.array
+        The value of each event.
+    user_ids : dict
+        Stores the user names (keys) and their user ids (values).
+    names : list
+        The user names, indexed by user id.
+
+    Methods
+    -------
+    add_user(user_name)
+        Adds a user with an empty log.
+    record(user_name, current_day, key, param)
+        Records an action, prize, electricity bill or bankruptcy.
+    record_many(user_names, current_day, key, params)
+        Records the same kind of entry for several users.
+    day_entry(user_name, current_day)
+        Returns the entry of a user on a given day.
+    recorded_days(user_name)
+        Returns the days on which something has been recorded for a user.
+    user_names()
+        Returns the names of the users in the log.
+    day_rows(current_day)
+        Returns the range of events recorded on a given day.
+    as_arrays()
+        Returns the columns as NumPy arrays, without copying.
+    totals(key)
+        Computes the total value of an event for every user.
+    '''
+
+    def __init__(self, n_days, user_names = ()):
+        '''
+        Parameters
+        ----------
+        n_days : int
+            Number of days in the simulation.
+        user_names : iterable, optional
+            The names of the users (default is an empty tuple).
+        '''
+
+        # event columns
+        self.days = array('I')
+        self.users = array('I')
+        self.codes = array('B')
+        self.values = array('d')
+
+        # user ids
+        self.user_ids = {}
+        self.names = []
+
+        # index of the first event of each day (day_starts[d] is the first event of day d + 1)
+        self.day_starts = array('L')
+        # whether the events have been recorded in chronological order
+        self.chronological = True
+
+        # cache of the entries of the last day that has been read
+        self.cached_day = None
+        self.cached_entries = {}
+
+        super().__init__(n_days, user_names)
+
+    # add a user with an empty log
+    def add_user(self, user_name):
+        '''
+        Adds a user with an empty log. Does nothing if the user already exists.
+
+        Parameters
+        ----------
+        user_name : str
+            The user name.
+        '''
+
+        if user_name not in self.user_ids:
+            self.user_ids[user_name] = len(self.names)
+            self.names.append(user_name)
+
+    # append an event
+    def record(self, user_name, current_day, key, param):
+        '''
+        Records an action, prize, electricity bill or bankruptcy as an event.
+
+        Parameters
+        ----------
+        user_name : str
+            The user name.
+        current_day : int
+            The current day.
+        key : str
+            'Action 1', 'Action 2', 'Action 3', 'Action 4', 'Electricity', 'Prize' or 'Bankrupt'.
+        param
+            The parameter of the action, or the value of the entry.
+        '''
+
+        user_id = self.user_ids.get(user_name)
+        if user_id is None:
+            self.add_user(user_name)
+            user_id = self.user_ids[user_name]
+
+        # keep track of where each day starts
+        recorded_days = len(self.day_starts)
+        if current_day > recorded_days:
+            self.day_starts.extend([len(self.days)] * (current_day - recorded_days))
+        elif current_day < recorded_days:
+            self.chronological = False
+
+        # the cached entries of the day are no longer complete
+        if current_day == self.cached_day:
+            self.cached_day = None
+
+        self.days.append(current_day)
+        self.users.append(user_id)
+        self.codes.append(EVENT_CODES[key])
+        self.values.append(PARAM_CODES[param] if isinstance(param, str) else param)
+
+    # append a block of events
+    def record_many(self, user_names, current_day, key, params):
+        '''
+        Records the same kind of entry for several users on the same day, extending the columns in one block.
+
+        Parameters
+        ----------
+        user_names : iterable
+            The user names.
+        current_day : int
+            The current day.
+        key : str
+            'Action 1', 'Action 2', 'Action 3', 'Action 4', 'Electricity', 'Prize' or 'Bankrupt'.
+        params : iterable
+            The parameter (or value) of each user, in the same order as `user_names`.
+        '''
+
+        # the user ids (adding the new users)
+        user_names = list(user_names)
+        user_ids = list(map(self.user_ids.get, user_names))
+        if None in user_ids:
+            for user_name in user_names:
+                self.add_user(user_name)
+            user_ids = [self.user_ids[user_name] for user_name in user_names]
+        # only the actions 3 and 4 and the bankruptcies have text parameters
+        if key in PARAM_DECODERS:
+            values = [PARAM_CODES[param] if isinstance(param, str) else param for param in params]
+        else:
+            values = params
+        if not user_ids:
+            return
+
+        # keep track of where each day starts
+        recorded_days = len(self.day_starts)
+        if current_day > recorded_days:
+            self.day_starts.extend([len(self.days)] * (current_day - recorded_days))
+        elif current_day < recorded_days:
+            self.chronological = False
+        if current_day == self.cached_day:
+            self.cached_day = None
+
+        self.days.extend(array('I', [current_day]) * len(user_ids))
+        self.users.extend(array('I', user_ids))
+        self.codes.extend(array('B', [EVENT_CODES[key]]) * len(user_ids))
+        self.values.extend(array('d', values))
+
+    # the events of a day
+    def day_rows(self, current_day):
+        '''
+        Returns the range of events recorded on a given day.
+
+        Parameters
+        ----------
+        current_day : int
+            The day.
+
+        Returns
+        -------
+        range
+            The indices of the events of the day (when the events were recorded out of chronological order, the
+            range covers the whole log, and the day has to be checked for each event).
+        '''
+
+        if not self.chronological:
+            return range(len(self.days))
+        if current_day > len(self.day_starts) or current_day < 1:
+            return range(0)
+        start = self.day_starts[current_day - 1]
+        stop = self.day_starts[current_day] if current_day < len(self.day_starts) else len(self.days)
+        return range(start, stop)
+
+    # decode an event
+    def decode(self, row):
+        '''
+        Decodes the event stored at a given index.
+
+        Parameters
+        ----------
+        row : int
+            The index of the event.
+
+        Returns
+        -------
+        tuple
+            The key (e.g. 'Action 1') and the parameter of the event.
+        '''
+
+        key = EVENT_KEYS[self.codes[row]]
+        value = self.values[row]
+        if key in PARAM_DECODERS:
+            return key, PARAM_DECODERS[key](value)
+        # purchased machines are whole numbers
+        if key == 'Action 1':
+            return key, int(value)
+        return key, value
+
+    # the entry of a user on a given day
+    def day_entry(self, user_name, current_day):
+        '''
+        Returns the entry of a user on a given day, in the same format as the eagerly created log, i.e. the 4 action
+        lists are always present, followed by the recorded 'Electricity', 'Prize' and 'Bankrupt' values.
+        The entries of the last day that has been read are cached, so reading every user on the same day only
+        decodes the day's events once.
+
+        Parameters
+        ----------
+        user_name : str
+            The user name.
+        current_day : int
+            The day.
+
+        Returns
+        -------
+        dict
+            The entry of the day.
+
+        Raises
+        ------
+        KeyError
+            If the user is not in the log.
+        '''
+
+        user_id = self.user_ids[user_name]
+
+        # decode all the events of the day at once
+        if current_day != self.cached_day:
+            entries = {}
+            for row in self.day_rows(current_day):
+                if self.days[row] != current_day:
+                    continue
+                entry = entries.get(self.users[row])
+                if entry is None:
+                    entry = entries[self.users[row]] = {action: [] for action in ACTIONS}
+                key, param = self.decode(row)
+                if key in ACTIONS:
+                    entry[key].append(param)
+                else:
+                    entry[key] = param
+            self.cached_day = current_day
+            self.cached_entries = entries
+
+        entry = self.cached_entries.get(user_id)
+        if entry is None:
+            return {action: [] for action in ACTIONS}
+        # return a copy, so that the cache cannot be modified
+        return {key: list(param) if key in ACTIONS else param for key, param in entry.items()}
+
+    # days with a record
+    def recorded_days(self, user_name):
+        '''
+        Returns the days on which something has been recorded for a user, in ascending order. With NumPy, the
+        columns are filtered in one vectorized pass (see `as_arrays`), instead of reading the events one by one.
+
+        Parameters
+        ----------
+        user_name : str
+            The user name.
+
+        Returns
+        -------
+        list
+            The recorded days (int).
+        '''
+
+        user_id = self.user_ids[user_name]
+        if np is not None:
+            columns = self.as_arrays()
+            return np.unique(columns['day'][columns['user'] == user_id]).tolist()
+        return sorted({day for day, user in zip(self.days, self.users) if user == user_id})
+
+    # names of the users
+    def user_names(self):
+        '''
+        Returns the names of the users in the log.
+
+        Returns
+        -------
+        list
+            The user names, indexed by user id.
+        '''
+
+        return self.names
+
+    # the events of a range of days
+    def events(self, first_day = 1, last_day = None):
+        '''
+        Returns the events recorded from `first_day` to `last_day` (inclusive), in the order they were recorded,
+        see `ActivityLog.events`. When the events were recorded in chronological order, only the rows of these days
+        are decoded.
+
+        Parameters
+        ----------
+        first_day : int, optional
+            The first day (default is 1).
+        last_day : int, optional
+            The last day (default is None, i.e. the last recorded day).
+
+        Returns
+        -------
+        list
+            A list of `(user_name, day, key, param)` tuples.
+        '''
+
+        if last_day is None:
+            last_day = len(self.day_starts)
+
+        # the rows of the days
+        if self.chronological:
+            if first_day > len(self.day_starts):
+                return []
+            start = self.day_starts[max(first_day, 1) - 1]
+            stop = self.day_starts[last_day] if last_day < len(self.day_starts) else len(self.days)
+            rows = range(start, stop)
+        else:
+            rows = range(len(self.days))
+
+        events = []
+        for row in rows:
+            day = self.days[row]
+            if first_day <= day <= last_day:
+                events.append((self.names[self.users[row]], day) + self.decode(row))
+        # sort by day, keeping the order of the records within the day
+        if not self.chronological:
+            events.sort(key = lambda event: event[1])
+        return events
+
+    def __contains__(self, user_name):
+        return user_name in self.user_ids
+
+    # zero-copy NumPy views of the columns
+    def as_arrays(self):
+        '''
+        Returns the columns as NumPy arrays that share memory with the log (no copy is made).
+        The arrays must be released before recording new events, as the columns cannot grow while they are shared.
+
+        Returns
+        -------
+        dict
+            The 'day', 'user', 'code' and 'value' columns.
+
+        Raises
+        ------
+        ImportError
+            If NumPy is not installed.
+        '''
+
+        if np is None:
+            raise ImportError('NumPy is required to view the columns of the activity log as arrays.')
+
+        return {
+            'day': np.frombuffer(self.days, dtype=np.uint32) if self.days else np.zeros(0, dtype=np.uint32),
+            'user': np.frombuffer(self.users, dtype=np.uint32) if self.users else np.zeros(0, dtype=np.uint32),
+            'code': np.frombuffer(self.codes, dtype=np.uint8) if self.codes else np.zeros(0, dtype=np.uint8),
+            'value': np.frombuffer(self.values, dtype=np.float64) if self.values else np.zeros(0, dtype=np.float64),
+        }
+
+    # per-user totals
+    def totals(self, key):
+        '''
+        Computes the total value of an event for every user over the whole log (e.g. the coins mined with 'Prize',
+        or the electricity bill paid with 'Electricity'). With NumPy installed, this is a single vectorized reduction.
+
+        Parameters
+        ----------
+        key : str
+            'Action 1', 'Action 2', 'Electricity' or 'Prize'.
+
+        Returns
+        -------
+        dict
+            Stores the user names (keys) and their totals (values).
+        '''
+
+        code = EVENT_CODES[key]
+
+        if np is not None:
+            columns = self.as_arrays()
+            mask = columns['code'] == code
+            sums = np.bincount(columns['user'][mask], weights=columns['value'][mask], minlength=len(self.names))
+            return dict(zip(self.names, sums.tolist()))
+
+        sums = [0] * len(self.names)
+        for row in range(len(self.codes)):
+            if self.codes[row] == code:
+                sums[self.users[row]] += self.values[row]
+        return dict(zip(self.names, sums))
+
+class RecordField:
+    '''
+    A read-only column of the records of a `MemmapActivityLog` (e.g. the days), read directly from the mapped file.
+    It supports `len()` and indexing, like the `array.array` columns of `ColumnarActivityLog`.
+    ...
+
+    Attributes
+    ----------
+    log : MemmapActivityLog
+        The activity log.
+    field : struct.Struct
+        The format of the field.
+    offset : int
+        Position of the field in the file, for the first record.
+    '''
+
+    def __init__(self, log, offset, field_format):
+        '''
+        Parameters
+        ----------
+        log : MemmapActivityLog
+            The activity log.
+        offset : int
+            Position of the field within a record.
+        field_format : str
+            The `struct` format of the field.
+        '''
+
+        self.log = log
+        self.field = struct.Struct(field_format)
+        self.offset = LOG_HEADER.size + offset
+
+    def __len__(self):
+        return self.log.count
+
+    def __getitem__(self, row):
+        if not 0 <= row < self.log.count:
+            raise IndexError('record index out of range')
+        return self.field.unpack_from(self.log.map, self.offset + row * LOG_RECORD.size)[0]
+
+class MemmapActivityLog(ColumnarActivityLog):
+    '''
+    A class to store the user activity log as fixed-width event records in a memory-mapped file.
+
+    It stores the same events as `ColumnarActivityLog`, but instead of growing columns in memory, every event is
+    written as a 24-byte record (day, user id, event code and value) into a file that is mapped into memory, so the
+    log can be larger than the available RAM: only the pages that are being written or read are held in memory by the
+    operating system. The user names are written to a sidecar file (the log's path followed by '.users'), one JSON
+    string per line.
+    An existing log file can be opened for analysis (`mode = 'r'`) without reading it fully: the records of a day are
+    located with a binary search, and `as_arrays` returns NumPy views of the mapped file (no copy is made).
+    Events must be recorded in chronological order, as in the simulation.
+    ...
+
+    Attributes
+    ----------
+    path : str
+        The log file.
+    mode : str
+        'w' (new log), 'a' (append to an existing log) or 'r' (read-only).
+    count : int
+        Number of records.
+    capacity : int
+        Number of records the file can hold before it has to grow.
+    days, users, codes, values : RecordField
+        Read-only views of the fields of the records.
+
+    Methods
+    -------
+    index_days()
+        Locates the first record of each day.
+    reserve(capacity)
+        Grows the file to hold at least `capacity` records.
+    truncate(count)
+        Discards the records after the first `count` records.
+    flush()
+        Writes the changes of the mapped file to disk.
+    close()
+        Flushes and closes the log file.
+    '''
+
+    def __init__(self, path, n_days = None, user_names = (), mode = 'w', capacity = 65536):
+        '''
+        Parameters
+        ----------
+        path : str
+            The log file.
+        n_days : int, optional
+            Number of days in the simulation. Required for a new log; read from the file otherwise (default is None).
+        user_names : iterable, optional
+            The names of the users of a new log (default is an empty tuple).
+        mode : str, optional
+            'w' to create a new log (replacing any existing file), 'a' to append to an existing log, or 'r' to open
+            an existing log read-only (default is 'w').
+        capacity : int, optional
+            Number of records the new file initially holds; the file doubles in size whenever it is full
+            (default is 65536, i.e. 1.5 MB).
+
+        Raises
+        ------
+        ValueError
+            If `mode` is invalid, `n_days` is missing for a new log, or the file is not an activity log file.
+        '''
+
+        if mode not in ('w', 'a', 'r'):
+            raise ValueError(f"Invalid mode: {mode}. Use 'w' (new log), 'a' (append) or 'r' (read-only).")
+
+        self.path = path
+        self.mode = mode
+
+        # user ids
+        self.user_ids = {}
+        self.names = []
+        # keep track of where each day starts
+        self.day_starts = array('L')
+        self.chronological = True
+        # decoded entries of the last day that has been read
+        self.cached_day = None
+        self.cached_entries = {}
+
+        # read-only views of the records
+        self.days = RecordField(self, 0, '<I')
+        self.users = RecordField(self, 4, '<I')
+        self.codes = RecordField(self, 8, '<B')
+        self.values = RecordField(self, 16, '<d')
+
+        if mode == 'w':
+            if n_days is None:
+                raise ValueError('Missing number of days: n_days is required to create a new log.')
+            self.count = 0
+            self.capacity = max(1, capacity)
+            self.file = open(path, 'w+b')
+            self.file.truncate(LOG_HEADER.size + self.capacity * LOG_RECORD.size)
+            self.map = mmap.mmap(self.file.fileno(), 0)
+            LOG_HEADER.pack_into(self.map, 0, LOG_MAGIC, LOG_VERSION, 0, n_days, 0)
+            self.names_file = open(path + '.users', 'w', encoding = 'utf-8')
+            super(ColumnarActivityLog, self).__init__(n_days, user_names)
+            return
+
+        # open an existing log
+        self.file = open(path, 'r+b' if mode == 'a' else 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access = mmap.ACCESS_WRITE if mode == 'a' else mmap.ACCESS_READ)
+        magic, version, flags, n_days, count = LOG_HEADER.unpack_from(self.map, 0)
+        if magic != LOG_MAGIC or version != LOG_VERSION:
+            raise ValueError(f'Invalid activity log file: {path}.')
+        self.n_days = n_days
+        self.count = count
+        self.capacity = (len(self.map) - LOG_HEADER.size) // LOG_RECORD.size
+        self.chronological = not flags & LOG_UNORDERED
+
+        with open(path + '.users', encoding = 'utf-8') as names_file:
+            for line in names_file:
+                ColumnarActivityLog.add_user(self, json.loads(line))
+        self.names_file = open(path + '.users', 'a', encoding = 'utf-8') if mode == 'a' else None
+
+        self.index_days()
+
+    # locate the first record of each day
+    def index_days(self):
+        '''
+        Locates the first record of each day with a binary search over the days of the records, so that the records
+        of a day can be read without scanning the file.
+        '''
+
+        self.day_starts = array('L')
+        if not self.chronological or self.count == 0:
+            return
+        last_day = self.days[self.count - 1]
+        for day in range(1, last_day + 1):
+            self.day_starts.append(bisect.bisect_left(self.days, day, 0, self.count))
+
+    # add a user
+    def add_user(self, user_name):
+        '''
+        Adds a user with an empty log, and writes the name to the sidecar file. Does nothing if the user already
+        exists.
+
+        Parameters
+        ----------
+        user_name : str
+            The user name.
+        '''
+
+        if user_name not in self.user_ids:
+            self.check_writable()
+            super().add_user(user_name)
+            # written to disk by `flush` and `close`
+            self.names_file.write(json.dumps(user_name) + '\n')
+
+    # make sure that the log can be written
+    def check_writable(self):
+        if self.mode == 'r':
+            raise ValueError(f'Read-only log: {self.path} has been opened for reading only.')
+
+    # grow the file
+    def reserve(self, capacity):
+        '''
+        Grows the file to hold at least `capacity` records. The NumPy views returned by `as_arrays` must be
+        released first, as the file cannot be mapped again while they are in use.
+
+        Parameters
+        ----------
+        capacity : int
+            Number of records.
+        '''
+
+        if capacity <= self.capacity:
+            return
+        self.map.flush()
+        self.map.close()
+        self.file.truncate(LOG_HEADER.size + capacity * LOG_RECORD.size)
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        self.capacity = capacity
+
+    # store the number of records and the flags in the header
+    def write_header(self):
+        flags = 0 if self.chronological else LOG_UNORDERED
+        LOG_HEADER.pack_into(self.map, 0, LOG_MAGIC, LOG_VERSION, flags, self.n_days, self.count)
+
+    # keep track of where each day starts
+    def start_day(self, current_day):
+        recorded_days = len(self.day_starts)
+        if current_day > recorded_days:
+            self.day_starts.extend([self.count] * (current_day - recorded_days))
+        elif current_day < recorded_days:
+            self.chronological = False
+
+        # the cached entries of the day are no longer complete
+        if current_day == self.cached_day:
+            self.cached_day = None
+
+    # append a record
+    def record(self, user_name, current_day, key, param):
+        '''
+        Records an action, prize, electricity bill or bankruptcy as a record of the file.
+
+        Parameters
+        ----------
+        user_name : str
+            The user name.
+        current_day : int
+            The current day.
+        key : str
+            'Action 1', 'Action 2', 'Action 3', 'Action 4', 'Electricity', 'Prize' or 'Bankrupt'.
+        param
+            The parameter of the action, or the value of the entry.
+
+        Raises
+        ------
+        ValueError
+            If the log is read-only.
+        '''
+
+        self.check_writable()
+        user_id = self.user_ids.get(user_name)
+        if user_id is None:
+            self.add_user(user_name)
+            user_id = self.user_ids[user_name]
+
+        self.start_day(current_day)
+        if self.count == self.capacity:
+            self.reserve(max(LOG_MIN_CAPACITY, 2 * self.capacity))
+
+        LOG_RECORD.pack_into(self.map, LOG_HEADER.size + self.count * LOG_RECORD.size, current_day, user_id,
+                             EVENT_CODES[key], PARAM_CODES[param] if isinstance(param, str) else param)
+        self.count += 1
+        self.write_header()
+
+    # append a block of records
+    def record_many(self, user_names, current_day, key, params):
+        '''
+        Records the same kind of entry for several users on the same day, writing the records in one block.
+
+        Parameters
+        ----------
+        user_names : iterable
+            The user names.
+        current_day : int
+            The current day.
+        key : str
+            'Action 1', 'Action 2', 'Action 3', 'Action 4', 'Electricity', 'Prize' or 'Bankrupt'.
+        params : iterable
+            The parameter (or value) of each user, in the same order as `user_names`.
+
+        Raises
+        ------
+        ValueError
+            If the log is read-only.
+        '''
+
+        self.check_writable()
+        # the user ids (adding the new users)
+        user_names = list(user_names)
+        user_ids = list(map(self.user_ids.get, user_names))
+        if None in user_ids:
+            for user_name in user_names:
+                self.add_user(user_name)
+            user_ids = [self.user_ids[user_name] for user_name in user_names]
+        if not user_ids:
+            return
+
+        self.start_day(current_day)
+        if self.count + len(user_ids) > self.capacity:
+            self.reserve(max(LOG_MIN_CAPACITY, 2 * self.capacity, self.count + len(user_ids)))
+
+        code = EVENT_CODES[key]
+        # only the actions 3 and 4 and the bankruptcies have text parameters
+        if key in PARAM_DECODERS:
+            values = [PARAM_CODES[param] if isinstance(param, str) else param for param in params]
+        else:
+            values = list(params)
+        if np is not None:
+            # fill the records in one vectorized pass
+            records = np.zeros(len(user_ids), dtype = LOG_DTYPE)
+            records['day'] = current_day
+            records['user'] = user_ids
+            records['code'] = code
+            records['value'] = values
+            block = records.tobytes()
+        else:
+            block = b''.join(LOG_RECORD.pack(current_day, user_id, code, value) for user_id, value in zip(user_ids, values))
+        start = LOG_HEADER.size + self.count * LOG_RECORD.size
+        self.map[start:start + len(block)] = block
+        self.count += len(user_ids)
+        self.write_header()
+
+    # discard the last records
+    def truncate(self, count):
+        '''
+        Discards the records after the first `count` records (e.g. the records written after the checkpoint a
+        simulation is resumed from).
+
+        Parameters
+        ----------
+        count : int
+            Number of records to keep.
+
+        Raises
+        ------
+        ValueError
+            If the log is read-only.
+        '''
+
+        self.check_writable()
+        self.count = min(count, self.count)
+        self.cached_day = None
+        self.write_header()
+        self.index_days()
+
+    # zero-copy NumPy views of the records
+    def as_arrays(self):
+        '''
+        Returns the fields of the records as NumPy arrays that share memory with the mapped file (no copy is made).
+        The arrays must be released before recording new events, as the file cannot grow while they are in use.
+
+        Returns
+        -------
+        dict
+            The 'day', 'user', 'code' and 'value' columns.
+
+        Raises
+        ------
+        ImportError
+            If NumPy is not installed.
+        '''
+
+        if np is None:
+            raise ImportError('NumPy is required to view the records of the activity log as arrays.')
+
+        records = np.frombuffer(self.map, dtype = LOG_DTYPE, count = self.count, offset = LOG_HEADER.size)
+        return {'day': records['day'], 'user': records['user'], 'code': records['code'], 'value': records['value']}
+
+    # write the changes to disk
+    def flush(self):
+        '''
+        Writes the changes of the mapped file (and the new user names) to disk.
+        '''
+
+        if self.mode != 'r':
+            self.names_file.flush()
+            self.map.flush()
+
+    # close the file
+    def close(self):
+        '''
+        Flushes and closes the log file. The unused space at the end of a written file is released.
+        '''
+
+        if self.map.closed:
+            return
+        self.flush()
+        self.map.close()
+        if self.mode != 'r':
+            self.file.truncate(LOG_HEADER.size + self.count * LOG_RECORD.size)
+            self.names_file.close()
+            self.capacity = self.count
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+class UserLog:
+    '''
+    A read-only view of a single user's log, indexed by day (e.g. 'Day 1').
+    Iterating over the view goes through every day of the simulation, including days without any record.
+    ...
+
+    Attributes
+    ----------
+    log : SparseActivityLog
+        The activity log.
+    user_name : str
+        The user name.
+    '''
+
+    def __init__(self, log, user_name):
+        '''
+        Parameters
+        ----------
+        log : SparseActivityLog
+            The activity log.
+        user_name : str
+            The user name.
+        '''
+
+        self.log = log
+        self.user_name = user_name
+
+    # convert 'Day n' into n
+    def day_number(self, day):
+        '''
+        Converts a day key (e.g. 'Day 1') into the day number.
+
+        Parameters
+        ----------
+        day : str or int
+            The day key, or the day number.
+
+        Returns
+        -------
+        int
+            The day number.
+
+        Raises
+        ------
+        KeyError
+            If `day` is not a valid day of the simulation.
+        '''
+
+        try:
+            current_day = day if isinstance(day, int) else int(day[4:]) if day.startswith('Day ') else 0
+        except ValueError:
+            current_day = 0
+        if not 1 <= current_day <= self.log.n_days:
+            raise KeyError(day)
+        return current_day
+
+    def __getitem__(self, day):
+        return self.log.day_entry(self.user_name, self.day_number(day))
+
+    def get(self, day, default = None):
+        try:
+            return self[day]
+        except KeyError:
+            return default
+
+    def __contains__(self, day):
+        return self.get(day) is not None
+
+    def __iter__(self):
+        return (f'Day {n}' for n in range(1, self.log.n_days + 1))
+
+    def __len__(self):
+        return self.log.n_days
+
+    def keys(self):
+        return list(self)
+
+    def items(self):
+        return ((f'Day {n}', self.log.day_entry(self.user_name, n)) for n in range(1, self.log.n_days + 1))
+
+    def values(self):
+        return (entry for day, entry in self.items())
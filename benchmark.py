@@ -0,0 +1,403 @@
+# Georgius Benedikt Ermanta
+# Fintech
+# This module times the hot paths of the blockchain mining simulation across grids of parameters, and records the
+# throughput and peak memory to a JSON file, so that commits can be compared and regressions caught.
+
+'''
+benchmark.py
+------------
+A module to benchmark the blockchain mining simulation.
+
+Each benchmark prepares its inputs (setup, not timed), then times one call of its hot path, which performs a known
+number of operations (e.g. one winner draw per day, or one electricity bill per user). The call is repeated and the
+fastest repetition gives the throughput (operations per second). The peak memory is measured separately with
+`tracemalloc` (setup and call included), so that tracing does not slow down the timed repetitions.
+
+The benchmarks are,
+- market: `Market.new_sdpa_price` and `Market.new_elec_price` (operations = 2 per day).
+- create_logs: `BlockChain.create_logs` with the 'sparse' and 'columnar' backends (operations = users).
+- winner: `BlockChain.winner` (operations = draws, one per day).
+- electricity_bill and bankrupt_check: `UserAccount.electricity_bill` and `UserAccount.bankrupt_check`
+  (operations = users).
+- day_loop: a full headless `Simulation` of passive users, which is fast-forwarded (operations = user-days).
+- day_loop_step: the same simulation stepped day by day, without fast-forward.
+over a grid of numbers of users and days, the fraction of users mining in the pool, and the fraction of users whose
+machines are on.
+
+Usage
+-----
+To run the quick grid and write the results to a JSON file:
+    `python benchmark.py --output results.json`
+To run a custom grid, and compare the results with those of a previous commit (slower benchmarks are reported, and the
+exit status is 1):
+    `python benchmark.py --users 10 1000 1000000 --days 7 365 10000 --output new.json --compare old.json`
+
+Functions
+---------
+make_users(n_users, pooled_fraction = 0.5, active_fraction = 1.0, machines = 10, capital = 50000)
+    Creates users that own machines, with the given mining type and machine status mix.
+bench_market(n_users, n_days, pooled_fraction, active_fraction)
+bench_create_logs(n_users, n_days, pooled_fraction, active_fraction)
+bench_winner(n_users, n_days, pooled_fraction, active_fraction)
+bench_electricity_bill(n_users, n_days, pooled_fraction, active_fraction)
+bench_bankrupt_check(n_users, n_days, pooled_fraction, active_fraction)
+bench_day_loop(n_users, n_days, pooled_fraction, active_fraction, fast_forward = True)
+bench_day_loop_step(n_users, n_days, pooled_fraction, active_fraction)
+    Prepare a benchmark, returning the timed call and its number of operations.
+measure(bench, params, repeat = 3)
+    Runs one benchmark and returns its throughput and peak memory.
+run_benchmarks(benchmarks, users, days, pooled_fractions, active_fractions, repeat = 3, max_user_days = 20000000)
+    Runs the benchmarks over the grid of parameters.
+compare_results(baseline, current, tolerance = 0.1)
+    Lists the benchmarks that are slower than in the baseline.
+'''
+
+# import libraries and classes
+import argparse
+import datetime
+import gc
+import itertools
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from market import Market
+from user_account import UserAccount
+from blockchain import BlockChain
+from simulation import Simulation
+
+# create users owning machines
+def make_users(n_users, pooled_fraction = 0.5, active_fraction = 1.0, machines = 10, capital = 50000):
+    '''
+    Creates users that own machines. The pooled and active users are spread evenly over the list of users.
+
+    Parameters
+    ----------
+    n_users : int
+        Number of users.
+    pooled_fraction : float, optional
+        Fraction of the users mining in the pool (default is 0.5).
+    active_fraction : float, optional
+        Fraction of the users whose machines are on (default is 1.0).
+    machines : int, optional
+        Number of machines owned by each user (default is 10).
+    capital : int or float, optional
+        The starting cash capital of each user (default is 50000).
+
+    Returns
+    -------
+    list
+        A list of `UserAccount` objects.
+    '''
+
+    users = []
+    for i in range(n_users):
+        user = UserAccount(f'User {i + 1}', capital)
+        user.verbose = False
+        user.machines = machines
+        # spread the pooled and active users evenly
+        user.mining_type = 'pooled' if int((i + 1) * pooled_fraction) > int(i * pooled_fraction) else 'solo'
+        user.machine_status = 'on' if int((i + 1) * active_fraction) > int(i * active_fraction) else 'off'
+        user.sdpa_price = 50
+        users.append(user)
+    return users
+
+# benchmark the price generation
+def bench_market(n_users, n_days, pooled_fraction, active_fraction):
+    market = Market(seed = 0)
+
+    def run():
+        for i in range(n_days):
+            market.new_sdpa_price()
+            market.new_elec_price()
+
+    return run, 2 * n_days
+
+# benchmark the creation of the logs
+def bench_create_logs(n_users, n_days, pooled_fraction, active_fraction, log_backend = 'sparse'):
+    users = make_users(n_users, pooled_fraction, active_fraction)
+    blockchain = BlockChain(n_days)
+
+    def run():
+        blockchain.create_logs(users, log_backend)
+
+    return run, n_users
+
+def bench_create_logs_columnar(n_users, n_days, pooled_fraction, active_fraction):
+    return bench_create_logs(n_users, n_days, pooled_fraction, active_fraction, 'columnar')
+
+# benchmark the winner draws
+def bench_winner(n_users, n_days, pooled_fraction, active_fraction):
+    users = make_users(n_users, pooled_fraction, active_fraction)
+    blockchain = BlockChain(n_days, seed = 0)
+    blockchain.create_logs(users)
+    blockchain.build_index(users)
+
+    def run():
+        for day in range(1, n_days + 1):
+            blockchain.winner(users, day)
+
+    return run, n_days
+
+# benchmark the electricity bills
+def bench_electricity_bill(n_users, n_days, pooled_fraction, active_fraction):
+    users = make_users(n_users, pooled_fraction, active_fraction)
+    log, bankruptcy_log = BlockChain(n_days).create_logs(users)
+    for user in users:
+        user.user_activity_log = log
+
+    def run():
+        for user in users:
+            user.electricity_bill(2.5, 1)
+
+    return run, n_users
+
+# benchmark the bankruptcy checks (half of the users need an automatic sale of SDPA coins)
+def bench_bankrupt_check(n_users, n_days, pooled_fraction, active_fraction):
+    users = make_users(n_users, pooled_fraction, active_fraction)
+    log, bankruptcy_log = BlockChain(n_days).create_logs(users)
+    for i, user in enumerate(users):
+        user.user_activity_log = log
+        user.sdpa_balance = 10
+
+    def run():
+        # reset the capital, so that every repetition does the same work
+        for i, user in enumerate(users):
+            user.capital = -10 if i % 2 else 10
+            user.sdpa_balance = 10
+        for user in users:
+            user.bankrupt_check(1, bankruptcy_log)
+
+    return run, n_users
+
+# benchmark the headless day loop
+def bench_day_loop(n_users, n_days, pooled_fraction, active_fraction, fast_forward = True):
+    # a new simulation for each repetition (a simulation can only be run once)
+    simulations = []
+
+    def prepare():
+        users = make_users(n_users, pooled_fraction, active_fraction)
+        simulations.append(Simulation(Market(seed = 0), BlockChain(n_days, seed = 0), users))
+
+    def run():
+        simulations.pop().run(fast_forward = fast_forward)
+
+    run.prepare = prepare
+    return run, n_users * n_days
+
+def bench_day_loop_step(n_users, n_days, pooled_fraction, active_fraction):
+    return bench_day_loop(n_users, n_days, pooled_fraction, active_fraction, False)
+
+# the available benchmarks
+BENCHMARKS = {
+    'market': bench_market,
+    'create_logs': bench_create_logs,
+    'create_logs_columnar': bench_create_logs_columnar,
+    'winner': bench_winner,
+    'electricity_bill': bench_electricity_bill,
+    'bankrupt_check': bench_bankrupt_check,
+    'day_loop': bench_day_loop,
+    'day_loop_step': bench_day_loop_step,
+}
+
+# parameters each benchmark depends on (the others are not varied, to avoid repeating the same measurement)
+BENCHMARK_PARAMS = {
+    'market': ('n_days',),
+    'create_logs': ('n_users',),
+    'create_logs_columnar': ('n_users',),
+    'winner': ('n_users', 'n_days', 'pooled_fraction', 'active_fraction'),
+    'electricity_bill': ('n_users', 'active_fraction'),
+    'bankrupt_check': ('n_users',),
+    'day_loop': ('n_users', 'n_days', 'pooled_fraction', 'active_fraction'),
+    'day_loop_step': ('n_users', 'n_days', 'pooled_fraction', 'active_fraction'),
+}
+
+# run a benchmark
+def measure(bench, params, repeat = 3):
+    '''
+    Runs one benchmark: `repeat` timed repetitions (the fastest one gives the throughput), then one repetition traced
+    with `tracemalloc` to measure the peak memory of the setup and the call.
+
+    Parameters
+    ----------
+    bench : callable
+        The benchmark, e.g. `bench_winner`.
+    params : dict
+        The parameters of the benchmark: 'n_users', 'n_days', 'pooled_fraction' and 'active_fraction'.
+    repeat : int, optional
+        Number of timed repetitions (default is 3).
+
+    Returns
+    -------
+    dict
+        The 'ops' (operations per call), 'seconds' (fastest call), 'ops_per_sec' and 'peak_memory_bytes'.
+    '''
+
+    run, n_ops = bench(**params)
+    prepare = getattr(run, 'prepare', None)
+
+    timings = []
+    for i in range(repeat):
+        if prepare is not None:
+            prepare()
+        # keep the garbage collector from running during the timed call
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - start)
+        finally:
+            gc.enable()
+    del run, prepare
+    gc.collect()
+
+    # measure the peak memory, including the setup
+    tracemalloc.start()
+    try:
+        run, n_ops = bench(**params)
+        if getattr(run, 'prepare', None) is not None:
+            run.prepare()
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    seconds = min(timings)
+    return {
+        'ops': n_ops,
+        'seconds': seconds,
+        'ops_per_sec': n_ops / seconds if seconds > 0 else float('inf'),
+        'peak_memory_bytes': peak,
+    }
+
+# run the grid
+def run_benchmarks(benchmarks, users, days, pooled_fractions, active_fractions, repeat = 3, max_user_days = 20000000):
+    '''
+    Runs the benchmarks over the grid of parameters. Each benchmark only varies the parameters it depends on
+    (e.g. the price generation only depends on the number of days).
+
+    Parameters
+    ----------
+    benchmarks : list
+        The names of the benchmarks (see `BENCHMARKS`).
+    users : list
+        The numbers of users.
+    days : list
+        The numbers of days.
+    pooled_fractions : list
+        The fractions of the users mining in the pool.
+    active_fractions : list
+        The fractions of the users whose machines are on.
+    repeat : int, optional
+        Number of timed repetitions (default is 3).
+    max_user_days : int, optional
+        The day loop is skipped when users x days exceeds this number (default is 20000000).
+
+    Returns
+    -------
+    list
+        A list of dictionaries: the 'benchmark' name, its 'params' and the measurements (see `measure`), or
+        'skipped' for the skipped combinations.
+    '''
+
+    # default value of the parameters a benchmark does not depend on
+    defaults = {'n_users': users[0], 'n_days': days[0], 'pooled_fraction': pooled_fractions[0],
+                'active_fraction': active_fractions[0]}
+    grid = {'n_users': users, 'n_days': days, 'pooled_fraction': pooled_fractions, 'active_fraction': active_fractions}
+
+    results = []
+    for name in benchmarks:
+        varied = BENCHMARK_PARAMS[name]
+        for values in itertools.product(*(grid[param] for param in varied)):
+            params = dict(defaults, **dict(zip(varied, values)))
+            if name in ('day_loop', 'day_loop_step') and params['n_users'] * params['n_days'] > max_user_days:
+                results.append({'benchmark': name, 'params': params, 'skipped': True})
+                continue
+            result = {'benchmark': name, 'params': params}
+            result.update(measure(BENCHMARKS[name], params, repeat))
+            results.append(result)
+            print(f"{name:22} {json.dumps(params):100} {result['ops_per_sec']:>14,.0f} ops/s "
+                  f"{result['peak_memory_bytes'] / 2 ** 20:>9.1f} MB", file = sys.stderr)
+    return results
+
+# the key identifying a measurement
+def result_key(result):
+    return result['benchmark'], tuple(sorted(result['params'].items()))
+
+# compare two runs
+def compare_results(baseline, current, tolerance = 0.1):
+    '''
+    Lists the benchmarks whose throughput dropped by more than `tolerance` compared with the baseline.
+
+    Parameters
+    ----------
+    baseline : dict
+        The results file of the baseline (e.g. the previous commit).
+    current : dict
+        The results file of the current run.
+    tolerance : float, optional
+        The relative drop in throughput that is tolerated (default is 0.1, i.e. 10%).
+
+    Returns
+    -------
+    list
+        A list of dictionaries with the 'benchmark', its 'params', the 'baseline' and 'current' throughput, and the
+        'change' (relative change of the throughput).
+    '''
+
+    baseline_results = {result_key(result): result for result in baseline['results'] if 'ops_per_sec' in result}
+    regressions = []
+    for result in current['results']:
+        before = baseline_results.get(result_key(result))
+        if before is None or 'ops_per_sec' not in result:
+            continue
+        change = result['ops_per_sec'] / before['ops_per_sec'] - 1
+        if change < -tolerance:
+            regressions.append({'benchmark': result['benchmark'], 'params': result['params'],
+                                'baseline': before['ops_per_sec'], 'current': result['ops_per_sec'], 'change': change})
+    return regressions
+
+# the commit being benchmarked
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output = True, text = True, check = True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Benchmark the hot paths of the SDPA coin mining simulation.')
+    parser.add_argument('--benchmarks', nargs = '+', choices = sorted(BENCHMARKS), default = list(BENCHMARKS),
+                        help = 'benchmarks to run (default: all)')
+    parser.add_argument('--users', nargs = '+', type = int, default = [10, 1000, 100000], help = 'numbers of users')
+    parser.add_argument('--days', nargs = '+', type = int, default = [7, 365], help = 'numbers of days')
+    parser.add_argument('--pooled', nargs = '+', type = float, default = [0.5], help = 'fractions of pooled users')
+    parser.add_argument('--active', nargs = '+', type = float, default = [1.0], help = 'fractions of active users')
+    parser.add_argument('--repeat', type = int, default = 3, help = 'number of timed repetitions')
+    parser.add_argument('--max-user-days', type = int, default = 20000000, help = 'largest day loop (users x days)')
+    parser.add_argument('--output', default = 'benchmark_results.json', help = 'JSON results file')
+    parser.add_argument('--compare', default = None, help = 'JSON results file of the baseline')
+    parser.add_argument('--tolerance', type = float, default = 0.1, help = 'tolerated drop in throughput')
+    cli_args = parser.parse_args()
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': run_benchmarks(cli_args.benchmarks, cli_args.users, cli_args.days, cli_args.pooled, cli_args.active,
+                                  cli_args.repeat, cli_args.max_user_days),
+    }
+    with open(cli_args.output, 'w') as file:
+        json.dump(report, file, indent = 2)
+
+    if cli_args.compare is not None:
+        with open(cli_args.compare) as file:
+            regressions = compare_results(json.load(file), report, cli_args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression['benchmark']} {json.dumps(regression['params'])} "
+                  f"{regression['baseline']:,.0f} -> {regression['current']:,.0f} ops/s ({regression['change']:.1%})")
+        sys.exit(1 if regressions else 0)
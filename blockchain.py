@@ -19,8 +19,10 @@ BlockChain
 
 '''
 
-# import libraries
+# import libraries and classes
 import random
+from activity_log import ActivityLog, ColumnarActivityLog, SparseActivityLog
+from mining_index import MiningPowerIndex
 
 class BlockChain:
     '''
@@ -32,30 +34,47 @@ class BlockChain:
     ----------
     n_days : int
         Number of days in the simulation.
+    rng : random.Random
+        The random number generator used to draw the daily winner.
 
     Methods
     -------
-    create_logs(lst_users)
+    create_logs(lst_users, log_backend = 'sparse')
         Creates 2 logs:
             - Stores users key actions.
             - Stores users that went benkrupt.
     winner(list_operational_users, current_day, base_pooled_mach = 1000, total_prize = 100)
         Determines the daily winners and the prize distributed to those winners.
+    draw_winner(list_operational_users, base_pooled_mach = 1000)
+        Draws the daily winner, without distributing the prize.
+    award_prize(player_winner, current_day, base_pooled_mach = 1000, total_prize = 100)
+        Distributes the daily prize to the winner drawn by `draw_winner`.
+    build_index(lst_users)
+        Creates the mining power index used to draw the daily winner.
     '''
 
-    def __init__(self, n_days):
+    def __init__(self, n_days, seed = None, rng = None):
         '''
         Parameters
         ----------
         n_days : int
             Number of days in the simulation.
+        seed : int, optional
+            Seed of the random number generator used to draw the winners (default is None, i.e. unpredictable draws).
+            See `seeding.derive_seed` to derive independent seeds for parallel simulations.
+        rng : random.Random, optional
+            The random number generator to use instead of creating one from `seed` (default is None).
         '''
 
         # store the number of days in the simulation
         self.n_days = n_days
+        # the mining power index (created by `build_index`)
+        self.mining_index = None
+        # random number generator of the winner draws
+        self.rng = rng if rng is not None else random.Random(seed)
 
     # create logs
-    def create_logs(self, lst_users):
+    def create_logs(self, lst_users, log_backend = 'sparse'):
         '''
         Creates 2 logs:
         1. User activity log: Stores users key actions during the simulation.
@@ -65,12 +84,16 @@ class BlockChain:
         ----------
         lst_users : list
             A list of `UserAccount` objects of all users.
+        log_backend : str or ActivityLog, optional
+            How the user activity log is stored: 'sparse' (`SparseActivityLog`, dictionaries of the recorded entries),
+            'columnar' (`ColumnarActivityLog`, typed columns of events), or an empty `ActivityLog` object to use as is,
+            e.g. a `MemmapActivityLog` writing the events to a memory-mapped file (default is 'sparse').
         
         Attributes
         ----------
-        user_activity_log : dict
-            A nested dictionary to stores users key actions in the simulation.
-            The data structure is,
+        user_activity_log : ActivityLog
+            Stores users key actions in the simulation. Entries are only allocated when something is recorded
+            (see `ActivityLog.record`), and the log reads like the nested dictionary,
                 {
                     user_name: {
                         day: {
@@ -94,14 +117,26 @@ class BlockChain:
         -------
         tuple
             A tuple containing 2 elements:
-            - dict: The user activity log.
+            - ActivityLog: The user activity log.
             - dict: The bankruptcy log.
+
+        Raises
+        ------
+        ValueError
+            If `log_backend` is not a valid backend.
         '''
 
-        # create activity log
-        self.user_activity_log = {}
+        # create activity log (entries are allocated as they are recorded)
+        if log_backend == 'sparse':
+            self.user_activity_log = SparseActivityLog(self.n_days)
+        elif log_backend == 'columnar':
+            self.user_activity_log = ColumnarActivityLog(self.n_days)
+        elif isinstance(log_backend, ActivityLog):
+            self.user_activity_log = log_backend
+        else:
+            raise ValueError(f"Invalid log backend: {log_backend}. Use 'sparse', 'columnar' or an ActivityLog object.")
         for user in lst_users:
-            self.user_activity_log[user.name] = {f'Day {n}': {f'Action {i}': [] for i in range(1,5)} for n in range(1, self.n_days+1)}
+            self.user_activity_log.add_user(user.name)
         
         # create bankruptcy log
         self.bankruptcy_log = {}
@@ -114,6 +149,8 @@ class BlockChain:
         Determine the daily winner and distrbute the daily prize to the winners.
         
         The daily winner is chosen at ranodm, with the probabilty of winning is proportional to the their mining power.
+        The winner is drawn from the mining power index (see `build_index`) with a binary search over the cumulative
+        mining power, where the mining pool comes first, followed by the solo miners in registration order.
         - If a user with solo mining type wins, they will receive the whole daily prize.
         - If the pool wins, users in the pool will be receive a portion of the total daily prize, based on their mining
         power relative to the aggregate mining power in the pool.
@@ -137,17 +174,8 @@ class BlockChain:
             A list of `UserAccount` class objects of all users that are operational (i.e. they have not gone bankrupt).
         total_machines : int
             The total number of machines (including active (on) and inactive (off) machines).
-        mining_players : dict
-            Stores the user names of users who have their machines turned on, along with
-            their respective computing power (i.e. the number of machines owned).
-            Note:
-                - Users with `pooled` mining type are aggregated under the `pooled` key.
         active_machines : int
-            Total number of active (on) machines across all operational users.
-        players_proportion : dict
-            Stores the user names with their respective proportional mining power, relative to the number of active machines.
-        players_cum_prop : dict
-            Stores the cumulative sum of the proportion mining power of each users.
+            Total number of active (on) machines across all operational users, including the base machines of the pool.
         
         Returns
         -------
@@ -159,6 +187,30 @@ class BlockChain:
         ------------
         - This method can only be called after the `create_logs` method has been called, as the
         `user_activity_log` attribute is initialized in the `create_logs` method.
+        - If `build_index` has not been called, the index is built from `list_operational_users` on the first call.
+        Users that are not registered in the index do not take part in the draw.
+        '''
+
+        # draw the winner, then distribute the prize
+        player_winner = self.draw_winner(list_operational_users, base_pooled_mach)
+        return self.award_prize(player_winner, current_day, base_pooled_mach, total_prize)
+
+    # draw the end-of-day winner
+    def draw_winner(self, list_operational_users, base_pooled_mach = 1000):
+        '''
+        Draws the daily winner from the mining power index, without distributing the prize (see `winner`).
+
+        Parameters
+        ----------
+        list_operational_users : list
+            A list of `UserAccount` objects of all users that are operational (i.e. they have not gone bankrupt).
+        base_pooled_mach : int, optional
+            The base number of machines in the pool (default is 1000).
+
+        Returns
+        -------
+        str or UserAccount
+            'pooled' if the mining pool wins, otherwise the `UserAccount` object of the winning solo miner.
         '''
 
         # base number of machines in the pool
@@ -166,99 +218,89 @@ class BlockChain:
         # an attribute for the list of UserAccount objects of opeartional users
         self.list_operational_users = list_operational_users
 
-        # store the total number of machines (including active and inactive machines)
-        self.total_machines = self.base_pooled_mach
-        # create a dictionary to store the players (i.e. users with machines that are turned on) with their respective computing power
-        self.mining_players = {'pooled': self.base_pooled_mach}
-        for user in list_operational_users:
-            # update the total number of machines
-            self.total_machines += user.machines
-
-            # users with machines switched off
-            if user.machine_status == 'off':
-                # ignore the user
-                pass
-            # active users with solo mining type
-            elif user.mining_type == 'solo':
-                # participate as an individual player
-                self.mining_players[user.name] = user.machines
-            # active users with pooled mining type
-            elif user.mining_type == 'pooled':
-                # participate as part of a mining pool
-                self.mining_players['pooled'] += user.machines
+        # build the mining power index on the first draw
+        if self.mining_index is None:
+            self.build_index(list_operational_users)
 
+        # store the total number of machines (including active and inactive machines)
+        self.total_machines = self.base_pooled_mach + self.mining_index.total_machines
         # compute the total number of active machines (turned 'on')
-        self.active_machines = 0
-        for user_name, n_machines in self.mining_players.items():
-            self.active_machines += n_machines
-
-        # store proportion of players mining power
-        self.players_proportion = {}
-        # compute the proportion of players mining power
-        for player_name, n_machines in self.mining_players.items():
-            self.players_proportion[player_name] = n_machines/self.active_machines
-
-        # store cumulative proportion of players mining power
-        self.players_cum_prop = {}
-        # compute the cumulative proportion of mining power
-        running_prop = 0
-        for player_name, prop in self.players_proportion.items():
-            running_prop += prop
-            self.players_cum_prop[player_name] = running_prop
+        self.active_machines = self.base_pooled_mach + self.mining_index.pooled_machines + self.mining_index.solo_machines
 
         # random number generator U ~ (0,1)
-        rng = random.uniform(0,1)
+        rng = self.rng.uniform(0,1)
 
         # declare the winner
-        prev_cum_prop = 0
-        for player_name, cum_prop in self.players_cum_prop.items():
-            if rng > prev_cum_prop and rng < cum_prop:
-                # define the winning player
-                player_winner = player_name
-
-                # total daily prize
-                total_prize = 100
-
-                # distribute prize when mining pool wins
-                if player_winner == 'pooled':
-                    # players and their respective active machines in the pool
-                    pooled_players = {}
-                    
-                    # avoid the loop when there are no active users in the pool (to improve performance)
-                    if self.mining_players['pooled'] == self.base_pooled_mach:
-                        pass
-                    else:
-                        # extract the number of active machines for each pooled players 
-                        for user in self.list_operational_users:
-                            if user.mining_type == 'pooled' and user.machine_status == 'on':
-                                pooled_players[user.name] = user.machines
-
-                    # distribute prize to the players in the pool
-                    for player_name, n_machines in pooled_players.items():
-                        # compute the prize attributable to player
-                        partial_prize = n_machines/self.mining_players['pooled'] * total_prize
-
-                        # update users' SDPA balance
-                        for user in self.list_operational_users:
-                            if user.name == player_name:
-                                # update user's SDPA balance 
-                                user.sdpa_balance += partial_prize
-                                # update activity log
-                                self.user_activity_log[user.name][f'Day {current_day}']['Prize'] = partial_prize
-
-                # distribute prize when solo miner wins
-                else:
-                    # update user's SDPA balance
-                    for user in self.list_operational_users:
-                        if user.name == player_winner:
-                            user.sdpa_balance += total_prize
-
-                    # update activity log
-                    self.user_activity_log[player_name][f'Day {current_day}']['Prize'] = total_prize
-
-                # return the winner and prize
-                return player_winner
-            
-            else:
-                # update prev_cum_prop
-                prev_cum_prop = cum_prop
\ No newline at end of file
+        return self.mining_index.draw(rng, self.base_pooled_mach)
+
+    # distribute the end-of-day prize
+    def award_prize(self, player_winner, current_day, base_pooled_mach = 1000, total_prize = 100):
+        '''
+        Distributes the daily prize to the winner drawn by `draw_winner`, and records it in the activity log.
+
+        Parameters
+        ----------
+        player_winner : str or UserAccount
+            'pooled' or the `UserAccount` object of the winning solo miner.
+        current_day : int
+            The current day.
+        base_pooled_mach : int, optional
+            The base number of machines in the pool (default is 1000).
+        total_prize : int or float, optional
+            The total daily SDPA prize (default is 100).
+
+        Returns
+        -------
+        str
+            The name of the winning user, or 'pooled' if the mining pool wins.
+        '''
+
+        # distribute prize when mining pool wins
+        if player_winner == 'pooled':
+            # distribute prize to the players in the pool (a single pass over the pool members)
+            for user, partial_prize in self.mining_index.pool_payout(total_prize, base_pooled_mach):
+                # update user's SDPA balance
+                user.receive_prize(partial_prize)
+                # update activity log
+                self.user_activity_log.record(user.name, current_day, 'Prize', partial_prize)
+
+            # return the winner
+            return player_winner
+
+        # distribute prize when solo miner wins
+        else:
+            # update user's SDPA balance
+            player_winner.receive_prize(total_prize)
+
+            # update activity log
+            self.user_activity_log.record(player_winner.name, current_day, 'Prize', total_prize)
+
+            # return the winner
+            return player_winner.name
+
+    # register the users in the mining power index
+    def build_index(self, lst_users):
+        '''
+        Creates the mining power index used by `winner` to draw the daily winner.
+
+        Each user is linked to the index, such that buying machines, switching machines on/off, changing mining type
+        and going bankrupt are reflected in the index as they happen (see `UserAccount.update_mining_index`).
+
+        Parameters
+        ----------
+        lst_users : list
+            A list of `UserAccount` objects of all users.
+
+        Attributes
+        ----------
+        mining_index : MiningPowerIndex
+            The mining power of the users, stored in a Fenwick tree.
+
+        Returns
+        -------
+        MiningPowerIndex
+            The mining power index.
+        '''
+
+        self.mining_index = MiningPowerIndex(lst_users)
+        return self.mining_index
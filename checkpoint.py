@@ -0,0 +1,413 @@
+# Georgius Benedikt Ermanta
+# Fintech
+# This module saves the state of a simulation to a compact binary checkpoint file, and restores it exactly, so that
+# long simulations can be resumed from the last completed day.
+
+'''
+checkpoint.py
+-------------
+A module to checkpoint and resume the blockchain mining simulation.
+
+A checkpoint holds everything needed to continue the day loop exactly where it stopped: the users' data, the list of
+operational users, the market (SDPA coin price, pre-generated prices and the state of its random number generator),
+the blockchain (the state of its random number generator, the user activity log, the bankruptcy log and the order of
+the users in the mining power index), and any extra values of the caller (e.g. the number of days).
+
+The checkpoint file starts with a full snapshot, followed by incremental snapshots (deltas) that only hold what has
+changed since the previous checkpoint: the users whose data changed, the new entries of the activity and bankruptcy
+logs, the generators' states, etc. Each snapshot is a frame (its length, followed by the zlib-compressed pickle of the
+snapshot) appended to the file, so checkpointing every N days costs little even for long simulations. When a frame is
+incomplete (e.g. the program crashed while writing it), the checkpoint is restored up to the previous frame.
+
+Usage
+-----
+    checkpointer = Checkpointer('game.ckpt', every = 10)
+    ... at the end of each day ...
+    checkpointer.save(current_day, market, blockchain, users, oper_users)
+    ... after a crash ...
+    state = load_checkpoint('game.ckpt')
+
+Classes
+-------
+Checkpointer
+    A class to write periodic checkpoints of a simulation.
+
+Functions
+---------
+load_checkpoint(path)
+    Restores the state of a simulation from a checkpoint file.
+'''
+
+# import libraries and classes
+import os
+import pickle
+import struct
+import zlib
+
+from market import Market
+from user_account import UserAccount
+from blockchain import BlockChain
+from activity_log import SparseActivityLog, ColumnarActivityLog, MemmapActivityLog
+
+# first bytes of a checkpoint file, followed by the format version
+MAGIC = b'SDPACKPT'
+FORMAT_VERSION = 1
+# length prefix of each frame
+FRAME_HEADER = struct.Struct('<I')
+
+# user attributes that refer to shared objects: they are restored by linking the users to the restored log and index
+SHARED_ATTRIBUTES = ('mining_index', 'user_activity_log')
+USER_FIELDS = tuple(field for field in UserAccount.__slots__ if field not in SHARED_ATTRIBUTES)
+# market attributes that do not change during the simulation (only stored in full snapshots)
+STATIC_MARKET_ATTRIBUTES = ('sdpa_path', 'elec_path', 'return_mean', 'return_std', 'elec_low', 'elec_high')
+
+# the data of a user, as a tuple aligned with USER_FIELDS (None for the attributes that have not been set yet)
+def user_state(user):
+    return tuple(getattr(user, field, None) for field in USER_FIELDS)
+
+# the log backends that are identified by name (others are pickled by reference to their class)
+# a memory-mapped log is already on disk: only its path is stored, and its number of records at each checkpoint
+def log_backend_name(log):
+    if type(log) is SparseActivityLog:
+        return 'sparse'
+    if type(log) is ColumnarActivityLog:
+        return 'columnar'
+    if isinstance(log, MemmapActivityLog):
+        return ('memmap', log.path)
+    return type(log)
+
+# the new events of the log
+def log_events(log, first_day, last_day):
+    if isinstance(log, MemmapActivityLog):
+        log.flush()
+        return log.count
+    return log.events(first_day, last_day)
+
+class Checkpointer:
+    '''
+    A class to write periodic checkpoints of a simulation.
+
+    The first call of `save` writes a full snapshot (replacing any existing file). The following calls append a delta
+    holding only what has changed since the previous checkpoint. Every `full_every` checkpoints, a full snapshot is
+    written again, so that the file does not grow without bound.
+    ...
+
+    Attributes
+    ----------
+    path : str
+        The checkpoint file.
+    every : int
+        Number of days between checkpoints.
+    full_every : int
+        Number of checkpoints between full snapshots (None to only write a full snapshot once).
+    n_saved : int
+        Number of checkpoints written since the last full snapshot.
+
+    Methods
+    -------
+    due(current_day)
+        Checks whether a checkpoint is due at the end of the day.
+    save(current_day, market, blockchain, users, oper_users, extra = None, history = None)
+        Writes a checkpoint (full snapshot or delta) at the end of a day.
+    '''
+
+    def __init__(self, path, every = 1, full_every = None):
+        '''
+        Parameters
+        ----------
+        path : str
+            The checkpoint file.
+        every : int, optional
+            Number of days between checkpoints (default is 1).
+        full_every : int, optional
+            Number of checkpoints between full snapshots (default is None, i.e. only the first snapshot is full).
+
+        Raises
+        ------
+        ValueError
+            If `every` or `full_every` is not a positive integer.
+        '''
+
+        if not isinstance(every, int) or every < 1:
+            raise ValueError(f'Invalid checkpoint interval: {every!r}. Only positive integer values are accepted.')
+        if full_every is not None and (not isinstance(full_every, int) or full_every < 1):
+            raise ValueError(f'Invalid full snapshot interval: {full_every!r}. Only positive integer values are accepted.')
+
+        self.path = path
+        self.every = every
+        self.full_every = full_every
+        self.n_saved = 0
+
+        # what has been saved so far (to compute the deltas)
+        self.saved_day = None
+        self.saved_users = []
+        self.saved_oper_users = None
+        self.saved_bankruptcies = 0
+        self.saved_index_users = 0
+        self.saved_extra = None
+        self.saved_history = {}
+
+    # check whether a checkpoint is due
+    def due(self, current_day):
+        '''
+        Checks whether a checkpoint is due at the end of the day.
+
+        Parameters
+        ----------
+        current_day : int
+            The current day.
+
+        Returns
+        -------
+        bool
+            True every `every` days.
+        '''
+
+        return current_day % self.every == 0
+
+    # write a checkpoint
+    def save(self, current_day, market, blockchain, users, oper_users, extra = None, history = None):
+        '''
+        Writes a checkpoint at the end of a day: a full snapshot on the first call (and every `full_every`
+        checkpoints), otherwise a delta appended to the file.
+
+        Parameters
+        ----------
+        current_day : int
+            The last completed day.
+        market : Market
+            The market.
+        blockchain : BlockChain
+            The blockchain, whose `create_logs` method has been called.
+        users : list
+            A list of `UserAccount` objects of all users.
+        oper_users : list
+            A list of `UserAccount` objects of the operational users (a subset of `users`).
+        extra : dict, optional
+            Additional values of the caller, which must be picklable (default is None).
+        history : dict, optional
+            Stores lists (values) that only grow during the simulation, such as the daily prices. Only their new
+            items are written in a delta (default is None).
+        '''
+
+        full = self.saved_day is None or (self.full_every is not None and self.n_saved >= self.full_every)
+        extra = dict(extra or {})
+        history = history or {}
+
+        # position of each user
+        positions = {user.name: position for position, user in enumerate(users)}
+        states = [user_state(user) for user in users]
+        oper_positions = [positions[user.name] for user in oper_users]
+
+        # market data, without its generator
+        market_data = {key: value for key, value in vars(market).items() if key != 'rng'}
+        if not full:
+            for key in STATIC_MARKET_ATTRIBUTES:
+                market_data.pop(key, None)
+
+        log = blockchain.user_activity_log
+        bankruptcies = list(blockchain.bankruptcy_log.items())
+        index_users = [user.name for user in blockchain.mining_index.users] if blockchain.mining_index is not None else []
+
+        snapshot = {
+            'full': full,
+            'day': current_day,
+            'market': market_data,
+            'market_rng': market.rng.getstate(),
+            'blockchain_rng': blockchain.rng.getstate(),
+        }
+
+        if full:
+            snapshot['n_days'] = blockchain.n_days
+            snapshot['log_backend'] = log_backend_name(log)
+            snapshot['log_users'] = list(log.user_names())
+            snapshot['events'] = log_events(log, 1, current_day)
+            snapshot['bankruptcies'] = bankruptcies
+            snapshot['index_users'] = index_users if blockchain.mining_index is not None else None
+            snapshot['users'] = states
+            snapshot['oper_users'] = oper_positions
+            snapshot['extra'] = extra
+            snapshot['history'] = {key: list(values) for key, values in history.items()}
+        else:
+            snapshot['events'] = log_events(log, self.saved_day + 1, current_day)
+            snapshot['bankruptcies'] = bankruptcies[self.saved_bankruptcies:]
+            snapshot['index_users'] = index_users[self.saved_index_users:]
+            # the users whose data changed, and the new users
+            snapshot['users'] = {position: state for position, state in enumerate(states)
+                                 if position >= len(self.saved_users) or state != self.saved_users[position]}
+            if oper_positions != self.saved_oper_users:
+                snapshot['oper_users'] = oper_positions
+            if extra != self.saved_extra:
+                snapshot['extra'] = extra
+            snapshot['history'] = {key: list(values[self.saved_history.get(key, 0):]) for key, values in history.items()}
+
+        frame = zlib.compress(pickle.dumps(snapshot, protocol = pickle.HIGHEST_PROTOCOL))
+        frame = FRAME_HEADER.pack(len(frame)) + frame
+
+        if full:
+            # write the full snapshot to a temporary file first, so that the previous checkpoint remains usable
+            temporary_path = self.path + '.tmp'
+            with open(temporary_path, 'wb') as file:
+                file.write(MAGIC + bytes([FORMAT_VERSION]) + frame)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temporary_path, self.path)
+            self.n_saved = 0
+        else:
+            with open(self.path, 'ab') as file:
+                file.write(frame)
+                file.flush()
+                os.fsync(file.fileno())
+        self.n_saved += 1
+
+        # remember what has been saved
+        self.saved_day = current_day
+        self.saved_users = states
+        self.saved_oper_users = oper_positions
+        self.saved_bankruptcies = len(bankruptcies)
+        self.saved_index_users = len(index_users)
+        self.saved_extra = extra
+        self.saved_history = {key: len(values) for key, values in history.items()}
+
+# read the snapshots of a checkpoint file
+def read_snapshots(path):
+    with open(path, 'rb') as file:
+        data = file.read()
+
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError(f'Invalid checkpoint file: {path}.')
+    if data[len(MAGIC)] != FORMAT_VERSION:
+        raise ValueError(f'Unsupported checkpoint format version: {data[len(MAGIC)]}.')
+
+    snapshots = []
+    position = len(MAGIC) + 1
+    while position + FRAME_HEADER.size <= len(data):
+        (length,) = FRAME_HEADER.unpack_from(data, position)
+        position += FRAME_HEADER.size
+        # stop at an incomplete frame
+        if position + length > len(data):
+            break
+        try:
+            snapshots.append(pickle.loads(zlib.decompress(data[position:position + length])))
+        except (zlib.error, pickle.UnpicklingError, EOFError):
+            break
+        position += length
+
+    if not snapshots or not snapshots[0]['full']:
+        raise ValueError(f'Invalid checkpoint file: {path} does not contain a full snapshot.')
+    return snapshots
+
+# restore a simulation
+def load_checkpoint(path):
+    '''
+    Restores the state of a simulation from a checkpoint file, i.e. the full snapshot and all following deltas.
+
+    Parameters
+    ----------
+    path : str
+        The checkpoint file.
+
+    Returns
+    -------
+    dict
+        The restored state with the keys:
+        - 'current_day' (int): the last completed day.
+        - 'market' (Market): the market, including the state of its generator.
+        - 'blockchain' (BlockChain): the blockchain, with its logs and mining power index.
+        - 'users' (list): the `UserAccount` objects of all users.
+        - 'oper_users' (list): the `UserAccount` objects of the operational users.
+        - 'user_activity_log' (ActivityLog) and 'bankruptcy_log' (dict): the logs of the blockchain.
+        - 'extra' (dict) and 'history' (dict): the values provided to `Checkpointer.save`.
+
+    Raises
+    ------
+    ValueError
+        If the file is not a checkpoint file.
+    '''
+
+    snapshots = read_snapshots(path)
+
+    # apply the deltas to the full snapshot
+    state = snapshots[0]
+    users = list(state['users'])
+    # the events, or the number of records of a memory-mapped log
+    events = state['events']
+    bankruptcies = list(state['bankruptcies'])
+    index_users = state['index_users']
+    history = state['history']
+    for delta in snapshots[1:]:
+        state['day'] = delta['day']
+        state['market'].update(delta['market'])
+        state['market_rng'] = delta['market_rng']
+        state['blockchain_rng'] = delta['blockchain_rng']
+        if isinstance(events, int):
+            events = delta['events']
+        else:
+            events.extend(delta['events'])
+        bankruptcies.extend(delta['bankruptcies'])
+        if delta['index_users']:
+            index_users = (index_users or []) + delta['index_users']
+        for position, user_data in delta['users'].items():
+            if position < len(users):
+                users[position] = user_data
+            else:
+                users.append(user_data)
+        if 'oper_users' in delta:
+            state['oper_users'] = delta['oper_users']
+        if 'extra' in delta:
+            state['extra'] = delta['extra']
+        for key, values in delta['history'].items():
+            history.setdefault(key, []).extend(values)
+
+    # restore the market
+    market = Market()
+    market.rng.setstate(state['market_rng'])
+    for key, value in state['market'].items():
+        setattr(market, key, value)
+
+    # restore the users
+    lst_users = []
+    for user_data in users:
+        user = UserAccount(user_data[USER_FIELDS.index('name')])
+        for field, value in zip(USER_FIELDS, user_data):
+            if value is not None:
+                setattr(user, field, value)
+        lst_users.append(user)
+    oper_users = [lst_users[position] for position in state['oper_users']]
+
+    # restore the blockchain and its logs
+    blockchain = BlockChain(state['n_days'])
+    blockchain.rng.setstate(state['blockchain_rng'])
+    log_backend = state['log_backend']
+    if isinstance(log_backend, tuple):
+        # reopen the memory-mapped log, without the records written after the checkpoint
+        log_backend = MemmapActivityLog(log_backend[1], mode = 'a')
+        log_backend.truncate(events)
+        events = []
+    elif not isinstance(log_backend, str):
+        log_backend = log_backend(state['n_days'])
+    user_activity_log, bankruptcy_log = blockchain.create_logs(lst_users, log_backend)
+    for user_name in state['log_users']:
+        user_activity_log.add_user(user_name)
+    for user_name, day, key, param in events:
+        user_activity_log.record(user_name, day, key, param)
+    bankruptcy_log.update(bankruptcies)
+    for user in lst_users:
+        user.user_activity_log = user_activity_log
+
+    # rebuild the mining power index, with the users in the same order
+    if index_users is not None:
+        users_by_name = {user.name: user for user in lst_users}
+        blockchain.build_index([users_by_name[user_name] for user_name in index_users])
+
+    return {
+        'current_day': state['day'],
+        'market': market,
+        'blockchain': blockchain,
+        'users': lst_users,
+        'oper_users': oper_users,
+        'user_activity_log': user_activity_log,
+        'bankruptcy_log': bankruptcy_log,
+        'extra': state['extra'],
+        'history': history,
+    }
@@ -0,0 +1,329 @@
+# Georgius Benedikt Ermanta
+# Fintech
+# This module gathers the economic parameters of the blockchain mining game (machine price, initial capital, prizes,
+# purchase limit and market distributions) in one configuration object.
+
+'''
+config.py
+---------
+A module to configure the economy of the blockchain mining game.
+
+This module defines the `GameConfig` class. It holds the parameters that used to be hard-coded across the modules:
+the price of an ASIC machine and the daily purchase limit (`UserAccount`), the initial capital of the users, the base
+number of machines in the pool and the daily prize (`BlockChain`, `Simulation`), and the initial SDPA coin price and
+the distributions of the daily returns and of the electricity prices (`Market`). The defaults are the values of the
+original game. A configuration creates the market, the users and the simulation with its parameters, and can be
+saved to (or loaded from) a JSON file, e.g. to tune the game economy with `sweep.py`.
+
+Usage
+-----
+To play the game with the parameters of a JSON file (any parameter that is left out keeps its default):
+    `python main.py --config economy.json`
+where `economy.json` reads like `{"machine_price": 800, "daily_machine_limit": 5}`.
+
+Classes
+-------
+GameConfig
+    A class to hold the economic parameters of the game.
+'''
+
+# import libraries and classes
+import json
+
+from market import Market
+from user_account import UserAccount
+from simulation import Simulation
+
+# the parameters of the game and their default values
+DEFAULTS = {
+    'machine_price': 600,
+    'initial_capital': 50000,
+    'base_pooled_mach': 1000,
+    'total_prize': 100,
+    'daily_machine_limit': 10,
+    'initial_sdpa_price': 50,
+    'sdpa_return_mean': 0.01,
+    'sdpa_return_std': 0.005,
+    'elec_price_low': 1.5,
+    'elec_price_high': 3.5,
+}
+# the parameters that are whole numbers
+INTEGER_PARAMETERS = ('base_pooled_mach', 'daily_machine_limit')
+# the parameters of the market (the price paths only depend on them)
+MARKET_PARAMETERS = ('initial_sdpa_price', 'sdpa_return_mean', 'sdpa_return_std', 'elec_price_low', 'elec_price_high')
+
+class GameConfig:
+    '''
+    A class to hold the economic parameters of the blockchain mining game.
+    ...
+
+    Attributes
+    ----------
+    machine_price : int or float
+        The price of 1 ASIC machine.
+    initial_capital : int or float
+        The starting cash capital of each user.
+    base_pooled_mach : int
+        The base number of machines in the pool.
+    total_prize : int or float
+        The total daily SDPA prize.
+    daily_machine_limit : int
+        The maximum number of machines a user can purchase in a trading day.
+    initial_sdpa_price : int or float
+        The SDPA coin market price on day 1.
+    sdpa_return_mean : float
+        The mean of the daily returns of SDPA coin.
+    sdpa_return_std : float
+        The standard deviation of the daily returns of SDPA coin.
+    elec_price_low : float
+        The lowest per unit price of electricity.
+    elec_price_high : float
+        The highest per unit price of electricity.
+
+    Methods
+    -------
+    as_dict()
+        Returns the parameters as a dictionary.
+    replace(**changes)
+        Returns a copy of the configuration with some parameters changed.
+    market_parameters()
+        Returns the parameters of the market.
+    market(seed = None, rng = None)
+        Creates a market with the configured distributions.
+    new_user(name)
+        Creates a user with the configured capital, machine price and purchase limit.
+    simulation(market, blockchain, users, policies = None, **kwargs)
+        Creates a headless simulation with the configured prizes and machine price.
+    save(path)
+        Writes the configuration to a JSON file.
+    load(path)
+        Reads a configuration from a JSON file (class method).
+    '''
+
+    def __init__(self, machine_price = 600, initial_capital = 50000, base_pooled_mach = 1000, total_prize = 100,
+                 daily_machine_limit = 10, initial_sdpa_price = 50, sdpa_return_mean = 0.01, sdpa_return_std = 0.005,
+                 elec_price_low = 1.5, elec_price_high = 3.5):
+        '''
+        Parameters
+        ----------
+        machine_price : int or float, optional
+            The price of 1 ASIC machine (default is 600).
+        initial_capital : int or float, optional
+            The starting cash capital of each user (default is 50000).
+        base_pooled_mach : int, optional
+            The base number of machines in the pool (default is 1000).
+        total_prize : int or float, optional
+            The total daily SDPA prize (default is 100).
+        daily_machine_limit : int, optional
+            The maximum number of machines a user can purchase in a trading day (default is 10).
+        initial_sdpa_price : int or float, optional
+            The SDPA coin market price on day 1 (default is 50).
+        sdpa_return_mean : float, optional
+            The mean of the daily returns of SDPA coin (default is 0.01).
+        sdpa_return_std : float, optional
+            The standard deviation of the daily returns of SDPA coin (default is 0.005).
+        elec_price_low : float, optional
+            The lowest per unit price of electricity (default is 1.5).
+        elec_price_high : float, optional
+            The highest per unit price of electricity (default is 3.5).
+
+        Raises
+        ------
+        ValueError
+            If a parameter is out of its range.
+        '''
+
+        if machine_price <= 0:
+            raise ValueError(f'Invalid configuration: machine_price must be positive, got {machine_price}.')
+        if initial_capital < 0:
+            raise ValueError(f'Invalid configuration: initial_capital must not be negative, got {initial_capital}.')
+        if base_pooled_mach < 0 or base_pooled_mach != int(base_pooled_mach):
+            raise ValueError(f'Invalid configuration: base_pooled_mach must be a non-negative integer, got {base_pooled_mach}.')
+        if total_prize <= 0:
+            raise ValueError(f'Invalid configuration: total_prize must be positive, got {total_prize}.')
+        if daily_machine_limit < 0 or daily_machine_limit != int(daily_machine_limit):
+            raise ValueError(f'Invalid configuration: daily_machine_limit must be a non-negative integer, got {daily_machine_limit}.')
+        if initial_sdpa_price <= 0:
+            raise ValueError(f'Invalid configuration: initial_sdpa_price must be positive, got {initial_sdpa_price}.')
+        if sdpa_return_std < 0:
+            raise ValueError(f'Invalid configuration: sdpa_return_std must not be negative, got {sdpa_return_std}.')
+        if not 0 <= elec_price_low <= elec_price_high:
+            raise ValueError(f'Invalid configuration: the electricity prices must satisfy 0 <= elec_price_low <= '
+                             f'elec_price_high, got {elec_price_low} and {elec_price_high}.')
+
+        self.machine_price = machine_price
+        self.initial_capital = initial_capital
+        self.base_pooled_mach = int(base_pooled_mach)
+        self.total_prize = total_prize
+        self.daily_machine_limit = int(daily_machine_limit)
+        self.initial_sdpa_price = initial_sdpa_price
+        self.sdpa_return_mean = sdpa_return_mean
+        self.sdpa_return_std = sdpa_return_std
+        self.elec_price_low = elec_price_low
+        self.elec_price_high = elec_price_high
+
+    def __repr__(self):
+        changed = ', '.join(f'{name} = {value!r}' for name, value in self.as_dict().items() if value != DEFAULTS[name])
+        return f'GameConfig({changed})'
+
+    # the parameters as a dictionary
+    def as_dict(self):
+        '''
+        Returns the parameters as a dictionary.
+
+        Returns
+        -------
+        dict
+            The parameter names (keys) and their values (values), in the order of `DEFAULTS`.
+        '''
+
+        return {name: getattr(self, name) for name in DEFAULTS}
+
+    # a copy with some parameters changed
+    def replace(self, **changes):
+        '''
+        Returns a copy of the configuration with some parameters changed.
+
+        Parameters
+        ----------
+        **changes
+            The new values of the parameters (e.g. `config.replace(machine_price = 800)`).
+
+        Returns
+        -------
+        GameConfig
+            The new configuration.
+
+        Raises
+        ------
+        ValueError
+            If a parameter is unknown or out of its range.
+        '''
+
+        unknown = sorted(set(changes) - set(DEFAULTS))
+        if unknown:
+            raise ValueError(f'Invalid configuration: unknown parameters {unknown}.')
+        return GameConfig(**{**self.as_dict(), **changes})
+
+    # the parameters of the market
+    def market_parameters(self):
+        '''
+        Returns the parameters of the market, which alone determine the price paths of a seed (so that configurations
+        with the same market parameters can share their price paths).
+
+        Returns
+        -------
+        tuple
+            The values of the parameters in `MARKET_PARAMETERS`.
+        '''
+
+        return tuple(getattr(self, name) for name in MARKET_PARAMETERS)
+
+    # create a market
+    def market(self, seed = None, rng = None):
+        '''
+        Creates a market with the configured initial price and distributions.
+
+        Parameters
+        ----------
+        seed : int, optional
+            Seed of the market's random number generator (default is None, i.e. unpredictable prices).
+        rng : random.Random, optional
+            The random number generator to use instead of creating one from `seed` (default is None).
+
+        Returns
+        -------
+        Market
+            The market.
+        '''
+
+        return Market(seed, rng, self.initial_sdpa_price, self.sdpa_return_mean, self.sdpa_return_std,
+                      self.elec_price_low, self.elec_price_high)
+
+    # create a user
+    def new_user(self, name):
+        '''
+        Creates a user with the configured initial capital, machine price and daily purchase limit.
+
+        Parameters
+        ----------
+        name : str
+            Name of the user.
+
+        Returns
+        -------
+        UserAccount
+            The user.
+        '''
+
+        return UserAccount(name, self.initial_capital, self.machine_price, self.daily_machine_limit)
+
+    # create a simulation
+    def simulation(self, market, blockchain, users, policies = None, **kwargs):
+        '''
+        Creates a headless simulation with the configured base pool, daily prize and machine price.
+
+        Parameters
+        ----------
+        market : Market
+            The market (see `market`).
+        blockchain : BlockChain
+            The blockchain.
+        users : list
+            The `UserAccount` objects of all users (see `new_user`).
+        policies : callable or dict, optional
+            The decision policies of the users, see `Simulation` (default is None, i.e. every user is passive).
+        **kwargs
+            The other arguments of `Simulation` (e.g. `log_backend`).
+
+        Returns
+        -------
+        Simulation
+            The simulation.
+        '''
+
+        return Simulation(market, blockchain, users, policies, self.base_pooled_mach, self.total_prize,
+                          self.machine_price, **kwargs)
+
+    # write to a JSON file
+    def save(self, path):
+        '''
+        Writes the configuration to a JSON file.
+
+        Parameters
+        ----------
+        path : str
+            The file.
+        '''
+
+        with open(path, 'w', encoding = 'utf-8') as file:
+            json.dump(self.as_dict(), file, indent = 2)
+
+    # read from a JSON file
+    @classmethod
+    def load(cls, path):
+        '''
+        Reads a configuration from a JSON file of parameter names and values. The parameters that are left out keep
+        their default values.
+
+        Parameters
+        ----------
+        path : str
+            The file.
+
+        Returns
+        -------
+        GameConfig
+            The configuration.
+
+        Raises
+        ------
+        ValueError
+            If the file does not hold a JSON object, or a parameter is unknown or out of its range.
+        '''
+
+        with open(path, encoding = 'utf-8') as file:
+            values = json.load(file)
+        if not isinstance(values, dict):
+            raise ValueError(f'Invalid configuration: {path} does not hold a JSON object.')
+        return cls().replace(**values)
@@ -0,0 +1,603 @@
+# Georgius Benedikt Ermanta
+# Fintech
+# This module runs the blockchain mining simulation on the arrays of a user population, so that every phase of the
+# day is a whole-array operation and millions of users can be simulated.
+
+'''
+engine.py
+---------
+A module to simulate a large population of users with array operations.
+
+`Simulation` goes through the `UserAccount` objects one by one every day. This module defines the
+`PopulationSimulation` class, which runs the same day loop on the parallel arrays of a `UserPopulation` (see
+`population.py`), with NumPy:
+- the electricity bills are charged to all the users whose machines are on at once
+  (`UserPopulation.charge_electricity`),
+- the winner is drawn with the same random number as `BlockChain.winner`, by a binary search over the cumulative
+  solo mining power (`numpy.searchsorted`, the same draw as the Fenwick tree of `MiningPowerIndex`),
+- the pool prize is split among all the pool members at once,
+- the automatic sales of SDPA coins and the bankruptcies are decided for all the users with a negative capital at once
+  (`UserPopulation.settle_balances`).
+The mining power of the users (the cumulative solo mining power, the pool members, and the machines billed) only
+changes when a user acts or goes bankrupt, so it is cached between days. The decision policies are only called for
+the users whose policy may act on the day (see `simulation.next_decision_day`), through `PopulationMember` views, and
+their actions are validated and executed on the arrays as by `UserAccount.action_query`.
+The computations follow those of the `UserAccount` and `BlockChain` objects operation by operation, so, for the same
+seeds, the results (and the entries of a sparse activity log) are identical to those of a `Simulation`. A day of a
+million users that do not act takes a few tens of milliseconds when no activity log is kept (the default): the log
+records every bill, so it costs far more than the day itself.
+
+Usage
+-----
+To simulate 1,000,000 users, each with 10 machines mining in the pool,
+    `population = UserPopulation(); population.add_users(1_000_000)`
+    `arrays = population.arrays(); arrays['machines'][:] = 10; arrays['flags'][:] = FLAG_ON | FLAG_POOLED`
+    `PopulationSimulation(Market(seed = 1), BlockChain(365, seed = 2), population).run()`
+
+Classes
+-------
+MiningTotals
+    The active mining power of the population, as seen by the decision policies.
+PopulationSimulation
+    A class to run the day loop of the simulation on the arrays of a user population.
+'''
+
+# import libraries and classes
+import numbers
+from types import SimpleNamespace
+
+# numpy is optional for the rest of the package, but the engine is built on it
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from population import PopulationMember, FLAG_ON, FLAG_POOLED, FLAG_BANKRUPT
+from simulation import MarketSnapshot, next_decision_day
+from reporting import user_performance
+
+class MiningTotals:
+    '''
+    The active mining power of the population, with the attributes of `MiningPowerIndex` read by the decision
+    policies (e.g. `strategies.ExpectedProfit`).
+    ...
+
+    Attributes
+    ----------
+    solo_machines : int
+        Total number of active machines of solo miners.
+    pooled_machines : int
+        Total number of active machines of pooled miners (excluding the base machines of the pool).
+    '''
+
+    __slots__ = ('solo_machines', 'pooled_machines')
+
+    def __init__(self, solo_machines = 0, pooled_machines = 0):
+        self.solo_machines = solo_machines
+        self.pooled_machines = pooled_machines
+
+class PopulationSimulation:
+    '''
+    A class to run the day loop of the simulation on the arrays of a user population.
+    ...
+
+    Attributes
+    ----------
+    market : Market
+        Generates the market price of SDPA coin and electricity.
+    blockchain : BlockChain
+        Its random number generator draws the daily winners, and its `n_days` attribute sets the length of the
+        simulation.
+    population : UserPopulation
+        The users. It cannot grow during the simulation (its arrays are shared with NumPy).
+    policies : list
+        The `(policy, user_ids)` tuples of the users of each decision policy.
+    n_days : int
+        Number of days in the simulation.
+    base_pooled_mach : int
+        The base number of machines in the pool.
+    total_prize : int or float
+        The total daily SDPA prize.
+    machine_price : int or float
+        The price of 1 ASIC machine.
+    daily_machine_limit : int
+        The maximum number of machines a user can purchase in a trading day.
+    coins_mined, electricity_paid, machines_bought, coins_sold, sales_proceeds : numpy.ndarray
+        The running totals of each user (see `UserAccount`).
+    initial_capital : numpy.ndarray
+        The starting capital of each user.
+    user_activity_log : ActivityLog
+        The user activity log (None when no log is kept).
+    bankruptcy_log : dict
+        Stores the names of the users who went bankrupt (keys) and their day of bankruptcy (values).
+    totals : MiningTotals
+        The active mining power of the population (also `population.mining_index` once the first winner is drawn).
+    current_day : int
+        The last completed day (0 before the simulation starts).
+    finished : bool
+        Whether the simulation has ended.
+    sdpa_prices, elec_prices : list
+        The market prices of each simulated day.
+    winners : list
+        The name of the winning player of each simulated day ('pooled' when the mining pool wins).
+
+    Methods
+    -------
+    step()
+        Simulates one day.
+    run(n_days = None)
+        Simulates the remaining days (or the next `n_days` days).
+    acting_users(current_day)
+        Returns the operational users whose policy may act on the day, and their policies.
+    execute(user_id, action, param, sdpa_price, current_day)
+        Validates and executes an action of a user.
+    cache_power()
+        Computes the cached mining power of the users.
+    remove_power(user_ids)
+        Takes the machines of bankrupt users out of the cached mining power.
+    results(machine_price = None)
+        Computes the end of simulation performance of each user.
+    '''
+
+    def __init__(self, market, blockchain, population, policies = None, base_pooled_mach = 1000, total_prize = 100,
+                 machine_price = None, daily_machine_limit = None, log_backend = None):
+        '''
+        Parameters
+        ----------
+        market : Market
+            Generates the market price of SDPA coin and electricity.
+        blockchain : BlockChain
+            Draws the daily winners. Its `n_days` attribute sets the length of the simulation.
+        population : UserPopulation
+            The users.
+        policies : callable or dict, optional
+            Either a single decision policy used by every user, or a dictionary of user names (keys) and their
+            respective decision policies (values), see `Simulation`. The policies receive a `PopulationMember` view of
+            the user (default is None, i.e. every user is passive).
+        base_pooled_mach : int, optional
+            The base number of machines in the pool (default is 1000).
+        total_prize : int or float, optional
+            The total daily SDPA prize (default is 100).
+        machine_price : int or float, optional
+            The price of 1 ASIC machine (default is None, i.e. that of the population). It is also set on the
+            population, whose members expose it to the decision policies.
+        daily_machine_limit : int, optional
+            The maximum number of machines a user can purchase in a trading day (default is None, i.e. that of the
+            population). It is also set on the population.
+        log_backend : str or ActivityLog, optional
+            How the user activity log is stored, see `BlockChain.create_logs` (default is None, i.e. no activity log
+            is kept).
+
+        Raises
+        ------
+        ImportError
+            If NumPy is not installed.
+        '''
+
+        if np is None:
+            raise ImportError('NumPy is required to simulate a user population.')
+
+        # store the simulation components
+        self.market = market
+        self.blockchain = blockchain
+        self.population = population
+        self.n_days = blockchain.n_days
+        # mining and machine parameters
+        self.base_pooled_mach = base_pooled_mach
+        self.total_prize = total_prize
+        # the members read the economy of the population (see `PopulationMember`)
+        if machine_price is not None:
+            population.machine_price = machine_price
+        if daily_machine_limit is not None:
+            population.daily_machine_limit = daily_machine_limit
+        self.machine_price = population.machine_price
+        self.daily_machine_limit = population.daily_machine_limit
+
+        # the users of each decision policy
+        n_users = len(population)
+        if policies is None:
+            self.policies = []
+        elif callable(policies):
+            self.policies = [(policies, np.arange(n_users))]
+        else:
+            groups = {}
+            for user_id in range(n_users):
+                policy = policies.get(population.name(user_id))
+                if policy is not None:
+                    groups.setdefault(id(policy), (policy, []))[1].append(user_id)
+            self.policies = [(policy, np.array(user_ids)) for policy, user_ids in groups.values()]
+
+        # the arrays of the population (shared, not copied) and the running totals of the users
+        views = population.arrays()
+        self.capital = views['capital']
+        self.sdpa_balance = views['sdpa_balance']
+        self.machines = views['machines']
+        self.day_machines = views['day_machines']
+        self.flags = views['flags']
+        self.coins_mined = np.zeros(n_users)
+        self.electricity_paid = np.zeros(n_users)
+        self.machines_bought = np.zeros(n_users, dtype = np.int64)
+        self.coins_sold = np.zeros(n_users)
+        self.sales_proceeds = np.zeros(n_users)
+        self.initial_capital = self.capital.copy()
+        # the users who are not bankrupt
+        self.operational = (self.flags & FLAG_BANKRUPT) == 0
+
+        # create the logs
+        if log_backend is None:
+            self.user_activity_log = None
+            self.bankruptcy_log = {}
+        else:
+            self.user_activity_log, self.bankruptcy_log = blockchain.create_logs(population, log_backend)
+
+        # the cached mining power (computed before the first bill)
+        self.totals = MiningTotals()
+        self.dirty = True
+        # whether machines have been purchased since the daily counts were reset
+        self.purchases = True
+
+        # simulation progress
+        self.current_day = 0
+        self.finished = False
+
+        # daily history of the market prices and winners
+        self.sdpa_prices = []
+        self.elec_prices = []
+        self.winners = []
+
+    # simulate one day
+    def step(self):
+        '''
+        Simulates one day, as `Simulation.step`: generates the day's prices, executes the actions of the users whose
+        policy acts, charges the electricity bills, determines the winner, and checks for bankruptcy.
+
+        Returns
+        -------
+        bool
+            True if the day has been simulated, False if the simulation has already ended (all days have been
+            simulated, the SDPA coin has been delisted, or all users are bankrupt).
+        '''
+
+        if self.finished or self.current_day >= self.n_days:
+            self.finished = True
+            return False
+
+        current_day = self.current_day + 1
+        log = self.user_activity_log
+        name = self.population.name
+
+        # SDPA price for the day
+        if current_day == 1:
+            sdpa_price_tdy = self.market.sdpa_price
+        else:
+            sdpa_price_tdy = self.market.new_sdpa_price()
+            # end the simulation when SDPA coin is delisted
+            if sdpa_price_tdy <= 0:
+                self.finished = True
+                return False
+        # electricity price for the day
+        elec_price_tdy = self.market.new_elec_price()
+        market_snapshot = MarketSnapshot(sdpa_price_tdy, elec_price_tdy)
+
+        # resets the trackers for daily machine purchases
+        if self.purchases:
+            self.day_machines.fill(0)
+            self.purchases = False
+
+        # perform the actions chosen by the policies
+        for user_id, policy in self.acting_users(current_day):
+            member = PopulationMember(self.population, user_id)
+            for action, param in policy(member, market_snapshot, current_day):
+                if action == 5:
+                    break
+                self.execute(user_id, action, param, sdpa_price_tdy, current_day)
+
+        # electricity bills of the users whose machines are on (0 for the others)
+        if self.dirty:
+            self.cache_power()
+        bills = self.population.charge_electricity(elec_price_tdy, current_day, log, self.bill_machines)
+        self.electricity_paid += bills
+
+        # draw the day's winner (as `MiningPowerIndex.draw`)
+        rng = self.blockchain.rng.uniform(0, 1)
+        pool_power = self.base_pooled_mach + self.totals.pooled_machines
+        solo_power = self.totals.solo_machines
+        target = rng * (pool_power + solo_power)
+        # the index is built at the first draw, after the day's actions (as `BlockChain.winner`)
+        self.population.mining_index = self.totals
+
+        # distribute prize when mining pool wins
+        if target < pool_power or solo_power == 0:
+            day_winner = 'pooled'
+            pool_ids = self.pool_ids
+            payouts = self.machines[pool_ids] / pool_power * self.total_prize
+            self.sdpa_balance[pool_ids] += payouts
+            self.coins_mined[pool_ids] += payouts
+            if log is not None:
+                log.record_many([name(user_id) for user_id in pool_ids.tolist()], current_day, 'Prize', payouts.tolist())
+
+        # distribute prize when solo miner wins: the first user whose cumulative solo mining power exceeds the target
+        else:
+            if self.solo_cumsum is None:
+                self.solo_cumsum = np.cumsum(self.solo_power)
+            winner_id = int(np.searchsorted(self.solo_cumsum, target - pool_power, side = 'right'))
+            # guard against floating point round-off at the upper end: the last active solo miner
+            if winner_id >= len(self.solo_cumsum):
+                winner_id = int(np.flatnonzero(np.diff(self.solo_cumsum, prepend = 0))[-1])
+            day_winner = name(winner_id)
+            self.sdpa_balance[winner_id] += self.total_prize
+            self.coins_mined[winner_id] += self.total_prize
+            if log is not None:
+                log.record(day_winner, current_day, 'Prize', self.total_prize)
+
+        # users with a negative capital either sell SDPA coins automatically or go bankrupt
+        sold, sold_coins, bankrupt = self.population.settle_balances(sdpa_price_tdy, current_day, log, self.bankruptcy_log,
+                                                                     self.operational)
+        if len(sold):
+            self.coins_sold[sold] += sold_coins
+            self.sales_proceeds[sold] += sdpa_price_tdy * sold_coins
+        # the machines of the bankrupt users are taken offline
+        if len(bankrupt):
+            self.remove_power(bankrupt)
+            # stop when all users are bankrupt
+            if not self.operational.any():
+                self.finished = True
+
+        # store the day's history
+        self.sdpa_prices.append(sdpa_price_tdy)
+        self.elec_prices.append(elec_price_tdy)
+        self.winners.append(day_winner)
+        self.current_day = current_day
+
+        return True
+
+    # simulate several days
+    def run(self, n_days = None):
+        '''
+        Simulates the remaining days of the simulation, or the next `n_days` days.
+
+        Parameters
+        ----------
+        n_days : int, optional
+            Number of days to simulate (default is None, i.e. until the end of the simulation).
+
+        Returns
+        -------
+        PopulationSimulation
+            The simulation itself, to chain calls (e.g. `PopulationSimulation(...).run().results()`).
+        '''
+
+        days_left = n_days
+        while days_left is None or days_left > 0:
+            if not self.step():
+                break
+            if days_left is not None:
+                days_left -= 1
+        return self
+
+    # the users who act today
+    def acting_users(self, current_day):
+        '''
+        Returns the operational users whose policy may act on the day (see `simulation.next_decision_day`), in the
+        order of the users, as `Simulation.step` calls the policies.
+
+        Parameters
+        ----------
+        current_day : int
+            The current day.
+
+        Returns
+        -------
+        list
+            The `(user_id, policy)` tuples.
+        '''
+
+        acting = []
+        for policy, user_ids in self.policies:
+            if next_decision_day(policy, current_day) != current_day:
+                continue
+            user_ids = user_ids[(self.flags[user_ids] & FLAG_BANKRUPT) == 0]
+            acting.extend(zip(user_ids.tolist(), [policy] * len(user_ids)))
+        # the users of several policies, in the order of the users
+        if len(acting) > 1 and len(self.policies) > 1:
+            acting.sort(key = lambda entry: entry[0])
+        return acting
+
+    # the active mining power of a user
+    def contribution(self, user_id):
+        flags = self.population.flags[user_id]
+        if flags & (FLAG_ON | FLAG_BANKRUPT) != FLAG_ON:
+            return 0, 0
+        machines = self.population.machines[user_id]
+        return (0, machines) if flags & FLAG_POOLED else (machines, 0)
+
+    # execute an action
+    def execute(self, user_id, action, param, sdpa_price, current_day):
+        '''
+        Validates and executes an action of a user, with the same rules as `UserAccount.action_query` (a rejected
+        quantity is skipped, and switching without any machine is recorded without changing the status).
+
+        Parameters
+        ----------
+        user_id : int
+            The user id.
+        action : int
+            The action number (1: Purchase mining machines, 2: Sell SDPA coins, 3: Switch ASIC on/off, 4: Switch
+            solo/pooled mining).
+        param : int or float
+            The quantity for actions 1 and 2 (ignored for actions 3 and 4).
+        sdpa_price : float
+            The market price of the SDPA coin.
+        current_day : int
+            The current day.
+
+        Returns
+        -------
+        bool
+            False if the quantity was rejected (nothing is recorded), otherwise True.
+        '''
+
+        population = self.population
+        log = self.user_activity_log
+        before = self.contribution(user_id)
+
+        # purchase mining machines
+        if action == 1:
+            n_machines = param
+            # only accept a positive integer
+            if isinstance(n_machines, str):
+                if not n_machines.isdigit():
+                    return False
+                n_machines = int(n_machines)
+            elif not isinstance(n_machines, numbers.Integral) or isinstance(n_machines, bool) or n_machines < 0:
+                return False
+            else:
+                n_machines = int(n_machines)
+            # ensure the daily limit and sufficient capital
+            if population.day_machines[user_id] + n_machines > self.daily_machine_limit:
+                return False
+            total_cost = self.machine_price * n_machines
+            if total_cost > population.capital[user_id]:
+                return False
+
+            population.day_machines[user_id] += n_machines
+            population.machines[user_id] += n_machines
+            self.machines_bought[user_id] += n_machines
+            population.capital[user_id] -= total_cost
+            self.purchases = True
+            record = ('Action 1', n_machines)
+
+        # sell SDPA coins
+        elif action == 2:
+            n_coins = param
+            # only accept a positive number
+            if isinstance(n_coins, str):
+                if not n_coins.replace('.', '', 1).isdigit():
+                    return False
+                n_coins = float(n_coins)
+            elif not isinstance(n_coins, numbers.Real) or isinstance(n_coins, bool) or not n_coins >= 0:
+                return False
+            # prevent short-selling
+            if n_coins > population.sdpa_balance[user_id]:
+                return False
+
+            population.sdpa_balance[user_id] -= n_coins
+            population.capital[user_id] += sdpa_price * n_coins
+            self.coins_sold[user_id] += n_coins
+            self.sales_proceeds[user_id] += sdpa_price * n_coins
+            record = ('Action 2', n_coins)
+
+        # switch the machines on/off (only with machines)
+        elif action == 3:
+            if population.machines[user_id] != 0:
+                population.flags[user_id] ^= FLAG_ON
+            record = ('Action 3', 'on' if population.flags[user_id] & FLAG_ON else 'off')
+
+        # switch the mining type (only with machines)
+        elif action == 4:
+            if population.machines[user_id] != 0:
+                population.flags[user_id] ^= FLAG_POOLED
+            record = ('Action 4', 'pooled' if population.flags[user_id] & FLAG_POOLED else 'solo')
+
+        else:
+            return True
+
+        # update the mining power
+        after = self.contribution(user_id)
+        if after != before:
+            self.totals.solo_machines += after[0] - before[0]
+            self.totals.pooled_machines += after[1] - before[1]
+            self.dirty = True
+
+        # update activity log
+        if log is not None:
+            log.record(population.name(user_id), current_day, *record)
+        return True
+
+    # cache the mining power of the users
+    def cache_power(self):
+        '''
+        Computes the mining power of the users, which only changes when a user acts or goes bankrupt: the active
+        machines of each user (0 for the users whose machines are off, who are not billed), the solo mining power
+        (whose cumulative sum is computed at the next solo draw), the pool members (the users mining in the pool with
+        their machines on), and the totals.
+        '''
+
+        flags = self.flags
+        active = (flags & (FLAG_ON | FLAG_BANKRUPT)) == FLAG_ON
+        pooled = (flags & FLAG_POOLED) != 0
+
+        self.active_machines = np.where(active, self.machines, 0)
+        self.bill_machines = self.active_machines.astype(np.float64)
+        self.solo_power = np.where(pooled, 0, self.active_machines)
+        self.solo_cumsum = None
+        self.pool_ids = np.flatnonzero(pooled & (self.active_machines > 0))
+
+        self.totals.solo_machines = int(self.solo_power.sum())
+        self.totals.pooled_machines = int(self.active_machines[self.pool_ids].sum())
+        self.dirty = False
+
+    # take the machines of bankrupt users offline
+    def remove_power(self, user_ids):
+        '''
+        Takes the machines of users who went bankrupt out of the cached mining power (see `cache_power`), in
+        O(len(user_ids)), plus a pass over the pool members when some of them are removed.
+
+        Parameters
+        ----------
+        user_ids : numpy.ndarray
+            The user ids.
+        '''
+
+        if self.dirty:
+            return
+
+        active = int(self.active_machines[user_ids].sum())
+        solo = int(self.solo_power[user_ids].sum())
+        self.active_machines[user_ids] = 0
+        self.bill_machines[user_ids] = 0
+        if solo:
+            self.solo_power[user_ids] = 0
+            self.solo_cumsum = None
+            self.totals.solo_machines -= solo
+        if active > solo:
+            self.pool_ids = self.pool_ids[self.active_machines[self.pool_ids] > 0]
+            self.totals.pooled_machines -= active - solo
+
+    # compute the end of simulation performance
+    def results(self, machine_price = None):
+        '''
+        Computes the end of simulation performance of each user, as `Simulation.results`.
+
+        Parameters
+        ----------
+        machine_price : int or float, optional
+            The price of 1 ASIC machine used to value the machines (default is None, i.e. the population's
+            `machine_price`).
+
+        Returns
+        -------
+        list
+            A list of dictionaries, one per user (see `reporting.user_performance`).
+        '''
+
+        # SDPA price on the last simulated day
+        sdpa_price_tdy = self.sdpa_prices[-1] if self.sdpa_prices else self.market.sdpa_price
+        # total coins mined by everyone during the simulation
+        total_mined_coins = self.total_prize * self.current_day
+
+        columns = zip(self.capital.tolist(), self.sdpa_balance.tolist(), self.machines.tolist(), self.flags.tolist(),
+                      self.coins_mined.tolist(), self.electricity_paid.tolist(), self.machines_bought.tolist(),
+                      self.coins_sold.tolist(), self.sales_proceeds.tolist(), self.initial_capital.tolist())
+        results = []
+        for user_id, (capital, sdpa_balance, machines, flags, coins_mined, electricity_paid, machines_bought, coins_sold,
+                      sales_proceeds, initial_capital) in enumerate(columns):
+            name = self.population.name(user_id)
+            user = SimpleNamespace(name = name, capital = capital, sdpa_balance = sdpa_balance, machines = machines,
+                                   bankrupt_status = 'yes' if flags & FLAG_BANKRUPT else 'no', coins_mined = coins_mined,
+                                   electricity_paid = electricity_paid, machines_bought = machines_bought,
+                                   coins_sold = coins_sold, sales_proceeds = sales_proceeds,
+                                   machine_price = self.machine_price)
+            results.append(user_performance(user, sdpa_price_tdy, total_mined_coins, initial_capital,
+                                            self.bankruptcy_log.get(name), machine_price))
+        return results
@@ -0,0 +1,495 @@
+# Georgius Benedikt Ermanta
+# Fintech
+# This module exports the results of a simulation (the activity log, the daily prices and winners, and the users' end
+# state) to columnar files, written in chunks as the simulation progresses.
+
+'''
+export.py
+---------
+A module to export the results of the blockchain mining simulation for downstream analysis.
+
+The `Exporter` class writes 3 tables to a directory,
+- events: one row per recorded event of the activity log, with the columns day, user_id, event and value.
+- days: one row per simulated day, with the columns day, sdpa_price, elec_price and winner.
+- users: one row per user at the end of the simulation, with the columns user_id, name and the performance figures
+  of `reporting.user_performance` (capital, sdpa_balance, total_assets, investment_return, total_mined, ...).
+The events and days are appended at the end of each simulated day, and each table is split into chunks of at most
+`chunk_rows` rows (`events-00000.csv`, `events-00001.csv`, ...), so nothing is built up in memory over the run.
+When a simulation is resumed from a checkpoint, the export continues after the chunks of the days simulated before the
+checkpoint, with the same user ids (see `Exporter.resume`).
+Each chunk is written in one or both formats,
+- 'csv': a CSV file with a header row. The event is its name (e.g. 'Electricity') and the value is the recorded
+  parameter (e.g. 'on' for Action 3).
+- 'npz': a NumPy archive of one `.npy` array per column (requires NumPy). The event is its code (see
+  `activity_log.EVENT_CODES`) and text parameters are encoded as numbers (see `activity_log.PARAM_CODES`), as in the
+  columnar log, so the columns are compact typed arrays.
+Users are referred to by their id (in order of appearance) in the events; the users table maps the ids to the names.
+`load_table` concatenates the NumPy chunks of a table.
+
+Classes
+-------
+ChunkedTable
+    A table written in chunks of rows, as CSV files and/or NumPy archives.
+Exporter
+    A class to export the events, daily prices and winners, and users' end state of a simulation.
+
+Functions
+---------
+load_table(directory, name)
+    Loads the NumPy chunks of a table as one array per column.
+'''
+
+# import libraries
+import csv
+import glob
+import os
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from activity_log import EVENT_CODES, PARAM_CODES
+
+# the supported formats
+FORMATS = ('csv', 'npz')
+
+# columns of the tables: name and array type code ('U' for text)
+EVENT_COLUMNS = (('day', 'I'), ('user_id', 'I'), ('event', 'B'), ('value', 'd'))
+DAY_COLUMNS = (('day', 'I'), ('sdpa_price', 'd'), ('elec_price', 'd'), ('winner', 'U'))
+USER_COLUMNS = (('user_id', 'I'), ('name', 'U'), ('bankrupt', 'B'), ('bankrupt_day', 'i'), ('capital', 'd'),
+                ('sdpa_balance', 'd'), ('sdpa_value', 'd'), ('machines', 'd'), ('total_assets', 'd'),
+                ('investment_return', 'd'), ('investment_return_pct', 'd'), ('total_mined', 'd'),
+                ('mining_performance', 'd'), ('total_bill', 'd'), ('machines_bought', 'd'), ('coins_sold', 'd'),
+                ('sales_proceeds', 'd'))
+
+class ChunkedTable:
+    '''
+    A table written in chunks of at most `chunk_rows` rows. CSV rows are written as they are appended; NumPy columns
+    are collected in typed buffers and written as an archive once the chunk is full (or the table is flushed).
+    ...
+
+    Attributes
+    ----------
+    directory : str
+        The directory of the chunk files.
+    name : str
+        The name of the table (the prefix of the chunk files).
+    columns : tuple
+        The name and type code of each column ('U' for text).
+    formats : tuple
+        The formats of the chunks ('csv' and/or 'npz').
+    chunk_rows : int
+        The maximum number of rows per chunk.
+    n_chunks : int
+        The number of chunks started so far.
+    n_rows : int
+        The number of rows appended so far.
+
+    Methods
+    -------
+    resume(last_day = None)
+        Continues the table after the chunks already in the directory, up to a given day.
+    append(rows)
+        Appends rows to the table.
+    flush()
+        Writes the current chunk, and starts a new one with the next row.
+    close()
+        Writes the current chunk.
+    '''
+
+    def __init__(self, directory, name, columns, formats = ('csv',), chunk_rows = 1000000):
+        '''
+        Parameters
+        ----------
+        directory : str
+            The directory of the chunk files (created if needed).
+        name : str
+            The name of the table.
+        columns : tuple
+            The name and type code of each column.
+        formats : tuple, optional
+            The formats of the chunks (default is ('csv',)).
+        chunk_rows : int, optional
+            The maximum number of rows per chunk (default is 1000000).
+
+        Raises
+        ------
+        ValueError
+            If a format is not supported, or `chunk_rows` is not positive.
+        ImportError
+            If the 'npz' format is requested and NumPy is not installed.
+        '''
+
+        for file_format in formats:
+            if file_format not in FORMATS:
+                raise ValueError(f"Invalid format: {file_format}. Use 'csv' or 'npz'.")
+        if 'npz' in formats and np is None:
+            raise ImportError("NumPy is required to export 'npz' files.")
+        if chunk_rows < 1:
+            raise ValueError(f'Invalid chunk size: {chunk_rows}. It must be at least 1 row.')
+
+        os.makedirs(directory, exist_ok = True)
+        self.directory = directory
+        self.name = name
+        self.columns = tuple(columns)
+        self.formats = tuple(formats)
+        self.chunk_rows = chunk_rows
+        self.n_chunks = 0
+        self.n_rows = 0
+
+        # the current chunk
+        self.chunk_size = 0
+        self.csv_file = None
+        self.csv_writer = None
+        self.buffers = None
+
+    # path of a chunk file
+    def chunk_path(self, chunk, extension):
+        return os.path.join(self.directory, f'{self.name}-{chunk:05d}.{extension}')
+
+    # continue after the existing chunks
+    def resume(self, last_day = None):
+        '''
+        Continues the table after the chunks already in the directory (e.g. written before the simulation was resumed
+        from a checkpoint): the rows of the days after `last_day` are removed from the existing chunks (the first
+        column of the table must be the day), and the next row starts a new chunk, numbered after the kept ones.
+
+        Parameters
+        ----------
+        last_day : int, optional
+            The last day whose rows are kept (default is None, i.e. the existing chunks are removed).
+
+        Raises
+        ------
+        ImportError
+            If the directory has NumPy chunks and NumPy is not installed.
+        '''
+
+        self.flush()
+        self.n_chunks = 0
+        self.n_rows = 0
+
+        chunk = 0
+        while any(os.path.exists(self.chunk_path(chunk, extension)) for extension in FORMATS):
+            kept_rows = 0
+            for extension in FORMATS:
+                path = self.chunk_path(chunk, extension)
+                if not os.path.exists(path):
+                    continue
+                if last_day is None:
+                    os.remove(path)
+                    continue
+
+                # keep the rows of the days up to `last_day` (the days are in ascending order)
+                if extension == 'csv':
+                    with open(path, newline = '') as csv_file:
+                        header, *rows = list(csv.reader(csv_file))
+                    kept = [row for row in rows if int(row[0]) <= last_day]
+                    if 0 < len(kept) < len(rows):
+                        with open(path, 'w', newline = '') as csv_file:
+                            csv.writer(csv_file).writerows([header] + kept)
+                    kept_rows = len(kept)
+                else:
+                    if np is None:
+                        raise ImportError("NumPy is required to resume an export of 'npz' files.")
+                    with np.load(path) as archive:
+                        columns = {column: archive[column] for column in archive.files}
+                    kept = columns[self.columns[0][0]] <= last_day
+                    if 0 < kept.sum() < len(kept):
+                        np.savez(path, **{column: values[kept] for column, values in columns.items()})
+                    kept_rows = int(kept.sum())
+                if kept_rows == 0:
+                    os.remove(path)
+
+            # the next chunk is numbered after the last chunk with kept rows
+            if kept_rows:
+                self.n_chunks = chunk + 1
+                self.n_rows += kept_rows
+            chunk += 1
+
+    # start a new chunk
+    def start_chunk(self):
+        if 'csv' in self.formats:
+            self.csv_file = open(self.chunk_path(self.n_chunks, 'csv'), 'w', newline = '')
+            self.csv_writer = csv.writer(self.csv_file)
+            self.csv_writer.writerow([name for name, typecode in self.columns])
+        if 'npz' in self.formats:
+            self.buffers = [[] if typecode == 'U' else array(typecode) for name, typecode in self.columns]
+        self.n_chunks += 1
+        self.chunk_size = 0
+
+    # append rows
+    def append(self, rows, npz_rows = None):
+        '''
+        Appends rows to the table, starting new chunks as needed.
+
+        Parameters
+        ----------
+        rows : list
+            The rows, as tuples of values in column order (written to the CSV files).
+        npz_rows : list, optional
+            The same rows with the values encoded for the NumPy columns (default is None, i.e. `rows`).
+        '''
+
+        if npz_rows is None:
+            npz_rows = rows
+        start = 0
+        while start < len(rows):
+            if self.csv_writer is None and self.buffers is None:
+                self.start_chunk()
+            # the rows that fit in the current chunk
+            stop = min(len(rows), start + self.chunk_rows - self.chunk_size)
+            if self.csv_writer is not None:
+                self.csv_writer.writerows(rows[start:stop])
+            if self.buffers is not None:
+                for column, buffer in enumerate(self.buffers):
+                    buffer.extend(row[column] for row in npz_rows[start:stop])
+            self.chunk_size += stop - start
+            self.n_rows += stop - start
+            start = stop
+            if self.chunk_size >= self.chunk_rows:
+                self.flush()
+
+    # write the current chunk
+    def flush(self):
+        '''
+        Writes the current chunk (if any row has been appended to it); the next row starts a new chunk.
+        '''
+
+        if self.csv_writer is None and self.buffers is None:
+            return
+        if self.csv_file is not None:
+            self.csv_file.close()
+        if self.buffers is not None:
+            columns = {}
+            for (name, typecode), buffer in zip(self.columns, self.buffers):
+                columns[name] = np.array(buffer, dtype = str) if typecode == 'U' else np.frombuffer(buffer, dtype = buffer.typecode)
+            np.savez(self.chunk_path(self.n_chunks - 1, 'npz'), **columns)
+        self.csv_file = None
+        self.csv_writer = None
+        self.buffers = None
+
+    def close(self):
+        '''
+        Writes the current chunk.
+        '''
+        self.flush()
+
+class Exporter:
+    '''
+    A class to export the events, daily prices and winners, and users' end state of a simulation to columnar files.
+    The events and days are appended at the end of each simulated day (see `day`), and the users' end state at the end
+    of the simulation (see `end_of_run`).
+    ...
+
+    Attributes
+    ----------
+    directory : str
+        The export directory.
+    formats : tuple
+        The formats of the files ('csv' and/or 'npz').
+    events : ChunkedTable
+        The events of the activity log.
+    days : ChunkedTable
+        The daily prices and winners.
+    users : ChunkedTable
+        The users' end state.
+    user_ids : dict
+        The user names (keys) and their ids (values), in order of appearance.
+    exported_day : int
+        The last day whose events have been exported.
+
+    Methods
+    -------
+    resume(last_day, user_activity_log)
+        Continues the export after the days already in the directory.
+    day(current_day, sdpa_price_tdy, elec_price_tdy, day_winner, user_activity_log)
+        Exports the events, prices and winner of a day.
+    end_of_run(results)
+        Exports the users' end state, and writes the remaining chunks.
+    close()
+        Writes the remaining chunks.
+    '''
+
+    def __init__(self, directory, formats = ('csv',), chunk_rows = 1000000):
+        '''
+        Parameters
+        ----------
+        directory : str
+            The export directory (created if needed). The chunks of the days that have already been simulated are
+            kept, and those of the later days are removed (see `resume`), so the export of a simulation resumed from
+            a checkpoint continues in the same directory, and that of a new simulation replaces any previous one.
+        formats : str or tuple, optional
+            The formats of the files: 'csv', 'npz' or both (default is ('csv',)).
+        chunk_rows : int, optional
+            The maximum number of rows per chunk file (default is 1000000).
+        '''
+
+        if isinstance(formats, str):
+            formats = (formats,)
+        self.directory = directory
+        self.formats = tuple(formats)
+        self.events = ChunkedTable(directory, 'events', EVENT_COLUMNS, self.formats, chunk_rows)
+        self.days = ChunkedTable(directory, 'days', DAY_COLUMNS, self.formats, chunk_rows)
+        self.users = ChunkedTable(directory, 'users', USER_COLUMNS, self.formats, chunk_rows)
+        self.user_ids = {}
+        self.exported_day = 0
+        self.closed = False
+        # whether the existing chunks have been handled (see `resume`)
+        self.resumed = False
+
+    # continue an export
+    def resume(self, last_day, user_activity_log):
+        '''
+        Continues the export after the days already in the directory: the events and days of the days after
+        `last_day` are removed from the existing chunks, the new chunks are numbered after the kept ones, the user
+        ids are assigned again from the events of the activity log, in the same order as when they were exported,
+        and the users' end state is removed (it is exported again at the end of the simulation).
+        It is called with the last simulated day when a simulation is resumed from a checkpoint, and with the day
+        before the first exported day otherwise (i.e. 0 for a new simulation, which removes any previous export).
+
+        Parameters
+        ----------
+        last_day : int
+            The last simulated day.
+        user_activity_log : ActivityLog
+            The activity log, with the events of the days up to `last_day`.
+        '''
+
+        self.events.resume(last_day)
+        self.days.resume(last_day)
+        self.users.resume()
+
+        # the ids of the users, in order of appearance in the exported events
+        self.user_ids = {}
+        if last_day > 0:
+            for user_name, day, key, param in user_activity_log.events(1, last_day):
+                self.user_id(user_name)
+        self.exported_day = last_day
+        self.resumed = True
+
+    # id of a user
+    def user_id(self, user_name):
+        user_id = self.user_ids.get(user_name)
+        if user_id is None:
+            user_id = self.user_ids[user_name] = len(self.user_ids)
+        return user_id
+
+    # export a day
+    def day(self, current_day, sdpa_price_tdy, elec_price_tdy, day_winner, user_activity_log):
+        '''
+        Exports the events recorded on the day (read from the activity log), and the day's prices and winner.
+
+        Parameters
+        ----------
+        current_day : int
+            The day.
+        sdpa_price_tdy : float
+            The day's SDPA coin market price.
+        elec_price_tdy : float
+            The day's per unit market price of electricity.
+        day_winner : str
+            The name of the winning user, or 'pooled'.
+        user_activity_log : ActivityLog
+            The activity log (see `BlockChain.create_logs`).
+        '''
+
+        # the first exported day continues after the previous days
+        if not self.resumed:
+            self.resume(current_day - 1, user_activity_log)
+
+        events = user_activity_log.events(current_day, current_day)
+        rows = [(day, self.user_id(user_name), key, param) for user_name, day, key, param in events]
+        if 'npz' in self.formats:
+            npz_rows = [(day, user_id, EVENT_CODES[key], PARAM_CODES[param] if isinstance(param, str) else param)
+                        for day, user_id, key, param in rows]
+        else:
+            npz_rows = None
+        self.events.append(rows, npz_rows)
+        self.days.append([(current_day, sdpa_price_tdy, elec_price_tdy, day_winner)])
+        self.exported_day = current_day
+
+    # export the users' end state
+    def end_of_run(self, results):
+        '''
+        Exports the users' end state, and writes the remaining chunks of all tables.
+
+        Parameters
+        ----------
+        results : list
+            The end of simulation performance of each user (see `reporting.user_performance` or
+            `Simulation.results`).
+        '''
+
+        # a previous end state is replaced
+        if not self.resumed:
+            self.users.resume()
+            self.resumed = True
+
+        rows = []
+        for result in results:
+            row = (self.user_id(result['name']), result['name'])
+            rows.append(row + tuple(result[name] for name, typecode in USER_COLUMNS[2:]))
+        if 'npz' in self.formats:
+            # the bankruptcy day is -1 for users that did not go bankrupt
+            npz_rows = [row[:2] + (int(row[2]), -1 if row[3] is None else row[3]) + row[4:] for row in rows]
+        else:
+            npz_rows = None
+        self.users.append(rows, npz_rows)
+        self.close()
+
+    def close(self):
+        '''
+        Writes the remaining chunks of all tables. Calling it again has no effect.
+        '''
+        if self.closed:
+            return
+        self.events.close()
+        self.days.close()
+        self.users.close()
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+# load a table
+def load_table(directory, name):
+    '''
+    Loads the NumPy chunks of a table (e.g. 'events') and concatenates them, in chunk order.
+
+    Parameters
+    ----------
+    directory : str
+        The export directory.
+    name : str
+        The name of the table: 'events', 'days' or 'users'.
+
+    Returns
+    -------
+    dict
+        The column names (keys) and the concatenated columns (values, NumPy arrays).
+
+    Raises
+    ------
+    ImportError
+        If NumPy is not installed.
+    FileNotFoundError
+        If the table has no NumPy chunk in the directory.
+    '''
+
+    if np is None:
+        raise ImportError("NumPy is required to load 'npz' files.")
+    paths = sorted(glob.glob(os.path.join(directory, f'{name}-[0-9][0-9][0-9][0-9][0-9].npz')))
+    if not paths:
+        raise FileNotFoundError(f'No NumPy chunks of the {name} table in {directory}.')
+
+    chunks = []
+    for path in paths:
+        with np.load(path) as archive:
+            chunks.append({column: archive[column] for column in archive.files})
+    return {column: np.concatenate([chunk[column] for chunk in chunks]) for column in chunks[0]}
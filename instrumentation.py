@@ -0,0 +1,423 @@
+# Georgius Benedikt Ermanta
+# Fintech
+# This module measures where the time of a simulation goes: how each day splits between its phases, how often the
+# key events happen, and (optionally) a function profile and the memory allocations over a range of days.
+
+'''
+instrumentation.py
+------------------
+A module to instrument the day loop of the blockchain mining simulation.
+
+The `Instrumentation` class collects, during a run of `main.py` or of a `Simulation`,
+- phase timers: the time spent in each named phase of the day loop, i.e. 'prices' (price generation), 'actions'
+  (the users' actions, including the time spent waiting for input in `main.py`), 'electricity' (electricity bills),
+  'winner' (winner draw and prize distribution), 'summary' (daily summary), 'bankruptcy' (bankruptcy checks),
+  'checkpoint' (writing checkpoints) and 'fast_forward' (days without decisions, see `Simulation.fast_forward`).
+- counters: the number of 'winner_draws', 'pool_wins', 'auto_sales' (automatic sales of SDPA coins to resolve a
+  negative capital) and 'bankruptcies'.
+- optionally, a `cProfile` function profile and a `tracemalloc` capture of the memory allocations over a range of
+  days (e.g. days 100 to 110 of a long run), so that their overhead only applies to those days.
+and exports them as a per-run report (a dictionary, rendered as text by `render_report`, or written to a JSON file).
+
+Constants
+---------
+PHASES
+    The names of the phases of the day loop, in order.
+COUNTERS
+    The names of the counters.
+
+Classes
+-------
+Instrumentation
+    A class to collect the phase timers, counters, function profile and memory allocations of a run.
+
+Functions
+---------
+render_report(report)
+    Renders a per-run report as text.
+'''
+
+# import libraries
+import cProfile
+import io
+import json
+import pstats
+import time
+import tracemalloc
+
+# phases of the day loop, in order
+PHASES = ('prices', 'actions', 'electricity', 'winner', 'summary', 'bankruptcy', 'checkpoint', 'fast_forward')
+# key events of the day loop
+COUNTERS = ('winner_draws', 'pool_wins', 'auto_sales', 'bankruptcies')
+
+class Instrumentation:
+    '''
+    A class to collect the phase timers, counters, function profile and memory allocations of a run.
+
+    The day loop marks the start and end of each day (`start_day`, `end_day`) and of each phase (`start`, `stop`, or
+    `add_time` for phases timed by the caller), and increments the counters (`count`).
+    ...
+
+    Attributes
+    ----------
+    profile_days : tuple
+        The first and last day (inclusive) profiled with `cProfile`, or None.
+    memory_days : tuple
+        The first and last day (inclusive) over which the memory allocations are traced with `tracemalloc`, or None.
+    profile_path : str
+        The file the `cProfile` statistics are written to (e.g. to be viewed with `snakeviz`), or None.
+    top : int
+        The number of functions and allocation sites listed in the report.
+    phase_seconds : dict
+        The phase names (keys) and the total time spent in each phase (values), in seconds.
+    phase_calls : dict
+        The phase names (keys) and the number of times each phase was timed (values).
+    counters : dict
+        The counter names (keys) and their counts (values).
+    day_seconds : list
+        The duration of each instrumented day, in seconds.
+    profiler : cProfile.Profile
+        The function profiler, or None before the first profiled day.
+    memory_snapshot : tracemalloc.Snapshot
+        The memory allocations at the end of the last traced day, or None.
+    memory_peak : int
+        The peak traced memory over the traced days, in bytes.
+
+    Methods
+    -------
+    start(phase)
+        Starts the timer of a phase.
+    stop(phase)
+        Stops the timer of a phase.
+    add_time(phase, seconds, calls = 1)
+        Adds time to a phase.
+    count(counter, n = 1)
+        Increments a counter.
+    start_day(day)
+        Marks the start of a day, and starts profiling or tracing on the first day of their ranges.
+    end_day(day)
+        Marks the end of a day, and stops profiling or tracing on the last day of their ranges.
+    stop_profile()
+        Stops profiling.
+    stop_tracing()
+        Takes a snapshot of the traced memory allocations, then stops tracing.
+    finish()
+        Stops profiling and tracing (e.g. when the simulation ends before the last day of their ranges).
+    report()
+        Returns the per-run report.
+    write_report(path)
+        Writes the per-run report to a JSON file.
+    '''
+
+    # the clock of the phase timers
+    clock = staticmethod(time.perf_counter)
+
+    def __init__(self, profile_days = None, memory_days = None, profile_path = None, top = 20):
+        '''
+        Parameters
+        ----------
+        profile_days : tuple, optional
+            The first and last day (inclusive) to profile with `cProfile` (default is None, i.e. no profile).
+        memory_days : tuple, optional
+            The first and last day (inclusive) over which the memory allocations are traced with `tracemalloc`
+            (default is None, i.e. no tracing).
+        profile_path : str, optional
+            The file the `cProfile` statistics are written to (default is None, i.e. they are only part of the report).
+        top : int, optional
+            The number of functions and allocation sites listed in the report (default is 20).
+        '''
+
+        self.profile_days = tuple(profile_days) if profile_days is not None else None
+        self.memory_days = tuple(memory_days) if memory_days is not None else None
+        self.profile_path = profile_path
+        self.top = top
+
+        # phase timers and counters (the known names come first in the report)
+        self.phase_seconds = dict.fromkeys(PHASES, 0.0)
+        self.phase_calls = dict.fromkeys(PHASES, 0)
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        # start time of the running phases
+        self.phase_start = {}
+
+        # duration of each day
+        self.day_seconds = []
+        self.day_start = None
+        self.first_day = None
+        self.last_day = None
+
+        # function profile
+        self.profiler = None
+        self.profiling = False
+        # memory allocations (tracing is only stopped at the end if it was started here)
+        self.tracing = False
+        self.started_tracing = False
+        self.memory_snapshot = None
+        self.memory_peak = 0
+
+    # start the timer of a phase
+    def start(self, phase):
+        '''
+        Starts the timer of a phase.
+
+        Parameters
+        ----------
+        phase : str
+            The phase name (e.g. 'prices').
+        '''
+        self.phase_start[phase] = self.clock()
+
+    # stop the timer of a phase
+    def stop(self, phase):
+        '''
+        Stops the timer of a phase, and adds the elapsed time since `start` to the phase.
+
+        Parameters
+        ----------
+        phase : str
+            The phase name (e.g. 'prices').
+
+        Raises
+        ------
+        ValueError
+            If the timer of the phase has not been started.
+        '''
+        start = self.phase_start.pop(phase, None)
+        if start is None:
+            raise ValueError(f'Phase not started: {phase}.')
+        self.add_time(phase, self.clock() - start)
+
+    # add time to a phase
+    def add_time(self, phase, seconds, calls = 1):
+        '''
+        Adds time to a phase, e.g. the sum of many short intervals timed by the caller with `clock`.
+
+        Parameters
+        ----------
+        phase : str
+            The phase name (e.g. 'actions').
+        seconds : float
+            The time spent in the phase.
+        calls : int, optional
+            The number of times the phase was timed (default is 1).
+        '''
+        self.phase_seconds[phase] = self.phase_seconds.get(phase, 0.0) + seconds
+        self.phase_calls[phase] = self.phase_calls.get(phase, 0) + calls
+
+    # increment a counter
+    def count(self, counter, n = 1):
+        '''
+        Increments a counter.
+
+        Parameters
+        ----------
+        counter : str
+            The counter name (e.g. 'winner_draws').
+        n : int, optional
+            The increment (default is 1).
+        '''
+        self.counters[counter] = self.counters.get(counter, 0) + n
+
+    # start of a day
+    def start_day(self, day):
+        '''
+        Marks the start of a day. Profiling and tracing start on the first day of their ranges (or on a later day of
+        their ranges, e.g. when a simulation is resumed from a checkpoint).
+
+        Parameters
+        ----------
+        day : int
+            The day.
+        '''
+
+        if self.first_day is None:
+            self.first_day = day
+
+        # start profiling
+        if self.profile_days is not None and not self.profiling and self.profile_days[0] <= day <= self.profile_days[1]:
+            if self.profiler is None:
+                self.profiler = cProfile.Profile()
+            self.profiler.enable()
+            self.profiling = True
+
+        # start tracing the memory allocations
+        if self.memory_days is not None and not self.tracing and self.memory_days[0] <= day <= self.memory_days[1]:
+            if tracemalloc.is_tracing():
+                tracemalloc.reset_peak()
+            else:
+                tracemalloc.start()
+                self.started_tracing = True
+            self.tracing = True
+
+        self.day_start = self.clock()
+
+    # end of a day
+    def end_day(self, day):
+        '''
+        Marks the end of a day. Profiling and tracing stop on the last day of their ranges.
+
+        Parameters
+        ----------
+        day : int
+            The day.
+        '''
+
+        if self.day_start is not None:
+            self.day_seconds.append(self.clock() - self.day_start)
+            self.day_start = None
+        self.last_day = day
+
+        if self.profiling and day >= self.profile_days[1]:
+            self.stop_profile()
+        if self.tracing and day >= self.memory_days[1]:
+            self.stop_tracing()
+
+    # stop profiling
+    def stop_profile(self):
+        '''
+        Stops profiling, and writes the statistics to `profile_path` (if provided).
+        '''
+        self.profiler.disable()
+        self.profiling = False
+        if self.profile_path is not None:
+            self.profiler.dump_stats(self.profile_path)
+
+    # stop tracing the memory allocations
+    def stop_tracing(self):
+        '''
+        Takes a snapshot of the traced memory allocations and the peak traced memory, then stops tracing (unless
+        tracing had already been started before the first traced day).
+        '''
+        # leave out the allocations of the instrumentation itself
+        self.memory_snapshot = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, __file__), tracemalloc.Filter(False, tracemalloc.__file__)])
+        self.memory_peak = tracemalloc.get_traced_memory()[1]
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+        self.tracing = False
+
+    # stop profiling and tracing
+    def finish(self):
+        '''
+        Stops profiling and tracing, e.g. when the simulation ends before the last day of their ranges.
+        Calling it again has no effect.
+        '''
+        if self.profiling:
+            self.stop_profile()
+        if self.tracing:
+            self.stop_tracing()
+
+    # the per-run report
+    def report(self):
+        '''
+        Returns the per-run report. Profiling and tracing are stopped first (see `finish`).
+
+        Returns
+        -------
+        dict
+            The keys are,
+            - 'days': the first and last instrumented day, and the number of instrumented days.
+            - 'seconds': the total duration of the instrumented days, and the mean and longest day.
+            - 'phases': for each timed phase, the 'seconds', 'calls' and 'share' (fraction of the total duration).
+            - 'counters': the counts.
+            - 'profile': the functions with the largest cumulative time (text, as printed by `pstats`), or None.
+            - 'memory': the traced days, the 'peak_bytes' and the allocation sites with the largest allocated
+              size ('top'), or None.
+        '''
+
+        self.finish()
+
+        total = sum(self.day_seconds)
+        n_days = len(self.day_seconds)
+        phases = {}
+        for phase, seconds in self.phase_seconds.items():
+            if self.phase_calls[phase]:
+                phases[phase] = {'seconds': seconds, 'calls': self.phase_calls[phase],
+                                 'share': seconds / total if total else 0.0}
+
+        # functions with the largest cumulative time
+        profile = None
+        if self.profiler is not None:
+            stream = io.StringIO()
+            pstats.Stats(self.profiler, stream = stream).sort_stats('cumulative').print_stats(self.top)
+            profile = stream.getvalue()
+
+        # allocation sites with the largest allocated size
+        memory = None
+        if self.memory_snapshot is not None:
+            memory = {
+                'days': list(self.memory_days),
+                'peak_bytes': self.memory_peak,
+                'top': [{'location': str(stat.traceback), 'size_bytes': stat.size, 'count': stat.count}
+                        for stat in self.memory_snapshot.statistics('lineno')[:self.top]],
+            }
+
+        return {
+            'days': {'first': self.first_day, 'last': self.last_day, 'count': n_days},
+            'seconds': {'total': total, 'mean_day': total / n_days if n_days else 0.0,
+                        'max_day': max(self.day_seconds, default = 0.0)},
+            'phases': phases,
+            'counters': dict(self.counters),
+            'profile': profile,
+            'memory': memory,
+        }
+
+    # write the per-run report
+    def write_report(self, path):
+        '''
+        Writes the per-run report (see `report`) to a JSON file.
+
+        Parameters
+        ----------
+        path : str
+            The JSON file.
+
+        Returns
+        -------
+        dict
+            The report.
+        '''
+        report = self.report()
+        with open(path, 'w') as file:
+            json.dump(report, file, indent = 2)
+        return report
+
+# render a per-run report
+def render_report(report):
+    '''
+    Renders a per-run report (see `Instrumentation.report`) as text.
+
+    Parameters
+    ----------
+    report : dict
+        The report.
+
+    Returns
+    -------
+    str
+        The rendered report.
+    '''
+
+    days = report['days']
+    seconds = report['seconds']
+    lines = ['Instrumentation Report',
+             '----------------------',
+             f"Days {days['first']} to {days['last']} ({days['count']} days): {seconds['total']:.4f} s "
+             f"(mean {seconds['mean_day'] * 1000:.3f} ms per day, longest {seconds['max_day'] * 1000:.3f} ms)",
+             'Phases:']
+    for phase, timing in report['phases'].items():
+        lines.append(f"    - {phase:12} {timing['seconds']:10.4f} s {timing['share']:7.1%} ({timing['calls']} calls)")
+    lines.append('Counters:')
+    for counter, count in report['counters'].items():
+        lines.append(f'    - {counter:12} {count}')
+
+    if report['memory'] is not None:
+        memory = report['memory']
+        lines.append(f"Memory (days {memory['days'][0]} to {memory['days'][1]}): peak {memory['peak_bytes'] / 2 ** 20:.2f} MB")
+        for stat in memory['top']:
+            lines.append(f"    - {stat['location']}: {stat['size_bytes'] / 1024:.1f} KB in {stat['count']} blocks")
+
+    text = ''.join(line + '\n' for line in lines)
+    if report['profile'] is not None:
+        text += 'Profile:\n' + report['profile']
+    return text
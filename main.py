@@ -22,18 +22,29 @@ To run the simulation:
     2. Open Command Prompt and change directory to where `main.py` is located.
     3. Run the `main.py` script in the Command Prompt by entering
             `python main.py`
+To write a checkpoint at the end of every 10 days, and to resume the simulation from the last checkpoint (e.g. after
+a crash), with the users' data, market prices, logs and random number generators restored exactly:
+            `python main.py --checkpoint game.ckpt --every 10`
+            `python main.py --checkpoint game.ckpt --resume`
+To write a report of the time spent in each phase of the day loop and of the key event counts, with a `cProfile`
+function profile of days 2 to 5 and the memory allocations of day 3:
+            `python main.py --instrument report.json --profile-days 2 5 --memory-days 3 3`
+To export the activity log, the daily prices and winners, and the users' end state to CSV files and NumPy archives,
+written day by day:
+            `python main.py --export results --export-format csv npz`
+To change the economy of the game (machine price, initial capital, prizes, purchase limit, market distributions) with
+the parameters of a JSON file (see `config.py`):
+            `python main.py --config economy.json`
 
 Functions
 ---------
 get_valid_input(prompt, min_val)
     Promts user for an input, ensuring the provided input is a positive interger, greater than `min_val`
-daily_summary(user_activity_log, oper_users, sdpa_price_tdy, current_day, machine_price=600)
+daily_summary(oper_users, sdpa_price_tdy, machine_price=600)
     Prints daily summary results for all operational users.
 print_actions(user_activity_log, user_name, action_messages)
     Prints a summary of the key actions performed throughout the simulation by a user.
-total_mined_and_bill(user_activity_log, user_name)
-    Computes a user's the total coins mined and electricity bill.
-print_user_summary(user, sdpa_price_tdy, total_mined_coins, user_activity_log, bankruptcy_log, action_messages, machine_price=600)
+print_user_summary(user, sdpa_price_tdy, total_mined_coins, user_activity_log, bankruptcy_log, action_messages, machine_price=600, initial_capital=50000)
     Prints a summary of performance throughout the simulation for a user.
 
 Classes Used
@@ -51,9 +62,15 @@ Georgius Benedikt Ermanta
 '''
 
 # import libraries and classes
-from market import Market
-from user_account import UserAccount
+import argparse
+import sys
+
 from blockchain import BlockChain
+from checkpoint import Checkpointer, load_checkpoint
+from reporting import user_performance, render_daily_summary, render_actions, render_user_summary
+from instrumentation import Instrumentation, render_report
+from export import Exporter
+from config import GameConfig
 
 # function to obtain valid input
 def get_valid_input(prompt, min_val):
@@ -93,7 +110,7 @@ def get_valid_input(prompt, min_val):
             print(err)
 
 # a function to compute and print daily summary results
-def daily_summary(user_activity_log, oper_users, sdpa_price_tdy, current_day, machine_price=600):
+def daily_summary(oper_users, sdpa_price_tdy, machine_price=600):
     '''
     Compute daily paper profit and daily net spending, and prints daily summary results for each operational user.
     This includes,
@@ -104,69 +121,22 @@ def daily_summary(user_activity_log, oper_users, sdpa_price_tdy, current_day, ma
     - Electricity bill (GBP)
     - Number of ASIC machines purchased
 
+    The figures are read from the users' daily totals (e.g. `day_mined`), which are updated as the actions, bills
+    and prizes are processed, rather than from the user activity log. The summaries of all users are rendered by
+    `render_daily_summary` (see `reporting.py`) and written in a single call.
+
     Parameters
     ----------
-    user_activity_log : dict
-        A nested dictionary that stores users key actions.
-        This log is generated by the `create_logs` method of the BlockChain class.
-        The data structure is,
-            {
-                user_name: {
-                    day: {
-                        action: [param]
-                    }
-                }
-            }
-        where:
-            - user_name : str
-                The user name.
-            - day : str
-                The day during the simulation (e.g. 'Day 1').
-            - action : str
-                The type of action performed (e.g. 'Action 1').
-            - param
-                The specified parameter for the action performed.
     oper_users : list
         A list of UserAccount class objects for users who are still operational (i.e. not bankrupt)
     sdpa_price_tdy : float
         Today's SDPA coin market price.
-    current_day : int
-        The current day.
     machine_price : float
         The price of 1 unit of ASIC machine.
     '''
 
-    # list of user names who are still operational
-    oper_user_names = [user.name for user in oper_users]
-
-    # iterate through each operational users
-    for user_name in oper_user_names:
-        # access the user's actions stored in user_activity_log
-        user_actions = user_activity_log[user_name][f'Day {current_day}']
-        
-        # number of machines purchased
-        user_purchase = sum(user_actions['Action 1']) if user_actions['Action 1'] else 0
-        # number of coins sold
-        user_sold = sum(user_actions['Action 2']) if user_actions['Action 2'] else 0
-        # electricity bill paid
-        user_elec = user_actions.get('Electricity', 0)
-        # prize received
-        user_prize = user_actions.get('Prize', 0)
-
-        # compute daily net spending
-        user_net_spending = user_sold * sdpa_price_tdy - user_purchase * machine_price - user_elec
-
-        # compute daily paper profit (assuming no depreciation expense from the ASIC machines)
-        user_paper_profit = user_prize * sdpa_price_tdy - user_elec
-
-        # print out the daily summary
-        print(user_name.capitalize() + ':')
-        print(f'    - Paper profit is {round(user_paper_profit, 2)} GBP.')
-        print(f'    - Net spending is {round(user_net_spending, 2)} GBP.')
-        print(f'    - Prize received is {round(user_prize, 2)} SDPA coins.')
-        print(f'    - Number of SDPA coins sold is {round(user_sold, 2)} units.')
-        print(f'    - Electrcity bill paid is {round(user_elec, 2)} GBP.')
-        print(f'    - Number of ASIC machines purchased is {user_purchase} units.')
+    # render the summaries of all users, then write them at once
+    sys.stdout.write(render_daily_summary(oper_users, sdpa_price_tdy, machine_price))
 
 
 # function to print out key actions taken in the simulation
@@ -177,13 +147,14 @@ def print_actions(user_activity_log, user_name, action_messages):
     This function utilizes the data stored in `user_activity_log` and the template message in `action_messages`
     to print a user's activity details for each day throughout the simulation.
     "No actions performed today" is printed if the user did not perform any action for the day.
+    The actions are rendered by `render_actions` (see `reporting.py`) and written in a single call.
     
     Parameters
     ----------
-    user_activity_log : dict
-        A nested dictionary that stores users key actions.
+    user_activity_log : SparseActivityLog
+        Stores users key actions.
         This log is generated by the `create_logs` method of the BlockChain class.
-        The data structure is,
+        It reads like the nested dictionary,
             {
                 user_name: {
                     day: {
@@ -225,88 +196,12 @@ def print_actions(user_activity_log, user_name, action_messages):
     - This function is intended to be used within the `print_user_summary` function.
     '''
 
-    for day, actions in user_activity_log[user_name].items():
-        # print the day
-        print(f'    {day}:')
-
-        # track wheter any action is perfomed on the day
-        action_indicator = False
-
-        # iterate through the actions and parameters
-        for action, param in actions.items():
-            # get the message from action_messages
-            message = action_messages[action](param)
-            # only print when the action was performed
-            if message:
-                print(message)
-                action_indicator = True # update the indicator when action/s are performed on the day
-        
-        # print message when no actions are performed on the day
-        if not action_indicator:
-            print('    - No actions performed today.')
-        
-        # break the loop once the user went bankrupt
-        if actions.get('Bankrupt', None) == 'yes':
-            break
-
-# function to compute total coins mined and electricity bill of a user in activity log
-def total_mined_and_bill(user_activity_log, user_name):
-    '''
-    Computes the total coins mined and total electricity bill for a user.
-
-    This function aggregates the prizes won throughout the simulation that is stored in the `user_activity_log`,
-    similarly with electricity bill.
-    
-    Parameters
-    ----------
-    user_activity_log : dict
-        A nested dictionary that stores users key actions.
-        This log is generated by the `create_logs` method of the BlockChain class.
-        The data structure is,
-            {
-                user_name: {
-                    day: {
-                        action: [param]
-                    }
-                }
-            }
-        where:
-            - user_name : str
-                The user name.
-            - day : str
-                The day during the simulation (e.g. 'Day 1').
-            - action : str
-                The type of action performed (e.g. 'Action 1').
-            - param
-                The specified parameter for the action performed.
-    user_name : str
-        The name of the user whose totals are going to be computed.
-
-    Returns
-    -------
-    tuple
-        The tuple contains 2 elements:
-        - float: Total coins mined
-        - float: Total electricity bill
-    
-    Notes
-    -----
-    Intented to be used within the print_user_summary function
-    '''
-
-    # store total values
-    user_mined_coins = 0 # total coins mined
-    user_total_bill = 0 # total electricity bill
-    # search for the specified user in the log
-    for day, actions in user_activity_log[user_name].items():
-        # update the total
-        user_mined_coins += actions.get('Prize', 0)
-        user_total_bill += actions.get('Electricity', 0)
-    
-    return user_mined_coins, user_total_bill
+    # render the actions of all days, then write them at once
+    sys.stdout.write(render_actions(user_activity_log, user_name, action_messages))
 
 # function to print user's summary
-def print_user_summary(user, sdpa_price_tdy, total_mined_coins, user_activity_log, bankruptcy_log, action_messages, machine_price=600):
+def print_user_summary(user, sdpa_price_tdy, total_mined_coins, user_activity_log, bankruptcy_log, action_messages, machine_price=600,
+                       initial_capital=50000):
     '''
     Prints a user's end of simulation summary
 
@@ -318,6 +213,7 @@ def print_user_summary(user, sdpa_price_tdy, total_mined_coins, user_activity_lo
     - Users who went bankrupt:
       Prints a similar summary to the above, except for cash capital balance, SDPA coin balance,
       total asset value and investment returns, as these values are either equal to zero or -100%.   
+    The summary is rendered by `render_user_summary` (see `reporting.py`) and written in a single call.
 
     Parameters
     ----------
@@ -327,10 +223,10 @@ def print_user_summary(user, sdpa_price_tdy, total_mined_coins, user_activity_lo
         The market price of SDPA coin price on the last day of the simulation.
     total_mined_coins : int
         Total coin mined by all users and the pool throughout the whole simulation.
-    user_activity_log : dict
-        A nested dictionary that stores users key actions.
+    user_activity_log : SparseActivityLog
+        Stores users key actions.
         This log is generated by the `create_logs` method of the BlockChain class.
-        The data structure is,
+        It reads like the nested dictionary,
             {
                 user_name: {
                     day: {
@@ -368,135 +264,134 @@ def print_user_summary(user, sdpa_price_tdy, total_mined_coins, user_activity_lo
             }
     machine_price : float, optional
         The price for 1 ASIC machine (default = 600).
+    initial_capital : int or float, optional
+        The starting cash capital of the user (default = 50000).
     '''
 
-    # print user's name
-    print(user.name.capitalize() + ':')
-
-    # for users that declared bankruptcy
-    if user.bankrupt_status == 'yes':
-        # print bankruptcy status
-        print(f'- {user.name.capitalize()} went bankrupt on day {bankruptcy_log[user.name]}')
+    # compute the user's performance
+    result = user_performance(user, sdpa_price_tdy, total_mined_coins, initial_capital, bankruptcy_log.get(user.name),
+                              machine_price)
+
+    # render the summary and the key actions, then write them at once
+    sys.stdout.write(render_user_summary(result, render_actions(user_activity_log, user.name, action_messages)))
+
+
+# command line options (without any option, the simulation runs from the beginning without checkpoints)
+parser = argparse.ArgumentParser(description = 'Run the SDPA coin mining simulation.')
+parser.add_argument('--config', default = None, help = 'JSON file of the economic parameters of the game (see config.py)')
+parser.add_argument('--checkpoint', default = None, help = 'checkpoint file, written at the end of every --every days')
+parser.add_argument('--every', type = int, default = 1, help = 'number of days between checkpoints (default: 1)')
+parser.add_argument('--resume', action = 'store_true', help = 'resume the simulation from the last checkpoint')
+parser.add_argument('--instrument', default = None, help = 'JSON file of the instrumentation report (phase timers and counters)')
+parser.add_argument('--profile-days', nargs = 2, type = int, default = None, metavar = ('FIRST', 'LAST'),
+                    help = 'days to profile with cProfile')
+parser.add_argument('--profile-output', default = None, help = 'file of the cProfile statistics')
+parser.add_argument('--memory-days', nargs = 2, type = int, default = None, metavar = ('FIRST', 'LAST'),
+                    help = 'days over which the memory allocations are traced with tracemalloc')
+parser.add_argument('--export', default = None, metavar = 'DIR', help = 'directory of the columnar export of the results')
+parser.add_argument('--export-format', nargs = '+', choices = ('csv', 'npz'), default = ['csv'],
+                    help = 'formats of the exported files (default: csv)')
+cli_args = parser.parse_args()
+if cli_args.resume and cli_args.checkpoint is None:
+    parser.error('--resume requires --checkpoint')
+
+# economic parameters of the game
+config = GameConfig.load(cli_args.config) if cli_args.config is not None else GameConfig()
+
+if cli_args.resume:
+    # restore the users, market, blockchain and logs as they were at the end of the last checkpointed day
+    state = load_checkpoint(cli_args.checkpoint)
+    n_days = state['extra']['n_days']
+    # the economy of the resumed game
+    if 'config' in state['extra']:
+        config = GameConfig(**state['extra']['config'])
+    market = state['market']
+    sdpa_blockchain = state['blockchain']
+    lst_users = state['users']
+    oper_users = state['oper_users']
+    user_activity_log = state['user_activity_log']
+    bankruptcy_log = state['bankruptcy_log']
+
+    # continue with the day after the last completed day
+    start_day = state['current_day']
+    current_day = start_day
+    sdpa_price_tdy = market.sdpa_price
+    print(f'Simulation resumed after Trading Day {start_day}.')
+
+else:
+    # query for number of days
+    n_days = get_valid_input('Enter number of days in the simulation (Minimum: 7): ', 7)
+
+    # query for number of users
+    n_users = get_valid_input('Enter number of users in the simulation (Minimum: 2): ', 2)
+
+    # list of all UserAccount objects
+    lst_users = []
+    # list of all user names
+    user_names = []
+
+    for i in range(n_users):
+        name_ind = True # indicator to keep track when a valid user name is provided
+        # loop until unique user name has been provided
+        while name_ind:
+            try:
+                # query for user names
+                name = input(f'Enter the name of User {i + 1}: ')
+            
+                # ensure that user names are unique
+                if name in user_names:
+                    raise ValueError('Invalid name: User name must be unique.')
 
-        # print final number of ASIC machines owned
-        print(f'- ASIC machines count = {user.machines}')
+                # create user object
+                user = config.new_user(name)
 
-        # copmute the total coins mined and electricity bill
-        user_mined_coins, user_total_bill = total_mined_and_bill(user_activity_log, user.name)
+                # update the indicator
+                name_ind = False
 
-        # print the total number of coins mined
-        print(f'- Total coins mined = {round(user_mined_coins, 2)} coins')
+            except ValueError as err:
+                print(err)
 
-        # print mining performance
-        mine_performance = user_mined_coins/total_mined_coins * 100
-        print(f'- Mining performance (%) = {round(mine_performance, 2)}%')
+        # update the list of users and names
+        lst_users.append(user)
+        user_names.append(name)
 
-        # print total electricity bill
-        print(f'- Total electricity bill = {round(user_total_bill, 2)} GBP.')
+    # create Market object
+    market = config.market()
+    # create BlockChain object
+    sdpa_blockchain = BlockChain(n_days)
+    # create winners log, user activity log, and user electricity bill log
+    user_activity_log, bankruptcy_log = sdpa_blockchain.create_logs(lst_users)
 
-        # print actions summary
-        print('- Key actions performed,')
-        print_actions(user_activity_log, user.name, action_messages)
+    # list of operational (non-bankrupt) users
+    oper_users = lst_users.copy()
 
-    # for users who remain oprational
-    else:
-        # print final (cash) capital balance
-        print(f'- Cash capital balance = {round(user.capital, 2)}')
-
-        # print final SDPA coin balance
-        print(f'- SDPA coin balance = {round(user.sdpa_balance, 2)}')
-        
-        # print dollar value of final SDPA coin balance
-        dollar_sdpa_balance = user.sdpa_balance * sdpa_price_tdy
-        print(f'- GBP value of SDPA coin balance = {round(dollar_sdpa_balance, 2)}')
-        
-        # print final number of ASIC machines owned
-        print(f'- ASIC machines count = {user.machines}')
-        
-        # print total GBP value of all assets (assuming the machines' value do not depreciate)
-        total_assets = user.capital + dollar_sdpa_balance + user.machines * machine_price
-        print(f'- Total GBP value of all assets = {round(total_assets, 2)}')
-
-        # print investment return
-            # GBP investment return
-        int_ret_gbp = total_assets - initial_capital
-        print(f'- Investment return (GBP) = {round(int_ret_gbp, 2)} GBP')
-            # % investment return
-        inv_ret_pct = (int_ret_gbp)/initial_capital * 100
-        print(f'- Investment return (%) = {round(inv_ret_pct, 2)}%')
-        
-        # copmute the total coins mined and electricity bill
-        user_mined_coins, user_total_bill = total_mined_and_bill(user_activity_log, user.name)
-
-        # print the total number of coins mined
-        print(f'- Total coins mined = {round(user_mined_coins, 2)} coins')
-
-        # print mining performance
-        mine_performance = user_mined_coins/total_mined_coins * 100
-        print(f'- Mining performance (%) = {round(mine_performance, 2)}%')
-
-        # print total electricity bill
-        print(f'- Total electricity bill = {round(user_total_bill, 2)} GBP.')
-
-        # print actions summary
-        print('- Key actions performed,')
-        print_actions(user_activity_log, user.name, action_messages)
-
-
-# query for number of days
-n_days = get_valid_input('Enter number of days in the simulation (Minimum: 7): ', 7)
-
-# query for number of users
-n_users = get_valid_input('Enter number of users in the simulation (Minimum: 2): ', 2)
+    # start with the first day
+    start_day = 0
 
 # set the price for 1 unit of ASIC machine
-machine_price = 600
+machine_price = config.machine_price
 # set intial cash capital
-initial_capital = 50000
-
-# list of all UserAccount objects
-lst_users = []
-# list of all user names
-user_names = []
-
-for i in range(n_users):
-    name_ind = True # indicator to keep track when a valid user name is provided
-    # loop until unique user name has been provided
-    while name_ind:
-        try:
-            # query for user names
-            name = input(f'Enter the name of User {i + 1}: ')
-            
-            # ensure that user names are unique
-            if name in user_names:
-                raise ValueError('Invalid name: User name must be unique.')
-
-            # create user object
-            user = UserAccount(name, initial_capital)
-
-            # update the indicator
-            name_ind = False
-
-        except ValueError as err:
-            print(err)
-
-    # update the list of users and names
-    lst_users.append(user)
-    user_names.append(name)
-
-# create Market object
-market = Market()
-# create BlockChain object
-sdpa_blockchain = BlockChain(n_days)
-# create winners log, user activity log, and user electricity bill log
-user_activity_log, bankruptcy_log = sdpa_blockchain.create_logs(lst_users)
-
-# list of operational (non-bankrupt) users
-oper_users = lst_users.copy()
+initial_capital = config.initial_capital
+# base number of machines in mining pool
+base_pooled_mach = config.base_pooled_mach
+# SDPA coins distributed per day
+total_prize = config.total_prize
+
+# periodic checkpoints
+checkpointer = Checkpointer(cli_args.checkpoint, cli_args.every) if cli_args.checkpoint is not None else None
+# phase timers and counters (the report is only written with --instrument)
+instrumentation = Instrumentation(cli_args.profile_days, cli_args.memory_days, cli_args.profile_output)
+# columnar export of the results (only with --export)
+exporter = Exporter(cli_args.export, cli_args.export_format) if cli_args.export is not None else None
+# a resumed game continues the export of the days before the checkpoint
+if exporter is not None:
+    exporter.resume(start_day, user_activity_log)
 
 # iterate through each day
-for i in range(n_days):
+for i in range(start_day, n_days):
     current_day = i + 1
+    instrumentation.start_day(current_day)
+    instrumentation.start('prices')
     print(f'''Trading Day {current_day}
 ------------- ''')
     
@@ -512,6 +407,8 @@ for i in range(n_days):
         # break the loop when SDPA price is less than or equal to zero
         if sdpa_price_tdy <= 0:
             print('Simulation ended. SDPA coin has been delisted.')
+            instrumentation.stop('prices')
+            instrumentation.end_day(current_day)
             break
         # otherwise print the market price
         else:
@@ -520,9 +417,11 @@ for i in range(n_days):
     # print electricity price for the day
     elec_price_tdy = market.new_elec_price()
     print(f'Today\'s unit price of electricity is {elec_price_tdy} GBP')
+    instrumentation.stop('prices')
 
     # iterate through each defined users
     for user in oper_users:
+        instrumentation.start('actions')
         # resets the tracker for daily machine purchases
         user.reset_daily_machine_purchases()
 
@@ -562,14 +461,22 @@ Enter action number: ''')
             except ValueError as err:
                 print(err)
     
+        instrumentation.stop('actions')
+
         # electricity bill payment
+        instrumentation.start('electricity')
         user.electricity_bill(elec_price_tdy, current_day)
+        instrumentation.stop('electricity')
 
     # determine the day's winners
-    base_pooled_mach = 1000 # base number of machines in mining pool
-    total_prize = 100 # SDPA coins distributed per day
+    instrumentation.start('winner')
     day_winners = sdpa_blockchain.winner(oper_users, current_day, base_pooled_mach, total_prize)
+    instrumentation.stop('winner')
+    instrumentation.count('winner_draws')
+    if day_winners == 'pooled':
+        instrumentation.count('pool_wins')
     
+    instrumentation.start('summary')
     # print total number of machines today
     print(f'Total number of ASIC machines: {sdpa_blockchain.total_machines}')
 
@@ -577,19 +484,39 @@ Enter action number: ''')
     print(f'{day_winners.capitalize()} wins PoW mining.')
 
     # print daily summary
-    daily_summary(user_activity_log, oper_users, sdpa_price_tdy, current_day, machine_price=600)
+    daily_summary(oper_users, sdpa_price_tdy, machine_price=machine_price)
+    instrumentation.stop('summary')
 
     # check for bankruptcy
-    for user in oper_users.copy():
+    instrumentation.start('bankruptcy')
+    # users with a negative capital either sell SDPA coins automatically or go bankrupt
+    n_negative = sum(1 for user in oper_users if user.capital < 0)
+    n_oper = len(oper_users)
+    for user in oper_users:
         user.bankrupt_check(current_day, bankruptcy_log)
-        # remove bankrupt users from list of operational users
-        if user.bankrupt_status == 'yes':
-            oper_users.remove(user)
+    # remove bankrupt users from list of operational users (in one pass, rather than removing them one by one)
+    oper_users = [user for user in oper_users if user.bankrupt_status == 'no']
+    instrumentation.stop('bankruptcy')
+    instrumentation.count('bankruptcies', n_oper - len(oper_users))
+    instrumentation.count('auto_sales', n_negative - (n_oper - len(oper_users)))
+
+    # export the day's events, prices and winner
+    if exporter is not None:
+        exporter.day(current_day, sdpa_price_tdy, elec_price_tdy, day_winners, user_activity_log)
 
     # stop the loop when all users are bankrupt
     if not oper_users:
+        instrumentation.end_day(current_day)
         break
 
+    # write a checkpoint of the completed day
+    if checkpointer is not None and checkpointer.due(current_day):
+        instrumentation.start('checkpoint')
+        checkpointer.save(current_day, market, sdpa_blockchain, lst_users, oper_users, {'n_days': n_days, 'config': config.as_dict()})
+        instrumentation.stop('checkpoint')
+
+    instrumentation.end_day(current_day)
+
 # total coins mined by everyone during the simulation
 total_mined_coins = total_prize * current_day
 
@@ -615,4 +542,14 @@ for user in lst_users:
                        user_activity_log,
                        bankruptcy_log,
                        action_messages,
-                       600)
\ No newline at end of file
+                       machine_price,
+                       initial_capital)
+
+# export the users' end state
+if exporter is not None:
+    exporter.end_of_run([user_performance(user, sdpa_price_tdy, total_mined_coins, initial_capital,
+                                          bankruptcy_log.get(user.name), machine_price) for user in lst_users])
+
+# write the instrumentation report
+if cli_args.instrument is not None:
+    sys.stdout.write('\n' + render_report(instrumentation.write_report(cli_args.instrument)))
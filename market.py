@@ -9,7 +9,12 @@ A module to generate the market price of SDPA coin and per unit of electricity.
 
 This module defines the `Market` class. It sets an intial price of SDPA coin at 50 GBP, and applies randomly generated
 daily returns, drawn from a normal distribution, to simulate price movement. It also generates the per unit market price
-of electricity, drawn from a uniform distribution.
+of electricity, drawn from a uniform distribution. The initial price and the parameters of both distributions can be
+changed (e.g. by a `GameConfig` from `config.py`).
+The prices can either be drawn day by day, or pre-generated for the whole simulation in one vectorized call (which
+requires NumPy), including a batched variant that generates many price paths at once for Monte Carlo runs.
+Each `Market` draws from its own random number generator, which can be seeded (or injected) to make the prices
+reproducible.
 
 Class
 -----
@@ -21,21 +26,41 @@ Market
 # import libraries
 import random
 
+# numpy is optional: it is only used to pre-generate the price paths
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 class Market:
     '''
     A class to generate SDPA coin and electricity market price,
 
-    SDPA coin market price always starts at 50 GBP, and each day, the price will randomly move based on the randomly
-    generated returns, drawn from a normal distribution.
+    SDPA coin market price starts at 50 GBP (by default), and each day, the price will randomly move based on the
+    randomly generated returns, drawn from a normal distribution.
     Market price for per unit of electricity is randomly generated from a uniform distribution.
     ...
 
     Attributes
     ----------
+    rng : random.Random
+        The random number generator of the market.
+    return_mean : float
+        The mean of the daily returns of SDPA coin.
+    return_std : float
+        The standard deviation of the daily returns of SDPA coin.
+    elec_low : float
+        The lowest per unit price of electricity.
+    elec_high : float
+        The highest per unit price of electricity.
     sdpa_price : float
         The market price of SDPA coin
     elec_price : float
         The per unit market price of electricity
+    sdpa_path : list
+        The pre-generated SDPA coin market prices, one per day (None unless `pregenerate` has been called)
+    elec_path : list
+        The pre-generated per unit market prices of electricity, one per day (None unless `pregenerate` has been called)
 
     Methods
     -------
@@ -43,16 +68,66 @@ class Market:
         Generate SDPA market price
     new_elec_price()
         Generate per unit market price of electricity 
+    pregenerate(n_days, seed = None)
+        Generate the prices of all days at once
+    price_paths(n_paths, n_days, initial_price = 50, seed = None, return_mean = 0.01, return_std = 0.005,
+                elec_low = 1.5, elec_high = 3.5)
+        Generate a batch of independent price paths
     '''
 
-    def __init__(self):
+    def __init__(self, seed = None, rng = None, initial_price = 50, return_mean = 0.01, return_std = 0.005,
+                 elec_low = 1.5, elec_high = 3.5):
         '''
         Initialize Market class with an initial SDPA coin price.
+
+        Parameters
+        ----------
+        seed : int, optional
+            Seed of the market's random number generator (default is None, i.e. unpredictable prices).
+            See `seeding.derive_seed` to derive independent seeds for parallel simulations.
+        rng : random.Random, optional
+            The random number generator to use instead of creating one from `seed` (default is None).
+        initial_price : int or float, optional
+            The SDPA coin market price on day 1 (default is 50).
+        return_mean : float, optional
+            The mean of the daily returns of SDPA coin (default is 0.01).
+        return_std : float, optional
+            The standard deviation of the daily returns of SDPA coin (default is 0.005).
+        elec_low : float, optional
+            The lowest per unit price of electricity (default is 1.5).
+        elec_high : float, optional
+            The highest per unit price of electricity (default is 3.5).
+
+        Raises
+        ------
+        ValueError
+            If the initial price is not positive, the standard deviation is negative, or the electricity price range
+            is invalid.
         '''
-        
+
+        if initial_price <= 0:
+            raise ValueError(f'Invalid price: The initial SDPA coin price must be positive, got {initial_price}.')
+        if return_std < 0:
+            raise ValueError(f'Invalid distribution: The standard deviation must not be negative, got {return_std}.')
+        if not 0 <= elec_low <= elec_high:
+            raise ValueError(f'Invalid distribution: The electricity prices must satisfy 0 <= low <= high, got '
+                             f'{elec_low} and {elec_high}.')
+
+        # random number generator of the market
+        self.rng = rng if rng is not None else random.Random(seed)
         # price of sdpa on day 1
-        self.sdpa_price = 50
-        pass
+        self.sdpa_price = initial_price
+        # distribution of the daily returns of sdpa, and of the electricity prices
+        self.return_mean = return_mean
+        self.return_std = return_std
+        self.elec_low = elec_low
+        self.elec_high = elec_high
+        # pre-generated prices (see `pregenerate`)
+        self.sdpa_path = None
+        self.elec_path = None
+        # position of the last price served from the pre-generated paths
+        self.sdpa_day = 0
+        self.elec_day = 0
     
     # generate new sdpa price
     def new_sdpa_price(self):
@@ -60,7 +135,8 @@ class Market:
         Generate SDPA coin market price.
 
         The coin's market price starts at 50 GBP. Each day, the market price will move based on the coin's randomly generated
-        daily return, drawn from the Normal distribution with mean 0.01 and std. 0.005, i.e. N~(0.01, 0.005).
+        daily return, drawn from the Normal distribution with mean 0.01 and std. 0.005, i.e. N~(0.01, 0.005) (by default,
+        see `return_mean` and `return_std`).
         
         Returns
         -------
@@ -68,8 +144,14 @@ class Market:
             The newly generated SDPA coin market price
         '''
 
+        # serve the next pre-generated price
+        if self.sdpa_path is not None and self.sdpa_day < len(self.sdpa_path) - 1:
+            self.sdpa_day += 1
+            self.sdpa_price = self.sdpa_path[self.sdpa_day]
+            return self.sdpa_price
+
         # generate new sdpa market price
-        self.sdpa_price *= (1 + random.gauss(0.01, 0.005))
+        self.sdpa_price *= (1 + self.rng.gauss(self.return_mean, self.return_std))
         return self.sdpa_price
     
     # generate new electricity unit price
@@ -77,7 +159,8 @@ class Market:
         '''
         Generate per unit market price of electricity.
 
-        The per unit market price of electricity is drawn from a Uniform distribution, i.e. U~(1.5, 3.5)
+        The per unit market price of electricity is drawn from a Uniform distribution, i.e. U~(1.5, 3.5) (by default, see
+        `elec_low` and `elec_high`)
         
         Returns
         -------
@@ -85,5 +168,118 @@ class Market:
             The newly generated per unit market price of electricity
         '''
 
-        self.elec_price = random.uniform(1.5, 3.5)
-        return self.elec_price
\ No newline at end of file
+        # serve the next pre-generated price
+        if self.elec_path is not None and self.elec_day < len(self.elec_path):
+            self.elec_price = self.elec_path[self.elec_day]
+            self.elec_day += 1
+            return self.elec_price
+
+        self.elec_price = self.rng.uniform(self.elec_low, self.elec_high)
+        return self.elec_price
+
+    # generate the prices of all days at once
+    def pregenerate(self, n_days, seed = None):
+        '''
+        Generate the SDPA coin and electricity market prices of all days in one vectorized call.
+
+        The SDPA coin price path starts at the current price (day 1) and is the cumulative product of the daily gross
+        returns 1 + N~(return_mean, return_std); the electricity prices are drawn from U~(elec_low, elec_high).
+        Afterwards, `new_sdpa_price` and `new_elec_price` serve the pre-generated prices in order (and go back to
+        drawing prices one by one once the paths are exhausted).
+
+        Parameters
+        ----------
+        n_days : int
+            Number of days in the simulation.
+        seed : int, optional
+            Seed of the NumPy random generator (default is None, i.e. the seed is drawn from the market's generator,
+            so a seeded market pre-generates reproducible prices).
+
+        Attributes
+        ----------
+        sdpa_path : list
+            The SDPA coin market price of each day; `sdpa_path[0]` is the current price.
+        elec_path : list
+            The per unit market price of electricity of each day.
+
+        Raises
+        ------
+        ValueError
+            If `n_days` is less than 1.
+        ImportError
+            If NumPy is not installed.
+        '''
+
+        if n_days < 1:
+            raise ValueError(f'Invalid length: The number of days must be at least 1, got {n_days}.')
+        if seed is None:
+            seed = self.rng.getrandbits(128)
+        sdpa_paths, elec_paths = Market.price_paths(1, n_days, self.sdpa_price, seed, self.return_mean, self.return_std,
+                                                    self.elec_low, self.elec_high)
+
+        # store the paths as lists, which are faster to serve one price at a time
+        self.sdpa_path = sdpa_paths[0].tolist()
+        self.elec_path = elec_paths[0].tolist()
+        self.sdpa_day = 0
+        self.elec_day = 0
+
+    # generate a batch of price paths
+    @staticmethod
+    def price_paths(n_paths, n_days, initial_price = 50, seed = None, return_mean = 0.01, return_std = 0.005,
+                    elec_low = 1.5, elec_high = 3.5):
+        '''
+        Generate a batch of independent SDPA coin and electricity price paths, e.g. for Monte Carlo simulations.
+
+        Parameters
+        ----------
+        n_paths : int
+            Number of price paths.
+        n_days : int
+            Number of days in each path.
+        initial_price : int or float, optional
+            The SDPA coin market price on day 1 (default is 50).
+        seed : int, optional
+            Seed of the NumPy random generator (default is None, i.e. unpredictable prices).
+        return_mean : float, optional
+            The mean of the daily returns of SDPA coin (default is 0.01).
+        return_std : float, optional
+            The standard deviation of the daily returns of SDPA coin (default is 0.005).
+        elec_low : float, optional
+            The lowest per unit price of electricity (default is 1.5).
+        elec_high : float, optional
+            The highest per unit price of electricity (default is 3.5).
+
+        Returns
+        -------
+        tuple
+            A tuple containing 2 elements:
+            - numpy.ndarray: The SDPA coin market prices, with shape (n_paths, n_days).
+            - numpy.ndarray: The per unit market prices of electricity, with shape (n_paths, n_days).
+
+        Raises
+        ------
+        ValueError
+            If `n_paths` or `n_days` is less than 1.
+        ImportError
+            If NumPy is not installed.
+        '''
+
+        if n_paths < 1:
+            raise ValueError(f'Invalid batch: The number of price paths must be at least 1, got {n_paths}.')
+        if n_days < 1:
+            raise ValueError(f'Invalid length: The number of days must be at least 1, got {n_days}.')
+        if np is None:
+            raise ImportError('NumPy is required to pre-generate the price paths.')
+
+        generator = np.random.default_rng(seed)
+
+        # gross returns of day 2 onwards, preceded by the price of day 1
+        sdpa_paths = np.empty((n_paths, n_days))
+        sdpa_paths[:, 0] = initial_price
+        sdpa_paths[:, 1:] = 1 + generator.normal(return_mean, return_std, size=(n_paths, n_days - 1))
+        # the running product multiplies the prices in the same order as `new_sdpa_price`
+        np.cumprod(sdpa_paths, axis=1, out=sdpa_paths)
+
+        elec_paths = generator.uniform(elec_low, elec_high, size=(n_paths, n_days))
+
+        return sdpa_paths, elec_paths
\ No newline at end of file
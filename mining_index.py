@@ -0,0 +1,281 @@
+# Georgius Benedikt Ermanta
+# Fintech
+# This module keeps track of the active mining power of all users, so that the daily winner can be drawn without
+# rebuilding the players' proportions every day.
+
+'''
+mining_index.py
+---------------
+A module to index the mining power of the users in the blockchain simulation.
+
+This module defines the `MiningPowerIndex` class. It stores the active mining power (i.e. the number of machines that
+are turned on) of every solo miner in a Fenwick tree (binary indexed tree), and the aggregate active mining power of the
+pooled miners in a running total, along with the pool membership (name -> account) of the users whose pooled machines
+are turned on, so that the pool prize can be distributed in a single pass over the members. The index is updated
+incrementally whenever a user buys machines, switches their machines on/off, changes their mining type or goes
+bankrupt, and the winner is picked with a binary search over the cumulative mining power, i.e. in O(log n) instead of
+several O(n) passes per day.
+
+Class
+-----
+MiningPowerIndex
+    A class to store the users' mining power and to draw the daily winner.
+'''
+
+class MiningPowerIndex:
+    '''
+    A class to store the users' mining power and to draw the daily winner.
+
+    Every user registered in the index occupies a slot (in registration order). A slot holds the user's active
+    mining power when the user is a solo miner, and 0 otherwise. The active mining power of pooled users is
+    aggregated in `pooled_machines`.
+    ...
+
+    Attributes
+    ----------
+    users : list
+        The `UserAccount` objects registered in the index, in slot order.
+    solo_machines : int
+        Total number of active machines of solo miners.
+    pooled_machines : int
+        Total number of active machines of pooled miners (excluding the base machines of the pool).
+    pool_members : dict
+        Stores the user names (keys) and `UserAccount` objects (values) of the users mining in the pool with their
+        machines turned on.
+    total_machines : int
+        Total number of machines (active and inactive) owned by operational users.
+
+    Methods
+    -------
+    add(user)
+        Registers a user in the index.
+    update(user)
+        Updates the index after the user's machines, machine status, mining type or bankruptcy status changed.
+    find(target)
+        Finds the solo miner whose cumulative mining power interval contains `target`.
+    draw(rng, base_pooled_mach = 1000)
+        Determines the winning player for a uniform random number.
+    pool_payout(total_prize, base_pooled_mach = 1000)
+        Computes the prize attributable to each pool member.
+    '''
+
+    def __init__(self, users = ()):
+        '''
+        Parameters
+        ----------
+        users : iterable, optional
+            The `UserAccount` objects to register in the index (default is an empty tuple).
+        '''
+
+        # Fenwick tree of the solo mining power (1-based, position 0 is unused)
+        self.tree = [0]
+        # the registered users and their slot
+        self.users = []
+        self.slots = {}
+        # the contribution of each slot: (solo machines, pooled machines, total machines)
+        self.contributions = []
+
+        # running totals
+        self.solo_machines = 0
+        self.pooled_machines = 0
+        self.total_machines = 0
+
+        # users mining in the pool with their machines turned on
+        self.pool_members = {}
+
+        for user in users:
+            self.add(user)
+
+    # register a new user
+    def add(self, user):
+        '''
+        Registers a user in the index, and links the index to the user (`user.mining_index`) so that the user's
+        changes are reflected automatically.
+
+        Parameters
+        ----------
+        user : UserAccount
+            The user to register.
+
+        Raises
+        ------
+        ValueError
+            If a user with the same name has already been registered.
+        '''
+
+        if user.name in self.slots:
+            raise ValueError(f'Invalid user: {user.name} is already registered in the mining index.')
+
+        # new position in the tree (1-based)
+        position = len(self.tree)
+        # the new node covers the slots (position - lowbit, position], where the new slot is still empty
+        self.tree.append(self.prefix_sum(position - 1) - self.prefix_sum(position - (position & -position)))
+
+        # register the user
+        self.slots[user.name] = len(self.users)
+        self.users.append(user)
+        self.contributions.append((0, 0, 0))
+        user.mining_index = self
+
+        # add the user's mining power
+        self.update(user)
+
+    # reflect the user's current state
+    def update(self, user):
+        '''
+        Updates the index after the user's machines, machine status, mining type or bankruptcy status changed.
+
+        Parameters
+        ----------
+        user : UserAccount
+            A user registered in the index.
+        '''
+
+        slot = self.slots[user.name]
+        old_solo, old_pooled, old_total = self.contributions[slot]
+
+        # bankrupt users (and their machines) are taken out of the simulation
+        if user.bankrupt_status == 'yes':
+            new_solo, new_pooled, new_total = 0, 0, 0
+        else:
+            new_total = user.machines
+            # only machines that are turned on participate in mining
+            active = user.machines if user.machine_status == 'on' else 0
+            if user.mining_type == 'pooled':
+                new_solo, new_pooled = 0, active
+            else:
+                new_solo, new_pooled = active, 0
+
+        self.contributions[slot] = (new_solo, new_pooled, new_total)
+
+        # update the pool membership
+        if new_pooled > 0:
+            self.pool_members[user.name] = user
+        elif old_pooled > 0:
+            del self.pool_members[user.name]
+
+        # update the running totals
+        self.pooled_machines += new_pooled - old_pooled
+        self.total_machines += new_total - old_total
+
+        # update the tree
+        delta = new_solo - old_solo
+        if delta != 0:
+            self.solo_machines += delta
+            position = slot + 1
+            while position < len(self.tree):
+                self.tree[position] += delta
+                position += position & -position
+
+    # sum of the solo mining power of the first `position` slots
+    def prefix_sum(self, position):
+        '''
+        Computes the total solo mining power of the first `position` slots.
+
+        Parameters
+        ----------
+        position : int
+            The number of slots to sum over.
+
+        Returns
+        -------
+        int
+            The cumulative solo mining power.
+        '''
+
+        total = 0
+        while position > 0:
+            total += self.tree[position]
+            position -= position & -position
+        return total
+
+    # binary search on the cumulative solo mining power
+    def find(self, target):
+        '''
+        Finds the solo miner whose cumulative mining power interval contains `target`, i.e. the first slot for which
+        the cumulative solo mining power is strictly greater than `target`.
+
+        Parameters
+        ----------
+        target : int or float
+            A value between 0 (inclusive) and `solo_machines` (exclusive).
+
+        Returns
+        -------
+        UserAccount
+            The user occupying the slot.
+        '''
+
+        size = len(self.tree) - 1
+        position = 0
+        step = 1 << (size.bit_length() - 1) if size else 0
+        # descend the tree from the largest power of 2
+        while step:
+            next_position = position + step
+            if next_position <= size and self.tree[next_position] <= target:
+                position = next_position
+                target -= self.tree[next_position]
+            step >>= 1
+
+        # guard against floating point round-off at the upper end: fall back to the last active solo miner
+        if position >= size:
+            position = size - 1
+            while position > 0 and self.contributions[position][0] == 0:
+                position -= 1
+
+        return self.users[position]
+
+    # determine the winning player
+    def draw(self, rng, base_pooled_mach = 1000):
+        '''
+        Determines the winning player for a uniform random number.
+
+        The players are ordered as in the original `BlockChain.winner` method: the mining pool first, followed by
+        the solo miners in registration order, and each player covers an interval of [0, 1) proportional to their
+        active mining power.
+
+        Parameters
+        ----------
+        rng : float
+            A random number drawn from U ~ (0, 1).
+        base_pooled_mach : int, optional
+            The base number of machines in the pool (default is 1000).
+
+        Returns
+        -------
+        str or UserAccount
+            'pooled' if the mining pool wins, otherwise the `UserAccount` object of the winning solo miner.
+        '''
+
+        # active mining power of the pool and of all players
+        pool_power = base_pooled_mach + self.pooled_machines
+        active_machines = pool_power + self.solo_machines
+
+        # position of the random number on the cumulative mining power
+        target = rng * active_machines
+        if target < pool_power or self.solo_machines == 0:
+            return 'pooled'
+        return self.find(target - pool_power)
+
+    # split the pool prize among its members
+    def pool_payout(self, total_prize, base_pooled_mach = 1000):
+        '''
+        Computes the prize attributable to each pool member, based on their active mining power relative to the
+        aggregate mining power in the pool (including the base machines of the pool).
+
+        Parameters
+        ----------
+        total_prize : int or float
+            The total daily SDPA prize won by the pool.
+        base_pooled_mach : int, optional
+            The base number of machines in the pool (default is 1000).
+
+        Returns
+        -------
+        list
+            A list of `(user, partial_prize)` tuples, one per pool member.
+        '''
+
+        # total active machines in the pool
+        pooled_machines = base_pooled_mach + self.pooled_machines
+        return [(user, user.machines/pooled_machines * total_prize) for user in self.pool_members.values()]
@@ -0,0 +1,337 @@
+# Georgius Benedikt Ermanta
+# Fintech
+# This module runs many independent headless simulations in parallel and aggregates the distribution of the users'
+# performance.
+
+'''
+montecarlo.py
+-------------
+A module to run Monte Carlo experiments of the blockchain mining simulation.
+
+This module defines the `MonteCarlo` class. Each run is an independent, seeded `Simulation` with its own `Market`,
+`BlockChain` and users. The market and the blockchain of a run draw from their own random number generators, seeded
+with `seeding.derive_seed(run_seed, 'market')` and `seeding.derive_seed(run_seed, 'blockchain')`, so every run is
+reproducible from its seed alone, whichever worker process runs it.
+The runs are spread across a process pool (`concurrent.futures.ProcessPoolExecutor`) in batches, so that the work
+scales with the number of cores, and the results of each run are streamed back as soon as its batch completes. The distributions of the final total assets, the investment return and the mining performance
+(as computed in `print_user_summary` in `main.py`) are then aggregated over all runs.
+
+Usage
+-----
+To run 1000 simulations of 365 days with 10 passive users on all cores:
+    `python montecarlo.py --runs 1000 --days 365 --users 10`
+To let every user follow one of the strategies of `strategies.py` (e.g. buy-and-hold):
+    `python montecarlo.py --runs 1000 --users 10 --strategy buy-and-hold`
+
+Classes
+-------
+MonteCarlo
+    A class to run many seeded simulations in parallel and aggregate their results.
+
+Functions
+---------
+run_simulation(seed, n_days, n_users, policies = None, initial_capital = 50000, log_backend = 'sparse')
+    Runs one seeded simulation and returns the performance of each user.
+run_batch(seeds, n_days, n_users, policies = None, initial_capital = 50000, log_backend = 'sparse')
+    Runs several seeded simulations (one task of the process pool).
+summarize(values)
+    Computes the summary statistics of a distribution.
+'''
+
+# import libraries and classes
+import argparse
+import json
+import os
+import statistics
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from market import Market
+from user_account import UserAccount
+from blockchain import BlockChain
+from simulation import Simulation
+from seeding import derive_seed
+from strategies import STRATEGIES
+
+# the performance metrics that are aggregated
+METRICS = ('total_assets', 'investment_return', 'investment_return_pct', 'total_mined', 'mining_performance')
+
+# run a single simulation
+def run_simulation(seed, n_days, n_users, policies = None, initial_capital = 50000, log_backend = 'sparse'):
+    '''
+    Runs one seeded simulation and returns the performance of each user.
+
+    Parameters
+    ----------
+    seed : int
+        The seed of the simulation.
+    n_days : int
+        Number of days in the simulation.
+    n_users : int
+        Number of users in the simulation. The users are named 'User 1', 'User 2', etc.
+    policies : callable or dict, optional
+        The decision policies of the users, see `Simulation` (default is None, i.e. every user is passive).
+        The policies have to be picklable (e.g. functions defined at module level) to be sent to the worker processes.
+    initial_capital : int or float, optional
+        The starting cash capital of each user (default is 50000).
+    log_backend : str, optional
+        How the user activity log is stored, see `BlockChain.create_logs` (default is 'sparse').
+
+    Returns
+    -------
+    dict
+        The 'seed', the number of simulated 'days', and the performance of the 'users' (see `Simulation.results`).
+    '''
+
+    # independent random number streams for the market and the blockchain
+    market = Market(seed = derive_seed(seed, 'market'))
+    blockchain = BlockChain(n_days, seed = derive_seed(seed, 'blockchain'))
+
+    users = [UserAccount(f'User {i + 1}', initial_capital) for i in range(n_users)]
+    sim = Simulation(market, blockchain, users, policies, log_backend = log_backend).run()
+
+    return {'seed': seed, 'days': sim.current_day, 'users': sim.results()}
+
+# run several simulations in one task
+def run_batch(seeds, n_days, n_users, policies = None, initial_capital = 50000, log_backend = 'sparse'):
+    '''
+    Runs several seeded simulations. Batching the runs reduces the overhead of sending tasks to the worker processes.
+
+    Parameters
+    ----------
+    seeds : list
+        The seeds of the simulations.
+    n_days, n_users, policies, initial_capital, log_backend
+        See `run_simulation`.
+
+    Returns
+    -------
+    list
+        The results of each simulation (see `run_simulation`).
+    '''
+
+    return [run_simulation(seed, n_days, n_users, policies, initial_capital, log_backend) for seed in seeds]
+
+# summary statistics of a distribution
+def summarize(values):
+    '''
+    Computes the summary statistics of a distribution.
+
+    Parameters
+    ----------
+    values : list
+        The observed values.
+
+    Returns
+    -------
+    dict
+        The 'count', 'mean', 'std', 'min', 'p5', 'p25', 'median', 'p75', 'p95' and 'max' of the values
+        (only the 'count' when there are no values).
+    '''
+
+    if not values:
+        return {'count': 0}
+
+    ordered = sorted(values)
+    # percentile by linear interpolation between the closest ranks
+    def percentile(pct):
+        position = (len(ordered) - 1) * pct / 100
+        lower = int(position)
+        upper = min(lower + 1, len(ordered) - 1)
+        return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+    return {
+        'count': len(ordered),
+        'mean': statistics.fmean(ordered),
+        'std': statistics.pstdev(ordered),
+        'min': ordered[0],
+        'p5': percentile(5),
+        'p25': percentile(25),
+        'median': percentile(50),
+        'p75': percentile(75),
+        'p95': percentile(95),
+        'max': ordered[-1],
+    }
+
+class MonteCarlo:
+    '''
+    A class to run many seeded simulations in parallel and aggregate their results.
+    ...
+
+    Attributes
+    ----------
+    n_runs : int
+        Number of simulations.
+    n_days : int
+        Number of days in each simulation.
+    n_users : int
+        Number of users in each simulation.
+    policies : callable or dict
+        The decision policies of the users.
+    seed : int
+        The base seed; run i is seeded with `seed + i`.
+    n_workers : int
+        Number of worker processes.
+    batch_size : int
+        Number of runs per task of the process pool.
+
+    Methods
+    -------
+    seeds()
+        Returns the seed of each run.
+    iter_results()
+        Runs the simulations and yields the result of each run as soon as it is available.
+    run()
+        Runs all the simulations and aggregates their results.
+    aggregate(results)
+        Aggregates the distributions of the users' performance.
+    '''
+
+    def __init__(self, n_runs, n_days, n_users, policies = None, seed = 0, n_workers = None, batch_size = None,
+                 initial_capital = 50000, log_backend = 'sparse'):
+        '''
+        Parameters
+        ----------
+        n_runs : int
+            Number of simulations.
+        n_days : int
+            Number of days in each simulation.
+        n_users : int
+            Number of users in each simulation.
+        policies : callable or dict, optional
+            The decision policies of the users, see `Simulation`. They have to be picklable
+            (default is None, i.e. every user is passive).
+        seed : int, optional
+            The base seed (default is 0).
+        n_workers : int, optional
+            Number of worker processes (default is None, i.e. the number of CPUs).
+        batch_size : int, optional
+            Number of runs per task (default is None, i.e. about 4 tasks per worker, so that the workers stay busy
+            while keeping the overhead per run low).
+        initial_capital : int or float, optional
+            The starting cash capital of each user (default is 50000).
+        log_backend : str, optional
+            How the user activity logs are stored, see `BlockChain.create_logs` (default is 'sparse').
+        '''
+
+        self.n_runs = n_runs
+        self.n_days = n_days
+        self.n_users = n_users
+        self.policies = policies
+        self.seed = seed
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self.batch_size = batch_size or max(1, n_runs // (self.n_workers * 4))
+        self.initial_capital = initial_capital
+        self.log_backend = log_backend
+
+    # seed of each run
+    def seeds(self):
+        '''
+        Returns the seed of each run.
+
+        Returns
+        -------
+        list
+            The seeds.
+        '''
+
+        return [self.seed + i for i in range(self.n_runs)]
+
+    # stream the results
+    def iter_results(self):
+        '''
+        Runs the simulations across the process pool and yields the result of each run (see `run_simulation`) as
+        soon as its batch has completed. The results are therefore not yielded in the order of the seeds.
+        With a single worker, the simulations run in the current process.
+
+        Yields
+        ------
+        dict
+            The result of a run.
+        '''
+
+        seeds = self.seeds()
+        batches = [seeds[i:i + self.batch_size] for i in range(0, len(seeds), self.batch_size)]
+        args = (self.n_days, self.n_users, self.policies, self.initial_capital, self.log_backend)
+
+        # no need for worker processes
+        if self.n_workers == 1:
+            for batch in batches:
+                yield from run_batch(batch, *args)
+            return
+
+        with ProcessPoolExecutor(max_workers = self.n_workers) as executor:
+            futures = [executor.submit(run_batch, batch, *args) for batch in batches]
+            for future in as_completed(futures):
+                yield from future.result()
+
+    # run and aggregate
+    def run(self):
+        '''
+        Runs all the simulations and aggregates their results.
+
+        Returns
+        -------
+        dict
+            The aggregated results (see `aggregate`).
+        '''
+
+        return self.aggregate(self.iter_results())
+
+    # aggregate the results of all runs
+    @staticmethod
+    def aggregate(results):
+        '''
+        Aggregates the distributions of the users' performance over all runs.
+
+        For each metric ('total_assets', 'investment_return', 'investment_return_pct', 'total_mined' and
+        'mining_performance'), the summary statistics are computed over all users of all runs ('all'), and for
+        each user name separately.
+
+        Parameters
+        ----------
+        results : iterable
+            The results of the runs (see `run_simulation`).
+
+        Returns
+        -------
+        dict
+            The number of 'runs', the 'bankruptcy_rate' (share of users that went bankrupt), the distribution of the
+            number of simulated 'days', and the 'metrics' as {metric: {'all': summary, user_name: summary}}.
+        '''
+
+        n_runs = 0
+        days = []
+        bankruptcies = 0
+        n_user_results = 0
+        values = {metric: {'all': []} for metric in METRICS}
+
+        for result in results:
+            n_runs += 1
+            days.append(result['days'])
+            for user_result in result['users']:
+                n_user_results += 1
+                bankruptcies += user_result['bankrupt']
+                for metric in METRICS:
+                    values[metric]['all'].append(user_result[metric])
+                    values[metric].setdefault(user_result['name'], []).append(user_result[metric])
+
+        return {
+            'runs': n_runs,
+            'days': summarize(days),
+            'bankruptcy_rate': bankruptcies / n_user_results if n_user_results else 0,
+            'metrics': {metric: {name: summarize(observed) for name, observed in groups.items()} for metric, groups in values.items()},
+        }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Run Monte Carlo simulations of the SDPA coin mining game.')
+    parser.add_argument('--runs', type = int, default = 100, help = 'number of simulations')
+    parser.add_argument('--days', type = int, default = 365, help = 'number of days in each simulation')
+    parser.add_argument('--users', type = int, default = 2, help = 'number of users in each simulation')
+    parser.add_argument('--seed', type = int, default = 0, help = 'base seed')
+    parser.add_argument('--workers', type = int, default = None, help = 'number of worker processes (default: all CPUs)')
+    parser.add_argument('--strategy', choices = sorted(STRATEGIES), default = 'passive', help = 'strategy followed by every user')
+    cli_args = parser.parse_args()
+
+    summary = MonteCarlo(cli_args.runs, cli_args.days, cli_args.users, policies = STRATEGIES[cli_args.strategy](),
+                         seed = cli_args.seed, n_workers = cli_args.workers).run()
+    print(json.dumps(summary, indent = 2))
@@ -0,0 +1,581 @@
+# Georgius Benedikt Ermanta
+# Fintech
+# This module stores the data of a large population of users in parallel typed arrays, instead of one object per user.
+
+'''
+population.py
+-------------
+A module to store the data of many users compactly.
+
+This module defines the `UserPopulation` class. The users' capital, SDPA coin balance, number of machines, number of
+machines purchased today, and status flags (machines on, pooled mining, bankrupt) are stored in parallel typed arrays
+(`array.array`), indexed by user id, which costs about 30 bytes per user instead of a full `UserAccount` object.
+The arrays can be viewed as NumPy arrays without copying, so that the whole population can be updated with vectorized
+operations.
+The electricity bills (`charge_electricity`), and the automatic sales of SDPA coins and bankruptcies
+(`settle_balances`) of the whole population are computed in one vectorized pass each (they require NumPy), as in the
+day loop of `PopulationSimulation` (see `engine.py`).
+Individual users can still be read and updated through `PopulationMember` views, which expose the same attributes as
+`UserAccount` (e.g. `machine_status` is 'on' or 'off').
+
+Classes
+-------
+UserPopulation
+    A class to store the data of many users in parallel typed arrays.
+PopulationMember
+    A view of a single user of a population.
+'''
+
+# import libraries
+from array import array
+from itertools import repeat
+
+# numpy is optional: it is only used for the vectorized operations on the arrays
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# status flags (bits of the `flags` array)
+FLAG_ON = 1
+FLAG_POOLED = 2
+FLAG_BANKRUPT = 4
+
+class UserPopulation:
+    '''
+    A class to store the data of many users in parallel typed arrays.
+    ...
+
+    Attributes
+    ----------
+    names : list
+        The name of each user, or None for users named by default ('User 1', 'User 2', etc.).
+    capital : array.array
+        The cash capital of each user (double).
+    sdpa_balance : array.array
+        The number of SDPA coins each user owns (double).
+    machines : array.array
+        The number of machines each user owns (signed 64-bit integer).
+    day_machines : array.array
+        The number of machines each user purchased today (signed 64-bit integer).
+    flags : array.array
+        The status flags of each user (unsigned char): `FLAG_ON` if the machines are turned on, `FLAG_POOLED` if the
+        user mines in the pool, and `FLAG_BANKRUPT` if the user is bankrupt.
+    mining_index : object
+        The active mining power of the population (`solo_machines` and `pooled_machines`), as seen by the members,
+        e.g. `engine.MiningTotals` (None when it is not tracked).
+    machine_price : int or float
+        The price of 1 ASIC machine, shared by the users.
+    daily_machine_limit : int
+        The maximum number of machines a user can purchase in a trading day, shared by the users.
+
+    Methods
+    -------
+    add_user(name = None, capital = 50000)
+        Adds a user to the population.
+    add_users(n_users, capital = 50000)
+        Adds several users named by default.
+    from_accounts(users, machine_price = None, daily_machine_limit = None)
+        Creates a population from `UserAccount` objects.
+    name(user_id)
+        Returns the name of a user.
+    member(user_id)
+        Returns a view of a single user.
+    arrays()
+        Returns the arrays as NumPy arrays, without copying.
+    nbytes()
+        Returns the memory used by the arrays.
+    operational_ids()
+        Returns the user ids of the users who are not bankrupt.
+    reset_daily_machine_purchases()
+        Resets the count of machines purchased today for every user.
+    charge_electricity(elec_price, current_day, user_activity_log = None, machines = None)
+        Charges the electricity bills of the users whose machines are turned on.
+    settle_balances(sdpa_price, current_day, user_activity_log = None, bankruptcy_log = None, operational = None)
+        Performs the automatic SDPA sales, and declares bankruptcies.
+    '''
+
+    def __init__(self, machine_price = 600, daily_machine_limit = 10):
+        '''
+        Parameters
+        ----------
+        machine_price : int or float, optional
+            The price of 1 ASIC machine (default = 600, see `GameConfig` in `config.py`).
+        daily_machine_limit : int, optional
+            The maximum number of machines a user can purchase in a trading day (default = 10).
+        '''
+
+        # the economy of the users
+        self.machine_price = machine_price
+        self.daily_machine_limit = daily_machine_limit
+
+        # user data, indexed by user id
+        self.names = []
+        self.capital = array('d')
+        self.sdpa_balance = array('d')
+        self.machines = array('q')
+        self.day_machines = array('q')
+        self.flags = array('B')
+
+        # user ids of the explicitly named users
+        self.name_ids = {}
+        # the active mining power, when tracked by an engine
+        self.mining_index = None
+
+    # add one user
+    def add_user(self, name = None, capital = 50000):
+        '''
+        Adds a user to the population, with the same initial state as a new `UserAccount`.
+
+        Parameters
+        ----------
+        name : str, optional
+            Name of the user (default is None, i.e. 'User n' where n is the user id + 1).
+        capital : int or float, optional
+            The starting cash capital of the user (default = 50000).
+
+        Returns
+        -------
+        int
+            The user id.
+
+        Raises
+        ------
+        ValueError
+            If the name is already used by another user.
+        '''
+
+        user_id = len(self.capital)
+        if name is not None:
+            if name in self.name_ids:
+                raise ValueError('Invalid name: User name must be unique.')
+            self.name_ids[name] = user_id
+
+        self.names.append(name)
+        self.capital.append(capital)
+        self.sdpa_balance.append(0)
+        self.machines.append(0)
+        self.day_machines.append(0)
+        # machines off, solo mining, not bankrupt
+        self.flags.append(0)
+
+        return user_id
+
+    # add many users at once
+    def add_users(self, n_users, capital = 50000):
+        '''
+        Adds several users named by default ('User n').
+
+        Parameters
+        ----------
+        n_users : int
+            Number of users to add.
+        capital : int or float, optional
+            The starting cash capital of each user (default = 50000).
+
+        Returns
+        -------
+        range
+            The user ids of the new users.
+        '''
+
+        first_id = len(self.capital)
+        self.names.extend([None] * n_users)
+        self.capital.extend(array('d', [capital]) * n_users)
+        self.sdpa_balance.extend(array('d', [0]) * n_users)
+        self.machines.extend(array('q', [0]) * n_users)
+        self.day_machines.extend(array('q', [0]) * n_users)
+        self.flags.extend(array('B', [0]) * n_users)
+
+        return range(first_id, first_id + n_users)
+
+    # build a population from user objects
+    @classmethod
+    def from_accounts(cls, users, machine_price = None, daily_machine_limit = None):
+        '''
+        Creates a population from `UserAccount` objects (their current state is copied).
+
+        Parameters
+        ----------
+        users : iterable
+            The `UserAccount` objects.
+        machine_price : int or float, optional
+            The price of 1 ASIC machine (default is None, i.e. that of the accounts).
+        daily_machine_limit : int, optional
+            The daily purchase limit of machines (default is None, i.e. that of the accounts).
+
+        Returns
+        -------
+        UserPopulation
+            The population, where the user ids follow the order of `users`.
+
+        Raises
+        ------
+        ValueError
+            If the accounts do not share the same machine price and daily purchase limit (and none is given).
+        '''
+
+        users = list(users)
+        # the users of a population share the economy of the game
+        if machine_price is None:
+            prices = {user.machine_price for user in users} or {600}
+            if len(prices) > 1:
+                raise ValueError('Invalid accounts: The users of a population must share the same machine price.')
+            machine_price = prices.pop()
+        if daily_machine_limit is None:
+            limits = {user.daily_machine_limit for user in users} or {10}
+            if len(limits) > 1:
+                raise ValueError('Invalid accounts: The users of a population must share the same daily machine limit.')
+            daily_machine_limit = limits.pop()
+
+        population = cls(machine_price, daily_machine_limit)
+        for user in users:
+            user_id = population.add_user(user.name, user.capital)
+            member = population.member(user_id)
+            member.sdpa_balance = user.sdpa_balance
+            member.machines = user.machines
+            member.machine_status = user.machine_status
+            member.mining_type = user.mining_type
+            member.bankrupt_status = user.bankrupt_status
+        return population
+
+    # name of a user
+    def name(self, user_id):
+        '''
+        Returns the name of a user.
+
+        Parameters
+        ----------
+        user_id : int
+            The user id.
+
+        Returns
+        -------
+        str
+            The name of the user.
+        '''
+
+        name = self.names[user_id]
+        return name if name is not None else f'User {user_id + 1}'
+
+    # view of a single user
+    def member(self, user_id):
+        '''
+        Returns a view of a single user, with the same attributes as `UserAccount`.
+
+        Parameters
+        ----------
+        user_id : int
+            The user id.
+
+        Returns
+        -------
+        PopulationMember
+            The view of the user.
+        '''
+
+        return PopulationMember(self, user_id)
+
+    # zero-copy NumPy views
+    def arrays(self):
+        '''
+        Returns the arrays as NumPy arrays that share memory with the population (no copy is made), so that
+        updating the NumPy arrays updates the population.
+        The NumPy arrays must be released before adding users, as the arrays cannot grow while they are shared.
+
+        Returns
+        -------
+        dict
+            The 'capital', 'sdpa_balance', 'machines', 'day_machines' and 'flags' arrays.
+
+        Raises
+        ------
+        ImportError
+            If NumPy is not installed.
+        '''
+
+        if np is None:
+            raise ImportError('NumPy is required to view the population as arrays.')
+
+        dtypes = {'capital': np.float64, 'sdpa_balance': np.float64, 'machines': np.int64, 'day_machines': np.int64, 'flags': np.uint8}
+        views = {}
+        for key, dtype in dtypes.items():
+            column = getattr(self, key)
+            views[key] = np.frombuffer(column, dtype = dtype) if len(column) else np.zeros(0, dtype = dtype)
+        return views
+
+    # memory used by the arrays
+    def nbytes(self):
+        '''
+        Returns the memory used by the arrays (excluding the names).
+
+        Returns
+        -------
+        int
+            The number of bytes.
+        '''
+
+        return sum(column.itemsize * len(column) for column in (self.capital, self.sdpa_balance, self.machines, self.day_machines, self.flags))
+
+    # users who are still operational
+    def operational_ids(self):
+        '''
+        Returns the user ids of the users who are not bankrupt, in ascending order.
+
+        Returns
+        -------
+        numpy.ndarray
+            The user ids.
+        '''
+
+        return np.flatnonzero((self.arrays()['flags'] & FLAG_BANKRUPT) == 0)
+
+    # reset the daily purchase limit
+    def reset_daily_machine_purchases(self):
+        '''
+        Resets the count of the number of machines purchased today for every user (see
+        `UserAccount.reset_daily_machine_purchases`).
+        '''
+
+        self.day_machines[:] = array('q', [0]) * len(self.day_machines)
+
+    # electricity bills of the whole population
+    def charge_electricity(self, elec_price, current_day, user_activity_log = None, machines = None):
+        '''
+        Charges the electricity bills of all operational users whose machines are turned on in one vectorized pass,
+        as `UserAccount.electricity_bill`: bill = machines * electricity price.
+
+        Parameters
+        ----------
+        elec_price : float
+            The per unit price of electricity.
+        current_day : int
+            The current day.
+        user_activity_log : ActivityLog, optional
+            The log to record the electricity bills in (default is None, i.e. nothing is recorded).
+        machines : numpy.ndarray, optional
+            The number of billed machines of each user, as floats, with 0 for the users who are not billed (default is
+            None, i.e. computed from the flags). A simulation can cache it between days, as it only changes when a
+            user acts or goes bankrupt.
+
+        Returns
+        -------
+        numpy.ndarray
+            The bill of each user (0 for the users who are not billed).
+
+        Raises
+        ------
+        ImportError
+            If NumPy is not installed.
+        '''
+
+        views = self.arrays()
+        flags = views['flags']
+        # operational users with their machines turned on
+        billed = (flags & (FLAG_ON | FLAG_BANKRUPT)) == FLAG_ON
+
+        if machines is None:
+            machines = np.where(billed, views['machines'], 0).astype(np.float64)
+        bills = machines * elec_price
+        views['capital'] -= bills
+
+        # update the log
+        if user_activity_log is not None:
+            billed_ids = np.flatnonzero(billed)
+            user_activity_log.record_many([self.name(i) for i in billed_ids.tolist()], current_day, 'Electricity',
+                                          bills[billed_ids].tolist())
+
+        return bills
+
+    # automatic sales and bankruptcies of the whole population
+    def settle_balances(self, sdpa_price, current_day, user_activity_log = None, bankruptcy_log = None, operational = None):
+        '''
+        Performs the automatic sales of SDPA coins and declares bankruptcies for all operational users with a negative
+        capital in one vectorized pass, as `UserAccount.bankrupt_check`: the SDPA coins needed to cover the negative
+        capital (rounded up to 2 decimal places) are sold at the day's price, or the user is declared bankrupt if they
+        do not own enough coins. The balances are identical to those of the equivalent `UserAccount` objects.
+
+        Parameters
+        ----------
+        sdpa_price : float
+            The market price of the SDPA coin.
+        current_day : int
+            The current day.
+        user_activity_log : ActivityLog, optional
+            The log to record the automatic sales and bankruptcies in (default is None, i.e. nothing is recorded).
+        bankruptcy_log : dict, optional
+            The log to record the users who went bankrupt and their day of bankruptcy in (default is None).
+        operational : numpy.ndarray, optional
+            The boolean mask of the users who are not bankrupt (default is None, i.e. computed from the flags). It is
+            updated with the users who go bankrupt.
+
+        Returns
+        -------
+        tuple
+            A tuple containing 3 elements:
+            - numpy.ndarray: The user ids of the users who sold SDPA coins automatically.
+            - numpy.ndarray: The number of coins each of them sold.
+            - numpy.ndarray: The user ids of the users who went bankrupt.
+
+        Raises
+        ------
+        ImportError
+            If NumPy is not installed.
+        '''
+
+        views = self.arrays()
+        capital = views['capital']
+        sdpa_balance = views['sdpa_balance']
+        flags = views['flags']
+        if operational is None:
+            operational = (flags & FLAG_BANKRUPT) == 0
+
+        # users with a negative capital balance
+        negative = np.flatnonzero((capital < 0) & operational)
+        if not len(negative):
+            return negative, np.zeros(0), negative
+
+        # the required number of coins to be sold, rounded up to 2 decimal places
+        auto_sale = np.ceil((capital[negative] * -1) / sdpa_price * 100) / 100
+        covered = auto_sale <= sdpa_balance[negative]
+
+        # automatic sale of SDPA coins
+        sold = negative[covered]
+        sold_coins = auto_sale[covered]
+        sdpa_balance[sold] -= sold_coins
+        capital[sold] += sdpa_price * sold_coins
+
+        # declare bankruptcy
+        bankrupt = negative[~covered]
+        flags[bankrupt] |= FLAG_BANKRUPT
+        operational[bankrupt] = False
+
+        # update the logs
+        if user_activity_log is not None:
+            user_activity_log.record_many([self.name(i) for i in sold.tolist()], current_day, 'Action 2', sold_coins.tolist())
+            user_activity_log.record_many([self.name(i) for i in bankrupt.tolist()], current_day, 'Bankrupt', ['yes'] * len(bankrupt))
+        if bankruptcy_log is not None:
+            bankruptcy_log.update(zip(map(self.name, bankrupt.tolist()), repeat(current_day)))
+
+        return sold, sold_coins, bankrupt
+
+    def __len__(self):
+        return len(self.capital)
+
+    def __iter__(self):
+        return (PopulationMember(self, user_id) for user_id in range(len(self.capital)))
+
+class PopulationMember:
+    '''
+    A view of a single user of a population, with the same attributes as `UserAccount`.
+    Reading or setting an attribute reads or updates the population's arrays.
+    ...
+
+    Attributes
+    ----------
+    population : UserPopulation
+        The population.
+    user_id : int
+        The user id.
+    machine_price : int or float
+        The price of 1 ASIC machine (that of the population).
+    daily_machine_limit : int
+        The maximum number of machines a user can purchase in a trading day (that of the population).
+    '''
+
+    __slots__ = ('population', 'user_id')
+
+    def __init__(self, population, user_id):
+        '''
+        Parameters
+        ----------
+        population : UserPopulation
+            The population.
+        user_id : int
+            The user id.
+        '''
+
+        self.population = population
+        self.user_id = user_id
+
+    @property
+    def name(self):
+        return self.population.name(self.user_id)
+
+    @property
+    def mining_index(self):
+        return self.population.mining_index
+
+    @property
+    def machine_price(self):
+        return self.population.machine_price
+
+    @property
+    def daily_machine_limit(self):
+        return self.population.daily_machine_limit
+
+    @property
+    def capital(self):
+        return self.population.capital[self.user_id]
+
+    @capital.setter
+    def capital(self, value):
+        self.population.capital[self.user_id] = value
+
+    @property
+    def sdpa_balance(self):
+        return self.population.sdpa_balance[self.user_id]
+
+    @sdpa_balance.setter
+    def sdpa_balance(self, value):
+        self.population.sdpa_balance[self.user_id] = value
+
+    @property
+    def machines(self):
+        return self.population.machines[self.user_id]
+
+    @machines.setter
+    def machines(self, value):
+        self.population.machines[self.user_id] = value
+
+    @property
+    def day_machines(self):
+        return self.population.day_machines[self.user_id]
+
+    @day_machines.setter
+    def day_machines(self, value):
+        self.population.day_machines[self.user_id] = value
+
+    # status flags, as the strings used by `UserAccount`
+    def get_flag(self, flag):
+        return bool(self.population.flags[self.user_id] & flag)
+
+    def set_flag(self, flag, value):
+        if value:
+            self.population.flags[self.user_id] |= flag
+        else:
+            self.population.flags[self.user_id] &= ~flag & 0xFF
+
+    @property
+    def machine_status(self):
+        return 'on' if self.get_flag(FLAG_ON) else 'off'
+
+    @machine_status.setter
+    def machine_status(self, value):
+        self.set_flag(FLAG_ON, value == 'on')
+
+    @property
+    def mining_type(self):
+        return 'pooled' if self.get_flag(FLAG_POOLED) else 'solo'
+
+    @mining_type.setter
+    def mining_type(self, value):
+        self.set_flag(FLAG_POOLED, value == 'pooled')
+
+    @property
+    def bankrupt_status(self):
+        return 'yes' if self.get_flag(FLAG_BANKRUPT) else 'no'
+
+    @bankrupt_status.setter
+    def bankrupt_status(self, value):
+        self.set_flag(FLAG_BANKRUPT, value == 'yes')
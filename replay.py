@@ -0,0 +1,710 @@
+# Georgius Benedikt Ermanta
+# Fintech
+# This module re-executes a recorded session of the blockchain mining simulation (its activity log, prices and winners)
+# without any prompt, and verifies that the engine reproduces the recorded final state.
+
+'''
+replay.py
+---------
+A module to replay a recorded session of the blockchain mining simulation, e.g. to regression-test optimisations of
+the engine against real sessions.
+
+A session is recorded by its activity log (see `BlockChain.create_logs`), the daily SDPA coin and electricity prices,
+and the daily winners (the history of a `Simulation`, or of a checkpoint). The `Replay` class runs a headless
+`Simulation` of the same users, where,
+- the market serves the recorded prices (see `recorded_market`).
+- the blockchain draws the recorded winner of each day instead of a random one (see `ReplayBlockChain`), and the
+  engine distributes the prize.
+- each user's decision policy performs the actions recorded in the log (see `ReplayPolicy`). The automatic sales of
+  SDPA coins and the bankruptcies are not replayed: the engine makes them again.
+Each user has their own policy, so the days on which only a few users acted are fast-forwarded (see
+`Simulation.fast_forward`), and long sessions of many users are replayed in seconds.
+The replayed log and final state are then compared with the recorded ones (see `Replay.verify`).
+
+The columnar logs keep the order of the records, so their replay is exact. The sparse log groups the actions of a day
+by type, so the actions of a day are replayed grouped (e.g. the sales after the purchases), which may change the last
+digits of the capital; and when a user sold coins on a day on which their coins were also sold automatically, the
+automatic sale is recognised from the recorded electricity bill. The comparisons thus allow a relative tolerance.
+
+Usage
+-----
+To replay a session from its last checkpoint (see `checkpoint.py`), the users starting with their initial capital:
+    `python replay.py game.ckpt`
+
+Classes
+-------
+ReplayBlockChain
+    A blockchain that draws the recorded winners.
+RecordedActions
+    The actions recorded in an activity log, by user.
+ReplayPolicy
+    The decision policy of a user that performs their recorded actions.
+Replay
+    A class to replay a recorded session and verify its final state.
+
+Functions
+---------
+recorded_market(sdpa_prices, elec_prices)
+    Creates a market that serves the recorded prices.
+replay_checkpoint(path, users = None, rel_tol = 1e-9)
+    Replays the session of a checkpoint and verifies it.
+'''
+
+# import libraries and classes
+import argparse
+import math
+import sys
+import time
+from collections import deque
+
+from market import Market
+from user_account import UserAccount
+from blockchain import BlockChain
+from activity_log import ACTIONS, SparseActivityLog, ColumnarActivityLog
+from simulation import Simulation
+from checkpoint import load_checkpoint
+
+# optional dependency (reads and compares the columnar logs as arrays)
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# number of days of the log read at once
+READ_DAYS = 32
+
+# the attributes of the users compared by `Replay.verify`
+STATE_ATTRIBUTES = ('capital', 'sdpa_balance', 'machines', 'machine_status', 'mining_type', 'bankrupt_status',
+                    'coins_mined', 'electricity_paid', 'machines_bought', 'coins_sold', 'sales_proceeds')
+
+# the columns of the events of a range of days
+def event_columns(user_activity_log, first_day, last_day):
+    '''
+    Returns the events of a columnar log recorded from `first_day` to `last_day` (inclusive), as NumPy arrays that
+    share memory with the log (see `ColumnarActivityLog.as_arrays`).
+
+    Parameters
+    ----------
+    user_activity_log : ActivityLog
+        The log.
+    first_day : int
+        The first day.
+    last_day : int
+        The last day.
+
+    Returns
+    -------
+    tuple or None
+        The index of the first event of the range, and the 'day', 'user', 'code' and 'value' columns of the range;
+        or None if the log is not columnar, its events were not recorded in chronological order, or NumPy is not
+        installed.
+    '''
+
+    if np is None or not isinstance(user_activity_log, ColumnarActivityLog) or not user_activity_log.chronological:
+        return None
+
+    columns = user_activity_log.as_arrays()
+    day_starts = user_activity_log.day_starts
+    n_events = len(columns['day'])
+    start = day_starts[first_day - 1] if first_day <= len(day_starts) else n_events
+    stop = day_starts[last_day] if last_day < len(day_starts) else n_events
+    return start, {name: column[start:stop] for name, column in columns.items()}
+
+# create a market of recorded prices
+def recorded_market(sdpa_prices, elec_prices):
+    '''
+    Creates a market that serves the recorded prices, in order, as if they had been pre-generated (see
+    `Market.pregenerate`).
+
+    Parameters
+    ----------
+    sdpa_prices : list
+        The SDPA coin market price of each day (the first one is the price of day 1).
+    elec_prices : list
+        The per unit market price of electricity of each day.
+
+    Returns
+    -------
+    Market
+        The market.
+    '''
+
+    market = Market(seed = 0)
+    market.sdpa_price = sdpa_prices[0]
+    market.sdpa_path = list(sdpa_prices)
+    market.elec_path = list(elec_prices)
+    return market
+
+class ReplayBlockChain(BlockChain):
+    '''
+    A blockchain that draws the recorded winner of each day, instead of a random one. The prize is distributed by
+    `BlockChain.award_prize`, as in the recorded session.
+    ...
+
+    Attributes
+    ----------
+    winners : list
+        The name of the winning user of each day, or 'pooled'.
+    users : dict
+        The user names (keys) and their `UserAccount` objects (values).
+    n_draws : int
+        The number of winners drawn so far.
+
+    Methods
+    -------
+    draw_winner(list_operational_users, base_pooled_mach = 1000)
+        Returns the recorded winner of the day.
+    '''
+
+    def __init__(self, winners, users):
+        '''
+        Parameters
+        ----------
+        winners : list
+            The name of the winning user of each day, or 'pooled'.
+        users : list
+            The `UserAccount` objects of all users.
+        '''
+
+        super().__init__(len(winners), seed = 0)
+        self.winners = list(winners)
+        self.users = {user.name: user for user in users}
+        self.n_draws = 0
+
+    def draw_winner(self, list_operational_users, base_pooled_mach = 1000):
+        '''
+        Returns the recorded winner of the day, see `BlockChain.draw_winner`.
+
+        Parameters
+        ----------
+        list_operational_users : list
+            A list of `UserAccount` objects of all users that are operational (i.e. they have not gone bankrupt).
+        base_pooled_mach : int, optional
+            The base number of machines in the pool (default is 1000).
+
+        Returns
+        -------
+        str or UserAccount
+            'pooled' if the mining pool won, otherwise the `UserAccount` object of the winning solo miner.
+
+        Raises
+        ------
+        ValueError
+            If the recorded winner is not an operational solo miner with active machines.
+        '''
+
+        self.base_pooled_mach = base_pooled_mach
+        self.list_operational_users = list_operational_users
+        if self.mining_index is None:
+            self.build_index(list_operational_users)
+        self.total_machines = self.base_pooled_mach + self.mining_index.total_machines
+        self.active_machines = self.base_pooled_mach + self.mining_index.pooled_machines + self.mining_index.solo_machines
+
+        # the recorded winner
+        winner = self.winners[self.n_draws]
+        self.n_draws += 1
+        if winner == 'pooled':
+            return winner
+
+        user = self.users.get(winner)
+        if (user is None or user.bankrupt_status != 'no' or user.machine_status != 'on' or user.mining_type != 'solo'
+                or user.machines <= 0):
+            raise ValueError(f'Invalid winner: {winner} could not win on day {self.n_draws}.')
+        return user
+
+class RecordedActions:
+    '''
+    The actions recorded in an activity log, by user. The log is read a few days at a time, as far as needed, and only
+    the actions chosen by the users are kept (not the automatic sales of the bankruptcy check).
+    ...
+
+    Attributes
+    ----------
+    user_activity_log : ActivityLog
+        The recorded log.
+    n_days : int
+        The number of recorded days.
+    machine_price : int or float
+        The price of 1 ASIC machine, used to recognise the automatic sales of the sparse log (None for the price of
+        each user).
+    actions : dict
+        The user names (keys) and their recorded actions not replayed yet (values, deques of `(day, actions)` tuples,
+        where `actions` is a list of `(action, param)` tuples).
+    read_day : int
+        The last day read from the log.
+
+    Methods
+    -------
+    read()
+        Reads the next days of the log.
+    next_action_day(user_name, current_day)
+        Returns the next day on which a user performed an action.
+    actions_of(user, market_snapshot, current_day)
+        Returns the actions performed by a user on a day.
+    '''
+
+    def __init__(self, user_activity_log, n_days, machine_price = None):
+        '''
+        Parameters
+        ----------
+        user_activity_log : ActivityLog
+            The recorded log.
+        n_days : int
+            The number of recorded days.
+        machine_price : int or float, optional
+            The price of 1 ASIC machine (default is None, i.e. each user's `machine_price`).
+        '''
+
+        self.user_activity_log = user_activity_log
+        self.n_days = n_days
+        self.machine_price = machine_price
+        # the sparse log groups the actions of a day by type
+        self.grouped = isinstance(user_activity_log, SparseActivityLog)
+        self.actions = {}
+        # the sales that may have been automatic (sparse log), with the day's electricity bill
+        self.uncertain_sales = {}
+        self.read_day = 0
+
+    # read the next days of the log
+    def read(self):
+        '''
+        Reads the actions of the next `READ_DAYS` days of the log.
+        '''
+
+        first_day = self.read_day + 1
+        last_day = min(self.n_days, self.read_day + READ_DAYS)
+
+        # the actions of each user and day
+        day_actions = {}
+        # the electricity bill of each user and day (sparse log)
+        bills = {}
+        log = self.user_activity_log
+        columns = event_columns(log, first_day, last_day)
+        if columns is not None:
+            # columnar log: only the actions are decoded
+            start, columns = columns
+            codes = columns['code']
+            rows = np.flatnonzero(codes <= len(ACTIONS))
+            if len(rows):
+                # the sales after the electricity bill of the user's day are made by the bankruptcy check
+                keys = columns['day'].astype(np.int64) * len(log.names) + columns['user']
+                billed = np.flatnonzero(codes == 5)
+                billed_keys, first_bills = np.unique(keys[billed], return_index = True)
+                if len(billed_keys):
+                    positions = np.minimum(np.searchsorted(billed_keys, keys[rows]), len(billed_keys) - 1)
+                    automatic = (billed_keys[positions] == keys[rows]) & (billed[first_bills[positions]] < rows)
+                    rows = rows[~automatic]
+                for row in (rows + start).tolist():
+                    key, param = log.decode(row)
+                    user_name = log.names[log.users[row]]
+                    day = log.days[row]
+                    day_actions.setdefault((user_name, day), []).append((ACTIONS.index(key) + 1, param))
+        elif self.grouped:
+            # sparse log: only the entries with actions are read
+            for user_name, user_entries in log.entries.items():
+                for day in range(first_day, last_day + 1):
+                    entry = user_entries.get(day)
+                    if entry is None or not any(key in ACTIONS for key in entry):
+                        continue
+                    user_actions = []
+                    for key, param in entry.items():
+                        # the sales after the electricity bill are made by the bankruptcy check
+                        if key == 'Electricity':
+                            break
+                        if key in ACTIONS:
+                            user_actions.extend((ACTIONS.index(key) + 1, action_param) for action_param in param)
+                    if user_actions:
+                        day_actions[(user_name, day)] = user_actions
+                        if 'Electricity' in entry:
+                            bills[(user_name, day)] = entry['Electricity']
+        else:
+            for user_name, day, key, param in log.events(first_day, last_day):
+                if key == 'Electricity':
+                    bills[(user_name, day)] = param
+                elif key in ACTIONS:
+                    # the sales after the electricity bill are made by the bankruptcy check
+                    if (user_name, day) in bills:
+                        continue
+                    day_actions.setdefault((user_name, day), []).append((ACTIONS.index(key) + 1, param))
+
+        # by day (the order of the records within the day is kept)
+        for (user_name, day), user_actions in sorted(day_actions.items(), key = lambda item: item[0][1]):
+            # in the sparse log, the sales of a day are listed where the first one was recorded: when it was chosen by
+            # the user, the last one may have been made by the bankruptcy check
+            bill = bills.get((user_name, day))
+            if self.grouped and bill is not None and sum(1 for action, param in user_actions if action == 2) >= 2:
+                for position in range(len(user_actions) - 1, -1, -1):
+                    if user_actions[position][0] == 2:
+                        self.uncertain_sales[(user_name, day)] = (position, user_actions.pop(position)[1], bill)
+                        break
+            queue = self.actions.get(user_name)
+            if queue is None:
+                queue = self.actions[user_name] = deque()
+            queue.append((day, user_actions))
+        self.read_day = last_day
+
+    # next day with an action of a user
+    def next_action_day(self, user_name, current_day):
+        '''
+        Returns the next day (from `current_day` on) on which a user performed an action, forgetting the actions of
+        the days before.
+
+        Parameters
+        ----------
+        user_name : str
+            The name of the user.
+        current_day : int
+            The day about to be simulated.
+
+        Returns
+        -------
+        int or None
+            The next day with an action of the user, or None if there is none.
+        '''
+
+        while True:
+            queue = self.actions.get(user_name)
+            while queue and queue[0][0] < current_day:
+                queue.popleft()
+            if queue:
+                return queue[0][0]
+            if self.read_day >= self.n_days:
+                return None
+            self.read()
+
+    def actions_of(self, user, market_snapshot, current_day):
+        '''
+        Returns the actions performed by a user on a day.
+
+        Parameters
+        ----------
+        user : UserAccount
+            The user (in their state before the day's actions).
+        market_snapshot : MarketSnapshot
+            The day's prices.
+        current_day : int
+            The day being simulated.
+
+        Returns
+        -------
+        list
+            The recorded `(action, param)` tuples.
+        '''
+
+        if self.next_action_day(user.name, current_day) != current_day:
+            return []
+        user_actions = self.actions[user.name].popleft()[1]
+        uncertain = self.uncertain_sales.pop((user.name, current_day), None)
+        if uncertain is None:
+            return user_actions
+
+        # the sale was automatic if the recorded purchases were affordable without it, the capital would have been
+        # negative after the electricity bill without it, and the automatic sale would have been of the same quantity
+        position, n_coins, bill = uncertain
+        price = market_snapshot.sdpa_price
+        capital = user.capital
+        machine_price = user.machine_price if self.machine_price is None else self.machine_price
+        affordable = True
+        for action, param in user_actions:
+            if action == 1:
+                affordable = affordable and machine_price * param <= capital
+                capital -= machine_price * param
+            elif action == 2:
+                capital += price * param
+        capital -= bill
+        if affordable and capital < 0 and math.ceil(-capital / price * 100) / 100 == n_coins:
+            return user_actions
+        # a sale chosen by the user, at its recorded position
+        return user_actions[:position] + [(2, n_coins)] + user_actions[position:]
+
+class ReplayPolicy:
+    '''
+    The decision policy of a user that performs their recorded actions. Each user has their own policy, so that only
+    the users who acted on a day are called on that day.
+    ...
+
+    Attributes
+    ----------
+    recorded_actions : RecordedActions
+        The recorded actions of all users.
+    user_name : str
+        The name of the user.
+
+    Methods
+    -------
+    next_decision_day(current_day)
+        Returns the next day on which the user performed an action.
+    '''
+
+    def __init__(self, recorded_actions, user_name):
+        '''
+        Parameters
+        ----------
+        recorded_actions : RecordedActions
+            The recorded actions of all users.
+        user_name : str
+            The name of the user.
+        '''
+
+        self.recorded_actions = recorded_actions
+        self.user_name = user_name
+
+    # next day with an action
+    def next_decision_day(self, current_day):
+        '''
+        Returns the next day (from `current_day` on) on which the user performed an action.
+
+        Parameters
+        ----------
+        current_day : int
+            The day about to be simulated.
+
+        Returns
+        -------
+        int or None
+            The next day with an action, or None if there is none.
+        '''
+
+        return self.recorded_actions.next_action_day(self.user_name, current_day)
+
+    def __call__(self, user, market_snapshot, current_day):
+        return self.recorded_actions.actions_of(user, market_snapshot, current_day)
+
+class Replay:
+    '''
+    A class to replay a recorded session of the simulation, and verify that it reproduces the recorded final state.
+    ...
+
+    Attributes
+    ----------
+    users : list
+        The `UserAccount` objects of the users, in their initial state, in the recorded order.
+    user_activity_log : ActivityLog
+        The recorded log.
+    n_days : int
+        The number of recorded days.
+    simulation : Simulation
+        The replayed simulation (once `run` has been called).
+
+    Methods
+    -------
+    run(fast_forward = True)
+        Replays the session.
+    verify(expected_users, rel_tol = 1e-9)
+        Compares the replayed log and final state with the recorded ones.
+    '''
+
+    def __init__(self, users, user_activity_log, sdpa_prices, elec_prices, winners, base_pooled_mach = 1000,
+                 total_prize = 100, machine_price = None, log_backend = None):
+        '''
+        Parameters
+        ----------
+        users : list
+            The `UserAccount` objects of the users, in their initial state (before day 1) and in the order of the
+            recorded simulation (which sets the order of the pool payouts).
+        user_activity_log : ActivityLog
+            The recorded log.
+        sdpa_prices : list
+            The recorded SDPA coin market price of each day.
+        elec_prices : list
+            The recorded per unit market price of electricity of each day.
+        winners : list
+            The recorded winner of each day (a user name or 'pooled').
+        base_pooled_mach : int, optional
+            The base number of machines in the pool (default is 1000).
+        total_prize : int or float, optional
+            The total daily SDPA prize (default is 100).
+        machine_price : int or float, optional
+            The price of 1 ASIC machine, set on every user (default is None, i.e. each user's `machine_price`).
+        log_backend : str, optional
+            The backend of the replayed log (default is None, i.e. 'sparse' for a sparse recorded log, otherwise
+            'columnar').
+
+        Raises
+        ------
+        ValueError
+            If the recorded histories do not have the same number of days.
+        '''
+
+        if not len(sdpa_prices) == len(elec_prices) == len(winners):
+            raise ValueError('Invalid history: The prices and winners must be recorded for the same days.')
+
+        self.users = list(users)
+        self.user_activity_log = user_activity_log
+        self.sdpa_prices = sdpa_prices
+        self.elec_prices = elec_prices
+        self.winners = winners
+        self.n_days = len(winners)
+        self.base_pooled_mach = base_pooled_mach
+        self.total_prize = total_prize
+        self.machine_price = machine_price
+        if log_backend is None:
+            log_backend = 'sparse' if isinstance(user_activity_log, SparseActivityLog) else 'columnar'
+        self.log_backend = log_backend
+        self.simulation = None
+
+    def run(self, fast_forward = True):
+        '''
+        Replays the session, without any terminal input/output.
+
+        Parameters
+        ----------
+        fast_forward : bool, optional
+            Whether the days on which few users acted are fast-forwarded (default is True, see `Simulation.run`).
+
+        Returns
+        -------
+        Simulation
+            The replayed simulation.
+        '''
+
+        market = recorded_market(self.sdpa_prices, self.elec_prices)
+        blockchain = ReplayBlockChain(self.winners, self.users)
+        recorded_actions = RecordedActions(self.user_activity_log, self.n_days, self.machine_price)
+        policies = {user.name: ReplayPolicy(recorded_actions, user.name) for user in self.users}
+        self.simulation = Simulation(market, blockchain, self.users, policies, self.base_pooled_mach, self.total_prize,
+                                     self.machine_price, self.log_backend)
+        return self.simulation.run(fast_forward = fast_forward)
+
+    def verify(self, expected_users, rel_tol = 1e-9):
+        '''
+        Compares the replayed session with the recorded one: the prices and winners of each day, the events of the
+        log, and the final state of each user.
+
+        Parameters
+        ----------
+        expected_users : list
+            The `UserAccount` objects of the users at the end of the recorded session (or any objects with the
+            attributes in `STATE_ATTRIBUTES`).
+        rel_tol : float, optional
+            The relative tolerance of the comparison of numbers (default is 1e-9; 0 compares exactly).
+
+        Returns
+        -------
+        list
+            The differences found, as messages (empty if the replay reproduces the recorded session).
+
+        Raises
+        ------
+        ValueError
+            If the session has not been replayed yet.
+        '''
+
+        if self.simulation is None:
+            raise ValueError('No replay: Please run the replay first.')
+
+        def same(replayed, recorded):
+            if isinstance(replayed, (int, float)) and isinstance(recorded, (int, float)):
+                return math.isclose(replayed, recorded, rel_tol = rel_tol, abs_tol = rel_tol)
+            return replayed == recorded
+
+        simulation = self.simulation
+        differences = []
+
+        # the replay ends early when the recorded actions cannot be performed again
+        if simulation.current_day != self.n_days:
+            differences.append(f'Days: {simulation.current_day} replayed, {self.n_days} recorded.')
+
+        # the events of the log, a few days at a time (the sparse logs are first compared as a whole, and the columnar
+        # logs as arrays; the events are decoded where they differ)
+        replayed_log = simulation.user_activity_log
+        recorded_log = self.user_activity_log
+        if (isinstance(replayed_log, SparseActivityLog) and isinstance(recorded_log, SparseActivityLog)
+                and replayed_log.entries == recorded_log.entries):
+            chunks = range(0)
+        else:
+            chunks = range(1, self.n_days + 1, READ_DAYS)
+        user_ids = None
+        for first_day in chunks:
+            last_day = min(self.n_days, first_day + READ_DAYS - 1)
+            replayed_columns = event_columns(replayed_log, first_day, last_day)
+            recorded_columns = event_columns(recorded_log, first_day, last_day)
+            if replayed_columns is not None and recorded_columns is not None:
+                replayed_columns = replayed_columns[1]
+                recorded_columns = recorded_columns[1]
+                if user_ids is None:
+                    # the ids of the users in the recorded log, indexed by their ids in the replayed log
+                    user_ids = np.array([recorded_log.user_ids.get(name, -1) for name in replayed_log.names],
+                                        dtype = np.int64)
+                if len(replayed_columns['day']) == len(recorded_columns['day']):
+                    replayed_values = replayed_columns['value']
+                    recorded_values = recorded_columns['value']
+                    tolerance = np.maximum(rel_tol * np.maximum(np.abs(replayed_values), np.abs(recorded_values)),
+                                           rel_tol)
+                    if (np.array_equal(replayed_columns['day'], recorded_columns['day'])
+                            and np.array_equal(replayed_columns['code'], recorded_columns['code'])
+                            and np.array_equal(user_ids[replayed_columns['user']], recorded_columns['user'])
+                            and np.all(np.abs(replayed_values - recorded_values) <= tolerance)):
+                        continue
+            replayed = replayed_log.events(first_day, last_day)
+            recorded = recorded_log.events(first_day, last_day)
+            if len(replayed) != len(recorded):
+                differences.append(f'Events of days {first_day}-{last_day}: {len(replayed)} replayed, '
+                                   f'{len(recorded)} recorded.')
+                continue
+            for replayed_event, recorded_event in zip(replayed, recorded):
+                if not all(same(a, b) for a, b in zip(replayed_event, recorded_event)):
+                    differences.append(f'Event: {replayed_event} replayed, {recorded_event} recorded.')
+                    break
+
+        # the final state of the users
+        replayed_users = {user.name: user for user in simulation.users}
+        for expected in expected_users:
+            user = replayed_users.get(expected.name)
+            if user is None:
+                differences.append(f'User: {expected.name} has not been replayed.')
+                continue
+            for attribute in STATE_ATTRIBUTES:
+                if not same(getattr(user, attribute), getattr(expected, attribute)):
+                    differences.append(f'{expected.name}.{attribute}: {getattr(user, attribute)} replayed, '
+                                       f'{getattr(expected, attribute)} recorded.')
+
+        return differences
+
+# replay a checkpoint
+def replay_checkpoint(path, users = None, rel_tol = 1e-9):
+    '''
+    Replays the session saved in a checkpoint file (see `Simulation.save_checkpoint`), up to its last day, and
+    verifies the log and the users' state of the checkpoint.
+
+    Parameters
+    ----------
+    path : str
+        The checkpoint file.
+    users : list, optional
+        The `UserAccount` objects of the users in their initial state, in the recorded order (default is None, i.e.
+        new users with the initial capital, machine price and daily purchase limit of the checkpoint, without any
+        machine).
+    rel_tol : float, optional
+        The relative tolerance of the comparison of numbers (default is 1e-9).
+
+    Returns
+    -------
+    list
+        The differences found, as messages (empty if the replay reproduces the recorded session).
+    '''
+
+    state = load_checkpoint(path)
+    extra = state['extra']
+    history = state['history']
+    if users is None:
+        users = [UserAccount(user.name, extra['initial_capital'][user.name], user.machine_price, user.daily_machine_limit)
+                 for user in state['users']]
+
+    replay = Replay(users, state['user_activity_log'], history['sdpa_prices'], history['elec_prices'],
+                    history['winners'], extra['base_pooled_mach'], extra['total_prize'])
+    replay.run()
+    return replay.verify(state['users'], rel_tol)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Replay a recorded session of the SDPA coin mining simulation.')
+    parser.add_argument('checkpoint', help = 'checkpoint file of the session (written by a Simulation)')
+    parser.add_argument('--rel-tol', type = float, default = 1e-9, help = 'relative tolerance (default: 1e-9)')
+    cli_args = parser.parse_args()
+
+    start = time.perf_counter()
+    differences = replay_checkpoint(cli_args.checkpoint, rel_tol = cli_args.rel_tol)
+    for difference in differences:
+        print(difference)
+    print(f"Replay {'failed' if differences else 'verified'} in {time.perf_counter() - start:.2f} s.")
+    sys.exit(1 if differences else 0)
@@ -0,0 +1,436 @@
+# Georgius Benedikt Ermanta
+# Fintech
+# This module renders the daily and end of simulation summaries into a buffer, and writes them to the terminal or to a
+# file of machine-readable lines in large blocks.
+
+'''
+reporting.py
+------------
+A module to report the results of the blockchain mining simulation.
+
+Printing the summaries line by line (several `print()` calls per user per day) makes the terminal output dominate the
+running time of simulations with many users. Instead, the summaries are rendered into strings, collected in a buffer,
+and written in large blocks. The `Reporter` class supports 3 verbosity levels,
+- SILENT: nothing is reported.
+- END_OF_RUN: only the end of simulation summary of each user is reported.
+- PER_DAY: the daily summaries are reported as well.
+and can stream JSON lines (one record per line) to a file instead of writing text to the terminal.
+
+Constants
+---------
+SILENT, END_OF_RUN, PER_DAY
+    The verbosity levels (0, 1 and 2).
+
+Classes
+-------
+Reporter
+    A class to write the summaries of a simulation in large blocks.
+
+Functions
+---------
+user_performance(user, sdpa_price_tdy, total_mined_coins, initial_capital, bankrupt_day = None, machine_price = None)
+    Computes the end of simulation performance of a user.
+render_daily_summary(oper_users, sdpa_price_tdy, machine_price = None)
+    Renders the daily summary of the operational users.
+render_actions(user_activity_log, user_name, action_messages)
+    Renders the key actions performed throughout the simulation by a user.
+render_user_summary(result, actions = None)
+    Renders the end of simulation summary of a user.
+'''
+
+# import libraries
+import json
+import sys
+
+# verbosity levels
+SILENT = 0
+END_OF_RUN = 1
+PER_DAY = 2
+
+# compute the performance of a user
+def user_performance(user, sdpa_price_tdy, total_mined_coins, initial_capital, bankrupt_day = None, machine_price = None):
+    '''
+    Computes the end of simulation performance of a user, from the user's balances and running totals.
+
+    Parameters
+    ----------
+    user : UserAccount
+        The user.
+    sdpa_price_tdy : float
+        The market price of SDPA coin on the last day of the simulation.
+    total_mined_coins : int or float
+        Total coins mined by all users and the pool throughout the whole simulation.
+    initial_capital : int or float
+        The starting cash capital of the user.
+    bankrupt_day : int, optional
+        The day the user went bankrupt (default is None).
+    machine_price : int or float, optional
+        The price of 1 ASIC machine used to value the machines (default = None, i.e. the user's `machine_price`).
+
+    Returns
+    -------
+    dict
+        The keys are: 'name', 'bankrupt', 'bankrupt_day', 'capital', 'sdpa_balance', 'sdpa_value', 'machines',
+        'total_assets', 'investment_return', 'investment_return_pct', 'total_mined', 'mining_performance',
+        'total_bill', 'machines_bought', 'coins_sold' and 'sales_proceeds'.
+        For bankrupt users, the total assets value is 0 and the investment return is -100%.
+    '''
+
+    # GBP value of the SDPA coin balance
+    sdpa_value = user.sdpa_balance * sdpa_price_tdy
+    if user.bankrupt_status == 'yes':
+        total_assets = 0
+    else:
+        # assuming that the machines' value do not depreciate
+        if machine_price is None:
+            machine_price = user.machine_price
+        total_assets = user.capital + sdpa_value + user.machines * machine_price
+    investment_return = total_assets - initial_capital
+
+    return {
+        'name': user.name,
+        'bankrupt': user.bankrupt_status == 'yes',
+        'bankrupt_day': bankrupt_day,
+        'capital': user.capital,
+        'sdpa_balance': user.sdpa_balance,
+        'sdpa_value': sdpa_value,
+        'machines': user.machines,
+        'total_assets': total_assets,
+        'investment_return': investment_return,
+        'investment_return_pct': investment_return / initial_capital * 100 if initial_capital else 0,
+        'total_mined': user.coins_mined,
+        'mining_performance': user.coins_mined / total_mined_coins * 100 if total_mined_coins else 0,
+        'total_bill': user.electricity_paid,
+        'machines_bought': user.machines_bought,
+        'coins_sold': user.coins_sold,
+        'sales_proceeds': user.sales_proceeds,
+    }
+
+# render the daily summary
+def render_daily_summary(oper_users, sdpa_price_tdy, machine_price = None):
+    '''
+    Renders the daily summary of each operational user (paper profit, net spending, prize received, coins sold,
+    electricity bill and machines purchased), as printed by `daily_summary` in `main.py`.
+
+    Parameters
+    ----------
+    oper_users : list
+        A list of UserAccount objects for users who are still operational (i.e. not bankrupt).
+    sdpa_price_tdy : float
+        Today's SDPA coin market price.
+    machine_price : float, optional
+        The price of 1 unit of ASIC machine (default = None, i.e. each user's `machine_price`).
+
+    Returns
+    -------
+    str
+        The rendered summary.
+    '''
+
+    lines = []
+    for user in oper_users:
+        # compute daily net spending
+        unit_price = user.machine_price if machine_price is None else machine_price
+        net_spending = user.day_coins_sold * sdpa_price_tdy - user.day_machines * unit_price - user.day_electricity
+        # compute daily paper profit (assuming no depreciation expense from the ASIC machines)
+        paper_profit = user.day_mined * sdpa_price_tdy - user.day_electricity
+
+        lines.append(user.name.capitalize() + ':')
+        lines.append(f'    - Paper profit is {round(paper_profit, 2)} GBP.')
+        lines.append(f'    - Net spending is {round(net_spending, 2)} GBP.')
+        lines.append(f'    - Prize received is {round(user.day_mined, 2)} SDPA coins.')
+        lines.append(f'    - Number of SDPA coins sold is {round(user.day_coins_sold, 2)} units.')
+        lines.append(f'    - Electrcity bill paid is {round(user.day_electricity, 2)} GBP.')
+        lines.append(f'    - Number of ASIC machines purchased is {user.day_machines} units.')
+
+    return ''.join(line + '\n' for line in lines)
+
+# render the key actions of a user
+def render_actions(user_activity_log, user_name, action_messages):
+    '''
+    Renders the key actions of a user for each day of the simulation, as printed by `print_actions` in `main.py`.
+
+    Parameters
+    ----------
+    user_activity_log : ActivityLog
+        Stores users key actions (see `BlockChain.create_logs`).
+    user_name : str
+        The name of the user whose actions are rendered.
+    action_messages : dict
+        Stores the action names (keys) and their respective message formatting functions (values), see `print_actions`.
+
+    Returns
+    -------
+    str
+        The rendered actions.
+    '''
+
+    lines = []
+    for day, actions in user_activity_log[user_name].items():
+        lines.append(f'    {day}:')
+
+        # track whether any action is performed on the day
+        action_indicator = False
+        for action, param in actions.items():
+            message = action_messages[action](param)
+            # only render the actions that were performed
+            if message:
+                lines.append(message)
+                action_indicator = True
+
+        if not action_indicator:
+            lines.append('    - No actions performed today.')
+
+        # stop once the user went bankrupt
+        if actions.get('Bankrupt', None) == 'yes':
+            break
+
+    return ''.join(line + '\n' for line in lines)
+
+# render the end of simulation summary of a user
+def render_user_summary(result, actions = None):
+    '''
+    Renders the end of simulation summary of a user, as printed by `print_user_summary` in `main.py`.
+
+    Parameters
+    ----------
+    result : dict
+        The performance of the user (see `user_performance`).
+    actions : str, optional
+        The rendered key actions of the user (see `render_actions`). Default is None, i.e. the key actions are not
+        part of the summary.
+
+    Returns
+    -------
+    str
+        The rendered summary.
+    '''
+
+    name = result['name'].capitalize()
+    lines = [name + ':']
+
+    # for users that declared bankruptcy
+    if result['bankrupt']:
+        lines.append(f'- {name} went bankrupt on day {result["bankrupt_day"]}')
+        lines.append(f'- ASIC machines count = {result["machines"]}')
+    # for users who remain operational
+    else:
+        lines.append(f'- Cash capital balance = {round(result["capital"], 2)}')
+        lines.append(f'- SDPA coin balance = {round(result["sdpa_balance"], 2)}')
+        lines.append(f'- GBP value of SDPA coin balance = {round(result["sdpa_value"], 2)}')
+        lines.append(f'- ASIC machines count = {result["machines"]}')
+        lines.append(f'- Total GBP value of all assets = {round(result["total_assets"], 2)}')
+        lines.append(f'- Investment return (GBP) = {round(result["investment_return"], 2)} GBP')
+        lines.append(f'- Investment return (%) = {round(result["investment_return_pct"], 2)}%')
+
+    lines.append(f'- Total coins mined = {round(result["total_mined"], 2)} coins')
+    lines.append(f'- Mining performance (%) = {round(result["mining_performance"], 2)}%')
+    lines.append(f'- Total electricity bill = {round(result["total_bill"], 2)} GBP.')
+
+    text = ''.join(line + '\n' for line in lines)
+    if actions is not None:
+        text += '- Key actions performed,\n' + actions
+    return text
+
+class Reporter:
+    '''
+    A class to write the summaries of a simulation in large blocks.
+
+    The summaries are rendered into a buffer, which is written to the output once it holds `buffer_size` characters,
+    and when the reporter is flushed or closed. The output is either text (the same summaries as `main.py`) written
+    to a stream, or JSON lines written to a file.
+    ...
+
+    Attributes
+    ----------
+    level : int
+        The verbosity level (SILENT, END_OF_RUN or PER_DAY).
+    stream : file object
+        The output the summaries are written to.
+    jsonl : bool
+        Whether JSON lines are written instead of text.
+    buffer_size : int
+        Number of buffered characters that triggers a write.
+
+    Methods
+    -------
+    write(text)
+        Adds text to the buffer.
+    write_record(record)
+        Adds a JSON line to the buffer.
+    flush()
+        Writes the buffer to the output.
+    close()
+        Flushes the buffer and closes the output file, if the reporter opened it.
+    day(current_day, sdpa_price_tdy, elec_price_tdy, winner, oper_users, machine_price = None)
+        Reports the day's summary.
+    end_of_run(results, user_activity_log = None, action_messages = None)
+        Reports the end of simulation summary of each user.
+    '''
+
+    def __init__(self, level = PER_DAY, stream = None, jsonl_path = None, buffer_size = 1 << 16):
+        '''
+        Parameters
+        ----------
+        level : int, optional
+            The verbosity level: SILENT, END_OF_RUN or PER_DAY (default is PER_DAY).
+        stream : file object, optional
+            The text stream to write to (default is None, i.e. the terminal).
+        jsonl_path : str, optional
+            When provided, one JSON record per line is streamed to this file, instead of writing text to `stream`
+            (default is None).
+        buffer_size : int, optional
+            Number of buffered characters that triggers a write (default is 65536).
+
+        Raises
+        ------
+        ValueError
+            If `level` is not one of SILENT, END_OF_RUN or PER_DAY.
+        '''
+
+        if level not in (SILENT, END_OF_RUN, PER_DAY):
+            raise ValueError(f'Invalid verbosity level: {level!r}. Please use SILENT (0), END_OF_RUN (1) or PER_DAY (2).')
+
+        self.level = level
+        self.buffer_size = buffer_size
+        self.jsonl = jsonl_path is not None
+        # the reporter only closes the files it opened
+        self.owns_stream = self.jsonl
+        if self.jsonl:
+            self.stream = open(jsonl_path, 'w', encoding = 'utf-8')
+        else:
+            self.stream = stream if stream is not None else sys.stdout
+
+        # buffered text and its number of characters
+        self.buffer = []
+        self.buffered = 0
+
+    # add text to the buffer
+    def write(self, text):
+        '''
+        Adds text to the buffer, and writes the buffer to the output once it is full.
+
+        Parameters
+        ----------
+        text : str
+            The text.
+        '''
+
+        self.buffer.append(text)
+        self.buffered += len(text)
+        if self.buffered >= self.buffer_size:
+            self.flush()
+
+    # add a JSON line to the buffer
+    def write_record(self, record):
+        '''
+        Adds a JSON record (on its own line) to the buffer.
+
+        Parameters
+        ----------
+        record : dict
+            The record.
+        '''
+
+        self.write(json.dumps(record, separators = (',', ':')) + '\n')
+
+    # write the buffer
+    def flush(self):
+        '''
+        Writes the buffer to the output in a single call.
+        '''
+
+        if self.buffer:
+            self.stream.write(''.join(self.buffer))
+            self.buffer = []
+            self.buffered = 0
+        self.stream.flush()
+
+    # flush and close
+    def close(self):
+        '''
+        Flushes the buffer and closes the output file, if the reporter opened it.
+        '''
+
+        self.flush()
+        if self.owns_stream:
+            self.stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    # report the day
+    def day(self, current_day, sdpa_price_tdy, elec_price_tdy, winner, oper_users, machine_price = 600):
+        '''
+        Reports the day's prices, winner and the daily summary of each operational user (only at the PER_DAY level).
+
+        Parameters
+        ----------
+        current_day : int
+            The current day.
+        sdpa_price_tdy : float
+            Today's SDPA coin market price.
+        elec_price_tdy : float
+            Today's unit price of electricity.
+        winner : str
+            The name of the day's winner ('pooled' if the pool won).
+        oper_users : list
+            A list of UserAccount objects for users who are still operational.
+        machine_price : float, optional
+            The price of 1 unit of ASIC machine (default = None, i.e. each user's `machine_price`).
+        '''
+
+        if self.level < PER_DAY:
+            return
+
+        if self.jsonl:
+            self.write_record({'type': 'day', 'day': current_day, 'sdpa_price': sdpa_price_tdy,
+                               'elec_price': elec_price_tdy, 'winner': winner})
+            for user in oper_users:
+                self.write_record({'type': 'user_day', 'day': current_day, 'name': user.name,
+                                   'capital': user.capital, 'sdpa_balance': user.sdpa_balance,
+                                   'machines': user.machines, 'machine_status': user.machine_status,
+                                   'mining_type': user.mining_type, 'prize': user.day_mined,
+                                   'coins_sold': user.day_coins_sold, 'electricity': user.day_electricity,
+                                   'machines_bought': user.day_machines})
+        else:
+            self.write(f'Trading Day {current_day}\n'
+                       f'-------------\n'
+                       f'Today\'s market price of SDPA coin is {sdpa_price_tdy} GBP\n'
+                       f'Today\'s unit price of electricity is {elec_price_tdy} GBP\n'
+                       f'{winner.capitalize()} wins PoW mining.\n')
+            self.write(render_daily_summary(oper_users, sdpa_price_tdy, machine_price))
+
+    # report the end of the simulation
+    def end_of_run(self, results, user_activity_log = None, action_messages = None):
+        '''
+        Reports the end of simulation summary of each user (at the END_OF_RUN and PER_DAY levels), then flushes
+        the buffer.
+
+        Parameters
+        ----------
+        results : list
+            The performance of each user (see `user_performance`).
+        user_activity_log : ActivityLog, optional
+            When provided with `action_messages`, the key actions of each user are part of the text summary
+            (default is None).
+        action_messages : dict, optional
+            The message formatting functions of the actions, see `print_actions` in `main.py` (default is None).
+        '''
+
+        if self.level >= END_OF_RUN:
+            if self.jsonl:
+                for result in results:
+                    self.write_record({'type': 'result', **result})
+            else:
+                self.write('\nSimulation Summary\n-----------------\n')
+                for result in results:
+                    actions = None
+                    if user_activity_log is not None and action_messages is not None:
+                        actions = render_actions(user_activity_log, result['name'], action_messages)
+                    self.write(render_user_summary(result, actions))
+
+        self.flush()
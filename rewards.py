@@ -0,0 +1,185 @@
+# Georgius Benedikt Ermanta
+# Fintech
+# This module computes the exact expected daily prize of each user, and its variance, from the current mining power of
+# the population, instead of estimating them from many simulated days.
+
+'''
+rewards.py
+----------
+A module to compute the expected daily prize of the users in the blockchain mining simulation.
+
+`BlockChain.winner` draws the daily winner with a probability proportional to the active mining power: with `B` the
+base machines of the pool, `P` the active machines of the pooled miners and `S` the active machines of the solo miners,
+the total active mining power is `A = B + P + S`, and for a total daily prize `R`,
+- a solo miner with `m` active machines wins the whole prize with probability `m / A`, so their daily prize has
+  mean `R m / A` and variance `R^2 (m / A) (1 - m / A)`.
+- the pool wins with probability `q = (B + P) / A` (or 1 without any active solo machine), and a pool member with `m`
+  active machines then receives `R m / (B + P)`, so their daily prize has mean `q R m / (B + P)` and variance
+  `(R m / (B + P))^2 q (1 - q)`.
+- users whose machines are off (or who are bankrupt) receive nothing.
+The mean is the same whether a user mines solo or in the pool (`R m / A`, as long as there is an active solo
+machine); the mining type only changes the variance. Turning machines on or buying machines changes `A`, and thus the
+mean of every user.
+
+The moments are exact (no sampling), computed in O(n) for the whole population, or in O(1) per user from the totals of
+a `MiningPowerIndex` (e.g. for a strategy evaluating a decision, see `what_if`).
+
+Functions
+---------
+mining_power(users, base_pooled_mach = 1000)
+    Computes the active mining power of the pool and of the solo miners.
+prize_moments(machines, mining_type, pool_power, solo_power, total_prize = 100)
+    Computes the mean and variance of the daily prize of a user.
+expected_rewards(users, base_pooled_mach = 1000, total_prize = 100)
+    Computes the mean and variance of the daily prize of every user.
+what_if(user, machines, machine_status, mining_type, pool_power, solo_power, total_prize = 100)
+    Computes the mean and variance of the daily prize of a user after a change of their machines, status or type.
+'''
+
+# active mining power of the population
+def mining_power(users, base_pooled_mach = 1000):
+    '''
+    Computes the active mining power of the pool (including its base machines) and of the solo miners, as used by
+    `BlockChain.winner`. Bankrupt users and machines that are turned off are left out.
+
+    Parameters
+    ----------
+    users : iterable
+        The `UserAccount` objects (or any objects with the same attributes) of the users.
+    base_pooled_mach : int, optional
+        The base number of machines in the pool (default is 1000).
+
+    Returns
+    -------
+    tuple
+        The active mining power of the pool and of the solo miners.
+    '''
+
+    pool_power = base_pooled_mach
+    solo_power = 0
+    for user in users:
+        if user.bankrupt_status == 'no' and user.machine_status == 'on':
+            if user.mining_type == 'pooled':
+                pool_power += user.machines
+            else:
+                solo_power += user.machines
+    return pool_power, solo_power
+
+# mean and variance of the daily prize of a user
+def prize_moments(machines, mining_type, pool_power, solo_power, total_prize = 100):
+    '''
+    Computes the mean and variance of the daily prize of a user with `machines` active machines, in SDPA coins.
+
+    Parameters
+    ----------
+    machines : int
+        The number of active machines of the user (0 if their machines are off).
+    mining_type : str
+        The mining type of the user ('solo' or 'pooled').
+    pool_power : int
+        The active mining power of the pool, including the base machines of the pool and the user's machines if they
+        are pooled (see `mining_power`).
+    solo_power : int
+        The active mining power of the solo miners, including the user's machines if they are solo.
+    total_prize : int or float, optional
+        The total daily SDPA prize (default is 100).
+
+    Returns
+    -------
+    tuple
+        The mean and variance of the user's daily prize.
+    '''
+
+    if machines <= 0:
+        return 0.0, 0.0
+
+    # the pool wins whenever there is no active solo machine (see `MiningPowerIndex.draw`)
+    if solo_power == 0:
+        pool_win = 1.0
+    else:
+        pool_win = pool_power / (pool_power + solo_power)
+
+    if mining_type == 'pooled':
+        # the user's share of the pool prize
+        payout = total_prize * machines / pool_power
+        return pool_win * payout, payout * payout * pool_win * (1 - pool_win)
+
+    # the solo miner wins the whole prize
+    win = machines / (pool_power + solo_power)
+    return win * total_prize, total_prize * total_prize * win * (1 - win)
+
+# mean and variance of the daily prize of every user
+def expected_rewards(users, base_pooled_mach = 1000, total_prize = 100):
+    '''
+    Computes the mean and variance of the daily prize of every user, from the current machines, machine status,
+    mining type and bankruptcy status of the population, in O(n).
+
+    Parameters
+    ----------
+    users : list
+        The `UserAccount` objects (or any objects with the same attributes) of the users.
+    base_pooled_mach : int, optional
+        The base number of machines in the pool (default is 1000).
+    total_prize : int or float, optional
+        The total daily SDPA prize (default is 100).
+
+    Returns
+    -------
+    dict
+        The user names (keys) and the mean and variance of their daily prize (values, as tuples).
+    '''
+
+    pool_power, solo_power = mining_power(users, base_pooled_mach)
+
+    rewards = {}
+    for user in users:
+        active = user.machines if user.bankrupt_status == 'no' and user.machine_status == 'on' else 0
+        rewards[user.name] = prize_moments(active, user.mining_type, pool_power, solo_power, total_prize)
+    return rewards
+
+# mean and variance of the daily prize after a decision
+def what_if(user, machines, machine_status, mining_type, pool_power, solo_power, total_prize = 100):
+    '''
+    Computes the mean and variance of the daily prize of a user if they had `machines` machines, with the given
+    machine status and mining type, the rest of the population being unchanged. The user's current machines are
+    taken out of the mining power first, so the result is computed in O(1).
+
+    Parameters
+    ----------
+    user : UserAccount
+        The user (or any object with the same attributes) evaluating a decision.
+    machines : int
+        The number of machines of the user after the decision.
+    machine_status : str
+        The machine status after the decision ('on' or 'off').
+    mining_type : str
+        The mining type after the decision ('solo' or 'pooled').
+    pool_power : int
+        The current active mining power of the pool, including its base machines (see `mining_power`, or
+        `base_pooled_mach + MiningPowerIndex.pooled_machines`).
+    solo_power : int
+        The current active mining power of the solo miners (see `mining_power`, or `MiningPowerIndex.solo_machines`).
+    total_prize : int or float, optional
+        The total daily SDPA prize (default is 100).
+
+    Returns
+    -------
+    tuple
+        The mean and variance of the user's daily prize after the decision.
+    '''
+
+    # take the user's current machines out of the mining power
+    if user.bankrupt_status == 'no' and user.machine_status == 'on':
+        if user.mining_type == 'pooled':
+            pool_power -= user.machines
+        else:
+            solo_power -= user.machines
+
+    # add the machines after the decision
+    active = machines if machine_status == 'on' else 0
+    if mining_type == 'pooled':
+        pool_power += active
+    else:
+        solo_power += active
+
+    return prize_moments(active, mining_type, pool_power, solo_power, total_prize)
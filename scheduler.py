@@ -0,0 +1,471 @@
+# Georgius Benedikt Ermanta
+# Fintech
+# This module runs the blockchain mining simulation as a sequence of timestamped events, so that many mining rounds
+# (blocks) can be resolved each day, and the users can act at different times of the day.
+
+'''
+scheduler.py
+------------
+A module to simulate several mining rounds per day with an event queue.
+
+`Simulation.step` resolves exactly one mining round per day, after every user has acted. This module defines the
+`EventSimulation` class, in which a day is a sequence of timestamped events, kept in a heap (`EventQueue`) and
+processed in order of time:
+- the price tick, at the start of the day, which generates the day's prices and schedules the users' actions,
+- the users' actions, at the time of the day at which each user's policy decides (see `decision_time`),
+- the users' electricity bills, right after their actions, as in `Simulation.step`,
+- the mining rounds, `blocks_per_day` of them (e.g. 144, one every 10 minutes), evenly spaced over the day, each
+  awarding `total_prize / blocks_per_day` SDPA coins, so the daily issuance of coins is unchanged,
+- the close of the day, after the last mining round (bankruptcy check, history, export and checkpoint, see
+  `Simulation.close_day`).
+A mining round does not go through the users: the winner is drawn from the cached mining power index
+(`MiningPowerIndex`) in O(log n), and a prize won by the pool is added to the prize per pooled machine accrued since
+the start of the day, in O(1), instead of being split among the members. A member's share is only paid out
+(`UserAccount.receive_prize`, one 'Prize' entry in the activity log) when their mining power is about to change, i.e.
+before their actions, and at the close of the day. With one block per day, the pool prize is paid out at once, and
+the simulation is the same as `Simulation.step` (up to the order of the records of the columnar logs).
+
+Usage
+-----
+To simulate 144 mining rounds per day, with the users deciding at a random time of each day,
+    `EventSimulation(market, blockchain, users, Staggered(BuyAndHold()), blocks_per_day = 144).run()`
+(see `strategies.Staggered`).
+
+Classes
+-------
+EventQueue
+    A priority queue of timestamped events.
+EventSimulation
+    A class to simulate several mining rounds per day, with the users acting at different times of the day.
+
+Functions
+---------
+decision_time(policy, user, current_day)
+    Returns the time of the day at which a decision policy decides.
+'''
+
+# import libraries and classes
+import heapq
+import itertools
+
+from simulation import Simulation, MarketSnapshot
+
+# the kinds of events, in order of processing when they share the same time
+PRICE_TICK = 0
+USER_ACTIONS = 1
+ELECTRICITY_BILLS = 2
+MINING_ROUND = 3
+DAY_CLOSE = 4
+# the instrumentation phase of each kind of event (the close of the day times its own phases, see `Simulation.close_day`)
+EVENT_PHASES = ('prices', 'actions', 'electricity', 'winner', None)
+
+# the time of the day at which a policy decides
+def decision_time(policy, user, current_day):
+    '''
+    Returns the time of the day at which a decision policy decides, as a fraction of the day in [0, 1). Policies tell
+    it with a `decision_time(user_state, day)` method (see `strategies.Staggered`); other callables decide at the
+    start of the day.
+
+    Parameters
+    ----------
+    policy : callable
+        The decision policy.
+    user : UserAccount
+        The user.
+    current_day : int
+        The current day.
+
+    Returns
+    -------
+    float
+        The time of the day.
+    '''
+
+    method = getattr(policy, 'decision_time', None)
+    if method is None:
+        return 0.0
+    return method(user, current_day)
+
+class EventQueue:
+    '''
+    A priority queue of timestamped events, stored in a heap. The events are popped in order of time, then of kind
+    (see the constants of the module), then of scheduling.
+    ...
+
+    Attributes
+    ----------
+    heap : list
+        The `(time, kind, sequence, payload)` tuples of the pending events.
+
+    Methods
+    -------
+    schedule(time, kind, payload = None)
+        Adds an event to the queue.
+    pop()
+        Removes and returns the next event.
+    clear()
+        Removes all pending events.
+    '''
+
+    def __init__(self):
+        self.heap = []
+        # the scheduling order of the events (breaks the ties between events of the same time and kind)
+        self.sequence = itertools.count()
+
+    def __len__(self):
+        return len(self.heap)
+
+    # add an event
+    def schedule(self, time, kind, payload = None):
+        '''
+        Adds an event to the queue, in O(log n).
+
+        Parameters
+        ----------
+        time : int
+            The time of the event.
+        kind : int
+            The kind of event (e.g. `MINING_ROUND`).
+        payload : object, optional
+            The data of the event (default is None).
+        '''
+
+        heapq.heappush(self.heap, (time, kind, next(self.sequence), payload))
+
+    # remove the next event
+    def pop(self):
+        '''
+        Removes and returns the next event, in O(log n).
+
+        Returns
+        -------
+        tuple
+            The time, kind and payload of the event.
+        '''
+
+        time, kind, _, payload = heapq.heappop(self.heap)
+        return time, kind, payload
+
+    # remove all events
+    def clear(self):
+        '''
+        Removes all pending events.
+        '''
+
+        self.heap.clear()
+
+class EventSimulation(Simulation):
+    '''
+    A class to simulate several mining rounds (blocks) per day, with the users acting at different times of the day.
+
+    The events of a day are timestamped in blocks: the events of day d happen at times `(d - 1) * blocks_per_day` to
+    `d * blocks_per_day - 1`, and the mining round of each block comes after the actions and bills of the same block.
+    ...
+
+    Attributes
+    ----------
+    blocks_per_day : int
+        Number of mining rounds per day.
+    block_prize : int or float
+        The SDPA prize of each mining round (the total daily prize with a single round per day).
+    events : EventQueue
+        The pending events.
+    block_winners : list
+        The name of the winning player of each mining round of each simulated day ('pooled' when the mining pool
+        wins). `winners` holds the winner of the last mining round of each day.
+    pool_reward : float
+        The prize per pooled machine accrued by the pool since the start of the day.
+    pool_marks : dict
+        Stores the user names (keys) and the value of `pool_reward` (values) up to which the pool members have been
+        paid.
+
+    Methods
+    -------
+    step()
+        Simulates one day, event by event.
+    process(kind, payload)
+        Processes an event.
+    settle(user)
+        Pays out the user's share of the pool prizes accrued since they were last paid.
+    fast_forward(n_days = None)
+        Fast-forwards the coming days, with one mining round per day only.
+    resume(path, policies = None, reporter = None, checkpointer = None, instrumentation = None, exporter = None,
+           blocks_per_day = 144)
+        Restores a simulation from a checkpoint file (class method).
+    '''
+
+    def __init__(self, market, blockchain, users, policies = None, base_pooled_mach = 1000, total_prize = 100, machine_price = None,
+                 log_backend = 'sparse', reporter = None, checkpointer = None, instrumentation = None, exporter = None,
+                 blocks_per_day = 144):
+        '''
+        Parameters
+        ----------
+        market, blockchain, users, policies, base_pooled_mach, total_prize, machine_price, log_backend, reporter,
+        checkpointer, instrumentation, exporter
+            See `Simulation`.
+        blocks_per_day : int, optional
+            Number of mining rounds per day (default is 144).
+
+        Raises
+        ------
+        ValueError
+            If `blocks_per_day` is not a positive integer.
+        '''
+
+        if not isinstance(blocks_per_day, int) or blocks_per_day < 1:
+            raise ValueError(f'Invalid number of blocks: blocks_per_day must be a positive integer, got {blocks_per_day}.')
+
+        super().__init__(market, blockchain, users, policies, base_pooled_mach, total_prize, machine_price, log_backend,
+                         reporter, checkpointer, instrumentation, exporter)
+
+        # the mining rounds of each day
+        self.blocks_per_day = blocks_per_day
+        self.block_prize = total_prize / blocks_per_day if blocks_per_day > 1 else total_prize
+        self.block_winners = []
+
+        # the pending events
+        self.events = EventQueue()
+
+        # the pool prizes that have not been paid out yet
+        self.pool_reward = 0.0
+        self.pool_marks = {}
+
+        # the state of the current day
+        self.day = None
+        self.day_start = None
+        self.market_snapshot = None
+        self.day_block_winners = None
+
+    # simulate one day
+    def step(self):
+        '''
+        Simulates one day, by processing its events in order of time: the price tick, the users' actions and bills,
+        the mining rounds, and the close of the day.
+
+        Returns
+        -------
+        bool
+            True if the day has been simulated, False if the simulation has already ended (all days have been
+            simulated, the SDPA coin has been delisted, or all users are bankrupt).
+        '''
+
+        if self.finished or self.current_day >= self.n_days:
+            self.finished = True
+            return False
+
+        self.day = self.current_day + 1
+        self.day_start = self.current_day * self.blocks_per_day
+        instr = self.instrumentation
+        if instr is not None:
+            instr.start_day(self.day)
+
+        # the price tick, the mining rounds and the close of the day (the actions are scheduled by the price tick)
+        events = self.events
+        events.schedule(self.day_start, PRICE_TICK)
+        for block in range(self.blocks_per_day):
+            events.schedule(self.day_start + block, MINING_ROUND)
+        events.schedule(self.day_start + self.blocks_per_day - 1, DAY_CLOSE)
+
+        while events:
+            _, kind, payload = events.pop()
+            phase = EVENT_PHASES[kind] if instr is not None else None
+            if phase is not None:
+                instr.start(phase)
+            simulated = self.process(kind, payload)
+            if phase is not None:
+                instr.stop(phase)
+            # the SDPA coin has been delisted
+            if not simulated:
+                events.clear()
+                if instr is not None:
+                    instr.end_day(self.day)
+                return False
+
+        return True
+
+    # process an event
+    def process(self, kind, payload):
+        '''
+        Processes an event of the current day.
+
+        Parameters
+        ----------
+        kind : int
+            The kind of event.
+        payload : object
+            The data of the event: the users acting (or billed) for `USER_ACTIONS` (or `ELECTRICITY_BILLS`), None
+            otherwise.
+
+        Returns
+        -------
+        bool
+            False if the SDPA coin has been delisted at the price tick, True otherwise.
+        '''
+
+        current_day = self.day
+        log = self.user_activity_log
+
+        if kind == MINING_ROUND:
+            # draw the round's winner from the mining power index, in O(log n)
+            blockchain = self.blockchain
+            block_winner = blockchain.draw_winner(self.oper_users, self.base_pooled_mach)
+            if block_winner == 'pooled' and self.blocks_per_day > 1:
+                # accrue the prize per pooled machine, in O(1)
+                pool_power = self.base_pooled_mach + blockchain.mining_index.pooled_machines
+                if pool_power > 0:
+                    self.pool_reward += self.block_prize / pool_power
+            else:
+                # with a single round per day, the pool prize is paid out at once, exactly as by `Simulation.step`
+                block_winner = blockchain.award_prize(block_winner, current_day, self.base_pooled_mach, self.block_prize)
+            self.day_block_winners.append(block_winner)
+            if self.instrumentation is not None:
+                self.instrumentation.count('winner_draws')
+                if block_winner == 'pooled':
+                    self.instrumentation.count('pool_wins')
+
+        elif kind == USER_ACTIONS:
+            snapshot = self.market_snapshot
+            sdpa_price_tdy = snapshot.sdpa_price
+            index = self.blockchain.mining_index
+            pool_members = index.pool_members if index is not None else {}
+            for user in payload:
+                # pay the pool prizes accrued with the user's current mining power, before the policy decides
+                if user.name in pool_members:
+                    self.settle(user)
+                # perform the actions chosen by the policy
+                for action, param in self.policies[user.name](user, snapshot, current_day):
+                    if action == 5:
+                        break
+                    user.action_query(action, sdpa_price_tdy, current_day, log, param)
+                # the user's share of the pool prizes accrues from now on
+                if user.name in pool_members:
+                    self.pool_marks[user.name] = self.pool_reward
+
+        elif kind == ELECTRICITY_BILLS:
+            elec_price_tdy = self.market_snapshot.elec_price
+            for user in payload:
+                user.electricity_bill(elec_price_tdy, current_day)
+
+        elif kind == PRICE_TICK:
+            # SDPA price for the day
+            if current_day == 1:
+                sdpa_price_tdy = self.market.sdpa_price
+            else:
+                sdpa_price_tdy = self.market.new_sdpa_price()
+                # end the simulation when SDPA coin is delisted
+                if sdpa_price_tdy <= 0:
+                    self.finished = True
+                    return False
+            # electricity price for the day
+            self.market_snapshot = MarketSnapshot(sdpa_price_tdy, self.market.new_elec_price())
+            self.day_block_winners = []
+
+            # start the day of every user, and group the users by the block in which they act
+            blocks = {}
+            for user in self.oper_users:
+                user.reset_daily_machine_purchases()
+                user.sdpa_price = sdpa_price_tdy
+                user.user_activity_log = log
+                time = decision_time(self.policies[user.name], user, current_day)
+                block = min(int(time * self.blocks_per_day), self.blocks_per_day - 1)
+                acting_users = blocks.get(block)
+                if acting_users is None:
+                    acting_users = blocks[block] = []
+                acting_users.append(user)
+            for block, acting_users in blocks.items():
+                self.events.schedule(self.day_start + block, USER_ACTIONS, acting_users)
+                self.events.schedule(self.day_start + block, ELECTRICITY_BILLS, acting_users)
+
+        elif kind == DAY_CLOSE:
+            # pay out the pool prizes of the day
+            instr = self.instrumentation
+            if instr is not None:
+                instr.start('winner')
+            index = self.blockchain.mining_index
+            if index is not None:
+                for user in index.pool_members.values():
+                    self.settle(user)
+            self.pool_reward = 0.0
+            self.pool_marks = {}
+            if instr is not None:
+                instr.stop('winner')
+
+            # store the mining rounds, then close the day as `Simulation.step` (the day's winner is the last round's)
+            self.block_winners.append(self.day_block_winners)
+            snapshot = self.market_snapshot
+            self.close_day(current_day, snapshot.sdpa_price, snapshot.elec_price, self.day_block_winners[-1])
+
+        return True
+
+    # pay out the accrued pool prizes
+    def settle(self, user):
+        '''
+        Pays out the user's share of the pool prizes accrued since they were last paid, i.e. their active machines
+        times the prize per pooled machine accrued in the meantime (their machines have not changed since then), and
+        records it in the activity log.
+
+        Parameters
+        ----------
+        user : UserAccount
+            A member of the pool.
+        '''
+
+        prize = user.machines * (self.pool_reward - self.pool_marks.get(user.name, 0.0))
+        if prize > 0:
+            user.receive_prize(prize)
+            self.user_activity_log.record(user.name, self.day, 'Prize', prize)
+        self.pool_marks[user.name] = self.pool_reward
+
+    # fast-forward the coming days
+    def fast_forward(self, n_days = None):
+        '''
+        Fast-forwards the coming days as `Simulation.fast_forward` when there is a single mining round per day
+        (nothing is fast-forwarded otherwise).
+
+        Parameters
+        ----------
+        n_days : int, optional
+            The maximum number of days to simulate (default is None, i.e. until the fast-forward stops).
+
+        Returns
+        -------
+        int
+            The number of days simulated.
+        '''
+
+        if self.blocks_per_day > 1:
+            return 0
+        simulated = super().fast_forward(n_days)
+        # one mining round per fast-forwarded day
+        self.block_winners.extend([winner] for winner in self.winners[len(self.winners) - simulated:])
+        return simulated
+
+    # restore a simulation
+    @classmethod
+    def resume(cls, path, policies = None, reporter = None, checkpointer = None, instrumentation = None, exporter = None,
+               blocks_per_day = 144):
+        '''
+        Restores a simulation from a checkpoint file, see `Simulation.resume`. The checkpoints are written at the
+        close of a day, when all the pool prizes have been paid out, so the simulation continues exactly as it would
+        have without interruption, provided that the same decision policies and number of blocks are given. The
+        mining rounds of the days before the checkpoint are not restored (`block_winners` starts empty).
+
+        Parameters
+        ----------
+        path, policies, reporter, checkpointer, instrumentation, exporter
+            See `Simulation.resume`.
+        blocks_per_day : int, optional
+            Number of mining rounds per day (default is 144).
+
+        Returns
+        -------
+        EventSimulation
+            The restored simulation.
+        '''
+
+        sim = super().resume(path, policies, reporter, checkpointer, instrumentation, exporter)
+        if not isinstance(blocks_per_day, int) or blocks_per_day < 1:
+            raise ValueError(f'Invalid number of blocks: blocks_per_day must be a positive integer, got {blocks_per_day}.')
+        sim.blocks_per_day = blocks_per_day
+        sim.block_prize = sim.total_prize / blocks_per_day if blocks_per_day > 1 else sim.total_prize
+        return sim
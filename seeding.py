@@ -0,0 +1,91 @@
+# Georgius Benedikt Ermanta
+# Fintech
+# This module derives independent, reproducible random number streams from a single seed.
+
+'''
+seeding.py
+----------
+A module to derive independent random number streams from a single seed.
+
+The `Market` and `BlockChain` classes each draw from their own `random.Random` generator. To make a simulation
+reproducible, and to run many simulations in parallel without the generators sharing or colliding on state, every
+generator is seeded with a seed derived from a base seed and a key naming the stream (e.g. the run number and
+'market'). The derived seeds are the SHA-256 hash of the base seed and the keys, so that streams with different keys
+are statistically independent, regardless of how close their base seeds are (e.g. seeds 1 and 2).
+
+Functions
+---------
+derive_seed(seed, *keys)
+    Derives the seed of an independent stream.
+spawn_seeds(seed, n, *keys)
+    Derives the seeds of `n` independent streams.
+make_rng(seed, *keys)
+    Creates a `random.Random` generator for an independent stream.
+'''
+
+# import libraries
+import hashlib
+import random
+
+# derive the seed of a stream
+def derive_seed(seed, *keys):
+    '''
+    Derives the seed of an independent stream from a base seed and the keys naming the stream.
+
+    Parameters
+    ----------
+    seed : int or str
+        The base seed.
+    *keys : int or str
+        The keys naming the stream (e.g. `derive_seed(42, 'run', 7, 'market')`).
+
+    Returns
+    -------
+    int
+        A 128-bit seed.
+    '''
+
+    digest = hashlib.sha256(repr((seed,) + keys).encode()).digest()
+    return int.from_bytes(digest[:16], 'little')
+
+# derive the seeds of several streams
+def spawn_seeds(seed, n, *keys):
+    '''
+    Derives the seeds of `n` independent streams, e.g. one per parallel run.
+
+    Parameters
+    ----------
+    seed : int or str
+        The base seed.
+    n : int
+        Number of streams.
+    *keys : int or str
+        Additional keys naming the streams.
+
+    Returns
+    -------
+    list
+        The seeds of the streams.
+    '''
+
+    return [derive_seed(seed, *keys, i) for i in range(n)]
+
+# create a generator for a stream
+def make_rng(seed, *keys):
+    '''
+    Creates a `random.Random` generator for an independent stream.
+
+    Parameters
+    ----------
+    seed : int or str
+        The base seed.
+    *keys : int or str
+        The keys naming the stream.
+
+    Returns
+    -------
+    random.Random
+        The generator.
+    '''
+
+    return random.Random(derive_seed(seed, *keys))
@@ -0,0 +1,733 @@
+# Georgius Benedikt Ermanta
+# Fintech
+# This module runs the blockchain mining game as a local multiplayer server, where each player connects with their own
+# client and all players choose their actions for the day at the same time, instead of taking turns at one terminal.
+
+'''
+server.py
+---------
+A module to play the blockchain mining game with several human players over a local TCP or Unix socket.
+
+The `GameServer` waits for `n_players` players to join, then runs the days of a headless `Simulation`. At the start
+of each day, every operational player receives the day's prices and their account, and submits their actions
+concurrently. The day closes once every connected player has ended their actions (action 5), or when the deadline
+passes (the actions submitted so far are kept). The collected batch of actions is then executed in one pass by
+`Simulation.step` (the actions are validated by `UserAccount.action_query`, in the order of the players, then the
+electricity bills are charged and `BlockChain.winner` runs once), and each player receives a summary of the day: the
+winner, their account and the events recorded for them (rejected actions are not recorded). The simulation runs in a
+worker thread, so the event loop keeps serving the players while a day is computed.
+
+The messages are JSON objects, one per line,
+- client to server: {"type": "join", "name": ...}, {"type": "action", "day": ..., "action": 1-4, "param": ...}
+  (`param` is the quantity for actions 1 and 2), and {"type": "end", "day": ...}.
+- server to client: "welcome", "day" (prices, account and deadline), "day_closed" (the day no longer accepts actions),
+  "summary" (after each day), "end_of_run" (the final performance of the player, see `reporting.user_performance`)
+  and "error" (e.g. an invalid action, or an action sent after the day closed).
+A player who disconnects is passive until they join again with the same name. The client reads the messages of the
+server while the player types, so the errors are shown as they arrive, and an answer typed after the deadline closed
+the day is not sent.
+
+Usage
+-----
+To serve a game of 3 players and 30 days on port 8765, with 60 seconds per day:
+    `python server.py serve --players 3 --days 30 --port 8765 --deadline 60`
+To join the game as a player:
+    `python server.py play --name alice --port 8765`
+
+Classes
+-------
+Player
+    A class to store the connection and the day's actions of a player.
+GameServer
+    A class to serve the multiplayer game.
+
+Functions
+---------
+encode(message)
+    Encodes a message as a line of JSON.
+play(name, host = '127.0.0.1', port = 8765, unix_path = None, ask = ask)
+    Joins a game as a player, prompting for the actions in the terminal.
+'''
+
+# import libraries and classes
+import argparse
+import asyncio
+import json
+import sys
+import threading
+
+from market import Market
+from user_account import UserAccount
+from blockchain import BlockChain
+from simulation import Simulation
+from reporting import render_user_summary
+
+# the actions a player can submit (5 ends the day's actions)
+PLAYER_ACTIONS = (1, 2, 3, 4)
+
+# the action menu of the client, as in main.py
+MENU = '''Select which action to make,
+1. Purchase mining machines
+2. Sell SDPA coins
+3. Switch ASIC on/off
+4. Switch solo/pooled mining
+5. End action
+Enter action number: '''
+
+# encode a message
+def encode(message):
+    '''
+    Encodes a message as a line of JSON.
+
+    Parameters
+    ----------
+    message : dict
+        The message.
+
+    Returns
+    -------
+    bytes
+        The encoded line.
+    '''
+    return (json.dumps(message) + '\n').encode()
+
+# account of a user, as sent to the players
+def account(user):
+    return {'capital': user.capital, 'sdpa_balance': user.sdpa_balance, 'machines': user.machines,
+            'machine_status': user.machine_status, 'mining_type': user.mining_type,
+            'bankrupt': user.bankrupt_status == 'yes'}
+
+class Player:
+    '''
+    A class to store the connection and the day's actions of a player.
+    ...
+
+    Attributes
+    ----------
+    name : str
+        The player name (the name of their `UserAccount`).
+    writer : asyncio.StreamWriter
+        The connection to the player, or None while they are disconnected.
+    actions : list
+        The `(action, param)` tuples submitted for the current day.
+    '''
+
+    def __init__(self, name, writer):
+        self.name = name
+        self.writer = writer
+        self.actions = []
+
+    # send a message
+    async def send(self, message):
+        '''
+        Sends a message to the player. Nothing is sent while they are disconnected.
+
+        Parameters
+        ----------
+        message : dict
+            The message.
+        '''
+
+        if self.writer is None:
+            return
+        try:
+            self.writer.write(encode(message))
+            await self.writer.drain()
+        except (ConnectionError, OSError):
+            self.writer = None
+
+class GameServer:
+    '''
+    A class to serve the multiplayer blockchain mining game over a local TCP or Unix socket.
+    ...
+
+    Attributes
+    ----------
+    n_players : int
+        The number of players.
+    n_days : int
+        The number of days in the simulation.
+    deadline : float
+        The number of seconds the players have to submit the day's actions.
+    players : dict
+        The player names (keys) and their `Player` objects (values), in order of joining.
+    simulation : Simulation
+        The simulation, created once all players have joined.
+
+    Methods
+    -------
+    serve()
+        Waits for the players, and plays the game (coroutine).
+    run()
+        Serves the game until it ends.
+    policy(user, market_snapshot, current_day)
+        Returns the actions submitted by a player for the day (the decision policy of every player).
+    collect_day(market_snapshot, current_day)
+        Sends the day to the players and collects their actions (coroutine).
+    '''
+
+    def __init__(self, n_players, n_days, host = '127.0.0.1', port = 8765, unix_path = None, deadline = 120.0,
+                 initial_capital = 50000, base_pooled_mach = 1000, total_prize = 100, machine_price = 600,
+                 market = None, blockchain = None, log_backend = 'sparse', reporter = None, checkpointer = None,
+                 exporter = None):
+        '''
+        Parameters
+        ----------
+        n_players : int
+            The number of players.
+        n_days : int
+            The number of days in the simulation (ignored when `blockchain` is provided).
+        host : str, optional
+            The TCP host (default is '127.0.0.1').
+        port : int, optional
+            The TCP port (default is 8765).
+        unix_path : str, optional
+            The path of a Unix socket to serve on instead of TCP (default is None).
+        deadline : float, optional
+            The number of seconds the players have to submit the day's actions (default is 120).
+        initial_capital : int or float, optional
+            The initial cash capital of each player (default is 50000).
+        base_pooled_mach : int, optional
+            The base number of machines in the pool (default is 1000).
+        total_prize : int or float, optional
+            The total daily SDPA prize (default is 100).
+        machine_price : int or float, optional
+            The price of 1 ASIC machine (default is 600).
+        market : Market, optional
+            Generates the market prices (default is None, i.e. a new `Market`).
+        blockchain : BlockChain, optional
+            Determines the daily winners (default is None, i.e. a new `BlockChain` of `n_days` days).
+        log_backend : str or ActivityLog, optional
+            How the user activity log is stored, see `BlockChain.create_logs` (default is 'sparse').
+        reporter, checkpointer, exporter : optional
+            Passed on to the `Simulation` (default is None).
+
+        Raises
+        ------
+        ValueError
+            If there are fewer than 1 player or the deadline is not positive.
+        '''
+
+        if n_players < 1:
+            raise ValueError(f'Invalid number of players: {n_players}. There must be at least 1 player.')
+        if deadline <= 0:
+            raise ValueError(f'Invalid deadline: {deadline}. It must be positive.')
+
+        self.n_players = n_players
+        self.n_days = blockchain.n_days if blockchain is not None else n_days
+        self.host = host
+        self.port = port
+        self.unix_path = unix_path
+        self.deadline = deadline
+        self.initial_capital = initial_capital
+        self.base_pooled_mach = base_pooled_mach
+        self.total_prize = total_prize
+        self.machine_price = machine_price
+        self.market = market if market is not None else Market()
+        self.blockchain = blockchain if blockchain is not None else BlockChain(n_days)
+        self.log_backend = log_backend
+        self.reporter = reporter
+        self.checkpointer = checkpointer
+        self.exporter = exporter
+
+        self.players = {}
+        self.simulation = None
+        # the open connections (writers) and their handler tasks
+        self.connections = {}
+
+        # the day open for actions (0 when no day is open)
+        self.open_day = 0
+        # the players who have not ended the day's actions
+        self.waiting = set()
+        # the day whose actions have been collected, and the batch of actions
+        self.batch_day = 0
+        self.batch = {}
+
+        # created in the event loop
+        self.loop = None
+        self.all_joined = None
+        self.day_closed = None
+
+    # handle a connection
+    async def handle(self, reader, writer):
+        '''
+        Handles the messages of a connected client (coroutine).
+
+        Parameters
+        ----------
+        reader : asyncio.StreamReader
+            The messages of the client.
+        writer : asyncio.StreamWriter
+            The connection to the client.
+        '''
+
+        self.connections[writer] = asyncio.current_task()
+        player = None
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                    if not isinstance(message, dict):
+                        raise ValueError('Invalid message: Messages must be JSON objects.')
+                    if player is None:
+                        player = await self.join(message, writer)
+                    else:
+                        self.submit(player, message)
+                except ValueError as err:
+                    writer.write(encode({'type': 'error', 'message': str(err)}))
+                    await writer.drain()
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            # a disconnected player is passive until they join again
+            if player is not None and player.writer is writer:
+                player.writer = None
+                self.end_actions(player)
+            del self.connections[writer]
+            writer.close()
+
+    # join the game
+    async def join(self, message, writer):
+        '''
+        Adds the player (or reconnects them) from a join message (coroutine).
+
+        Parameters
+        ----------
+        message : dict
+            The join message.
+        writer : asyncio.StreamWriter
+            The connection to the player.
+
+        Returns
+        -------
+        Player
+            The player.
+
+        Raises
+        ------
+        ValueError
+            If the message is not a join message, the name is invalid or taken, or the game is full.
+        '''
+
+        if message.get('type') != 'join':
+            raise ValueError('Invalid message: Please join the game first.')
+        name = message.get('name')
+        if not isinstance(name, str) or not name.strip():
+            raise ValueError('Invalid name: Please provide a user name.')
+
+        player = self.players.get(name)
+        if player is not None:
+            # reconnect a disconnected player
+            if player.writer is not None:
+                raise ValueError('Invalid name: User name must be unique.')
+            player.writer = writer
+        elif len(self.players) >= self.n_players:
+            raise ValueError('The game is full.')
+        else:
+            player = self.players[name] = Player(name, writer)
+
+        await player.send({'type': 'welcome', 'name': name, 'players': len(self.players), 'n_players': self.n_players,
+                           'n_days': self.n_days, 'deadline': self.deadline})
+        if len(self.players) == self.n_players:
+            self.all_joined.set()
+        return player
+
+    # submit an action
+    def submit(self, player, message):
+        '''
+        Adds an action (or the end of the actions) to the player's batch for the open day. The quantities are only
+        checked to be numbers: the actions are validated when the day closes.
+
+        Parameters
+        ----------
+        player : Player
+            The player.
+        message : dict
+            The action or end message.
+
+        Raises
+        ------
+        ValueError
+            If no day is open for the player, or the action is invalid.
+        '''
+
+        if message.get('type') not in ('action', 'end'):
+            raise ValueError(f"Invalid message type: {message.get('type')}.")
+        if self.open_day == 0 or message.get('day') != self.open_day or player.name not in self.waiting:
+            raise ValueError(f"Day {message.get('day')} is closed for actions.")
+
+        if message['type'] == 'end':
+            self.end_actions(player)
+            return
+
+        action = message.get('action')
+        param = message.get('param')
+        if action not in PLAYER_ACTIONS or isinstance(action, bool):
+            raise ValueError('Invalid input: To select the action, please enter 1, 2, 3, 4, or 5.')
+        if action in (1, 2) and (isinstance(param, bool) or not isinstance(param, (int, float))):
+            raise ValueError('Invalid input: Please provide the quantity as a number.')
+        player.actions.append((action, param))
+
+    # end the day's actions of a player
+    def end_actions(self, player):
+        self.waiting.discard(player.name)
+        if self.open_day and not self.waiting:
+            self.day_closed.set()
+
+    # decision policy of the players
+    def policy(self, user, market_snapshot, current_day):
+        '''
+        Returns the actions submitted by a player for the day. It is called by `Simulation.step` (in the worker
+        thread): the first call of the day sends the day to the players and waits until the day closes.
+
+        Parameters
+        ----------
+        user : UserAccount
+            The player's account.
+        market_snapshot : MarketSnapshot
+            The day's prices.
+        current_day : int
+            The day.
+
+        Returns
+        -------
+        list
+            The `(action, param)` tuples of the player.
+        '''
+
+        if self.batch_day != current_day:
+            self.batch = asyncio.run_coroutine_threadsafe(self.collect_day(market_snapshot, current_day), self.loop).result()
+            self.batch_day = current_day
+        return self.batch.get(user.name, ())
+
+    # collect the day's actions
+    async def collect_day(self, market_snapshot, current_day):
+        '''
+        Sends the day's prices and accounts to the operational players, and waits until all connected players have
+        ended their actions or the deadline passes (coroutine).
+
+        Parameters
+        ----------
+        market_snapshot : MarketSnapshot
+            The day's prices.
+        current_day : int
+            The day.
+
+        Returns
+        -------
+        dict
+            The player names (keys) and their submitted `(action, param)` tuples (values).
+        '''
+
+        users = self.simulation.oper_users
+        for user in users:
+            self.players[user.name].actions = []
+        self.waiting = {user.name for user in users if self.players[user.name].writer is not None}
+        self.day_closed.clear()
+        self.open_day = current_day
+
+        for user in users:
+            await self.players[user.name].send({'type': 'day', 'day': current_day, 'n_days': self.n_days,
+                                                'sdpa_price': market_snapshot.sdpa_price,
+                                                'elec_price': market_snapshot.elec_price, 'deadline': self.deadline,
+                                                'account': account(user)})
+
+        # the day closes once every connected player has ended their actions, or at the deadline
+        if self.waiting:
+            try:
+                await asyncio.wait_for(self.day_closed.wait(), self.deadline)
+            except asyncio.TimeoutError:
+                pass
+        self.open_day = 0
+        self.waiting = set()
+
+        # tell the players, so that those still choosing stop prompting
+        for user in users:
+            await self.players[user.name].send({'type': 'day_closed', 'day': current_day})
+
+        return {user.name: list(self.players[user.name].actions) for user in users}
+
+    # send the day's summary
+    async def send_summary(self, users):
+        simulation = self.simulation
+        current_day = simulation.current_day
+        events = {}
+        for user_name, day, key, param in simulation.user_activity_log.events(current_day, current_day):
+            events.setdefault(user_name, []).append([key, param])
+        for user in users:
+            await self.players[user.name].send({'type': 'summary', 'day': current_day,
+                                                'winner': simulation.winners[-1],
+                                                'sdpa_price': simulation.sdpa_prices[-1],
+                                                'total_machines': self.blockchain.total_machines,
+                                                'account': account(user), 'events': events.get(user.name, [])})
+
+    # play the game
+    async def serve(self):
+        '''
+        Waits for the players to join, then plays the days of the game and sends the final performance of each
+        player (coroutine).
+
+        Returns
+        -------
+        Simulation
+            The simulation of the game.
+        '''
+
+        self.loop = asyncio.get_running_loop()
+        self.all_joined = asyncio.Event()
+        self.day_closed = asyncio.Event()
+
+        if self.unix_path is not None:
+            server = await asyncio.start_unix_server(self.handle, self.unix_path)
+        else:
+            server = await asyncio.start_server(self.handle, self.host, self.port)
+
+        async with server:
+            await self.all_joined.wait()
+
+            # the players' accounts, in order of joining
+            users = [UserAccount(name, self.initial_capital, self.machine_price) for name in self.players]
+            self.simulation = Simulation(self.market, self.blockchain, users, self.policy, self.base_pooled_mach,
+                                         self.total_prize, self.machine_price, self.log_backend, self.reporter,
+                                         self.checkpointer, exporter = self.exporter)
+
+            # simulate the days in a worker thread, so the players are served while a day is computed
+            while True:
+                day_users = list(self.simulation.oper_users)
+                if not await self.loop.run_in_executor(None, self.simulation.step):
+                    break
+                await self.send_summary(day_users)
+
+            self.simulation.report()
+            for result in self.simulation.results():
+                await self.players[result['name']].send({'type': 'end_of_run', 'result': result})
+
+            # close the connections, and let their handlers finish
+            tasks = list(self.connections.values())
+            for writer in list(self.connections):
+                writer.close()
+            await asyncio.gather(*tasks, return_exceptions = True)
+
+        return self.simulation
+
+    def run(self):
+        '''
+        Serves the game until it ends.
+
+        Returns
+        -------
+        Simulation
+            The simulation of the game.
+        '''
+        return asyncio.run(self.serve())
+
+# read a line from the terminal
+def ask(prompt):
+    try:
+        return input(prompt)
+    except EOFError:
+        return '5'
+
+# read a line from the terminal without blocking the event loop
+def ask_later(loop, prompt, ask = ask):
+    '''
+    Prompts the player in a daemon thread, so the messages of the server are still read while the player types (and a
+    pending prompt does not keep the client running once the game has ended).
+
+    Parameters
+    ----------
+    loop : asyncio.AbstractEventLoop
+        The event loop of the client.
+    prompt : str
+        The prompt.
+    ask : callable, optional
+        Reads the answer of the player, given the prompt (default is `ask`, i.e. `input`).
+
+    Returns
+    -------
+    asyncio.Future
+        The answer of the player.
+    '''
+
+    answer = loop.create_future()
+
+    def read():
+        line = ask(prompt)
+        try:
+            loop.call_soon_threadsafe(lambda: answer.done() or answer.set_result(line))
+        except RuntimeError:
+            # the client has stopped
+            pass
+
+    threading.Thread(target = read, daemon = True).start()
+    return answer
+
+# join a game as a player
+def play(name, host = '127.0.0.1', port = 8765, unix_path = None, ask = ask):
+    '''
+    Joins a game as a player, and prompts for the actions of each day in the terminal, with the same menu as
+    `main.py`. The actions are sent as they are chosen, and validated by the server when the day closes. The messages
+    of the server are read while the player types: the errors are shown as they arrive, and once the server closes the
+    day (e.g. at the deadline), the answer being typed is not sent.
+
+    Parameters
+    ----------
+    name : str
+        The player name.
+    host : str, optional
+        The TCP host of the server (default is '127.0.0.1').
+    port : int, optional
+        The TCP port of the server (default is 8765).
+    unix_path : str, optional
+        The path of the Unix socket of the server, instead of TCP (default is None).
+    ask : callable, optional
+        Reads the answer of the player, given the prompt (default is `ask`, i.e. `input`).
+    '''
+    asyncio.run(play_game(name, host, port, unix_path, ask))
+
+# join a game as a player (coroutine)
+async def play_game(name, host, port, unix_path, ask):
+    if unix_path is not None:
+        reader, writer = await asyncio.open_unix_connection(unix_path)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+    loop = asyncio.get_running_loop()
+
+    # the day messages, prompted one after the other
+    days = asyncio.Queue()
+    # the day open for the player's actions (0 once they have ended it, or the server has closed it)
+    open_day = 0
+
+    async def send(message):
+        writer.write(encode(message))
+        await writer.drain()
+
+    # prompt the player for the actions of each day
+    async def prompt_days():
+        nonlocal open_day
+        while True:
+            message = await days.get()
+            day = message['day']
+            # the day closed before the previous prompt was answered
+            if day != open_day:
+                continue
+
+            state = message['account']
+            print(f'''
+Trading Day {day}
+-----------------''')
+            print(f"Today's market price of SDPA coin is {message['sdpa_price']} GBP")
+            print(f"Today's unit price of electricity is {message['elec_price']} GBP")
+            print(f"You have {message['deadline']} seconds to submit your actions.")
+            print(f"{name}'s current balance = {state['capital']} GBP; number of SDPA coins = "
+                  f"{state['sdpa_balance']}; number of ASIC = {state['machines']}; mining status = "
+                  f"({state['machine_status']}, {state['mining_type']}).")
+
+            # prompt the player until action 5 is chosen, or the day closes
+            while day == open_day:
+                action = await ask_later(loop, MENU, ask)
+                if day != open_day:
+                    print(f'Day {day} is closed: the action was not sent.')
+                    break
+                if action not in ['1', '2', '3', '4', '5']:
+                    print('Invalid input: To select the action, please enter 1, 2, 3, 4, or 5.')
+                    continue
+                if action == '5':
+                    open_day = 0
+                    await send({'type': 'end', 'day': day})
+                    print('Waiting for the other players...')
+                    break
+
+                param = None
+                if action in ('1', '2'):
+                    prompt = 'Enter number of ASIC machines to buy: ' if action == '1' else 'Enter the number of SDPA coins to be sold: '
+                    answer = await ask_later(loop, prompt, ask)
+                    if day != open_day:
+                        print(f'Day {day} is closed: the action was not sent.')
+                        break
+                    try:
+                        param = float(answer)
+                    except ValueError:
+                        print('Invalid input: Please provide the quantity as a number.')
+                        continue
+                    if param.is_integer():
+                        param = int(param)
+                await send({'type': 'action', 'day': day, 'action': int(action), 'param': param})
+
+    prompts = asyncio.create_task(prompt_days())
+    try:
+        await send({'type': 'join', 'name': name})
+
+        joined = False
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            message = json.loads(line)
+
+            if message['type'] == 'error':
+                print(message['message'])
+                # the join was rejected
+                if not joined:
+                    break
+
+            elif message['type'] == 'welcome':
+                joined = True
+                print(f"Joined as {message['name']} ({message['players']}/{message['n_players']} players). "
+                      f"Waiting for the other players...")
+
+            elif message['type'] == 'day':
+                open_day = message['day']
+                days.put_nowait(message)
+
+            elif message['type'] == 'day_closed':
+                # the player was still choosing their actions
+                if message['day'] == open_day:
+                    open_day = 0
+                    print(f"\nThe deadline has passed: day {message['day']} is closed for actions. "
+                          f"Press Enter to continue.")
+
+            elif message['type'] == 'summary':
+                state = message['account']
+                winner = message['winner']
+                print(f"Total number of ASIC machines: {message['total_machines']}")
+                print(f'{winner.capitalize()} wins PoW mining.')
+                for key, param in message['events']:
+                    print(f'    - {key}: {param}')
+                print(f"{name}'s balance = {state['capital']} GBP; number of SDPA coins = {state['sdpa_balance']}; "
+                      f"number of ASIC = {state['machines']}.")
+                if state['bankrupt']:
+                    print(f'{name} went bankrupt.')
+
+            elif message['type'] == 'end_of_run':
+                print('''
+Simulation Summary
+-----------------''')
+                sys.stdout.write(render_user_summary(message['result']))
+                break
+    finally:
+        prompts.cancel()
+        writer.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Play the SDPA coin mining game with several players.')
+    commands = parser.add_subparsers(dest = 'command', required = True)
+    serve_parser = commands.add_parser('serve', help = 'serve a game')
+    serve_parser.add_argument('--players', type = int, required = True, help = 'number of players')
+    serve_parser.add_argument('--days', type = int, default = 30, help = 'number of days (default: 30)')
+    serve_parser.add_argument('--deadline', type = float, default = 120.0, help = 'seconds per day (default: 120)')
+    play_parser = commands.add_parser('play', help = 'join a game as a player')
+    play_parser.add_argument('--name', required = True, help = 'player name')
+    for command_parser in (serve_parser, play_parser):
+        command_parser.add_argument('--host', default = '127.0.0.1', help = 'TCP host (default: 127.0.0.1)')
+        command_parser.add_argument('--port', type = int, default = 8765, help = 'TCP port (default: 8765)')
+        command_parser.add_argument('--unix', default = None, help = 'Unix socket path, instead of TCP')
+    cli_args = parser.parse_args()
+
+    if cli_args.command == 'serve':
+        GameServer(cli_args.players, cli_args.days, cli_args.host, cli_args.port, cli_args.unix, cli_args.deadline).run()
+    else:
+        play(cli_args.name, cli_args.host, cli_args.port, cli_args.unix)
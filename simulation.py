@@ -0,0 +1,931 @@
+# Georgius Benedikt Ermanta
+# Fintech
+# This module runs the blockchain mining simulation without any terminal interaction, so that many simulated days
+# can be run automatically (e.g. for strategy research).
+
+'''
+simulation.py
+-------------
+A module to run the blockchain mining simulation headlessly.
+
+This module defines the `Simulation` class. It performs the same day loop as `main.py` (price generation, user actions,
+electricity bill, prize distribution, and bankruptcy check), except that the users' actions are chosen by a decision
+policy instead of being queried with `input()`, and nothing is printed to the terminal (unless a `Reporter` from
+`reporting.py` is provided, which writes the summaries in large blocks, or streams them to a file). An
+`Instrumentation` from `instrumentation.py` can be provided to time the phases of each day and count the key events,
+and an `Exporter` from `export.py` to stream the results to columnar files as the simulation progresses.
+
+A decision policy is any callable with the signature,
+    policy(user, market_snapshot, current_day)
+which returns an iterable of `(action, param)` tuples, where `action` uses the same numbering as the action menu in
+`main.py` (1: Purchase mining machines, 2: Sell SDPA coins, 3: Switch ASIC on/off, 4: Switch solo/pooled mining,
+5: End action) and `param` is the quantity for actions 1 and 2 (ignored for actions 3 and 4). The quantities are
+numbers, so they are neither parsed nor re-prompted: an invalid quantity is simply skipped. Ready-made policies (bots)
+are defined in `strategies.py`.
+
+Classes
+-------
+MarketSnapshot
+    A named tuple holding the day's SDPA coin and electricity market prices.
+Simulation
+    A class to run the day loop of the simulation without terminal input/output.
+
+Functions
+---------
+passive_policy(user, market_snapshot, current_day)
+    A decision policy that never performs any action.
+next_decision_day(policy, current_day)
+    Returns the first day, from `current_day` on, on which a decision policy may perform an action.
+'''
+
+# import libraries and classes
+import heapq
+from bisect import bisect_left
+from collections import namedtuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from reporting import user_performance, PER_DAY
+from checkpoint import load_checkpoint
+
+# the day's market prices, as seen by the decision policies
+MarketSnapshot = namedtuple('MarketSnapshot', ['sdpa_price', 'elec_price'])
+
+# a policy that always chooses to end action
+def passive_policy(user, market_snapshot, current_day):
+    '''
+    A decision policy that never performs any action (i.e. always chooses Action 5).
+
+    Parameters
+    ----------
+    user : UserAccount
+        The user that is making the decision.
+    market_snapshot : MarketSnapshot
+        The day's SDPA coin and electricity market prices.
+    current_day : int
+        The current day.
+
+    Returns
+    -------
+    list
+        An empty list of actions.
+    '''
+
+    return []
+
+# the next day on which a policy may act
+def next_decision_day(policy, current_day):
+    '''
+    Returns the first day, from `current_day` on, on which a decision policy may perform an action. Policies tell
+    it with a `next_decision_day(day)` method (see `strategies.Strategy`); other callables may act on any day.
+
+    Parameters
+    ----------
+    policy : callable
+        The decision policy.
+    current_day : int
+        The current day.
+
+    Returns
+    -------
+    int
+        The first day on which the policy may act, or None if it never acts.
+    '''
+
+    if policy is passive_policy:
+        return None
+    method = getattr(policy, 'next_decision_day', None)
+    if method is None:
+        return current_day
+    return method(current_day)
+
+class Simulation:
+    '''
+    A class to run the blockchain mining simulation without terminal input/output.
+
+    The day loop mirrors the one in `main.py`. Each day, the decision policy of every operational user is called
+    and the returned actions are executed through `UserAccount.action_query`, without prompting.
+    ...
+
+    Attributes
+    ----------
+    market : Market
+        Generates the market price of SDPA coin and electricity.
+    blockchain : BlockChain
+        Determines the daily winners and stores the logs.
+    users : list
+        A list of `UserAccount` objects of all users.
+    oper_users : list
+        A list of `UserAccount` objects of users who are still operational (i.e. not bankrupt).
+    policies : dict
+        Stores the user names (keys) and their respective decision policies (values).
+    n_days : int
+        Number of days in the simulation.
+    current_day : int
+        The last completed day (0 before the simulation starts).
+    finished : bool
+        Whether the simulation has ended.
+    sdpa_prices : list
+        SDPA coin market price of each simulated day.
+    elec_prices : list
+        Per unit market price of electricity of each simulated day.
+    winners : list
+        The name of the winning player of each simulated day ('pooled' when the mining pool wins).
+
+    Methods
+    -------
+    step()
+        Simulates one day.
+    close_day(current_day, sdpa_price_tdy, elec_price_tdy, day_winner)
+        Checks for bankruptcy, and stores, exports and checkpoints the day.
+    fast_forward(n_days = None)
+        Simulates the coming days without any decision in whole-population array operations.
+    run(n_days = None, fast_forward = True)
+        Simulates the remaining days (or the next `n_days` days).
+    results(machine_price = None)
+        Computes the end of simulation performance of each user.
+    report()
+        Reports the end of simulation summary to the reporter.
+    save_checkpoint()
+        Writes a checkpoint of the simulation.
+    resume(path, policies = None, reporter = None, checkpointer = None, instrumentation = None, exporter = None)
+        Restores a simulation from a checkpoint file (class method).
+    '''
+
+    # smallest number of operational users for which `run` fast-forwards (below it, stepping day by day is faster)
+    fast_forward_min_users = 100
+    # largest fraction of the operational users whose policies may act on a fast-forwarded day
+    fast_forward_max_acting = 0.05
+
+    def __init__(self, market, blockchain, users, policies = None, base_pooled_mach = 1000, total_prize = 100, machine_price = None,
+                 log_backend = 'sparse', reporter = None, checkpointer = None, instrumentation = None, exporter = None):
+        '''
+        Parameters
+        ----------
+        market : Market
+            Generates the market price of SDPA coin and electricity.
+        blockchain : BlockChain
+            Determines the daily winners. Its `n_days` attribute sets the length of the simulation.
+        users : list
+            A list of `UserAccount` objects of all users. Their `verbose` attribute is switched off.
+        policies : callable or dict, optional
+            Either a single decision policy used by every user, or a dictionary of user names (keys) and their
+            respective decision policies (values). Users without a policy are passive (default is None, i.e. every
+            user is passive).
+        base_pooled_mach : int, optional
+            The base number of machines in the pool (default is 1000).
+        total_prize : int or float, optional
+            The total daily SDPA prize (default is 100).
+        machine_price : int or float, optional
+            The price of 1 ASIC machine, set on every user (default is None, i.e. each user keeps their own
+            `machine_price`, which is the only price used to buy and to value the machines).
+        log_backend : str or ActivityLog, optional
+            How the user activity log is stored, see `BlockChain.create_logs` (default is 'sparse').
+        reporter : Reporter, optional
+            Reports the daily and end of simulation summaries, see `reporting.py` (default is None, i.e. nothing is
+            reported).
+        checkpointer : Checkpointer, optional
+            Writes a checkpoint at the end of every `checkpointer.every` days, see `checkpoint.py` (default is None,
+            i.e. no checkpoints).
+        instrumentation : Instrumentation, optional
+            Times the phases of each day and counts the key events, see `instrumentation.py` (default is None, i.e.
+            the day loop is not instrumented).
+        exporter : Exporter, optional
+            Exports the events, prices and winner of each day, and the end state of the users, to columnar files, see
+            `export.py` (default is None, i.e. nothing is exported).
+        '''
+
+        # store the simulation components
+        self.market = market
+        self.blockchain = blockchain
+        self.users = list(users)
+        # number of days in the simulation
+        self.n_days = blockchain.n_days
+        # mining and machine parameters
+        self.base_pooled_mach = base_pooled_mach
+        self.total_prize = total_prize
+        if machine_price is not None:
+            for user in self.users:
+                user.machine_price = machine_price
+        # the summaries are only reported when a reporter is provided
+        self.reporter = reporter
+        self.reported = False
+        # periodic checkpoints
+        self.checkpointer = checkpointer
+        # phase timers and counters
+        self.instrumentation = instrumentation
+        # columnar export of the results
+        self.exporter = exporter
+
+        # assign a decision policy to every user
+        if policies is None:
+            policies = passive_policy
+        if callable(policies):
+            self.policies = {user.name: policies for user in self.users}
+        else:
+            self.policies = {user.name: policies.get(user.name, passive_policy) for user in self.users}
+
+        # silence the users and keep their initial capital for the investment return
+        self.initial_capital = {}
+        for user in self.users:
+            user.verbose = False
+            self.initial_capital[user.name] = user.capital
+
+        # create the logs
+        self.user_activity_log, self.bankruptcy_log = self.blockchain.create_logs(self.users, log_backend)
+
+        # list of operational (non-bankrupt) users
+        self.oper_users = self.users.copy()
+
+        # simulation progress
+        self.current_day = 0
+        self.finished = False
+
+        # daily history of the market prices and winners
+        self.sdpa_prices = []
+        self.elec_prices = []
+        self.winners = []
+
+    # simulate one day
+    def step(self):
+        '''
+        Simulates one day.
+
+        Generates the day's prices, executes the actions returned by each user's decision policy, charges the
+        electricity bill, determines the winner, and checks for bankruptcy.
+
+        Returns
+        -------
+        bool
+            True if the day has been simulated, False if the simulation has already ended (all days have been
+            simulated, the SDPA coin has been delisted, or all users are bankrupt).
+        '''
+
+        if self.finished or self.current_day >= self.n_days:
+            self.finished = True
+            return False
+
+        current_day = self.current_day + 1
+        instr = self.instrumentation
+        if instr is not None:
+            clock = instr.clock
+            instr.start_day(current_day)
+            instr.start('prices')
+
+        # SDPA price for the day
+        if current_day == 1:
+            sdpa_price_tdy = self.market.sdpa_price
+        else:
+            sdpa_price_tdy = self.market.new_sdpa_price()
+
+            # end the simulation when SDPA coin is delisted
+            if sdpa_price_tdy <= 0:
+                self.finished = True
+                if instr is not None:
+                    instr.stop('prices')
+                    instr.end_day(current_day)
+                return False
+
+        # electricity price for the day
+        elec_price_tdy = self.market.new_elec_price()
+        market_snapshot = MarketSnapshot(sdpa_price_tdy, elec_price_tdy)
+        if instr is not None:
+            instr.stop('prices')
+            # time spent on the actions and on the electricity bills, summed over the users
+            actions_seconds = 0.0
+            electricity_seconds = 0.0
+
+        log = self.user_activity_log
+        for user in self.oper_users:
+            if instr is not None:
+                action_start = clock()
+
+            # resets the tracker for daily machine purchases
+            user.reset_daily_machine_purchases()
+            # keep the user's view of the market up to date, even on days without any action
+            user.sdpa_price = sdpa_price_tdy
+            user.user_activity_log = log
+
+            # perform the actions chosen by the policy
+            for action, param in self.policies[user.name](user, market_snapshot, current_day):
+                if action == 5:
+                    break
+                user.action_query(action, sdpa_price_tdy, current_day, log, param)
+
+            if instr is not None:
+                bill_start = clock()
+                actions_seconds += bill_start - action_start
+
+            # electricity bill payment
+            user.electricity_bill(elec_price_tdy, current_day)
+
+            if instr is not None:
+                electricity_seconds += clock() - bill_start
+
+        if instr is not None:
+            instr.add_time('actions', actions_seconds)
+            instr.add_time('electricity', electricity_seconds)
+            instr.start('winner')
+
+        # determine the day's winners
+        day_winner = self.blockchain.winner(self.oper_users, current_day, self.base_pooled_mach, self.total_prize)
+
+        if instr is not None:
+            instr.stop('winner')
+            instr.count('winner_draws')
+            if day_winner == 'pooled':
+                instr.count('pool_wins')
+
+        # check for bankruptcy and store the day
+        self.close_day(current_day, sdpa_price_tdy, elec_price_tdy, day_winner)
+
+        return True
+
+    # end-of-day bookkeeping
+    def close_day(self, current_day, sdpa_price_tdy, elec_price_tdy, day_winner):
+        '''
+        Closes a day once the prizes have been distributed: reports the daily summary, checks for bankruptcy, stores
+        the day's history, exports the day, and writes a checkpoint when one is due.
+
+        Parameters
+        ----------
+        current_day : int
+            The day being closed.
+        sdpa_price_tdy : float
+            The day's SDPA coin market price.
+        elec_price_tdy : float
+            The day's per unit market price of electricity.
+        day_winner : str
+            The name of the day's winning player ('pooled' when the mining pool wins).
+        '''
+
+        instr = self.instrumentation
+
+        # report the daily summary (before the bankruptcy check, as in main.py)
+        if self.reporter is not None:
+            if instr is not None:
+                instr.start('summary')
+            self.reporter.day(current_day, sdpa_price_tdy, elec_price_tdy, day_winner, self.oper_users)
+            if instr is not None:
+                instr.stop('summary')
+
+        if instr is not None:
+            instr.start('bankruptcy')
+            # users with a negative capital either sell SDPA coins automatically or go bankrupt
+            n_negative = sum(1 for user in self.oper_users if user.capital < 0)
+            n_oper = len(self.oper_users)
+
+        # check for bankruptcy, then keep the operational users only
+        for user in self.oper_users:
+            user.bankrupt_check(current_day, self.bankruptcy_log)
+        self.oper_users = [user for user in self.oper_users if user.bankrupt_status == 'no']
+
+        if instr is not None:
+            instr.stop('bankruptcy')
+            n_bankrupt = n_oper - len(self.oper_users)
+            instr.count('bankruptcies', n_bankrupt)
+            instr.count('auto_sales', n_negative - n_bankrupt)
+
+        # store the day's history
+        self.sdpa_prices.append(sdpa_price_tdy)
+        self.elec_prices.append(elec_price_tdy)
+        self.winners.append(day_winner)
+        self.current_day = current_day
+
+        # export the day
+        if self.exporter is not None:
+            self.exporter.day(current_day, sdpa_price_tdy, elec_price_tdy, day_winner, self.user_activity_log)
+
+        # stop when all users are bankrupt
+        if not self.oper_users:
+            self.finished = True
+
+        # write a checkpoint of the completed day
+        if self.checkpointer is not None and self.checkpointer.due(current_day):
+            if instr is not None:
+                instr.start('checkpoint')
+            self.save_checkpoint()
+            if instr is not None:
+                instr.stop('checkpoint')
+
+        if instr is not None:
+            instr.end_day(current_day)
+
+    # simulate the coming days without any decision
+    def fast_forward(self, n_days = None):
+        '''
+        Simulates the coming days on which no decision policy acts, or only the policies of a few users (see
+        `next_decision_day`), up to `n_days` days, with the same results as `step`, day by day, but without going
+        through the users one by one.
+
+        While no user acts, the machines, machine status and mining type of every user are frozen, so the electricity
+        bills are array operations over the users whose machines are on, the winner is drawn from the cached mining
+        power index in O(log n) (with the same random numbers as `winner`), the pool payouts are computed once, and
+        the day's bills and prizes are recorded in blocks (`ActivityLog.record_many`). On a day on which the policies
+        of at most `fast_forward_max_acting` of the users may act, only these users' policies are called (in the
+        order of the users, with their bills recorded in between as in `step`), and the arrays are updated for the
+        users whose state changed. The fast-forward stops,
+        - before the first day on which the policies of more users may act,
+        - after the first day on which a user goes bankrupt (the users whose capital is negative are checked as in
+          `step`, and the automatic sales of SDPA coins do not stop the fast-forward),
+        - after a day on which a checkpoint is due (and written),
+        - when the SDPA coin is delisted or the simulation ends.
+        Nothing is fast-forwarded while the reporter reports daily summaries.
+
+        Parameters
+        ----------
+        n_days : int, optional
+            The maximum number of days to simulate (default is None, i.e. until the fast-forward stops).
+
+        Returns
+        -------
+        int
+            The number of days simulated (0 if the next day has to be simulated with `step`).
+
+        Raises
+        ------
+        ImportError
+            If NumPy is not installed.
+        '''
+
+        if np is None:
+            raise ImportError('NumPy is required to fast-forward the simulation.')
+
+        # the days that may be fast-forwarded
+        first_day = self.current_day + 1
+        last_day = self.n_days if n_days is None else min(self.n_days, self.current_day + n_days)
+        if self.finished or first_day > last_day or not self.oper_users:
+            return 0
+        if self.reporter is not None and self.reporter.level >= PER_DAY:
+            return 0
+
+        # the users of each policy (with their positions), and the days on which the policies act
+        users = self.oper_users
+        policy_users = {}
+        for position, user in enumerate(users):
+            policy = self.policies[user.name]
+            entry = policy_users.get(id(policy))
+            if entry is None:
+                entry = policy_users[id(policy)] = (policy, [])
+            entry[1].append((position, user))
+        max_acting = int(len(users) * self.fast_forward_max_acting)
+        decision_days = []
+        for policy_id, (policy, acting_users) in policy_users.items():
+            decision_day = next_decision_day(policy, first_day)
+            if decision_day is None:
+                continue
+            # stop before the first day on which a policy of too many users may act
+            if len(acting_users) > max_acting:
+                last_day = min(last_day, decision_day - 1)
+            else:
+                decision_days.append((decision_day, policy_id))
+        heapq.heapify(decision_days)
+        # stop before the first day on which too many users may act
+        n_acting = sum(len(policy_users[policy_id][1]) for day, policy_id in decision_days if day == first_day)
+        if first_day > last_day or n_acting > max_acting:
+            return 0
+        # the mining power index is built after the day's actions (as in `BlockChain.winner`)
+        if self.blockchain.mining_index is None and n_acting:
+            return 0
+
+        instr = self.instrumentation
+        if instr is not None:
+            block_start = instr.clock()
+
+        # the users whose machines are on (the only ones that are billed and can win)
+        market = self.market
+        blockchain = self.blockchain
+        log = self.user_activity_log
+        if blockchain.mining_index is None:
+            blockchain.build_index(users)
+        index = blockchain.mining_index
+        active_positions = [position for position, user in enumerate(users) if user.machine_status == 'on']
+        active = [users[position] for position in active_positions]
+        active_names = [user.name for user in active]
+        machines = np.array([user.machines for user in active])
+        capital = np.array([user.capital for user in active], dtype = float)
+        electricity_paid = np.array([user.electricity_paid for user in active], dtype = float)
+
+        # the pool members and their payouts (as in `MiningPowerIndex.pool_payout`)
+        pool = list(index.pool_members.values())
+        pool_names = [user.name for user in pool]
+        pool_machines = np.array([user.machines for user in pool])
+        pool_payout = pool_machines / (self.base_pooled_mach + index.pooled_machines) * self.total_prize
+        pool_payout_list = pool_payout.tolist()
+        sdpa_balance = np.array([user.sdpa_balance for user in pool], dtype = float)
+        coins_mined = np.array([user.coins_mined for user in pool], dtype = float)
+        pool_rewarded = False
+        pool_positions = {user.name: position for position, user in enumerate(pool)}
+
+        n_simulated = 0
+        bills = None
+        # the winner of the last simulated day
+        last_winner = None
+        # automatic sales of SDPA coins on the last simulated day
+        day_sales = []
+        # the users who acted on the last simulated day
+        acted = set()
+        bankrupt = False
+        checkpoint_due = False
+        for current_day in range(first_day, last_day + 1):
+            # the users whose policies may act today, in order (stop before the day if there are too many)
+            acting = None
+            if decision_days and decision_days[0][0] == current_day:
+                deciding = []
+                while decision_days and decision_days[0][0] == current_day:
+                    deciding.append(heapq.heappop(decision_days)[1])
+                acting = sorted((entry for policy_id in deciding for entry in policy_users[policy_id][1]),
+                                key = lambda entry: entry[0])
+                if len(acting) > max_acting:
+                    break
+            acted = set()
+
+            if instr is not None:
+                instr.start_day(current_day)
+
+            # SDPA price for the day
+            if current_day == 1:
+                sdpa_price_tdy = market.sdpa_price
+            else:
+                sdpa_price_tdy = market.new_sdpa_price()
+
+                # end the simulation when SDPA coin is delisted
+                if sdpa_price_tdy <= 0:
+                    self.finished = True
+                    if instr is not None:
+                        instr.end_day(current_day)
+                    break
+
+            # electricity price for the day
+            elec_price_tdy = market.new_elec_price()
+
+            # the actions of the acting users, between the bills of the users before and after them (as in `step`)
+            recorded = 0
+            if acting is not None:
+                market_snapshot = MarketSnapshot(sdpa_price_tdy, elec_price_tdy)
+                for position, user in acting:
+                    # record the bills of the active users before the acting user
+                    split = bisect_left(active_positions, position)
+                    if split > recorded:
+                        log.record_many(active_names[recorded:split], current_day, 'Electricity',
+                                        (machines[recorded:split] * elec_price_tdy).tolist())
+                        recorded = split
+                    was_active = split < len(active_positions) and active_positions[split] == position
+                    pool_position = pool_positions.get(user.name)
+
+                    # the user's state as it would be after `step` on the previous day
+                    if was_active and n_simulated:
+                        user.capital = capital[split].item()
+                        user.electricity_paid = electricity_paid[split].item()
+                        user.total_bill = bills[split].item()
+                    if pool_position is not None and pool_rewarded:
+                        user.sdpa_balance = sdpa_balance[pool_position].item()
+                        user.coins_mined = coins_mined[pool_position].item()
+                    user.reset_daily_machine_purchases()
+                    user.sdpa_price = sdpa_price_tdy
+                    user.user_activity_log = log
+
+                    # perform the actions chosen by the policy
+                    for action, param in self.policies[user.name](user, market_snapshot, current_day):
+                        if action == 5:
+                            break
+                        user.action_query(action, sdpa_price_tdy, current_day, log, param)
+                    acted.add(user.name)
+
+                    # update the arrays of the users whose machines are on
+                    is_active = user.machine_status == 'on'
+                    if was_active and is_active:
+                        machines[split] = user.machines
+                        capital[split] = user.capital
+                    elif was_active:
+                        del active_positions[split], active[split], active_names[split]
+                        machines = np.delete(machines, split)
+                        capital = np.delete(capital, split)
+                        electricity_paid = np.delete(electricity_paid, split)
+                        if bills is not None:
+                            bills = np.delete(bills, split)
+                    elif is_active:
+                        active_positions.insert(split, position)
+                        active.insert(split, user)
+                        active_names.insert(split, user.name)
+                        machines = np.insert(machines, split, user.machines)
+                        capital = np.insert(capital, split, user.capital)
+                        electricity_paid = np.insert(electricity_paid, split, user.electricity_paid)
+                        if bills is not None:
+                            bills = np.insert(bills, split, 0.0)
+
+                    # update the pool members and their payouts
+                    is_member = user.name in index.pool_members
+                    if pool_position is not None and is_member:
+                        sdpa_balance[pool_position] = user.sdpa_balance
+                        pool_machines[pool_position] = user.machines
+                    elif is_member:
+                        # a new member is listed last (as in `MiningPowerIndex.pool_members`)
+                        pool_positions[user.name] = len(pool)
+                        pool.append(user)
+                        pool_names.append(user.name)
+                        pool_machines = np.append(pool_machines, user.machines)
+                        sdpa_balance = np.append(sdpa_balance, user.sdpa_balance)
+                        coins_mined = np.append(coins_mined, user.coins_mined)
+                    elif pool_position is not None:
+                        # a former member keeps their state
+                        del pool[pool_position], pool_names[pool_position]
+                        pool_machines = np.delete(pool_machines, pool_position)
+                        sdpa_balance = np.delete(sdpa_balance, pool_position)
+                        coins_mined = np.delete(coins_mined, pool_position)
+                        pool_positions = dict(zip(pool_names, range(len(pool_names))))
+                    if pool_position is not None or is_member:
+                        pool_payout = pool_machines / (self.base_pooled_mach + index.pooled_machines) * self.total_prize
+                        pool_payout_list = pool_payout.tolist()
+
+                # the policies act again on their next decision day
+                for policy_id in deciding:
+                    decision_day = next_decision_day(policy_users[policy_id][0], current_day + 1)
+                    if decision_day is not None and decision_day <= last_day:
+                        heapq.heappush(decision_days, (decision_day, policy_id))
+
+            # electricity bills
+            bills = machines * elec_price_tdy
+            capital -= bills
+            electricity_paid += bills
+            if recorded:
+                log.record_many(active_names[recorded:], current_day, 'Electricity', bills[recorded:].tolist())
+            else:
+                log.record_many(active_names, current_day, 'Electricity', bills.tolist())
+
+            # determine the day's winners (a solo miner is never a pool member, so the arrays stay up to date)
+            last_winner = blockchain.draw_winner(users, self.base_pooled_mach)
+            if last_winner == 'pooled':
+                sdpa_balance += pool_payout
+                coins_mined += pool_payout
+                pool_rewarded = True
+                log.record_many(pool_names, current_day, 'Prize', pool_payout_list)
+                day_winner = last_winner
+            else:
+                last_winner.receive_prize(self.total_prize)
+                log.record(last_winner.name, current_day, 'Prize', self.total_prize)
+                day_winner = last_winner.name
+            last_sdpa_price = sdpa_price_tdy
+            n_simulated += 1
+
+            if instr is not None:
+                instr.count('winner_draws')
+                if day_winner == 'pooled':
+                    instr.count('pool_wins')
+
+            # check for bankruptcy (only users with a negative capital sell SDPA coins or go bankrupt)
+            day_sales = []
+            if capital.min(initial = 0) < 0:
+                for position in np.flatnonzero(capital < 0).tolist():
+                    user = active[position]
+                    pool_position = pool_positions.get(user.name)
+                    # the user's state as it would be after `step`
+                    user.capital = capital[position].item()
+                    if pool_position is not None:
+                        user.sdpa_balance = sdpa_balance[pool_position].item()
+                    user.sdpa_price = sdpa_price_tdy
+                    user.user_activity_log = log
+                    if user.name not in acted:
+                        user.day_coins_sold = 0
+                    user.bankrupt_check(current_day, self.bankruptcy_log)
+
+                    if user.bankrupt_status == 'yes':
+                        bankrupt = True
+                        if instr is not None:
+                            instr.count('bankruptcies')
+                    else:
+                        # read back the automatic sale
+                        capital[position] = user.capital
+                        if pool_position is not None:
+                            sdpa_balance[pool_position] = user.sdpa_balance
+                        day_sales.append((user, user.day_coins_sold))
+                        if instr is not None:
+                            instr.count('auto_sales')
+
+            # store the day's history
+            self.sdpa_prices.append(sdpa_price_tdy)
+            self.elec_prices.append(elec_price_tdy)
+            self.winners.append(day_winner)
+            self.current_day = current_day
+            if self.exporter is not None:
+                self.exporter.day(current_day, sdpa_price_tdy, elec_price_tdy, day_winner, self.user_activity_log)
+
+            if instr is not None:
+                instr.end_day(current_day)
+
+            # stop after a bankruptcy, since the mining power changed
+            if bankrupt:
+                self.oper_users = [user for user in users if user.bankrupt_status == 'no']
+                if not self.oper_users:
+                    self.finished = True
+
+            # stop to write a checkpoint
+            if self.checkpointer is not None and self.checkpointer.due(current_day):
+                checkpoint_due = True
+                break
+            if bankrupt:
+                break
+
+        # write the users' state back, with the daily totals of the last simulated day
+        if n_simulated:
+            for user in users:
+                # the users who acted on the last day have already been reset
+                if user.name not in acted:
+                    user.reset_daily_machine_purchases()
+                user.sdpa_price = last_sdpa_price
+                user.user_activity_log = log
+            for position, user in enumerate(active):
+                user.capital = capital[position].item()
+                user.electricity_paid = electricity_paid[position].item()
+                user.total_bill = user.day_electricity = bills[position].item()
+            if pool_rewarded:
+                for position, user in enumerate(pool):
+                    user.sdpa_balance = sdpa_balance[position].item()
+                    user.coins_mined = coins_mined[position].item()
+            if last_winner == 'pooled':
+                for position, user in enumerate(pool):
+                    user.day_mined = pool_payout_list[position]
+            else:
+                last_winner.day_mined = self.total_prize
+            for user, coins_sold in day_sales:
+                user.day_coins_sold = coins_sold
+
+        if instr is not None:
+            instr.add_time('fast_forward', instr.clock() - block_start)
+
+        # write a checkpoint of the last day
+        if checkpoint_due:
+            self.save_checkpoint()
+
+        return n_simulated
+
+    # simulate several days
+    def run(self, n_days = None, fast_forward = True):
+        '''
+        Simulates the remaining days of the simulation, or only the next `n_days` days.
+        Once the simulation has ended, the end of simulation summary is reported (see `report`).
+
+        Parameters
+        ----------
+        n_days : int, optional
+            The number of days to simulate (default is None, i.e. until the simulation ends).
+        fast_forward : bool, optional
+            Whether the days on which no policy acts are simulated with `fast_forward` (default is True; ignored
+            when NumPy is not installed or with fewer than `fast_forward_min_users` operational users). The results
+            are the same either way.
+
+        Returns
+        -------
+        Simulation
+            The simulation itself, to allow chaining (e.g. `Simulation(...).run().results()`).
+        '''
+
+        days_left = n_days
+        while days_left is None or days_left > 0:
+            # fast-forward the days without any decision
+            if fast_forward and np is not None and len(self.oper_users) >= self.fast_forward_min_users:
+                n_simulated = self.fast_forward(days_left)
+                if n_simulated:
+                    if days_left is not None:
+                        days_left -= n_simulated
+                    continue
+            if not self.step():
+                break
+            if days_left is not None:
+                days_left -= 1
+
+        # report once all days have been simulated
+        if self.finished or self.current_day >= self.n_days:
+            self.report()
+            # stop profiling and tracing, even if their ranges extend beyond the last day
+            if self.instrumentation is not None:
+                self.instrumentation.finish()
+
+        return self
+
+    # compute the end of simulation performance
+    def results(self, machine_price = None):
+        '''
+        Computes the end of simulation performance of each user, as printed by `print_user_summary` in `main.py`.
+
+        Parameters
+        ----------
+        machine_price : int or float, optional
+            The price of 1 ASIC machine used to value the machines (default is None, i.e. each user's
+            `machine_price`).
+
+        Returns
+        -------
+        list
+            A list of dictionaries, one per user, with the keys: 'name', 'bankrupt', 'bankrupt_day', 'capital',
+            'sdpa_balance', 'sdpa_value', 'machines', 'total_assets', 'investment_return', 'investment_return_pct',
+            'total_mined', 'mining_performance', 'total_bill', 'machines_bought', 'coins_sold' and 'sales_proceeds'
+            (see `reporting.user_performance`). For bankrupt users, the total assets value is 0 and the investment
+            return is -100%. The totals are read from the users' running totals, so the activity log is not scanned.
+        '''
+
+        # SDPA price on the last simulated day
+        sdpa_price_tdy = self.sdpa_prices[-1] if self.sdpa_prices else self.market.sdpa_price
+        # total coins mined by everyone during the simulation
+        total_mined_coins = self.total_prize * self.current_day
+
+        return [user_performance(user, sdpa_price_tdy, total_mined_coins, self.initial_capital[user.name],
+                                 self.bankruptcy_log.get(user.name), machine_price) for user in self.users]
+
+    # report the end of simulation summary
+    def report(self):
+        '''
+        Reports the end of simulation summary of each user to the reporter, and flushes it, and exports the end state
+        of the users to the exporter. The summary is only reported once; nothing happens without a reporter or an
+        exporter.
+        '''
+
+        if (self.reporter is None and self.exporter is None) or self.reported:
+            return
+
+        results = self.results()
+        if self.reporter is not None:
+            self.reporter.end_of_run(results)
+        if self.exporter is not None:
+            self.exporter.end_of_run(results)
+        self.reported = True
+
+    # write a checkpoint
+    def save_checkpoint(self):
+        '''
+        Writes a checkpoint of the simulation (see `Checkpointer.save`), from which it can be resumed with `resume`.
+        The decision policies and the reporter are not part of the checkpoint.
+
+        Raises
+        ------
+        ValueError
+            If the simulation has no checkpointer.
+        '''
+
+        if self.checkpointer is None:
+            raise ValueError('No checkpointer: Please provide a Checkpointer to save the simulation.')
+
+        extra = {
+            'base_pooled_mach': self.base_pooled_mach,
+            'total_prize': self.total_prize,
+            'initial_capital': self.initial_capital,
+            'finished': self.finished,
+        }
+        history = {'sdpa_prices': self.sdpa_prices, 'elec_prices': self.elec_prices, 'winners': self.winners}
+        self.checkpointer.save(self.current_day, self.market, self.blockchain, self.users, self.oper_users, extra, history)
+
+    # restore a simulation
+    @classmethod
+    def resume(cls, path, policies = None, reporter = None, checkpointer = None, instrumentation = None, exporter = None):
+        '''
+        Restores a simulation from a checkpoint file written by `save_checkpoint`. The simulation continues exactly
+        as it would have without interruption (including the random draws of the market and the blockchain), provided
+        that the same decision policies are given.
+
+        Parameters
+        ----------
+        path : str
+            The checkpoint file.
+        policies : callable or dict, optional
+            The decision policies of the users, see `__init__` (default is None, i.e. every user is passive).
+        reporter : Reporter, optional
+            Reports the summaries of the remaining days (default is None).
+        checkpointer : Checkpointer, optional
+            Writes the checkpoints of the remaining days (default is None).
+        instrumentation : Instrumentation, optional
+            Instruments the remaining days (default is None).
+        exporter : Exporter, optional
+            Exports the remaining days and the end state of the users (default is None).
+
+        Returns
+        -------
+        Simulation
+            The restored simulation.
+        '''
+
+        state = load_checkpoint(path)
+        extra = state['extra']
+
+        # the restored log is used as is
+        sim = cls(state['market'], state['blockchain'], state['users'], policies, extra['base_pooled_mach'],
+                  extra['total_prize'], None, state['user_activity_log'], reporter, checkpointer,
+                  instrumentation, exporter)
+
+        # restore the progress of the simulation
+        sim.bankruptcy_log.update(state['bankruptcy_log'])
+        sim.oper_users = state['oper_users']
+        sim.initial_capital = extra['initial_capital']
+        sim.current_day = state['current_day']
+        sim.finished = extra['finished']
+        sim.sdpa_prices = state['history']['sdpa_prices']
+        sim.elec_prices = state['history']['elec_prices']
+        sim.winners = state['history']['winners']
+
+        # continue the export of the days before the checkpoint
+        if exporter is not None:
+            exporter.resume(sim.current_day, sim.user_activity_log)
+
+        return sim
@@ -0,0 +1,396 @@
+# Georgius Benedikt Ermanta
+# Fintech
+# This module defines automated strategies (bots) that choose the users' daily actions, replacing the interactive
+# action menu of main.py in headless simulations.
+
+'''
+strategies.py
+-------------
+A module of automated strategies for the blockchain mining simulation.
+
+A strategy decides which actions a user performs on a given day. It implements
+    decide(user_state, market_snapshot, day) -> list of (action, param)
+    next_decision_day(day) -> the first day from `day` on which it may perform an action (None if never)
+where `user_state` is the user (a `UserAccount`, or any object with the same attributes, e.g. a `PopulationMember`),
+`market_snapshot` holds the day's prices (`simulation.MarketSnapshot`), and each action is a tuple of the action
+number of the menu in `main.py` and its quantity (see the action constants below). Strategies are callable, so they can
+be used directly as the decision policies of a `Simulation`. The quantities are passed as numbers, so the engine does
+not parse strings or loop until a valid input is provided; a rejected quantity is simply skipped. `next_decision_day`
+tells the simulation which days are free of decisions, so that they can be fast-forwarded (see
+`Simulation.fast_forward`).
+
+Constants
+---------
+BUY_MACHINES, SELL_SDPA, SWITCH_MACHINES, SWITCH_MINING_TYPE, END_ACTION
+    The action numbers (1 to 5).
+
+Classes
+-------
+Strategy
+    The base class of the strategies (never performs any action).
+BuyAndHold
+    Buys machines up to a target, keeps them on and never sells.
+ThresholdSeller
+    Sells SDPA coins whenever the coin price reaches a threshold.
+ElectricityAware
+    Turns the machines on when electricity is cheap and off when it is expensive.
+PoolSwitcher
+    Mines in the pool while the user's mining power is small, and solo once it is large.
+ExpectedProfit
+    Chooses the machine status and mining type with the best risk-adjusted expected daily profit.
+Combined
+    Performs the actions of several strategies, in order.
+Periodic
+    Performs the actions of a strategy on scheduled days only (e.g. once a week).
+Staggered
+    Performs the actions of a strategy at a time of the day of its own for each user (see `scheduler.py`).
+'''
+
+# import functions
+from rewards import what_if
+from seeding import derive_seed
+
+# action numbers, as in the action menu of main.py
+BUY_MACHINES = 1
+SELL_SDPA = 2
+SWITCH_MACHINES = 3
+SWITCH_MINING_TYPE = 4
+END_ACTION = 5
+
+class Strategy:
+    '''
+    The base class of the strategies. It never performs any action.
+
+    Methods
+    -------
+    decide(user_state, market_snapshot, day)
+        Returns the actions the user performs on the day.
+    next_decision_day(day)
+        Returns the first day, from `day` on, on which the strategy may perform an action.
+    '''
+
+    def decide(self, user_state, market_snapshot, day):
+        '''
+        Returns the actions the user performs on the day.
+
+        Parameters
+        ----------
+        user_state : UserAccount
+            The user (or any object with the same attributes).
+        market_snapshot : MarketSnapshot
+            The day's SDPA coin and electricity market prices.
+        day : int
+            The current day.
+
+        Returns
+        -------
+        list
+            A list of `(action, param)` tuples.
+        '''
+
+        return []
+
+    def next_decision_day(self, day):
+        '''
+        Returns the first day, from `day` on, on which the strategy may perform an action. Strategies that decide
+        based on the day's prices may act on any day, so `day` itself is returned, unless the strategy never acts.
+
+        Parameters
+        ----------
+        day : int
+            The current day.
+
+        Returns
+        -------
+        int
+            The first day on which the strategy may act, or None if it never acts.
+        '''
+
+        # the base strategy never acts
+        if type(self).decide is Strategy.decide:
+            return None
+        return day
+
+    # strategies are decision policies of `Simulation`
+    def __call__(self, user_state, market_snapshot, day):
+        return self.decide(user_state, market_snapshot, day)
+
+    def __repr__(self):
+        params = ', '.join(f'{key}={value!r}' for key, value in vars(self).items())
+        return f'{type(self).__name__}({params})'
+
+class BuyAndHold(Strategy):
+    '''
+    Buys machines (within the daily limit and the available capital) until the user owns `target_machines`,
+    keeps the machines on with the chosen mining type, and never sells SDPA coins.
+
+    Attributes
+    ----------
+    target_machines : int
+        The number of machines to own.
+    mining_type : str
+        The mining type to use ('solo' or 'pooled').
+    machine_price : int or float
+        The price of 1 ASIC machine (None for the user's `machine_price`).
+    daily_limit : int
+        The maximum number of machines purchased per day (None for the user's `daily_machine_limit`).
+    '''
+
+    def __init__(self, target_machines = 50, mining_type = 'solo', machine_price = None, daily_limit = None):
+        self.target_machines = target_machines
+        self.mining_type = mining_type
+        self.machine_price = machine_price
+        self.daily_limit = daily_limit
+
+    def decide(self, user_state, market_snapshot, day):
+        actions = []
+
+        # buy as many machines as allowed, up to the target
+        machine_price = self.machine_price if self.machine_price is not None else user_state.machine_price
+        daily_limit = self.daily_limit if self.daily_limit is not None else user_state.daily_machine_limit
+        n_machines = min(self.target_machines - user_state.machines, daily_limit - user_state.day_machines,
+                         int(user_state.capital // machine_price))
+        if n_machines > 0:
+            actions.append((BUY_MACHINES, n_machines))
+
+        # keep the machines on, with the chosen mining type
+        if user_state.machines + max(n_machines, 0) > 0:
+            if user_state.machine_status == 'off':
+                actions.append((SWITCH_MACHINES, None))
+            if user_state.mining_type != self.mining_type:
+                actions.append((SWITCH_MINING_TYPE, None))
+
+        return actions
+
+class ThresholdSeller(Strategy):
+    '''
+    Sells a fraction of the SDPA coins owned whenever the coin price is at or above a threshold.
+
+    Attributes
+    ----------
+    sell_price : float
+        The SDPA coin price at which coins are sold.
+    fraction : float
+        The fraction of the SDPA coin balance sold.
+    '''
+
+    def __init__(self, sell_price = 60, fraction = 1.0):
+        self.sell_price = sell_price
+        self.fraction = fraction
+
+    def decide(self, user_state, market_snapshot, day):
+        if market_snapshot.sdpa_price >= self.sell_price and user_state.sdpa_balance > 0:
+            return [(SELL_SDPA, user_state.sdpa_balance * self.fraction)]
+        return []
+
+class ElectricityAware(Strategy):
+    '''
+    Turns the machines on when the price of electricity is at or below `max_elec_price`, and off when it is above.
+
+    Attributes
+    ----------
+    max_elec_price : float
+        The highest price of electricity at which the machines run.
+    '''
+
+    def __init__(self, max_elec_price = 2.5):
+        self.max_elec_price = max_elec_price
+
+    def decide(self, user_state, market_snapshot, day):
+        if user_state.machines == 0:
+            return []
+        run = market_snapshot.elec_price <= self.max_elec_price
+        if run != (user_state.machine_status == 'on'):
+            return [(SWITCH_MACHINES, None)]
+        return []
+
+class PoolSwitcher(Strategy):
+    '''
+    Mines in the pool while the user owns fewer than `min_solo_machines` machines (steady, small prizes), and
+    mines solo once they own at least `min_solo_machines` machines (occasional, full prizes).
+
+    Attributes
+    ----------
+    min_solo_machines : int
+        The number of machines from which the user mines solo.
+    '''
+
+    def __init__(self, min_solo_machines = 100):
+        self.min_solo_machines = min_solo_machines
+
+    def decide(self, user_state, market_snapshot, day):
+        if user_state.machines == 0:
+            return []
+        mining_type = 'solo' if user_state.machines >= self.min_solo_machines else 'pooled'
+        if user_state.mining_type != mining_type:
+            return [(SWITCH_MINING_TYPE, None)]
+        return []
+
+class ExpectedProfit(Strategy):
+    '''
+    Chooses, among the 4 combinations of machine status (on/off) and mining type (solo/pooled), the one with the best
+    risk-adjusted expected daily profit,
+        mean prize x SDPA price - electricity bill - risk_aversion x variance of the prize x SDPA price^2
+    where the mean and variance of the prize are exact (see `rewards.what_if`), given the other users' current mining
+    power. The current configuration is kept unless another one is strictly better. Since the mean prize does not
+    depend on the mining type, a risk-averse user (`risk_aversion` > 0) picks the mining type with the smaller variance.
+    The mining power is read from the user's mining power index, so users without an index perform no action.
+
+    Attributes
+    ----------
+    risk_aversion : float
+        The penalty per unit of variance of the daily prize (in GBP^2).
+    base_pooled_mach : int
+        The base number of machines in the pool.
+    total_prize : int or float
+        The total daily SDPA prize.
+    '''
+
+    def __init__(self, risk_aversion = 0.0, base_pooled_mach = 1000, total_prize = 100):
+        self.risk_aversion = risk_aversion
+        self.base_pooled_mach = base_pooled_mach
+        self.total_prize = total_prize
+
+    def decide(self, user_state, market_snapshot, day):
+        index = getattr(user_state, 'mining_index', None)
+        if user_state.machines == 0 or index is None:
+            return []
+
+        # current mining power of the pool and of the solo miners
+        pool_power = self.base_pooled_mach + index.pooled_machines
+        solo_power = index.solo_machines
+        sdpa_price = market_snapshot.sdpa_price
+
+        # risk-adjusted expected profit of each configuration (the current one first, so that it wins ties)
+        current = (user_state.machine_status, user_state.mining_type)
+        best, best_value = None, None
+        options = [current] + [(status, mining_type) for status in ('on', 'off') for mining_type in ('solo', 'pooled')
+                               if (status, mining_type) != current]
+        for status, mining_type in options:
+            mean, variance = what_if(user_state, user_state.machines, status, mining_type, pool_power, solo_power,
+                                     self.total_prize)
+            bill = user_state.machines * market_snapshot.elec_price if status == 'on' else 0
+            value = mean * sdpa_price - bill - self.risk_aversion * variance * sdpa_price * sdpa_price
+            if best_value is None or value > best_value:
+                best, best_value = (status, mining_type), value
+
+        actions = []
+        if best[0] != current[0]:
+            actions.append((SWITCH_MACHINES, None))
+        if best[1] != current[1]:
+            actions.append((SWITCH_MINING_TYPE, None))
+        return actions
+
+class Combined(Strategy):
+    '''
+    Performs the actions of several strategies, in order (e.g. `Combined(BuyAndHold(), ThresholdSeller())`).
+    Each strategy decides based on the user's state at the start of the day.
+
+    Attributes
+    ----------
+    strategies : tuple
+        The strategies.
+    '''
+
+    def __init__(self, *strategies):
+        self.strategies = strategies
+
+    def decide(self, user_state, market_snapshot, day):
+        actions = []
+        for strategy in self.strategies:
+            actions.extend(strategy.decide(user_state, market_snapshot, day))
+        return actions
+
+    def next_decision_day(self, day):
+        days = [strategy.next_decision_day(day) for strategy in self.strategies]
+        days = [decision_day for decision_day in days if decision_day is not None]
+        return min(days) if days else None
+
+class Periodic(Strategy):
+    '''
+    Performs the actions of a strategy on scheduled days only, i.e. every `every` days starting from day `first_day`
+    (e.g. `Periodic(ThresholdSeller(), 7)` reviews the coins once a week). The days in between are free of decisions,
+    so they can be fast-forwarded.
+
+    Attributes
+    ----------
+    strategy : Strategy
+        The strategy performed on the scheduled days.
+    every : int
+        The number of days between scheduled days.
+    first_day : int
+        The first scheduled day.
+    '''
+
+    def __init__(self, strategy, every = 7, first_day = 1):
+        if every < 1:
+            raise ValueError(f'Invalid schedule: every must be at least 1, got {every}.')
+        self.strategy = strategy
+        self.every = every
+        self.first_day = first_day
+
+    def decide(self, user_state, market_snapshot, day):
+        if day < self.first_day or (day - self.first_day) % self.every != 0:
+            return []
+        return self.strategy.decide(user_state, market_snapshot, day)
+
+    def next_decision_day(self, day):
+        # the next scheduled day
+        if day <= self.first_day:
+            scheduled = self.first_day
+        else:
+            scheduled = day + (-(day - self.first_day)) % self.every
+        # the first scheduled day on which the strategy may act
+        while True:
+            decision_day = self.strategy.next_decision_day(scheduled)
+            if decision_day is None:
+                return None
+            if decision_day == scheduled:
+                return scheduled
+            scheduled = decision_day + (-(decision_day - self.first_day)) % self.every
+
+class Staggered(Strategy):
+    '''
+    Performs the actions of a strategy at a time of the day of its own for each user and day, for the simulations with
+    several mining rounds per day (see `scheduler.EventSimulation`). The time is either fixed, or a uniform draw in
+    [0, 1) seeded by `seed`, the user name and the day, so that the users act throughout the day, in the same order
+    in every run. It must be the outermost strategy (e.g. `Staggered(Periodic(ThresholdSeller(), 7))`).
+
+    Attributes
+    ----------
+    strategy : Strategy
+        The strategy performed.
+    time : float
+        The time of the day at which every user decides, as a fraction of the day (None for random times).
+    seed : int
+        The seed of the random times.
+    '''
+
+    def __init__(self, strategy, time = None, seed = 0):
+        if time is not None and not 0 <= time < 1:
+            raise ValueError(f'Invalid time: time must be in [0, 1), got {time}.')
+        self.strategy = strategy
+        self.time = time
+        self.seed = seed
+
+    def decide(self, user_state, market_snapshot, day):
+        return self.strategy.decide(user_state, market_snapshot, day)
+
+    def next_decision_day(self, day):
+        return self.strategy.next_decision_day(day)
+
+    def decision_time(self, user_state, day):
+        if self.time is not None:
+            return self.time
+        # the 128-bit derived seed, as a fraction of its range
+        return derive_seed(self.seed, user_state.name, day) / 2 ** 128
+
+# strategies available by name (e.g. on the command line)
+STRATEGIES = {
+    'passive': Strategy,
+    'buy-and-hold': BuyAndHold,
+    'threshold-seller': ThresholdSeller,
+    'electricity-aware': ElectricityAware,
+    'pool-switcher': PoolSwitcher,
+    'expected-profit': ExpectedProfit,
+}
@@ -0,0 +1,500 @@
+# Georgius Benedikt Ermanta
+# Fintech
+# This module explores a grid (or a Latin hypercube) of the economic parameters of the blockchain mining game with
+# parallel Monte Carlo simulations, and writes a table of the results of each parameter set.
+
+'''
+sweep.py
+--------
+A module to tune the economy of the blockchain mining game by parameter sweeps.
+
+Each point of a sweep is a `GameConfig` (see `config.py`), i.e. the default parameters of the game with some of them
+changed. The points are either the grid of all the combinations of a few values of each parameter (see `grid`), or a
+Latin hypercube sample of ranges of the parameters (see `latin_hypercube`), which covers many parameters with few
+points. Every point is simulated with the same seeded runs, as in `montecarlo.py`, so the points are compared under
+the same market and mining luck (common random numbers). The points that share the market parameters also share the
+price paths of each run: they are generated once per run (with NumPy) and served to all these points. The runs are
+spread across a process pool in batches, and the performance of the users is aggregated for each point (see
+`MonteCarlo.aggregate`) into a row of a results table, which is written to a CSV file.
+
+Usage
+-----
+To simulate 20 runs of 365 days with 10 buy-and-hold users for each combination of 3 machine prices and 2 prizes:
+    `python sweep.py --grid machine_price=400,600,800 total_prize=50,100 --runs 20 --users 10 --strategy buy-and-hold`
+To sample 30 points of ranges of the parameters (Latin hypercube), from the defaults of a JSON file:
+    `python sweep.py --lhs 30 --ranges machine_price=400:800 daily_machine_limit=5:20 --config economy.json`
+
+Classes
+-------
+Sweep
+    A class to simulate the points of a parameter sweep in parallel and tabulate their results.
+
+Functions
+---------
+grid(space)
+    Returns the points of a grid of parameter values.
+latin_hypercube(ranges, n_points, seed = 0)
+    Returns the points of a Latin hypercube sample of parameter ranges.
+strategy_policy(strategy, config)
+    Creates the decision policy of a named strategy for a configuration.
+run_batch(configs, seeds, n_days, n_users, strategy = 'passive', log_backend = 'sparse')
+    Runs several seeded simulations of several configurations that share their market parameters.
+write_table(rows, path)
+    Writes the results table to a CSV file.
+'''
+
+# import libraries and classes
+import argparse
+import csv
+import inspect
+import itertools
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from market import Market
+from blockchain import BlockChain
+from config import GameConfig, DEFAULTS, INTEGER_PARAMETERS
+from montecarlo import MonteCarlo, METRICS
+from seeding import derive_seed
+from strategies import STRATEGIES
+
+# optional dependency (generates the shared price paths)
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# the statistics of each metric in the results table
+STATISTICS = ('mean', 'std', 'p5', 'median', 'p95')
+# the columns of the results table
+TABLE_COLUMNS = (tuple(DEFAULTS) + ('runs', 'days_mean', 'bankruptcy_rate')
+                 + tuple(f'{metric}_{statistic}' for metric in METRICS for statistic in STATISTICS))
+
+# the points of a grid
+def grid(space):
+    '''
+    Returns the points of a grid, i.e. every combination of the values of the parameters.
+
+    Parameters
+    ----------
+    space : dict
+        The parameter names (keys) and their values (values, lists), e.g. `{'machine_price': [400, 600, 800]}`.
+
+    Returns
+    -------
+    list
+        The points, as dictionaries of parameter names and values.
+
+    Raises
+    ------
+    ValueError
+        If a parameter is unknown or has no value.
+    '''
+
+    for name, values in space.items():
+        if name not in DEFAULTS:
+            raise ValueError(f'Invalid parameter: {name} is not a parameter of the game.')
+        if not values:
+            raise ValueError(f'Invalid grid: {name} has no value.')
+
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+# the points of a latin hypercube
+def latin_hypercube(ranges, n_points, seed = 0):
+    '''
+    Returns the points of a Latin hypercube sample of parameter ranges: the range of each parameter is split into
+    `n_points` intervals of equal width, and each interval is sampled by exactly one point (at a uniformly random
+    position), the intervals of the parameters being paired at random. The integer parameters are rounded.
+
+    Parameters
+    ----------
+    ranges : dict
+        The parameter names (keys) and their ranges (values, `(low, high)` tuples).
+    n_points : int
+        Number of points.
+    seed : int, optional
+        The seed of the sample (default is 0).
+
+    Returns
+    -------
+    list
+        The points, as dictionaries of parameter names and values.
+
+    Raises
+    ------
+    ValueError
+        If a parameter is unknown, a range is empty, or the number of points is not positive.
+    '''
+
+    if n_points < 1:
+        raise ValueError(f'Invalid sample: The number of points must be positive, got {n_points}.')
+
+    rng = random.Random(seed)
+    points = [{} for _ in range(n_points)]
+    for name, (low, high) in ranges.items():
+        if name not in DEFAULTS:
+            raise ValueError(f'Invalid parameter: {name} is not a parameter of the game.')
+        if low > high:
+            raise ValueError(f'Invalid range: {name} must satisfy low <= high, got {low} and {high}.')
+
+        # one point in each interval, in random order
+        intervals = list(range(n_points))
+        rng.shuffle(intervals)
+        for point, interval in zip(points, intervals):
+            value = low + (high - low) * (interval + rng.random()) / n_points
+            point[name] = round(value) if name in INTEGER_PARAMETERS else value
+    return points
+
+# the policy of a strategy
+def strategy_policy(strategy, config):
+    '''
+    Creates the decision policy of a strategy of `strategies.py`, with the parameters of the strategy that are also
+    parameters of the game (e.g. the prize of `ExpectedProfit`) taken from the configuration.
+
+    Parameters
+    ----------
+    strategy : str
+        The name of the strategy (see `strategies.STRATEGIES`).
+    config : GameConfig
+        The configuration.
+
+    Returns
+    -------
+    Strategy
+        The policy.
+    '''
+
+    strategy_class = STRATEGIES[strategy]
+    parameters = inspect.signature(strategy_class).parameters
+    return strategy_class(**{name: value for name, value in config.as_dict().items() if name in parameters})
+
+# run several simulations of several configurations in one task
+def run_batch(configs, seeds, n_days, n_users, strategy = 'passive', log_backend = 'sparse'):
+    '''
+    Runs the seeded simulations of several configurations that share their market parameters. The price paths of
+    each seed are generated once (with NumPy), and served to the markets of all the configurations; without NumPy,
+    each market draws the same prices from its seeded generator.
+
+    Parameters
+    ----------
+    configs : list
+        The `GameConfig` objects, with the same market parameters.
+    seeds : list
+        The seeds of the runs.
+    n_days : int
+        Number of days in each simulation.
+    n_users : int
+        Number of users in each simulation. The users are named 'User 1', 'User 2', etc.
+    strategy : str, optional
+        The name of the strategy followed by every user (default is 'passive').
+    log_backend : str, optional
+        How the user activity logs are stored, see `BlockChain.create_logs` (default is 'sparse').
+
+    Returns
+    -------
+    list
+        `(position, result)` tuples, where `position` is the position of the configuration in `configs` and `result`
+        the result of a run (see `montecarlo.run_simulation`).
+    '''
+
+    policies = [strategy_policy(strategy, config) for config in configs]
+    results = []
+    for seed in seeds:
+        # the price paths of the run, shared by the configurations
+        if np is not None:
+            market_config = configs[0]
+            sdpa_paths, elec_paths = Market.price_paths(1, n_days, market_config.initial_sdpa_price,
+                                                        derive_seed(seed, 'prices'), market_config.sdpa_return_mean,
+                                                        market_config.sdpa_return_std, market_config.elec_price_low,
+                                                        market_config.elec_price_high)
+            sdpa_path = sdpa_paths[0].tolist()
+            elec_path = elec_paths[0].tolist()
+
+        for position, (config, policy) in enumerate(zip(configs, policies)):
+            market = config.market(seed = derive_seed(seed, 'market'))
+            if np is not None:
+                market.sdpa_path = sdpa_path
+                market.elec_path = elec_path
+            blockchain = BlockChain(n_days, seed = derive_seed(seed, 'blockchain'))
+            users = [config.new_user(f'User {i + 1}') for i in range(n_users)]
+            sim = config.simulation(market, blockchain, users, policy, log_backend = log_backend).run()
+            results.append((position, {'seed': seed, 'days': sim.current_day, 'users': sim.results()}))
+    return results
+
+# write the results table
+def write_table(rows, path):
+    '''
+    Writes the results table to a CSV file, one row per point.
+
+    Parameters
+    ----------
+    rows : list
+        The rows (see `Sweep.run`).
+    path : str
+        The CSV file.
+    '''
+
+    with open(path, 'w', newline = '', encoding = 'utf-8') as file:
+        writer = csv.DictWriter(file, fieldnames = TABLE_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+class Sweep:
+    '''
+    A class to simulate the points of a parameter sweep in parallel, and tabulate their results.
+    ...
+
+    Attributes
+    ----------
+    points : list
+        The points, as dictionaries of the parameters that differ from the base configuration.
+    n_runs : int
+        Number of simulations of each point.
+    n_days : int
+        Number of days in each simulation.
+    n_users : int
+        Number of users in each simulation.
+    strategy : str
+        The name of the strategy followed by every user.
+    base_config : GameConfig
+        The configuration of the parameters that are not swept.
+    seed : int
+        The base seed; run i of every point is seeded with `seed + i`.
+    n_workers : int
+        Number of worker processes.
+    batch_size : int
+        Number of runs per task of the process pool.
+    log_backend : str
+        How the user activity logs are stored.
+
+    Methods
+    -------
+    configs()
+        Returns the configuration of each point.
+    seeds()
+        Returns the seed of each run.
+    iter_results()
+        Runs the simulations and yields the result of each run as soon as it is available.
+    run()
+        Runs all the simulations and returns the results table.
+    row(config, summary)
+        Returns the row of the results table of a point.
+    '''
+
+    def __init__(self, points, n_runs, n_days, n_users, strategy = 'passive', base_config = None, seed = 0,
+                 n_workers = None, batch_size = None, log_backend = 'sparse'):
+        '''
+        Parameters
+        ----------
+        points : list
+            The points, as dictionaries of parameter names and values (see `grid` and `latin_hypercube`).
+        n_runs : int
+            Number of simulations of each point.
+        n_days : int
+            Number of days in each simulation.
+        n_users : int
+            Number of users in each simulation.
+        strategy : str, optional
+            The name of the strategy followed by every user, see `strategies.STRATEGIES` (default is 'passive').
+        base_config : GameConfig, optional
+            The configuration of the parameters that are not swept (default is None, i.e. the defaults of the game).
+        seed : int, optional
+            The base seed (default is 0).
+        n_workers : int, optional
+            Number of worker processes (default is None, i.e. the number of CPUs).
+        batch_size : int, optional
+            Number of runs per task (default is None, i.e. about 4 tasks per worker).
+        log_backend : str, optional
+            How the user activity logs are stored, see `BlockChain.create_logs` (default is 'sparse').
+
+        Raises
+        ------
+        ValueError
+            If the strategy is unknown, or a point is not a valid configuration.
+        '''
+
+        if strategy not in STRATEGIES:
+            raise ValueError(f'Invalid strategy: {strategy} is not one of {sorted(STRATEGIES)}.')
+
+        self.points = list(points)
+        self.n_runs = n_runs
+        self.n_days = n_days
+        self.n_users = n_users
+        self.strategy = strategy
+        self.base_config = base_config if base_config is not None else GameConfig()
+        self.seed = seed
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self.batch_size = batch_size or max(1, n_runs // (self.n_workers * 4))
+        self.log_backend = log_backend
+        # validate the points before any simulation
+        self.configs()
+
+    # configuration of each point
+    def configs(self):
+        '''
+        Returns the configuration of each point.
+
+        Returns
+        -------
+        list
+            The `GameConfig` objects, in the order of the points.
+        '''
+
+        return [self.base_config.replace(**point) for point in self.points]
+
+    # seed of each run
+    def seeds(self):
+        '''
+        Returns the seed of each run (the same for every point).
+
+        Returns
+        -------
+        list
+            The seeds.
+        '''
+
+        return [self.seed + i for i in range(self.n_runs)]
+
+    # stream the results
+    def iter_results(self):
+        '''
+        Runs the simulations across the process pool and yields the result of each run as soon as its batch has
+        completed. Each task runs a batch of seeds for all the points that share the same market parameters, so that
+        they share the price paths. With a single worker, the simulations run in the current process.
+
+        Yields
+        ------
+        tuple
+            The position of the point, and the result of the run (see `montecarlo.run_simulation`).
+        '''
+
+        # the points of each market
+        configs = self.configs()
+        markets = {}
+        for position, config in enumerate(configs):
+            markets.setdefault(config.market_parameters(), []).append(position)
+
+        seeds = self.seeds()
+        batches = [seeds[i:i + self.batch_size] for i in range(0, len(seeds), self.batch_size)]
+        tasks = [(positions, batch) for positions in markets.values() for batch in batches]
+        args = (self.n_days, self.n_users, self.strategy, self.log_backend)
+
+        # no need for worker processes
+        if self.n_workers == 1:
+            for positions, batch in tasks:
+                for position, result in run_batch([configs[i] for i in positions], batch, *args):
+                    yield positions[position], result
+            return
+
+        with ProcessPoolExecutor(max_workers = self.n_workers) as executor:
+            futures = {executor.submit(run_batch, [configs[i] for i in positions], batch, *args): positions
+                       for positions, batch in tasks}
+            for future in as_completed(futures):
+                positions = futures[future]
+                for position, result in future.result():
+                    yield positions[position], result
+
+    # run and tabulate
+    def run(self):
+        '''
+        Runs all the simulations, and aggregates the results of each point (see `MonteCarlo.aggregate`).
+
+        Returns
+        -------
+        list
+            The rows of the results table, one per point, in the order of the points (see `row`).
+        '''
+
+        results = [[] for _ in self.points]
+        for position, result in self.iter_results():
+            results[position].append(result)
+        return [self.row(config, MonteCarlo.aggregate(point_results))
+                for config, point_results in zip(self.configs(), results)]
+
+    # a row of the results table
+    @staticmethod
+    def row(config, summary):
+        '''
+        Returns the row of the results table of a point: its parameters, the number of runs, the mean number of
+        simulated days, the bankruptcy rate, and the statistics (`STATISTICS`) of each performance metric over all
+        users of all runs.
+
+        Parameters
+        ----------
+        config : GameConfig
+            The configuration of the point.
+        summary : dict
+            The aggregated results of the point (see `MonteCarlo.aggregate`).
+
+        Returns
+        -------
+        dict
+            The values of the columns of `TABLE_COLUMNS`.
+        '''
+
+        row = config.as_dict()
+        row['runs'] = summary['runs']
+        row['days_mean'] = summary['days'].get('mean')
+        row['bankruptcy_rate'] = summary['bankruptcy_rate']
+        for metric in METRICS:
+            metric_summary = summary['metrics'][metric]['all']
+            for statistic in STATISTICS:
+                row[f'{metric}_{statistic}'] = metric_summary.get(statistic)
+        return row
+
+# parse a number of the command line
+def parse_number(text):
+    number = float(text)
+    return int(number) if number.is_integer() and not any(char in text for char in '.eE') else number
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Sweep the economic parameters of the SDPA coin mining game.')
+    points_group = parser.add_mutually_exclusive_group(required = True)
+    points_group.add_argument('--grid', nargs = '+', metavar = 'NAME=V1,V2', help = 'values of the parameters of the grid')
+    points_group.add_argument('--lhs', type = int, metavar = 'N', help = 'number of points of a Latin hypercube sample')
+    parser.add_argument('--ranges', nargs = '+', default = [], metavar = 'NAME=LOW:HIGH',
+                        help = 'ranges of the parameters of the Latin hypercube sample')
+    parser.add_argument('--config', default = None, help = 'JSON file of the parameters that are not swept (see config.py)')
+    parser.add_argument('--runs', type = int, default = 10, help = 'number of simulations of each point')
+    parser.add_argument('--days', type = int, default = 365, help = 'number of days in each simulation')
+    parser.add_argument('--users', type = int, default = 10, help = 'number of users in each simulation')
+    parser.add_argument('--strategy', choices = sorted(STRATEGIES), default = 'passive', help = 'strategy followed by every user')
+    parser.add_argument('--seed', type = int, default = 0, help = 'base seed')
+    parser.add_argument('--workers', type = int, default = None, help = 'number of worker processes (default: all CPUs)')
+    parser.add_argument('--output', default = 'sweep.csv', help = 'CSV file of the results table (default: sweep.csv)')
+    cli_args = parser.parse_args()
+
+    try:
+        if cli_args.grid is not None:
+            space = {}
+            for text in cli_args.grid:
+                name, _, values = text.partition('=')
+                space[name] = [parse_number(value) for value in values.split(',') if value]
+            points = grid(space)
+        else:
+            if not cli_args.ranges:
+                parser.error('--lhs requires --ranges')
+            ranges = {}
+            for text in cli_args.ranges:
+                name, _, bounds = text.partition('=')
+                low, _, high = bounds.partition(':')
+                ranges[name] = (parse_number(low), parse_number(high))
+            points = latin_hypercube(ranges, cli_args.lhs, cli_args.seed)
+
+        base_config = GameConfig.load(cli_args.config) if cli_args.config is not None else None
+        sweep = Sweep(points, cli_args.runs, cli_args.days, cli_args.users, cli_args.strategy, base_config,
+                      cli_args.seed, cli_args.workers)
+    except ValueError as err:
+        parser.error(str(err))
+
+    rows = sweep.run()
+    write_table(rows, cli_args.output)
+
+    # print the swept parameters and the main results of each point
+    columns = list(points[0]) + ['bankruptcy_rate', 'investment_return_pct_mean', 'mining_performance_mean']
+    print('  '.join(f'{column:>26}' for column in columns))
+    for row in rows:
+        print('  '.join(f'{row[column]:>26.6g}' for column in columns))
+    print(f'{len(rows)} points written to {cli_args.output}.')
@@ -0,0 +1,16 @@
+# Georgius Benedikt Ermanta
+# Fintech
+# This module makes the modules of the game importable from the tests.
+
+'''
+conftest.py
+-----------
+The pytest configuration of the tests: the modules of the game are flat modules in the parent directory, which is
+added to the import path.
+'''
+
+# import libraries
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
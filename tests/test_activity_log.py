@@ -0,0 +1,83 @@
+# Georgius Benedikt Ermanta
+# Fintech
+# This module tests the storage backends of the user activity log.
+
+'''
+test_activity_log.py
+--------------------
+Tests of `activity_log.py`: a memory-mapped log reads back what was recorded, after being closed and reopened, and
+the columnar logs list the recorded days of each user as the sparse log does.
+'''
+
+# import libraries and classes
+import pytest
+
+from activity_log import ColumnarActivityLog, MemmapActivityLog, SparseActivityLog
+
+# the events recorded in the tests: (user_name, day, key, param)
+EVENTS = [('a', 1, 'Action 1', 2), ('b', 1, 'Electricity', 12.5), ('a', 1, 'Prize', 100.0), ('b', 2, 'Action 3', 'on'),
+          ('a', 2, 'Action 2', 1.25), ('b', 2, 'Bankrupt', 'yes')]
+
+def test_memmap_round_trip(tmp_path):
+    path = str(tmp_path / 'activity.log')
+    expected = SparseActivityLog(2, ['a', 'b'])
+    with MemmapActivityLog(path, 2, ['a', 'b']) as log:
+        for event in EVENTS:
+            log.record(*event)
+            expected.record(*event)
+
+    log = MemmapActivityLog(path, mode = 'r')
+    assert log.count == len(EVENTS)
+    # the events are read back in the order they were recorded
+    assert log.events() == EVENTS
+    for user_name in ('a', 'b'):
+        for day in ('Day 1', 'Day 2'):
+            assert log[user_name][day] == expected[user_name][day]
+    log.close()
+
+@pytest.mark.parametrize('record_many', [False, True])
+def test_memmap_append_to_empty_log(tmp_path, record_many):
+    # a closed log without records is truncated to its header, so appending must grow the file from nothing
+    path = str(tmp_path / 'activity.log')
+    MemmapActivityLog(path, 5, ['a']).close()
+
+    log = MemmapActivityLog(path, mode = 'a')
+    if record_many:
+        log.record_many(['a'] * 3000, 1, 'Prize', [3.0] * 3000)
+    else:
+        log.record('a', 1, 'Prize', 3.0)
+    log.close()
+
+    log = MemmapActivityLog(path, mode = 'r')
+    assert log.count == (3000 if record_many else 1)
+    assert log['a']['Day 1']['Prize'] == 3.0
+    log.close()
+
+def test_memmap_append_after_reopen(tmp_path):
+    path = str(tmp_path / 'activity.log')
+    with MemmapActivityLog(path, 2, ['a', 'b']) as log:
+        for event in EVENTS[:3]:
+            log.record(*event)
+    with MemmapActivityLog(path, mode = 'a') as log:
+        for event in EVENTS[3:]:
+            log.record(*event)
+
+    log = MemmapActivityLog(path, mode = 'r')
+    assert log.events() == EVENTS
+    log.close()
+
+@pytest.mark.parametrize('backend', ['columnar', 'memmap'])
+def test_recorded_days(tmp_path, backend):
+    expected = SparseActivityLog(3, ['a', 'b', 'c'])
+    if backend == 'columnar':
+        log = ColumnarActivityLog(3, ['a', 'b', 'c'])
+    else:
+        log = MemmapActivityLog(str(tmp_path / 'activity.log'), 3, ['a', 'b', 'c'], capacity = 2)
+    for event in EVENTS + [('a', 3, 'Prize', 5.0)]:
+        log.record(*event)
+        expected.record(*event)
+        # reading the days does not prevent the log from growing
+        for user_name in ('a', 'b', 'c'):
+            assert log.recorded_days(user_name) == expected.recorded_days(user_name)
+    assert log.recorded_days('a') == [1, 2, 3]
+    assert log.recorded_days('c') == []
@@ -0,0 +1,74 @@
+# Georgius Benedikt Ermanta
+# Fintech
+# This module tests the population engine against the day by day simulation.
+
+'''
+test_engine.py
+--------------
+Tests of `engine.py`: for the same seeds, `PopulationSimulation` gives the same winners, results and logs as
+`Simulation`, with the default economy and a configured one.
+'''
+
+# import libraries and classes
+import pytest
+
+from blockchain import BlockChain
+from config import GameConfig
+from population import UserPopulation
+from strategies import BuyAndHold, ThresholdSeller, PoolSwitcher, ExpectedProfit, Combined, Periodic
+
+pytest.importorskip('numpy')
+from engine import PopulationSimulation
+
+# the economies of the tests
+ECONOMIES = [GameConfig(), GameConfig(machine_price = 20000, daily_machine_limit = 3, initial_capital = 90000),
+             GameConfig(machine_price = 450, daily_machine_limit = 25, base_pooled_mach = 300, total_prize = 40)]
+
+# the decision policies of the users: a different mix for every other user, and passive users
+def policies():
+    buy = Combined(Periodic(BuyAndHold(), 15), ThresholdSeller(56, 0.5))
+    switch = Combined(Periodic(BuyAndHold(4, 'solo'), 25), PoolSwitcher(20))
+    expected = Combined(ExpectedProfit(), ThresholdSeller(60, 0.25))
+    strategies = [buy, switch, expected]
+    return {f'User {i + 1}': strategies[i % 3] for i in range(40) if i % 4 != 3}
+
+# the same game, run by `Simulation` and `PopulationSimulation`
+def play(config, seed, log_backend):
+    users = [config.new_user(f'User {i + 1}') for i in range(40)]
+    # a few users start with more capital, to mix bankruptcies and survivors
+    for i, user in enumerate(users):
+        user.capital += 1000 * (i % 7)
+    # the population has the default economy: the engine's machine price and daily limit apply to its members
+    population = UserPopulation()
+    for user in users:
+        population.add_user(user.name, user.capital)
+
+    expected = config.simulation(config.market(seed = seed), BlockChain(200, seed = seed + 1), users, policies(),
+                                 log_backend = log_backend).run(fast_forward = False)
+    engine = PopulationSimulation(config.market(seed = seed), BlockChain(200, seed = seed + 1), population, policies(),
+                                  config.base_pooled_mach, config.total_prize, config.machine_price,
+                                  config.daily_machine_limit, log_backend).run()
+    return expected, engine
+
+@pytest.mark.parametrize('config', ECONOMIES)
+@pytest.mark.parametrize('seed', [1, 2, 3])
+def test_engine_matches_simulation(config, seed):
+    expected, engine = play(config, seed, 'sparse')
+    assert engine.current_day == expected.current_day
+    assert engine.winners == expected.winners
+    assert engine.results() == expected.results()
+    assert dict(engine.bankruptcy_log) == dict(expected.bankruptcy_log)
+    assert engine.user_activity_log.events() == expected.user_activity_log.events()
+
+def test_engine_columnar_log():
+    # the columnar log records the events of a day in another order
+    expected, engine = play(ECONOMIES[1], 4, 'columnar')
+    assert engine.results() == expected.results()
+    assert sorted(engine.user_activity_log.events()) == sorted(expected.user_activity_log.events())
+
+def test_non_default_economy_buys_machines():
+    # machines far more expensive than by default are still bought, within the configured limit
+    expected, engine = play(ECONOMIES[1], 5, 'sparse')
+    machines = [result['machines'] for result in engine.results()]
+    assert machines == [result['machines'] for result in expected.results()]
+    assert 0 < max(machines) <= 3 * 200
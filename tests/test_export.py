@@ -0,0 +1,72 @@
+# Georgius Benedikt Ermanta
+# Fintech
+# This module tests the columnar export of the simulation results.
+
+'''
+test_export.py
+--------------
+Tests of `export.py`: the export of a simulation resumed from a checkpoint into the same directory is the same as that
+of an uninterrupted simulation.
+'''
+
+# import libraries and classes
+import pytest
+
+from market import Market
+from blockchain import BlockChain
+from user_account import UserAccount
+from simulation import Simulation
+from strategies import BuyAndHold, ThresholdSeller, Periodic, Combined
+from checkpoint import Checkpointer
+from export import Exporter, load_table
+
+np = pytest.importorskip('numpy')
+
+# the decision policies of the users
+def policies():
+    return {f'u{i}': Combined(Periodic(BuyAndHold(3 + i, 'pooled' if i % 2 else 'solo'), 7), ThresholdSeller(60, 0.5))
+            for i in range(6)}
+
+def new_game(**kwargs):
+    users = [UserAccount(f'u{i}', 20000) for i in range(8)]
+    return Simulation(Market(seed = 11), BlockChain(30, seed = 12), users, policies(), log_backend = 'columnar', **kwargs)
+
+# the CSV chunks of a table, concatenated
+def read_csv(directory, name):
+    rows = []
+    for path in sorted(directory.glob(f'{name}-*.csv')):
+        lines = path.read_text().splitlines()
+        rows.extend(lines[1:])
+    return rows
+
+def test_resumed_export_matches_uninterrupted(tmp_path):
+    expected = tmp_path / 'expected'
+    new_game(exporter = Exporter(str(expected), ('csv', 'npz'), chunk_rows = 40)).run()
+
+    # the first run writes a checkpoint at day 10 and stops after day 15
+    resumed = tmp_path / 'resumed'
+    checkpoint = str(tmp_path / 'game.ckpt')
+    interrupted = new_game(checkpointer = Checkpointer(checkpoint, 10),
+                           exporter = Exporter(str(resumed), ('csv', 'npz'), chunk_rows = 40))
+    interrupted.run(15)
+    interrupted.exporter.close()
+
+    # the days after the checkpoint are exported again, after the days before it
+    sim = Simulation.resume(checkpoint, policies(), exporter = Exporter(str(resumed), ('csv', 'npz'), chunk_rows = 40))
+    assert sim.current_day == 10
+    sim.run()
+
+    for name in ('events', 'days', 'users'):
+        assert read_csv(resumed, name) == read_csv(expected, name)
+        resumed_table = load_table(str(resumed), name)
+        expected_table = load_table(str(expected), name)
+        for column in expected_table:
+            assert np.array_equal(resumed_table[column], expected_table[column])
+
+def test_new_export_replaces_previous_one(tmp_path):
+    # a longer previous run leaves more chunks than the new one writes
+    new_game(exporter = Exporter(str(tmp_path), 'csv', chunk_rows = 4)).run()
+    new_game(exporter = Exporter(str(tmp_path), 'csv', chunk_rows = 4)).run(5)
+
+    days = read_csv(tmp_path, 'days')
+    assert [int(row.split(',')[0]) for row in days] == [1, 2, 3, 4, 5]
@@ -0,0 +1,47 @@
+# Georgius Benedikt Ermanta
+# Fintech
+# This module tests that recorded sessions are replayed exactly.
+
+'''
+test_replay.py
+--------------
+Tests of `replay.py`: replaying the activity log of a session, or of a checkpoint, reproduces the recorded end state,
+including for a game with a non-default economy.
+'''
+
+# import libraries and classes
+import copy
+
+import pytest
+
+from blockchain import BlockChain
+from checkpoint import Checkpointer
+from config import GameConfig
+from replay import Replay, replay_checkpoint
+from strategies import BuyAndHold, ThresholdSeller, Combined
+
+# the economies of the tests
+ECONOMIES = [GameConfig(), GameConfig(machine_price = 800, daily_machine_limit = 5, initial_capital = 30000)]
+
+def play(config, log_backend, checkpointer = None):
+    users = [config.new_user(f'u{i}') for i in range(12)]
+    initial_users = copy.deepcopy(users)
+    policy = Combined(BuyAndHold(), ThresholdSeller(55, 0.5))
+    simulation = config.simulation(config.market(seed = 21), BlockChain(60, seed = 22), users, policy,
+                                   log_backend = log_backend, checkpointer = checkpointer)
+    return simulation.run(), initial_users
+
+@pytest.mark.parametrize('config', ECONOMIES)
+@pytest.mark.parametrize('log_backend', ['sparse', 'columnar'])
+def test_replay_reproduces_session(config, log_backend):
+    simulation, initial_users = play(config, log_backend)
+    replay = Replay(initial_users, simulation.user_activity_log, simulation.sdpa_prices, simulation.elec_prices,
+                    simulation.winners, config.base_pooled_mach, config.total_prize, config.machine_price)
+    replay.run()
+    assert replay.verify(simulation.users) == []
+
+@pytest.mark.parametrize('config', ECONOMIES)
+def test_replay_checkpoint(tmp_path, config):
+    path = str(tmp_path / 'game.ckpt')
+    play(config, 'columnar', Checkpointer(path, 20))
+    assert replay_checkpoint(path) == []
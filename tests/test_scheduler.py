@@ -0,0 +1,65 @@
+# Georgius Benedikt Ermanta
+# Fintech
+# This module tests the event-driven simulation against the day by day simulation.
+
+'''
+test_scheduler.py
+-----------------
+Tests of `scheduler.py`: with one mining round per day, `EventSimulation` gives the same results as `Simulation` for the
+same seeds, a run resumed from a checkpoint gives the same results as an uninterrupted run, and the instrumented phases
+of a day do not overlap.
+'''
+
+# import libraries and classes
+import pytest
+
+from market import Market
+from blockchain import BlockChain
+from user_account import UserAccount
+from simulation import Simulation
+from scheduler import EventSimulation
+from checkpoint import Checkpointer
+from instrumentation import Instrumentation, PHASES
+from strategies import BuyAndHold, ThresholdSeller, PoolSwitcher, Combined, Periodic, Staggered
+
+# the decision policies of the users: some act at a random time of the day
+def policies():
+    return {f'u{i}': Staggered(Combined(Periodic(BuyAndHold(4 + i % 5, 'pooled' if i % 3 else 'solo'), 20),
+                                        ThresholdSeller(58, 0.5), PoolSwitcher(25)), seed = i)
+            for i in range(15)}
+
+def new_game(simulation_class, log_backend = 'sparse', **kwargs):
+    users = [UserAccount(f'u{i}', 3000 + 2500 * i) for i in range(18)]
+    return simulation_class(Market(seed = 31), BlockChain(150, seed = 32), users, policies(), log_backend = log_backend,
+                            **kwargs)
+
+# the end state of a simulation
+def end_state(simulation):
+    return (simulation.results(), simulation.winners, simulation.sdpa_prices, simulation.elec_prices,
+            dict(simulation.bankruptcy_log), simulation.current_day)
+
+@pytest.mark.parametrize('log_backend', ['sparse', 'columnar'])
+def test_one_block_per_day_matches_simulation(log_backend):
+    expected = new_game(Simulation, log_backend).run(fast_forward = False)
+    events = new_game(EventSimulation, log_backend, blocks_per_day = 1).run()
+    assert end_state(events) == end_state(expected)
+    assert sorted(events.user_activity_log.events()) == sorted(expected.user_activity_log.events())
+
+def test_resume_matches_uninterrupted(tmp_path):
+    expected = new_game(EventSimulation, blocks_per_day = 24).run()
+
+    path = str(tmp_path / 'game.ckpt')
+    new_game(EventSimulation, blocks_per_day = 24, checkpointer = Checkpointer(path, 40)).run(100)
+    resumed = EventSimulation.resume(path, policies(), blocks_per_day = 24)
+    assert resumed.current_day == 80
+    resumed.run()
+    assert end_state(resumed) == end_state(expected)
+
+def test_phases_are_timed_once(tmp_path):
+    instrumentation = Instrumentation()
+    new_game(EventSimulation, blocks_per_day = 4, checkpointer = Checkpointer(str(tmp_path / 'game.ckpt'), 50),
+             instrumentation = instrumentation).run()
+    # the close of the day is timed by its own phases, so the phases add up to at most the time of the days
+    assert set(instrumentation.phase_seconds) <= set(PHASES)
+    assert {'bankruptcy', 'checkpoint'} <= set(instrumentation.phase_seconds)
+    assert sum(instrumentation.phase_seconds.values()) <= sum(instrumentation.day_seconds)
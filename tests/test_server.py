@@ -0,0 +1,126 @@
+# Georgius Benedikt Ermanta
+# Fintech
+# This module tests the multiplayer server with scripted players.
+
+'''
+test_server.py
+--------------
+Tests of `server.py`: short games over a Unix socket, with scripted players. A day closes at the deadline when a player
+has not ended their actions (the actions submitted so far are kept), the invalid or late actions are answered with an
+error, and the `play` client stops prompting once the server has closed the day.
+'''
+
+# import libraries and classes
+import asyncio
+import json
+import os
+import time
+
+from market import Market
+from blockchain import BlockChain
+from user_account import UserAccount
+from simulation import Simulation
+from server import GameServer, encode, play
+
+# start a game, and wait until it accepts the players
+async def start_game(path, n_players, n_days, deadline):
+    game = GameServer(n_players, n_days, unix_path = path, deadline = deadline, market = Market(seed = 3),
+                      blockchain = BlockChain(n_days, seed = 4))
+    task = asyncio.create_task(game.serve())
+    while not os.path.exists(path):
+        await asyncio.sleep(0.01)
+    return task
+
+# a scripted player: sends the planned messages of each day, and ends the day unless it stalls
+async def scripted_player(path, name, plan, stall_days = ()):
+    reader, writer = await asyncio.open_unix_connection(path)
+    writer.write(encode({'type': 'join', 'name': name}))
+    messages = []
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        message = json.loads(line)
+        messages.append(message)
+        if message['type'] == 'day':
+            day = message['day']
+            for action in plan.get(day, []):
+                writer.write(encode({'type': 'action', 'day': day, **action}))
+            if day not in stall_days:
+                writer.write(encode({'type': 'end', 'day': day}))
+        elif message['type'] == 'day_closed' and message['day'] in stall_days:
+            # too late: the day is closed
+            writer.write(encode({'type': 'action', 'day': message['day'], 'action': 3}))
+        elif message['type'] == 'end_of_run':
+            break
+        await writer.drain()
+    writer.close()
+    return messages
+
+# the same game, played without the server (the players in order of joining)
+def reference_game(simulation, plans):
+    def policy(user, market_snapshot, current_day):
+        return plans[user.name].get(current_day, [])
+    n_days = simulation.blockchain.n_days
+    users = [UserAccount(user.name) for user in simulation.users]
+    return Simulation(Market(seed = 3), BlockChain(n_days, seed = 4), users, policy).run(fast_forward = False)
+
+def test_deadline_and_rejected_actions(tmp_path):
+    plans = {'a': {1: [{'action': 1, 'param': 5}, {'action': 9}, {'action': 3}]},
+             'b': {1: [{'action': 1, 'param': 'two'}, {'action': 1, 'param': 2}, {'action': 3}],
+                   2: [{'action': 4}]}}
+    path = str(tmp_path / 'game.sock')
+
+    async def game():
+        task = await start_game(path, 2, 3, deadline = 0.3)
+        start = time.perf_counter()
+        messages = await asyncio.gather(scripted_player(path, 'a', plans['a']),
+                                        scripted_player(path, 'b', plans['b'], stall_days = (2,)))
+        return await task, messages, time.perf_counter() - start
+
+    simulation, (messages_a, messages_b), elapsed = asyncio.run(game())
+
+    # the invalid actions are rejected as they are submitted
+    errors_a = [message['message'] for message in messages_a if message['type'] == 'error']
+    errors_b = [message['message'] for message in messages_b if message['type'] == 'error']
+    assert errors_a == ['Invalid input: To select the action, please enter 1, 2, 3, 4, or 5.']
+    assert errors_b == ['Invalid input: Please provide the quantity as a number.', 'Day 2 is closed for actions.']
+
+    # day 2 closed at the deadline, and every player was told
+    assert 0.3 <= elapsed < 5
+    for messages in (messages_a, messages_b):
+        assert [message['day'] for message in messages if message['type'] == 'day_closed'] == [1, 2, 3]
+
+    # the actions submitted before the deadline are kept, as if the game was played without the server
+    reference = reference_game(simulation, {'a': {1: [(1, 5), (3, None)]},
+                                            'b': {1: [(1, 2), (3, None)], 2: [(4, None)]}})
+    assert simulation.results() == reference.results()
+    assert simulation.user_activity_log.events() == reference.user_activity_log.events()
+    assert ['b', 2, 'Action 4'] in [list(event[:3]) for event in simulation.user_activity_log.events()]
+
+def test_play_stops_prompting_when_the_day_closes(tmp_path, capsys):
+    # the answers of the player: buy 3 machines on day 1, answer too late on day 2, and end day 3
+    answers = iter([(0, '1'), (0, '3'), (0, '5'), (0.6, '1'), (0, '5')])
+
+    def ask(prompt):
+        delay, answer = next(answers, (0, '5'))
+        time.sleep(delay)
+        return answer
+
+    path = str(tmp_path / 'game.sock')
+
+    async def game():
+        task = await start_game(path, 2, 3, deadline = 0.3)
+        player = asyncio.get_running_loop().run_in_executor(None, lambda: play('b', unix_path = path, ask = ask))
+        await asyncio.gather(scripted_player(path, 'a', {}), player)
+        return await task
+
+    simulation = asyncio.run(game())
+    output = capsys.readouterr().out
+
+    assert 'The deadline has passed: day 2 is closed for actions.' in output
+    assert 'Day 2 is closed: the action was not sent.' in output
+    assert 'Simulation Summary' in output
+    # the late answer was not sent
+    assert [event[:3] for event in simulation.user_activity_log.events() if event[0] == 'b'] == [('b', 1, 'Action 1')]
+    assert simulation.results() == reference_game(simulation, {'a': {}, 'b': {1: [(1, 3)]}}).results()
@@ -0,0 +1,95 @@
+# Georgius Benedikt Ermanta
+# Fintech
+# This module tests that the faster code paths of the simulation give the same results as the day by day loop.
+
+'''
+test_simulation.py
+------------------
+Tests of `simulation.py`: for the same seeds, fast-forwarding through the days on which no policy acts gives the same
+end state as simulating every day with `Simulation.step`, and the machines are valued at the users' machine price.
+'''
+
+# import libraries and classes
+import pytest
+
+from market import Market
+from blockchain import BlockChain
+from user_account import UserAccount
+from simulation import Simulation, passive_policy
+from config import GameConfig
+from reporting import render_daily_summary
+from strategies import BuyAndHold, ThresholdSeller, Periodic, Combined
+
+# the attributes of the users compared between the simulations
+FIELDS = [field for field in UserAccount.__slots__ if field not in ('mining_index', 'user_activity_log')]
+
+# the end state of a simulation
+def end_state(simulation):
+    users = [[(field, getattr(user, field, None)) for field in FIELDS] for user in simulation.users]
+    return (users, simulation.user_activity_log.events(), simulation.winners, simulation.sdpa_prices,
+            simulation.elec_prices, simulation.current_day, dict(simulation.bankruptcy_log), simulation.results())
+
+# users who buy machines every 30 days and sell coins above a price, and passive users whose machines were set up
+def periodic_game(log_backend):
+    users = [UserAccount(f'u{i}', 2000 + 1500 * i) for i in range(30)]
+    policies = {f'u{i}': Combined(Periodic(BuyAndHold(10 + i % 7, 'pooled' if i % 3 else 'solo'), 30),
+                                  Periodic(ThresholdSeller(55, 0.5), 45, 3)) for i in range(20)}
+    simulation = Simulation(Market(seed = 7), BlockChain(300, seed = 8), users, policies, log_backend = log_backend)
+    for i, user in enumerate(simulation.users[20:]):
+        user.machines = 5 + i
+        user.machine_status = 'on' if i % 4 else 'off'
+        user.mining_type = 'pooled' if i % 2 else 'solo'
+    return simulation
+
+# users who go bankrupt after buying as many machines as they can afford
+def bankrupt_game(log_backend):
+    users = [UserAccount(f'u{i}', 600 * 8 + 50 * i) for i in range(25)]
+    policies = {f'u{i}': Periodic(BuyAndHold(8, 'solo' if i % 2 else 'pooled'), 1000) for i in range(25)}
+    return Simulation(Market(seed = 3), BlockChain(200, seed = 4), users, policies, log_backend = log_backend)
+
+@pytest.mark.parametrize('game', [periodic_game, bankrupt_game])
+@pytest.mark.parametrize('log_backend', ['sparse', 'columnar'])
+def test_fast_forward_matches_step(monkeypatch, game, log_backend):
+    # fast-forward small populations too
+    monkeypatch.setattr(Simulation, 'fast_forward_min_users', 0)
+    stepped = game(log_backend)
+    stepped.run(fast_forward = False)
+    fast = game(log_backend)
+    fast.run()
+    assert end_state(fast) == end_state(stepped)
+
+    # in several runs
+    partial = game(log_backend)
+    partial.run(37)
+    partial.run(11)
+    partial.run()
+    assert end_state(partial) == end_state(stepped)
+
+def test_passive_game_fast_forward(monkeypatch):
+    monkeypatch.setattr(Simulation, 'fast_forward_min_users', 0)
+    simulations = []
+    for fast_forward in (False, True):
+        users = [UserAccount(f'u{i}', 50000) for i in range(10)]
+        simulation = Simulation(Market(seed = 5), BlockChain(100, seed = 6), users, passive_policy)
+        for i, user in enumerate(simulation.users):
+            user.machines = 5 + i
+            user.machine_status = 'on'
+            user.mining_type = 'pooled' if i % 2 else 'solo'
+        simulations.append(simulation.run(fast_forward = fast_forward))
+    assert end_state(simulations[1]) == end_state(simulations[0])
+
+def test_results_value_machines_at_users_price():
+    # a simulation built directly (not by `GameConfig.simulation`) values the machines at the users' price
+    config = GameConfig(machine_price = 2000)
+    users = [config.new_user(f'u{i}') for i in range(3)]
+    simulation = Simulation(Market(seed = 1), BlockChain(1, seed = 2), users, {'u0': BuyAndHold(5)})
+    simulation.run()
+
+    result = simulation.results()[0]
+    user = simulation.users[0]
+    assert result['machines'] == 5
+    assert user.capital == config.initial_capital - 5 * 2000 - user.electricity_paid
+    assert result['total_assets'] == user.capital + result['sdpa_value'] + 5 * 2000
+    assert result['investment_return'] == result['total_assets'] - config.initial_capital
+    # the daily summary counts the purchase at the users' price too
+    assert f'Net spending is {round(-5 * 2000 - user.day_electricity, 2)} GBP.' in render_daily_summary(users, 50)
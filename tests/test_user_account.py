@@ -0,0 +1,41 @@
+# Georgius Benedikt Ermanta
+# Fintech
+# This module tests the validation of the quantities of the users' actions.
+
+'''
+test_user_account.py
+--------------------
+Tests of `user_account.py`: purchases of machines and sales of SDPA coins only accept positive quantities of a
+numeric type (or numeric strings), and reject booleans and other values without raising.
+'''
+
+# import libraries and classes
+import pytest
+
+from user_account import UserAccount
+
+np = pytest.importorskip('numpy')
+
+def new_user():
+    user = UserAccount('u', 50000)
+    user.verbose = False
+    user.sdpa_balance = 10
+    user.sdpa_price = 50
+    user.reset_daily_machine_purchases()
+    return user
+
+@pytest.mark.parametrize('n_machines, bought', [(2, 2), ('3', 3), (np.int64(2), 2), (np.int32(1), 1), (True, 0),
+                                                (False, 0), (1.0, 0), (-1, 0), (None, 0), ([1], 0), ('1.5', 0)])
+def test_buy_machines(n_machines, bought):
+    user = new_user()
+    user.buy_machines(n_machines)
+    assert user.machines == bought
+    assert type(user.machines) is int
+
+@pytest.mark.parametrize('n_coins, sold', [(2, 2), (1.5, 1.5), ('1.5', 1.5), (np.float64(2.5), 2.5), (True, 0),
+                                           (None, 0), ([1], 0), (float('nan'), 0), (-1, 0), ('abc', 0), (11, 0)])
+def test_sell_sdpa(n_coins, sold):
+    user = new_user()
+    user.sell_sdpa(n_coins)
+    assert user.sdpa_balance == 10 - sold
+    assert user.capital == 50000 + 50 * sold
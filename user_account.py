@@ -20,6 +20,7 @@ UserAccount
 
 # import libraries
 import math
+import numbers
 
 # UserAccount class
 class UserAccount:
@@ -29,6 +30,8 @@ class UserAccount:
     This module stores user information, including name, capital, SDPA coins balance,
     number of machines owned, machines status, and mining type.
     Moreover, user data will be updated based on the user's chosen action.
+    The attributes are stored in `__slots__` (no per-object `__dict__`) to keep large populations of users compact.
+    For millions of users, see `UserPopulation` in `population.py`.
     ...
 
     Attributes
@@ -47,12 +50,34 @@ class UserAccount:
         Users can either be a solo miner or part of a mining pool.
     bankrupt_status : str
         Indicates whether the user is bankrupt ('yes' or 'no').
+    verbose : bool
+        Whether validation and bankruptcy messages are printed (default = True).
+    mining_index : MiningPowerIndex
+        The mining power index the user is registered in, if any.
+    coins_mined : float
+        Running total of the SDPA coins received as mining prizes.
+    electricity_paid : float
+        Running total of the electricity bills paid (GBP).
+    machines_bought : int
+        Running total of the ASIC machines purchased.
+    coins_sold : float
+        Running total of the SDPA coins sold (including automatic sales).
+    sales_proceeds : float
+        Running total of the GBP realised from the sale of SDPA coins.
+    day_mined, day_electricity, day_coins_sold : float
+        The same totals for the current day (reset with `day_machines` by `reset_daily_machine_purchases`).
+    machine_price : int or float
+        The price of 1 ASIC machine (default = 600).
+    daily_machine_limit : int
+        The maximum number of machines the user can purchase in a trading day (default = 10).
     
     Methods
     -------
+    update_mining_index()
+        Reflects changes of the user's mining power in the mining power index.
     reset_daily_machine_purchases()
-        To reset the count of the number of machines purchased for the day.
-    buy_machines(n_machines, machine_price = 600)
+        To reset the count of the number of machines purchased (and the other daily totals) for the day.
+    buy_machines(n_machines, machine_price = None)
         Updates the number of machines owned and capital balance for the purchase of machines.
     sell_sdpa(n_coins)
         Updates the capital and SDPA coin balance for the sale of SPDA coins.
@@ -60,15 +85,24 @@ class UserAccount:
         Toggles machine status between 'off' or 'on'.
     change_mining_type()
         Toggles mining type between 'solo' or 'pooled'
-    action_query(action, sdpa_price, current_day, user_activity_log)
+    action_query(action, sdpa_price, current_day, user_activity_log, param = None)
         Handles user's chosen action and updates the logs.
     electricity_bill(electricity_unit_price, current_day)
         Update the capital balance for electricity bill payment.
+    receive_prize(prize)
+        Updates the SDPA coin balance for a mining prize.
     bankrupt_check(current_day, bankruptcy_log)
         Performs automatic sale of SDPA coins if capital turns negative; otherwise delcare bankruptcy.
     '''
 
-    def __init__(self, name, capital = 50000):
+    # every attribute the class sets (including those set by its methods)
+    __slots__ = ('name', 'capital', 'sdpa_balance', 'machines', 'machine_status', 'mining_type', 'bankrupt_status',
+                 'verbose', 'mining_index', 'day_machines', 'n_machines', 'n_coins', 'valid_indicator', 'current_day',
+                 'sdpa_price', 'user_activity_log', 'total_bill', 'coins_mined', 'electricity_paid', 'machines_bought',
+                 'coins_sold', 'sales_proceeds', 'day_mined', 'day_electricity', 'day_coins_sold', 'machine_price',
+                 'daily_machine_limit')
+
+    def __init__(self, name, capital = 50000, machine_price = 600, daily_machine_limit = 10):
         '''
         Parameters
         ----------
@@ -76,6 +110,10 @@ class UserAccount:
             Name of the user.
         capital : int or float, optional
             The starting cash capital of the user (default = 50000).
+        machine_price : int or float, optional
+            The price of 1 ASIC machine (default = 600).
+        daily_machine_limit : int, optional
+            The maximum number of machines the user can purchase in a trading day (default = 10).
         '''
         # name of the user
         self.name = name
@@ -92,11 +130,38 @@ class UserAccount:
         # bankruptcy status
             # 'yes' to indicate bankruptcy, otherwise 'no'
         self.bankrupt_status = 'no'
+        # print validation and bankruptcy messages (disabled by headless simulations)
+        self.verbose = True
+        # the mining power index the user is registered in (set by `MiningPowerIndex.add`)
+        self.mining_index = None
+        # running totals, updated as the actions, bills and prizes are processed (so that summaries do not need to
+        # scan the activity log)
+        self.coins_mined = 0
+        self.electricity_paid = 0
+        self.machines_bought = 0
+        self.coins_sold = 0
+        self.sales_proceeds = 0
+        # today's totals
+        self.day_mined = 0
+        self.day_electricity = 0
+        self.day_coins_sold = 0
+        # the economics of the machines (see `GameConfig` in `config.py`)
+        self.machine_price = machine_price
+        self.daily_machine_limit = daily_machine_limit
     
+    def update_mining_index(self):
+        '''
+        Reflects changes of the user's machines, machine status, mining type or bankruptcy status in the mining
+        power index used by `BlockChain.winner`. Does nothing if the user is not registered in an index.
+        '''
+        if self.mining_index is not None:
+            self.mining_index.update(self)
+
     def reset_daily_machine_purchases(self):
         '''
         To reset the count of the number of machines purchased for the day.
         This is intended to ensure that the daily purchase limit of the machines is honored.
+        The day's other totals (coins mined, electricity paid and coins sold) are reset as well.
 
         Attributes
         ----------
@@ -104,9 +169,12 @@ class UserAccount:
             The total number of machines that has been purchased in a trading day.
         '''
         self.day_machines = 0
+        self.day_mined = 0
+        self.day_electricity = 0
+        self.day_coins_sold = 0
     
     # purchase new machines
-    def buy_machines(self, n_machines, machine_price = 600):
+    def buy_machines(self, n_machines, machine_price = None):
         '''
         Manages the purchase of mining machines.
         
@@ -116,15 +184,17 @@ class UserAccount:
 
         Parameters
         ----------
-        n_machines : str
-            The number machines to be purchased. Only accepts a positive integer as a string.
+        n_machines : str or int
+            The number machines to be purchased. Only accepts a positive integer, either as a string (user input)
+            or as an integer of any integer type, e.g. a NumPy integer (automated strategies, which skips parsing the
+            string). Booleans are rejected.
         machine_price : int or float, optional
-            The cost of 1 ASIC machine (default = 600).
+            The cost of 1 ASIC machine (default = None, i.e. the user's `machine_price`).
 
         Raises
         ------
         ValueError
-            If `n_machines` is not a positive integer, exceeds the daily purchase limit of 10, or
+            If `n_machines` is not a positive integer, exceeds the daily purchase limit (`daily_machine_limit`), or
             insufficient capital to complete the purchase.
 
         Restrictions
@@ -140,17 +210,26 @@ class UserAccount:
 
         try:
             # ensure that the input is a positive integer (i.e. preventing negative numbers, non-integer, letters, and characters)
-            if not n_machines.isdigit():
+            if isinstance(n_machines, str):
+                if not n_machines.isdigit():
+                    raise ValueError('Invalid input: Only positive integer values are accepted. (Enter "0" to cancel purchase and go back to main menu.)')
+
+                # convert data type to integer
+                n_machines = int(n_machines)
+            # accept any integer type (e.g. NumPy integers), but not booleans
+            elif not isinstance(n_machines, numbers.Integral) or isinstance(n_machines, bool) or n_machines < 0:
                 raise ValueError('Invalid input: Only positive integer values are accepted. (Enter "0" to cancel purchase and go back to main menu.)')
+            else:
+                # convert data type to integer
+                n_machines = int(n_machines)
 
-            # convert data type to integer
-            n_machines = int(n_machines)
-
-            # ensure that the number of machines purchased per day does not exceed 10
-            if self.day_machines + n_machines > 10:
-                raise ValueError(f'Invalid quantitiy: 10 is the daily limit on the purchase of ASIC machines. {self.day_machines} units has been purchased today. (Enter "0" to cancel purchase and go back to main menu.)')
+            # ensure that the number of machines purchased per day does not exceed the daily limit
+            if self.day_machines + n_machines > self.daily_machine_limit:
+                raise ValueError(f'Invalid quantitiy: {self.daily_machine_limit} is the daily limit on the purchase of ASIC machines. {self.day_machines} units has been purchased today. (Enter "0" to cancel purchase and go back to main menu.)')
 
             # compute total cost
+            if machine_price is None:
+                machine_price = self.machine_price
             total_cost = machine_price * n_machines
             
             # ensure that the user has sufficient capital to purchase the machines
@@ -163,13 +242,18 @@ class UserAccount:
             self.day_machines += n_machines
             # update total number of machines owned
             self.machines += n_machines
+            # update running total of machines purchased
+            self.machines_bought += n_machines
             # update capital
             self.capital -= total_cost
             # update valid indicator
             self.valid_indicator = 1
+            # update mining power
+            self.update_mining_index()
 
         except ValueError as err:
-            print(err)
+            if self.verbose:
+                print(err)
 
     # sell SDPA coin
     def sell_sdpa(self, n_coins):
@@ -182,8 +266,10 @@ class UserAccount:
 
         Parameters
         ----------
-        n_coins : str
-            The number of coins to be sold. Only accepts positive number as a string.
+        n_coins : str, int or float
+            The number of coins to be sold. Only accepts a positive number, either as a string (user input) or
+            as a real number of any type, e.g. a NumPy float (automated strategies, which skips parsing the string).
+            Booleans are rejected.
 
         Raises
         ------
@@ -197,11 +283,15 @@ class UserAccount:
 
         try:
             # ensure that the input is a postive numeric value (including decimal, but exclude negative number)
-            if not n_coins.replace('.', '', 1).isdigit():
-                raise ValueError('Invalid quantitiy: Please enter a positive numeric value. (Enter "0" to cancel SDPA coins sale and go back to main menu.)')
+            if isinstance(n_coins, str):
+                if not n_coins.replace('.', '', 1).isdigit():
+                    raise ValueError('Invalid quantitiy: Please enter a positive numeric value. (Enter "0" to cancel SDPA coins sale and go back to main menu.)')
             
-            # covert data type to float
-            n_coins = float(n_coins)
+                # covert data type to float
+                n_coins = float(n_coins)
+            # numbers of any real type (rejects booleans, non-numeric values, negative values and NaN)
+            elif not isinstance(n_coins, numbers.Real) or isinstance(n_coins, bool) or not n_coins >= 0:
+                raise ValueError('Invalid quantitiy: Please enter a positive numeric value. (Enter "0" to cancel SDPA coins sale and go back to main menu.)')
 
             # prevent short-selling
             if n_coins > self.sdpa_balance:
@@ -213,6 +303,11 @@ class UserAccount:
             # update capital
             self.capital += self.sdpa_price * n_coins
 
+            # update running totals of coins sold and GBP realised
+            self.coins_sold += n_coins
+            self.day_coins_sold += n_coins
+            self.sales_proceeds += self.sdpa_price * n_coins
+
             # update valid indicator
             self.valid_indicator = 1
 
@@ -221,7 +316,8 @@ class UserAccount:
 
         # print error message
         except ValueError as err:
-            print(err)
+            if self.verbose:
+                print(err)
             
     # switch the machines on/off
     def machine_swith(self):
@@ -249,10 +345,13 @@ class UserAccount:
             # turn on the machines if the machines are currently off
             elif self.machine_status == 'off':
                 self.machine_status = 'on'
+            # update mining power
+            self.update_mining_index()
 
         # print error message
         except ValueError as err:
-            print(err)
+            if self.verbose:
+                print(err)
 
     # switch mining type (solo/pooled)
     def change_mining_type(self):
@@ -280,13 +379,16 @@ class UserAccount:
             # change mining type to solo if current mining type is pooled
             elif self.mining_type == 'pooled':
                 self.mining_type = 'solo'
+            # update mining power
+            self.update_mining_index()
 
         # print error message
         except ValueError as err:
-            print(err)
+            if self.verbose:
+                print(err)
 
     # process user's chosen action
-    def action_query(self, action, sdpa_price, current_day, user_activity_log):
+    def action_query(self, action, sdpa_price, current_day, user_activity_log, param = None):
         '''
         Executes user's chosen actions.
 
@@ -301,10 +403,10 @@ class UserAccount:
             The market price of the SDPA coin.
         current_day : int
             The current day.
-        user_activity_log : dict
-            A nested dictionary that stores user's key actions.
+        user_activity_log : SparseActivityLog
+            Stores user's key actions; actions are added with its `record` method.
             This log is generated by the `create_logs` method of the BlockChain class.
-            The data structure is,
+            It reads like the nested dictionary,
                 {
                     user_name: {
                         day: {
@@ -321,7 +423,9 @@ class UserAccount:
                     The type of action performed (e.g. 'Action 1').
                 - param
                     The specified parameter for the action performed.
-
+        param : int or float, optional
+            The quantity for Action 1 (machines to buy) or Action 2 (coins to sell). When provided, the quantity is
+            validated once instead of prompting the user with `input()` (default is None, i.e. prompt the user).
 
         Attributes
         ----------
@@ -329,11 +433,16 @@ class UserAccount:
             The current day.
         sdpa_price : float
             The market price of the SDPA coin.
-        user_activity_log : dict
-            A nested dictionary that stores user's key actions.
+        user_activity_log : SparseActivityLog
+            Stores user's key actions.
         valid_indicator : int
             An indicator to keep track when a valid user input has been provided.
 
+        Returns
+        -------
+        bool
+            False if the quantity supplied through `param` was rejected (nothing is recorded), otherwise True.
+
         Notes
         -----
         - This method assumes that the correct data structure has been provided for the `user_activity_log`
@@ -352,6 +461,12 @@ class UserAccount:
         if action == 1:
             # an indicator to keep track when a valid input has been provided
             self.valid_indicator = 0
+            # headless call: a single attempt with the supplied quantity
+            if param is not None:
+                self.buy_machines(param)
+                # do not record rejected purchases
+                if self.valid_indicator == 0:
+                    return False
             while self.valid_indicator == 0:
                 # query for the number of machines to purchase
                 n_machines = input('Enter number of ASIC machines to buy: ')
@@ -359,12 +474,18 @@ class UserAccount:
                 self.buy_machines(n_machines)
                 
             # update activity log
-            user_activity_log[self.name][f'Day {current_day}']['Action 1'].append(self.n_machines)
+            user_activity_log.record(self.name, current_day, 'Action 1', self.n_machines)
 
         # if choose to sell SDPA coins
         elif action == 2:
             # an indicator to keep track when a valid input has been provided
             self.valid_indicator = 0
+            # headless call: a single attempt with the supplied quantity
+            if param is not None:
+                self.sell_sdpa(param)
+                # do not record rejected sales
+                if self.valid_indicator == 0:
+                    return False
 
             while self.valid_indicator == 0:
                 # query for the number of coins to be sold
@@ -374,7 +495,7 @@ class UserAccount:
                 self.sell_sdpa(sdpa_sold)
 
             # update activity log
-            user_activity_log[self.name][f'Day {current_day}']['Action 2'].append(self.n_coins)
+            user_activity_log.record(self.name, current_day, 'Action 2', self.n_coins)
 
         # if choose to switch ASIC machine (on/off)
         elif action == 3:
@@ -382,7 +503,7 @@ class UserAccount:
             self.machine_swith()
 
             # update activity log
-            user_activity_log[self.name][f'Day {current_day}']['Action 3'].append(self.machine_status)
+            user_activity_log.record(self.name, current_day, 'Action 3', self.machine_status)
 
         # if choose to mining type
         elif action == 4:
@@ -390,7 +511,9 @@ class UserAccount:
             self.change_mining_type()
 
             # update activity log
-            user_activity_log[self.name][f'Day {current_day}']['Action 4'].append(self.mining_type)
+            user_activity_log.record(self.name, current_day, 'Action 4', self.mining_type)
+
+        return True
     
     # charging electricity bill    
     def electricity_bill(self, electricity_unit_price, current_day):
@@ -432,11 +555,35 @@ class UserAccount:
             self.total_bill = self.machines * electricity_unit_price
             # update user's capital
             self.capital -= self.total_bill
+            # update running totals of electricity paid
+            self.electricity_paid += self.total_bill
+            self.day_electricity += self.total_bill
             # update activity log
-            self.user_activity_log[self.name][f'Day {current_day}']['Electricity'] = self.total_bill
+            self.user_activity_log.record(self.name, current_day, 'Electricity', self.total_bill)
         else:
             pass
 
+    # receive a mining prize
+    def receive_prize(self, prize):
+        '''
+        Adds a mining prize to the SDPA coin balance and to the running totals of coins mined.
+
+        Parameters
+        ----------
+        prize : int or float
+            The number of SDPA coins won.
+
+        Notes
+        -----
+        - This method is intended to be called within the `winner` method of the `BlockChain` class.
+        '''
+
+        # update SDPA coin balance
+        self.sdpa_balance += prize
+        # update running totals of coins mined
+        self.coins_mined += prize
+        self.day_mined += prize
+
     # check for bankruptcy
     def bankrupt_check(self, current_day, bankruptcy_log):
         '''
@@ -477,11 +624,12 @@ class UserAccount:
             # check whether the user owns enough SDPA coin
             if sdpa_auto_sale <= self.sdpa_balance:
                 # sell the required amount of SDPA coin
-                self.sell_sdpa(str(sdpa_auto_sale))
-                print(f'{sdpa_auto_sale} SDPA coins belonging to {self.name.capitalize()} were automatically sold to resolve the negative capital balance.')
+                self.sell_sdpa(sdpa_auto_sale)
+                if self.verbose:
+                    print(f'{sdpa_auto_sale} SDPA coins belonging to {self.name.capitalize()} were automatically sold to resolve the negative capital balance.')
 
                 # update activity log
-                self.user_activity_log[self.name][f'Day {current_day}']['Action 2'].append(sdpa_auto_sale)
+                self.user_activity_log.record(self.name, current_day, 'Action 2', sdpa_auto_sale)
 
             # declare bakruptcy
             else:
@@ -490,10 +638,13 @@ class UserAccount:
 
                 # update bankruptcy status
                 self.bankrupt_status = 'yes'
-                print(f"{self.name.capitalize()} has declared bankruptcy. All of {self.name.capitalize()}'s ASIC machines will be taken offline.")
+                # take the machines offline
+                self.update_mining_index()
+                if self.verbose:
+                    print(f"{self.name.capitalize()} has declared bankruptcy. All of {self.name.capitalize()}'s ASIC machines will be taken offline.")
 
                 # update activity log
-                self.user_activity_log[self.name][f'Day {current_day}']['Bankrupt'] = self.bankrupt_status
+                self.user_activity_log.record(self.name, current_day, 'Bankrupt', self.bankrupt_status)
         # do nothing when capital is positive
         else:
             pass
\ No newline at end of file